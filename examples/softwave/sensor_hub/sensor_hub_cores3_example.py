@@ -0,0 +1,69 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+import os, sys, io
+import M5
+from M5 import *
+from hardware import *
+from unit import ENVUnit, UltrasoundI2CUnit, CO2Unit
+from utility import SensorHub
+import asyncio
+
+
+i2c0 = None
+hub = None
+label0 = None
+label1 = None
+label2 = None
+
+
+def show_env(channel, ticks, value):
+    label0.setText("T: %.2f C  RH: %.1f %%" % value)
+
+
+def show_distance(channel, ticks, value):
+    label1.setText("Distance: %.1f mm" % value)
+
+
+def show_co2(channel, ticks, value):
+    label2.setText("CO2: %d ppm" % value[0])
+
+
+async def ui():
+    while True:
+        M5.update()
+        await asyncio.sleep_ms(20)
+
+
+async def main():
+    global i2c0, hub, label0, label1, label2
+
+    M5.begin()
+    Widgets.fillScreen(0x222222)
+    label0 = Widgets.Label("T: -", 10, 20, 1.0, 0xFFFFFF, 0x222222, Widgets.FONTS.DejaVu18)
+    label1 = Widgets.Label("Distance: -", 10, 60, 1.0, 0xFFFFFF, 0x222222, Widgets.FONTS.DejaVu18)
+    label2 = Widgets.Label("CO2: -", 10, 100, 1.0, 0xFFFFFF, 0x222222, Widgets.FONTS.DejaVu18)
+
+    i2c0 = I2C(0, scl=Pin(1), sda=Pin(2), freq=100000)
+    hub = SensorHub()
+    # The hub triggers all three conversions, then reads each one when it is
+    # ready, the UI task keeps running in between.
+    hub.add(ENVUnit(i2c=i2c0, type=3), 1000, callback=show_env)
+    hub.add(UltrasoundI2CUnit(i2c0), 200, callback=show_distance)
+    hub.add(CO2Unit(i2c0), 5000, callback=show_co2, retry_ms=500)
+
+    asyncio.create_task(hub.run_async())
+    await ui()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except (Exception, KeyboardInterrupt) as e:
+        try:
+            from utility import print_error_msg
+
+            print_error_msg(e)
+        except ImportError:
+            print("please update to latest firmware")
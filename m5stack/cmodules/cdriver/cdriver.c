@@ -15,6 +15,7 @@
 extern const mp_obj_module_t mp_module_max30100;
 extern const mp_obj_module_t mp_module_max30102;
 extern const mp_obj_module_t mp_module_esp_dmx;
+extern const mp_obj_module_t mp_module_ir_rmt;
 
 STATIC const mp_rom_map_elem_t mp_module_cdriver_globals_table[] = {
     /* *FORMAT-OFF* */
@@ -22,6 +23,7 @@ STATIC const mp_rom_map_elem_t mp_module_cdriver_globals_table[] = {
     { MP_ROM_QSTR(MP_QSTR_max30100),           MP_OBJ_FROM_PTR(&mp_module_max30100) },
     { MP_ROM_QSTR(MP_QSTR_max30102),           MP_OBJ_FROM_PTR(&mp_module_max30102) },
     { MP_ROM_QSTR(MP_QSTR_esp_dmx),           MP_OBJ_FROM_PTR(&mp_module_esp_dmx) },
+    { MP_ROM_QSTR(MP_QSTR_ir_rmt),            MP_OBJ_FROM_PTR(&mp_module_ir_rmt) },
     /* *FORMAT-ON* */
 };
 STATIC MP_DEFINE_CONST_DICT(mp_module_cdriver_globals, mp_module_cdriver_globals_table);
@@ -11,6 +11,7 @@ target_sources(usermod_DRIVER INTERFACE
     ${CMAKE_CURRENT_LIST_DIR}/max30102/max30102.c
     ${CMAKE_CURRENT_LIST_DIR}/max30102/driver_max30102.c
     ${CMAKE_CURRENT_LIST_DIR}/esp_dmx/driver_esp_dmx.c
+    ${CMAKE_CURRENT_LIST_DIR}/ir_rmt/driver_ir_rmt.c
 )
 
 target_include_directories(usermod_DRIVER INTERFACE
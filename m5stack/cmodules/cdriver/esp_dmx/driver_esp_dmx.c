@@ -14,6 +14,7 @@
 #include "py/runtime.h"
 #include "py/mphal.h"
 #include "py/mperrno.h"
+#include "py/mpthread.h"
 #include "mphalport.h"
 
 #include "dmx/include/driver.h"
@@ -109,6 +110,60 @@ STATIC mp_obj_t mp_dmx_read_data(size_t n_args, const mp_obj_t *pos_args, mp_map
 }
 STATIC MP_DEFINE_CONST_FUN_OBJ_KW(mp_dmx_read_data_obj, 1, mp_dmx_read_data);
 
+// dmx_wait_sent(timeout_ms=-1) -> bool: wait until the packet being sent
+// is on the wire, other threads keep running meanwhile.
+STATIC mp_obj_t mp_dmx_wait_sent(size_t n_args, const mp_obj_t *args) {
+    mp_int_t timeout = n_args > 0 ? mp_obj_get_int(args[0]) : -1;
+    TickType_t wait = timeout < 0 ? DMX_TIMEOUT_TICK : pdMS_TO_TICKS(timeout);
+    MP_THREAD_GIL_EXIT();
+    bool sent = dmx_wait_sent(dmxPort, wait);
+    MP_THREAD_GIL_ENTER();
+    return mp_obj_new_bool(sent);
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(mp_dmx_wait_sent_obj, 0, 1, mp_dmx_wait_sent);
+
+// dmx_write_universe(buf): send a whole packet, buf[0] is the start code
+// followed by up to 512 slots. Waits until the previous packet is on the
+// wire, so calling it in a loop sends at the DMX refresh rate; the packet
+// is copied into the driver and buf can be reused right away.
+STATIC mp_obj_t mp_dmx_write_universe(mp_obj_t buf_in) {
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(buf_in, &bufinfo, MP_BUFFER_READ);
+    size_t size = MIN(bufinfo.len, DMX_PACKET_SIZE);
+    MP_THREAD_GIL_EXIT();
+    dmx_wait_sent(dmxPort, DMX_TIMEOUT_TICK);
+    MP_THREAD_GIL_ENTER();
+    // buf may have been resized by another thread while waiting.
+    mp_get_buffer_raise(buf_in, &bufinfo, MP_BUFFER_READ);
+    size = MIN(bufinfo.len, size);
+    memcpy(dmx_data, bufinfo.buf, size);
+    dmx_write(dmxPort, dmx_data, size);
+    dmx_send_num(dmxPort, size);
+    return mp_const_none;
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_1(mp_dmx_write_universe_obj, mp_dmx_write_universe);
+
+// dmx_read_universe(buf, timeout_ms=0) -> size: wait up to timeout_ms for a
+// packet and copy it, start code first, into buf. Returns 0 without a valid
+// packet.
+STATIC mp_obj_t mp_dmx_read_universe(size_t n_args, const mp_obj_t *args) {
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(args[0], &bufinfo, MP_BUFFER_WRITE);
+    TickType_t wait = n_args > 1 ? pdMS_TO_TICKS(mp_obj_get_int(args[1])) : 0;
+    dmx_packet_t packet;
+    MP_THREAD_GIL_EXIT();
+    size_t size = dmx_receive(dmxPort, &packet, wait);
+    MP_THREAD_GIL_ENTER();
+    mp_get_buffer_raise(args[0], &bufinfo, MP_BUFFER_WRITE);
+    if (size == 0 || packet.err != DMX_OK) {
+        return MP_OBJ_NEW_SMALL_INT(0);
+    }
+    size = MIN(size, bufinfo.len);
+    dmx_read(dmxPort, bufinfo.buf, size);
+    return MP_OBJ_NEW_SMALL_INT(size);
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(mp_dmx_read_universe_obj, 1, 2, mp_dmx_read_universe);
+
 STATIC mp_obj_t mp_dmx_clear_buffer() {
     memset(dmx_data, 0, DMX_PACKET_SIZE);
     return mp_const_none;
@@ -131,6 +186,9 @@ STATIC const mp_rom_map_elem_t esp_dmx_globals_dict_table[] = {
     {MP_ROM_QSTR(MP_QSTR_dmx_init), (mp_obj_t)&mp_dmx_init_obj},
     {MP_ROM_QSTR(MP_QSTR_dmx_write_data), (mp_obj_t)&mp_dmx_write_data_obj},
     {MP_ROM_QSTR(MP_QSTR_dmx_read_data), (mp_obj_t)&mp_dmx_read_data_obj},
+    {MP_ROM_QSTR(MP_QSTR_dmx_wait_sent), (mp_obj_t)&mp_dmx_wait_sent_obj},
+    {MP_ROM_QSTR(MP_QSTR_dmx_write_universe), (mp_obj_t)&mp_dmx_write_universe_obj},
+    {MP_ROM_QSTR(MP_QSTR_dmx_read_universe), (mp_obj_t)&mp_dmx_read_universe_obj},
     {MP_ROM_QSTR(MP_QSTR_dmx_clear_buffer), (mp_obj_t)&mp_dmx_clear_buffer_obj},
     {MP_ROM_QSTR(MP_QSTR_dmx_delete_port), (mp_obj_t)&mp_dmx_delete_port_obj},
     {MP_ROM_QSTR(MP_QSTR_dmx_deinit), (mp_obj_t)&mp_dmx_deinit_obj},
@@ -0,0 +1,156 @@
+/*
+* SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+*
+* SPDX-License-Identifier: MIT
+*/
+
+// IR burst capture on the RMT receive channel.
+//
+// The RMT peripheral records a whole burst in hardware and ends it after
+// idle_us without an edge; the driver queues the burst in a ring buffer.
+// read() copies the oldest burst as durations in microseconds, alternating
+// mark and space and starting with a mark, so Python never sees edge
+// interrupts.
+
+#include <string.h>
+
+#include "py/runtime.h"
+#include "py/mphal.h"
+#include "py/mperrno.h"
+#include "mphalport.h"
+
+#include "driver/rmt.h"
+#include "freertos/ringbuf.h"
+
+#if CONFIG_IDF_TARGET_ESP32C3
+#define IR_RMT_DEFAULT_CHANNEL (2)
+#define IR_RMT_DEFAULT_BLOCKS  (2)
+#elif CONFIG_IDF_TARGET_ESP32S2
+#define IR_RMT_DEFAULT_CHANNEL (2)
+#define IR_RMT_DEFAULT_BLOCKS  (2)
+#else
+// ESP32 and ESP32-S3: channel 0 is used by the IR transmitter, 1 by
+// machine.bitstream, 4..7 are receive capable on every target.
+#define IR_RMT_DEFAULT_CHANNEL (4)
+#define IR_RMT_DEFAULT_BLOCKS  (4)
+#endif
+
+static int ir_rmt_channel = -1;
+static RingbufHandle_t ir_rmt_ringbuf = NULL;
+static uint32_t ir_rmt_overruns = 0;
+
+STATIC mp_obj_t mp_ir_rmt_init(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
+    static const mp_arg_t allowed_args[] = {
+        {MP_QSTR_pin, MP_ARG_REQUIRED | MP_ARG_INT, {.u_int = -1}},
+        {MP_QSTR_channel, MP_ARG_KW_ONLY | MP_ARG_INT, {.u_int = IR_RMT_DEFAULT_CHANNEL}},
+        {MP_QSTR_mem_blocks, MP_ARG_KW_ONLY | MP_ARG_INT, {.u_int = IR_RMT_DEFAULT_BLOCKS}},
+        {MP_QSTR_idle_us, MP_ARG_KW_ONLY | MP_ARG_INT, {.u_int = 12000}},
+        {MP_QSTR_filter_ticks, MP_ARG_KW_ONLY | MP_ARG_INT, {.u_int = 100}},
+        {MP_QSTR_buf_size, MP_ARG_KW_ONLY | MP_ARG_INT, {.u_int = 2048}},
+    };
+    mp_arg_val_t args[MP_ARRAY_SIZE(allowed_args)];
+    mp_arg_parse_all(n_args, pos_args, kw_args, MP_ARRAY_SIZE(allowed_args), allowed_args, args);
+
+    if (ir_rmt_channel >= 0) {
+        rmt_driver_uninstall(ir_rmt_channel);
+        ir_rmt_channel = -1;
+    }
+
+    // clk_div 80 -> 1us ticks, idle_threshold is 15 bits wide.
+    rmt_config_t config = RMT_DEFAULT_CONFIG_RX(args[0].u_int, args[1].u_int);
+    config.clk_div = 80;
+    config.mem_block_num = args[2].u_int;
+    config.rx_config.idle_threshold = MIN(args[3].u_int, 32767);
+    config.rx_config.filter_en = args[4].u_int > 0;
+    config.rx_config.filter_ticks_thresh = MIN(args[4].u_int, 255);
+
+    esp_err_t err = rmt_config(&config);
+    if (err == ESP_OK) {
+        err = rmt_driver_install(config.channel, args[5].u_int, 0);
+    }
+    if (err != ESP_OK) {
+        mp_raise_OSError(MP_EINVAL);
+    }
+    rmt_get_ringbuf_handle(config.channel, &ir_rmt_ringbuf);
+    rmt_rx_start(config.channel, true);
+    ir_rmt_channel = config.channel;
+    ir_rmt_overruns = 0;
+    return mp_const_none;
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_KW(mp_ir_rmt_init_obj, 1, mp_ir_rmt_init);
+
+// read(buf) -> n: copy the oldest captured burst into buf, an array("H"),
+// and return the number of durations, 0 when no burst is queued. Durations
+// that do not fit are dropped and counted in overruns().
+STATIC mp_obj_t mp_ir_rmt_read(mp_obj_t buf_in) {
+    if (ir_rmt_channel < 0) {
+        mp_raise_OSError(MP_ENODEV);
+    }
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(buf_in, &bufinfo, MP_BUFFER_WRITE);
+    uint16_t *out = (uint16_t *)bufinfo.buf;
+    size_t cap = bufinfo.len / sizeof(uint16_t);
+
+    size_t length = 0;
+    rmt_item32_t *items = (rmt_item32_t *)xRingbufferReceive(ir_rmt_ringbuf, &length, 0);
+    if (items == NULL) {
+        return MP_OBJ_NEW_SMALL_INT(0);
+    }
+    size_t n = 0;
+    size_t count = length / sizeof(rmt_item32_t);
+    for (size_t i = 0; i < count; i++) {
+        // The demodulator output is active low: level 0 is a mark. A zero
+        // duration terminates the burst.
+        uint32_t d0 = items[i].duration0;
+        uint32_t d1 = items[i].duration1;
+        if (d0 == 0) {
+            break;
+        }
+        if (n < cap) {
+            out[n++] = d0;
+        } else {
+            ir_rmt_overruns++;
+        }
+        if (d1 == 0) {
+            break;
+        }
+        if (n < cap) {
+            out[n++] = d1;
+        } else {
+            ir_rmt_overruns++;
+        }
+    }
+    vRingbufferReturnItem(ir_rmt_ringbuf, (void *)items);
+    return MP_OBJ_NEW_SMALL_INT(n);
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_1(mp_ir_rmt_read_obj, mp_ir_rmt_read);
+
+STATIC mp_obj_t mp_ir_rmt_overruns(void) {
+    return mp_obj_new_int_from_uint(ir_rmt_overruns);
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_0(mp_ir_rmt_overruns_obj, mp_ir_rmt_overruns);
+
+STATIC mp_obj_t mp_ir_rmt_deinit(void) {
+    if (ir_rmt_channel >= 0) {
+        rmt_rx_stop(ir_rmt_channel);
+        rmt_driver_uninstall(ir_rmt_channel);
+        ir_rmt_channel = -1;
+        ir_rmt_ringbuf = NULL;
+    }
+    return mp_const_none;
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_0(mp_ir_rmt_deinit_obj, mp_ir_rmt_deinit);
+
+STATIC const mp_rom_map_elem_t ir_rmt_globals_dict_table[] = {
+    {MP_ROM_QSTR(MP_QSTR_init), (mp_obj_t)&mp_ir_rmt_init_obj},
+    {MP_ROM_QSTR(MP_QSTR_read), (mp_obj_t)&mp_ir_rmt_read_obj},
+    {MP_ROM_QSTR(MP_QSTR_overruns), (mp_obj_t)&mp_ir_rmt_overruns_obj},
+    {MP_ROM_QSTR(MP_QSTR_deinit), (mp_obj_t)&mp_ir_rmt_deinit_obj},
+};
+
+STATIC MP_DEFINE_CONST_DICT(ir_rmt_globals_dict, ir_rmt_globals_dict_table);
+
+const mp_obj_module_t mp_module_ir_rmt = {
+    .base = {&mp_type_module},
+    .globals = (mp_obj_dict_t *)&ir_rmt_globals_dict,
+};
@@ -29,8 +29,11 @@ def init(
 def deinit() -> bool: ...
 def skip_frames(time: int = 300) -> None: ...
 def capture() -> bytes: ...
+def fb_get() -> memoryview | None: ...
+def fb_return() -> bool: ...
 def capture_to_jpg(quality=int) -> bytes: ...
 def capture_to_bmp() -> bytes: ...
+def jpeg_encode(buf, width: int, height: int, quality: int) -> bytes | None: ...
 def pixformat(format: RGB565 | GRAYSCALE | YUV422) -> bool: ...
 def framesize(
     size: FRAME_96X96
@@ -20,11 +20,14 @@
 #include "py/obj.h"
 #include "py/runtime.h"
 #include "py/binary.h"
+#include "py/objarray.h"
+#include "py/mpthread.h"
 #include "mphalport.h"
 
 #include "esp_system.h"
 #include "esp_spi_flash.h"
 #include "esp_camera.h"
+#include "img_converters.h"
 #include "esp_log.h"
 
 #define TAG "m5camera"
@@ -80,6 +83,19 @@ static enum {
     E_CAMERA_DEINIT
 } status = E_CAMERA_DEINIT;
 
+// Frame buffers handed to Python by fb_get(), oldest first. The driver
+// keeps filling the others while they are held.
+#define CAMERA_FB_MAX 3
+static camera_fb_t *held_fb[CAMERA_FB_MAX];
+static int held_count = 0;
+
+static void camera_return_all(void) {
+    for (int i = 0; i < held_count; i++) {
+        esp_camera_fb_return(held_fb[i]);
+    }
+    held_count = 0;
+}
+
 // STATIC camera_obj_t camera_obj;
 STATIC bool camera_init_helper(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
     enum {ARG_pixformat, ARG_framesize, ARG_fb_count, ARG_fb_location};
@@ -119,6 +135,7 @@ STATIC bool camera_init_helper(size_t n_args, const mp_obj_t *pos_args, mp_map_t
     camera_config.fb_location = fb_location;
 
     if (status == E_CAMERA_INIT) {
+        camera_return_all();
         esp_camera_deinit();
     }
     esp_err_t err = esp_camera_init(&camera_config);
@@ -142,6 +159,7 @@ STATIC mp_obj_t camera_init(size_t n_pos_args, const mp_obj_t *pos_args, mp_map_
 STATIC MP_DEFINE_CONST_FUN_OBJ_KW(camera_init_obj, 0, camera_init);
 
 STATIC mp_obj_t camera_deinit() {
+    camera_return_all();
     esp_err_t err = esp_camera_deinit();
     if (err != ESP_OK) {
         ESP_LOGE(TAG, "Camera deinit Failed");
@@ -202,6 +220,37 @@ STATIC mp_obj_t camera_capture() {
 }
 STATIC MP_DEFINE_CONST_FUN_OBJ_0(camera_capture_obj, camera_capture);
 
+STATIC mp_obj_t camera_fb_get() {
+    // Wait for the next frame without holding the GIL and return a
+    // memoryview of the driver's frame buffer, no copy is made. The buffer
+    // must be given back with fb_return() before it is overwritten.
+    if (held_count >= camera_config.fb_count || held_count >= CAMERA_FB_MAX) {
+        mp_raise_msg(&mp_type_RuntimeError, MP_ERROR_TEXT("All frame buffers are held"));
+    }
+    MP_THREAD_GIL_EXIT();
+    camera_fb_t *fb = esp_camera_fb_get();
+    MP_THREAD_GIL_ENTER();
+    if (!fb) {
+        ESP_LOGE(TAG, "Camera capture Failed");
+        return mp_const_none;
+    }
+    held_fb[held_count++] = fb;
+    return mp_obj_new_memoryview('B', fb->len, fb->buf);
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_0(camera_fb_get_obj, camera_fb_get);
+
+STATIC mp_obj_t camera_fb_return() {
+    // Give the oldest frame buffer from fb_get() back to the driver.
+    if (held_count == 0) {
+        return mp_const_false;
+    }
+    esp_camera_fb_return(held_fb[0]);
+    held_count--;
+    memmove(&held_fb[0], &held_fb[1], held_count * sizeof(held_fb[0]));
+    return mp_const_true;
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_0(camera_fb_return_obj, camera_fb_return);
+
 STATIC mp_obj_t camera_capture_to_jpg(mp_obj_t quality_in) {
     // acquire a frame
     camera_fb_t *fb = esp_camera_fb_get();
@@ -228,6 +277,36 @@ STATIC mp_obj_t camera_capture_to_jpg(mp_obj_t quality_in) {
 }
 STATIC MP_DEFINE_CONST_FUN_OBJ_1(camera_capture_to_jpg_obj, camera_capture_to_jpg);
 
+STATIC mp_obj_t camera_jpeg_encode(size_t n_args, const mp_obj_t *args) {
+    // jpeg_encode(buf, width, height, quality): JPEG of an RGB565 image,
+    // e.g. a frame from fb_get() or a scaled copy of it.
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(args[0], &bufinfo, MP_BUFFER_READ);
+    int width = mp_obj_get_int(args[1]);
+    int height = mp_obj_get_int(args[2]);
+    int quality = mp_obj_get_int(args[3]);
+    if ((width <= 0) || (height <= 0) || ((size_t)(width * height * 2) > bufinfo.len)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("Buffer too small for the image size"));
+    }
+    if ((quality < 0) || (quality > 100)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("Quality is not valid"));
+    }
+
+    uint8_t *out = NULL;
+    size_t out_len = 0;
+    MP_THREAD_GIL_EXIT();
+    bool ok = fmt2jpg(bufinfo.buf, width * height * 2, width, height, PIXFORMAT_RGB565, quality, &out, &out_len);
+    MP_THREAD_GIL_ENTER();
+    if (!ok) {
+        ESP_LOGE(TAG, "JPEG encode Failed");
+        return mp_const_none;
+    }
+    mp_obj_t image = mp_obj_new_bytes(out, out_len);
+    free(out);
+    return image;
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(camera_jpeg_encode_obj, 4, 4, camera_jpeg_encode);
+
 STATIC mp_obj_t camera_capture_to_bmp() {
     // acquire a frame
     camera_fb_t *fb = esp_camera_fb_get();
@@ -381,8 +460,11 @@ STATIC const mp_rom_map_elem_t m5_camera_globals_table[] = {
     { MP_ROM_QSTR(MP_QSTR_deinit),          MP_ROM_PTR(&camera_deinit_obj) },
     { MP_ROM_QSTR(MP_QSTR_skip_frames),     MP_ROM_PTR(&camera_skip_frames_obj) },
     { MP_ROM_QSTR(MP_QSTR_capture),         MP_ROM_PTR(&camera_capture_obj) },
+    { MP_ROM_QSTR(MP_QSTR_fb_get),          MP_ROM_PTR(&camera_fb_get_obj) },
+    { MP_ROM_QSTR(MP_QSTR_fb_return),       MP_ROM_PTR(&camera_fb_return_obj) },
     { MP_ROM_QSTR(MP_QSTR_capture_to_jpg),  MP_ROM_PTR(&camera_capture_to_jpg_obj) },
     { MP_ROM_QSTR(MP_QSTR_capture_to_bmp),  MP_ROM_PTR(&camera_capture_to_bmp_obj) },
+    { MP_ROM_QSTR(MP_QSTR_jpeg_encode),     MP_ROM_PTR(&camera_jpeg_encode_obj) },
     { MP_ROM_QSTR(MP_QSTR_pixformat),       MP_ROM_PTR(&camera_pixformat_obj) },
     { MP_ROM_QSTR(MP_QSTR_framesize),       MP_ROM_PTR(&camera_framesize_obj) },
     { MP_ROM_QSTR(MP_QSTR_contrast),        MP_ROM_PTR(&camera_contrast_obj) },
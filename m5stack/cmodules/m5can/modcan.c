@@ -51,6 +51,17 @@
 #define CAN_MAX_FILTER              (28)
 #define CAN_MAX_DATA_FRAME          (8)
 
+// Record written by recv_into(): id u32, flags u8 (bit 0 extframe, bit 1 rtr),
+// dlc u8, 2 bytes padding, 8 data bytes, all little endian.
+#define CAN_FRAME_RECORD_SIZE       (16)
+#define CAN_FRAME_FLAG_EXTFRAME     (1)
+#define CAN_FRAME_FLAG_RTR          (2)
+
+#define CAN_FILTER_MASK16           (0)
+#define CAN_FILTER_LIST16           (1)
+#define CAN_FILTER_MASK32           (2)
+#define CAN_FILTER_LIST32           (3)
+
 
 #define CAN_STATE_STOPPED 0
 #define CAN_STATE_ERROR_ACTIVE 1
@@ -108,7 +119,7 @@ STATIC void pyb_can_print(const mp_print_t *print, mp_obj_t self_in, mp_print_ki
 
 // init(mode, prescaler=100, *, sjw=1, bs1=6, bs2=8)
 STATIC mp_obj_t pyb_can_init_helper(pyb_can_obj_t *self, size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
-    enum { ARG_mode, ARG_tx, ARG_rx, ARG_prescaler, ARG_sjw, ARG_bs1, ARG_bs2, ARG_triple_sampling };
+    enum { ARG_mode, ARG_tx, ARG_rx, ARG_prescaler, ARG_sjw, ARG_bs1, ARG_bs2, ARG_triple_sampling, ARG_rx_queue };
     static const mp_arg_t allowed_args[] = {
         { MP_QSTR_mode,            MP_ARG_REQUIRED | MP_ARG_INT, {.u_int = CAN_MODE_NORMAL} },
         { MP_QSTR_tx,              MP_ARG_REQUIRED | MP_ARG_INT, {.u_int = 2} },
@@ -118,6 +129,7 @@ STATIC mp_obj_t pyb_can_init_helper(pyb_can_obj_t *self, size_t n_args, const mp
         { MP_QSTR_bs1,             MP_ARG_INT,                   {.u_int = CAN_DEFAULT_BS1} },
         { MP_QSTR_bs2,             MP_ARG_INT,                   {.u_int = CAN_DEFAULT_BS2} },
         { MP_QSTR_triple_sampling, MP_ARG_BOOL,                  {.u_bool = false} },
+        { MP_QSTR_rx_queue,        MP_ARG_KW_ONLY | MP_ARG_INT,  {.u_int = 5} },
     };
 
     // parse args
@@ -133,6 +145,7 @@ STATIC mp_obj_t pyb_can_init_helper(pyb_can_obj_t *self, size_t n_args, const mp
     self->g_config.tx_io = args[ARG_tx].u_int;
     self->g_config.rx_io = args[ARG_rx].u_int;
     self->g_config.mode = args[ARG_mode].u_int;
+    self->g_config.rx_queue_len = MAX(args[ARG_rx_queue].u_int, 1);
 
     DEBUG_printf(&mp_plat_print, "prescaler=%u, sjw=%u, bs1=%u, bs2=%u, triple_sampling=%u\n", self->t_config.brp, self->t_config.tseg_1, self->t_config.tseg_2, self->t_config.sjw, self->t_config.triple_sampling);
     DEBUG_printf(&mp_plat_print, "mode=%u, tx=%u, rx=%u\n", self->g_config.mode, self->g_config.tx_io, self->g_config.rx_io);
@@ -292,6 +305,38 @@ STATIC mp_obj_t pyb_can_info(size_t n_args, const mp_obj_t *args) {
 }
 STATIC MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(pyb_can_info_obj, 1, 2, pyb_can_info);
 
+// stats([list]) - TEC, REC, frames lost because the RX queue was full, bus
+// errors, arbitration losses and pending RX messages
+STATIC mp_obj_t pyb_can_stats(size_t n_args, const mp_obj_t *args) {
+    pyb_can_obj_t *self = MP_OBJ_TO_PTR(args[0]);
+    mp_obj_list_t *list;
+    if (n_args == 1) {
+        list = MP_OBJ_TO_PTR(mp_obj_new_list(6, NULL));
+    } else {
+        if (!mp_obj_is_type(args[1], &mp_type_list)) {
+            mp_raise_TypeError(NULL);
+        }
+        list = MP_OBJ_TO_PTR(args[1]);
+        if (list->len < 6) {
+            mp_raise_ValueError(NULL);
+        }
+    }
+
+    twai_status_info_t status_info = { 0 };
+    if (self->is_enabled) {
+        check_esp_err(twai_get_status_info(&status_info));
+    }
+    list->items[0] = MP_OBJ_NEW_SMALL_INT(status_info.tx_error_counter);
+    list->items[1] = MP_OBJ_NEW_SMALL_INT(status_info.rx_error_counter);
+    list->items[2] = mp_obj_new_int_from_uint(status_info.rx_missed_count);
+    list->items[3] = mp_obj_new_int_from_uint(status_info.bus_error_count);
+    list->items[4] = mp_obj_new_int_from_uint(status_info.arb_lost_count);
+    list->items[5] = MP_OBJ_NEW_SMALL_INT(status_info.msgs_to_rx);
+
+    return MP_OBJ_FROM_PTR(list);
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(pyb_can_stats_obj, 1, 2, pyb_can_stats);
+
 // any(fifo) - return `True` if any message waiting on the FIFO, else `False`
 STATIC mp_obj_t pyb_can_any(mp_obj_t self_in, mp_obj_t fifo_in) {
     pyb_can_obj_t *self = MP_OBJ_TO_PTR(self_in);
@@ -415,6 +460,62 @@ STATIC mp_obj_t pyb_can_recv(size_t n_args, const mp_obj_t *pos_args, mp_map_t *
 }
 STATIC MP_DEFINE_CONST_FUN_OBJ_KW(pyb_can_recv_obj, 1, pyb_can_recv);
 
+// recv_into(buf, *, timeout=0) - drain queued messages into buf as fixed size
+// records, waiting up to timeout ms for the first one. Returns the number of
+// records written, at most len(buf) // CAN_FRAME_RECORD_SIZE.
+STATIC mp_obj_t pyb_can_recv_into(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
+    enum { ARG_buf, ARG_timeout };
+    static const mp_arg_t allowed_args[] = {
+        { MP_QSTR_buf,     MP_ARG_REQUIRED | MP_ARG_OBJ, {.u_obj = MP_OBJ_NULL} },
+        { MP_QSTR_timeout, MP_ARG_KW_ONLY | MP_ARG_INT,  {.u_int = 0} },
+    };
+
+    pyb_can_obj_t *self = MP_OBJ_TO_PTR(pos_args[0]);
+    mp_arg_val_t args[MP_ARRAY_SIZE(allowed_args)];
+    mp_arg_parse_all(n_args - 1, pos_args + 1, kw_args, MP_ARRAY_SIZE(allowed_args), allowed_args, args);
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(args[ARG_buf].u_obj, &bufinfo, MP_BUFFER_WRITE);
+    if (!self->is_enabled) {
+        return MP_OBJ_NEW_SMALL_INT(0);
+    }
+
+    uint8_t *rec = (uint8_t *)bufinfo.buf;
+    size_t cap = bufinfo.len / CAN_FRAME_RECORD_SIZE;
+    size_t n = 0;
+    TickType_t wait = args[ARG_timeout].u_int / portTICK_PERIOD_MS;
+    twai_message_t rx_msg;
+    while (n < cap && twai_receive(&rx_msg, n ? 0 : wait) == ESP_OK) {
+        if (rx_msg.data_length_code > CAN_MAX_DATA_FRAME) {
+            continue;
+        }
+        uint32_t id = rx_msg.identifier;
+        rec[0] = id;
+        rec[1] = id >> 8;
+        rec[2] = id >> 16;
+        rec[3] = id >> 24;
+        rec[4] = (rx_msg.extd ? CAN_FRAME_FLAG_EXTFRAME : 0) | (rx_msg.rtr ? CAN_FRAME_FLAG_RTR : 0);
+        rec[5] = rx_msg.data_length_code;
+        rec[6] = 0;
+        rec[7] = 0;
+        memcpy(rec + 8, rx_msg.data, CAN_MAX_DATA_FRAME);
+        rec += CAN_FRAME_RECORD_SIZE;
+        n++;
+    }
+    return MP_OBJ_NEW_SMALL_INT(n);
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_KW(pyb_can_recv_into_obj, 1, pyb_can_recv_into);
+
+// The acceptance filter only takes effect when the driver is installed.
+STATIC void pyb_can_apply_filter(pyb_can_obj_t *self) {
+    if (self->is_enabled) {
+        twai_stop();
+        check_esp_err(twai_driver_uninstall());
+        check_esp_err(twai_driver_install(&self->g_config, &self->t_config, &self->f_config));
+        check_esp_err(twai_start());
+    }
+}
+
 STATIC mp_obj_t pyb_can_clearfilter(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
     enum { ARG_extframe };
     static const mp_arg_t allowed_args[] = {
@@ -427,14 +528,47 @@ STATIC mp_obj_t pyb_can_clearfilter(size_t n_args, const mp_obj_t *pos_args, mp_
     mp_arg_val_t args[MP_ARRAY_SIZE(allowed_args)];
     mp_arg_parse_all(n_args - 2, pos_args + 2, kw_args, MP_ARRAY_SIZE(allowed_args), allowed_args, args);
 
-    // TODO: implement filter
+    // The controller has a single acceptance filter, every bank clears it.
+    (void)f;
+    self->f_config.acceptance_code = 0;
+    self->f_config.acceptance_mask = 0xFFFFFFFF;
+    self->f_config.single_filter = true;
+    pyb_can_apply_filter(self);
 
     return mp_const_none;
 }
 STATIC MP_DEFINE_CONST_FUN_OBJ_KW(pyb_can_clearfilter_obj, 2, pyb_can_clearfilter);
 
 // setfilter(bank, mode, fifo, params, *, rtr)
-#define EXTENDED_ID_TO_16BIT_FILTER(id) (((id & 0xC00000) >> 13) | ((id & 0x38000) >> 15)) | 8
+
+// Position of an identifier in the acceptance registers. Single filter mode
+// holds the whole ID; dual filter mode holds two 11 bit IDs, or the upper 16
+// bits of two extended IDs.
+STATIC uint32_t can_filter_bits(uint32_t id, bool extframe, bool dual, int slot) {
+    if (dual) {
+        uint32_t v = extframe ? (id >> 13) & 0xFFFF : (id & 0x7FF) << 5;
+        return slot ? v : v << 16;
+    }
+    return extframe ? (id & 0x1FFFFFFF) << 3 : (id & 0x7FF) << 21;
+}
+
+// RTR bit of a filter in the acceptance registers, 0 when the layout has
+// none (dual filter mode with extended IDs).
+STATIC uint32_t can_filter_rtr_bit(bool extframe, bool dual, int slot) {
+    if (dual) {
+        return extframe ? 0 : (slot ? 1 << 4 : 1 << 20);
+    }
+    return extframe ? 1 << 2 : 1 << 20;
+}
+
+// Identifier bits that are equal in all IDs of params[first:first + count].
+STATIC void can_filter_common(mp_obj_t *params, size_t first, size_t count, uint32_t *id, uint32_t *mask) {
+    *id = mp_obj_get_int_truncated(params[first]);
+    *mask = 0x1FFFFFFF;
+    for (size_t i = first + 1; i < first + count; i++) {
+        *mask &= ~(*id ^ (uint32_t)mp_obj_get_int_truncated(params[i]));
+    }
+}
 STATIC mp_obj_t pyb_can_setfilter(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
     enum { ARG_bank, ARG_mode, ARG_fifo, ARG_params, ARG_rtr, ARG_extframe };
     static const mp_arg_t allowed_args[] = {
@@ -451,7 +585,78 @@ STATIC mp_obj_t pyb_can_setfilter(size_t n_args, const mp_obj_t *pos_args, mp_ma
     mp_arg_val_t args[MP_ARRAY_SIZE(allowed_args)];
     mp_arg_parse_all(n_args - 1, pos_args + 1, kw_args, MP_ARRAY_SIZE(allowed_args), allowed_args, args);
 
-    // TODO: implement filter
+    // MASK32: (id, mask), LIST32: (id, ...) merged into one mask,
+    // MASK16: (id1, mask1, id2, mask2), LIST16: (id1, id2, id3, id4) as two
+    // merged pairs. Mask bits set to 1 must match, as in pyb.CAN.
+    size_t len;
+    mp_obj_t *params;
+    mp_obj_get_array(args[ARG_params].u_obj, &len, &params);
+    mp_int_t mode = args[ARG_mode].u_int;
+    bool ext = args[ARG_extframe].u_bool;
+    bool dual = mode == CAN_FILTER_MASK16 || mode == CAN_FILTER_LIST16;
+    uint32_t id[2] = { 0, 0 };
+    uint32_t mask[2] = { 0, 0 };
+
+    if (mode == CAN_FILTER_MASK32 && len == 2) {
+        id[0] = mp_obj_get_int_truncated(params[0]);
+        mask[0] = mp_obj_get_int_truncated(params[1]);
+    } else if (mode == CAN_FILTER_LIST32 && len >= 1) {
+        can_filter_common(params, 0, len, &id[0], &mask[0]);
+    } else if (mode == CAN_FILTER_MASK16 && len == 4) {
+        for (int i = 0; i < 2; i++) {
+            id[i] = mp_obj_get_int_truncated(params[2 * i]);
+            mask[i] = mp_obj_get_int_truncated(params[2 * i + 1]);
+        }
+    } else if (mode == CAN_FILTER_LIST16 && len == 4) {
+        can_filter_common(params, 0, 2, &id[0], &mask[0]);
+        can_filter_common(params, 2, 2, &id[1], &mask[1]);
+    } else {
+        mp_raise_ValueError(MP_ERROR_TEXT("invalid filter params"));
+    }
+
+    // TWAI mask bits set to 1 are "don't care"; data bits are not filtered.
+    uint32_t code = can_filter_bits(id[0], ext, dual, 0);
+    uint32_t care = can_filter_bits(mask[0], ext, dual, 0);
+    if (dual) {
+        code |= can_filter_bits(id[1], ext, dual, 1);
+        care |= can_filter_bits(mask[1], ext, dual, 1);
+    }
+
+    // rtr: one flag for all filters, or one per id or id/mask pair as in pyb.CAN.
+    // Entries merged into one filter must agree, otherwise RTR is not filtered.
+    mp_obj_t rtr_obj = args[ARG_rtr].u_obj;
+    if (rtr_obj != MP_OBJ_NULL && rtr_obj != mp_const_none) {
+        int slots = dual ? 2 : 1;
+        size_t n_rtr = 0;
+        mp_obj_t *rtr = NULL;
+        if (rtr_obj != mp_const_true && rtr_obj != mp_const_false) {
+            mp_obj_get_array(rtr_obj, &n_rtr, &rtr);
+            if (n_rtr == 0 || n_rtr % slots) {
+                mp_raise_ValueError(MP_ERROR_TEXT("invalid rtr"));
+            }
+        }
+        for (int slot = 0; slot < slots; slot++) {
+            int want = rtr_obj == mp_const_true;
+            if (rtr != NULL) {
+                size_t per = n_rtr / slots;
+                want = mp_obj_is_true(rtr[slot * per]);
+                for (size_t i = 1; i < per; i++) {
+                    if (mp_obj_is_true(rtr[slot * per + i]) != want) {
+                        want = -1;
+                    }
+                }
+            }
+            uint32_t bit = can_filter_rtr_bit(ext, dual, slot);
+            if (bit && want >= 0) {
+                care |= bit;
+                code |= want ? bit : 0;
+            }
+        }
+    }
+    self->f_config.acceptance_code = code & care;
+    self->f_config.acceptance_mask = ~care;
+    self->f_config.single_filter = !dual;
+    pyb_can_apply_filter(self);
 
     return mp_const_none;
 }
@@ -467,6 +672,8 @@ STATIC const mp_rom_map_elem_t pyb_can_locals_dict_table[] = {
     { MP_ROM_QSTR(MP_QSTR_any), MP_ROM_PTR(&pyb_can_any_obj) },
     { MP_ROM_QSTR(MP_QSTR_send), MP_ROM_PTR(&pyb_can_send_obj) },
     { MP_ROM_QSTR(MP_QSTR_recv), MP_ROM_PTR(&pyb_can_recv_obj) },
+    { MP_ROM_QSTR(MP_QSTR_recv_into), MP_ROM_PTR(&pyb_can_recv_into_obj) },
+    { MP_ROM_QSTR(MP_QSTR_stats), MP_ROM_PTR(&pyb_can_stats_obj) },
     { MP_ROM_QSTR(MP_QSTR_setfilter), MP_ROM_PTR(&pyb_can_setfilter_obj) },
     { MP_ROM_QSTR(MP_QSTR_clearfilter), MP_ROM_PTR(&pyb_can_clearfilter_obj) },
 
@@ -480,10 +687,10 @@ STATIC const mp_rom_map_elem_t pyb_can_locals_dict_table[] = {
     { MP_ROM_QSTR(MP_QSTR_NO_ACKNOWLEDGE), MP_ROM_INT(CAN_MODE_NO_ACKNOWLEDGE_MODE) },
     { MP_ROM_QSTR(MP_QSTR_LISTEN_ONLY), MP_ROM_INT(CAN_MODE_LISTEN_ONLY) },
 
-    { MP_ROM_QSTR(MP_QSTR_MASK16), MP_ROM_INT(0) },
-    { MP_ROM_QSTR(MP_QSTR_LIST16), MP_ROM_INT(1) },
-    { MP_ROM_QSTR(MP_QSTR_MASK32), MP_ROM_INT(2) },
-    { MP_ROM_QSTR(MP_QSTR_LIST32), MP_ROM_INT(3) },
+    { MP_ROM_QSTR(MP_QSTR_MASK16), MP_ROM_INT(CAN_FILTER_MASK16) },
+    { MP_ROM_QSTR(MP_QSTR_LIST16), MP_ROM_INT(CAN_FILTER_LIST16) },
+    { MP_ROM_QSTR(MP_QSTR_MASK32), MP_ROM_INT(CAN_FILTER_MASK32) },
+    { MP_ROM_QSTR(MP_QSTR_LIST32), MP_ROM_INT(CAN_FILTER_LIST32) },
 
     // { MP_ROM_QSTR(MP_QSTR_DUAL), MP_ROM_INT(0) },  // not supported
     // { MP_ROM_QSTR(MP_QSTR_RANGE), MP_ROM_INT(1) }, // not supported
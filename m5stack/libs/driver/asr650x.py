@@ -5,30 +5,43 @@
 import machine
 import time
 import binascii
+from collections import deque
 
 AT_RESPONED_OK = "OK\r\n"
 AT_RESPONED_ERROR = "ERROR\r\n"
 AT_RECV_OK = "OK+RECV:"
+AT_PROMPT = "ASR6501:~# "
+
+# Lines that end a command with an error.
+_AT_ERRORS = ("ERR+SENT", "ERR+SEND", "+CME ERROR")
 
 
 class LoRaWAN_Asr650x(object):
+    MAX_PAYLOAD = (51, 51, 51, 115, 222, 222)
+
     def __init__(self, tx, rx, debug=False):
-        self.__uart = machine.UART(1, tx=tx, rx=rx)
-        self.__uart.init(115200, bits=0, parity=None, stop=1)
+        self._uart = machine.UART(1, tx=tx, rx=rx)
+        self._uart.init(115200, bits=0, parity=None, stop=1)
         self.debug = debug
-        self.set_work_mode(2)
-        self._downlink_buffer = []
+        self._rx = b""
+        self._busy = False
+        self._timer = None
+        self._datarate = None
         self._downlink_buffer_size = 50
+        self._downlink_buffer = deque((), self._downlink_buffer_size)
+        self._downlink_callback = None
+        self._sent_callback = None
         self._join_status = False
+        self.set_work_mode(2)
 
     def get_product_serial_number(self):
         """
         AT+CGSN?
         """
-        result, error = self.__at_cmd("AT+CGSN?")
+        result, error = self._at_cmd("AT+CGSN?")
         if error:
             return False
-        result = self.__message_recv_data(result)
+        result = self._message_recv_data(result)
         return result[1][6:]
 
     def reset_module_to_default(self):
@@ -56,10 +69,10 @@ class LoRaWAN_Asr650x(object):
             DevAddr: xxxxxxxx  4 bytes
         """
         cmd = "AT+CDEVADDR?"
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         if error:
             return False
-        result = self.__message_recv_data(result)
+        result = self._message_recv_data(result)
         return result[1][10:]
 
     def set_device_address(self, devaddr):
@@ -77,7 +90,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CDEVADDR=" + str(devaddr)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def get_device_eui(self):
@@ -94,10 +107,10 @@ class LoRaWAN_Asr650x(object):
             DevEui: xxxxxxxxxxxxxxxx 8 byte
         """
         cmd = "AT+CDEVEUI?"
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         if error:
             return False
-        result = self.__message_recv_data(result)
+        result = self._message_recv_data(result)
         return result[1][9:]
 
     def set_device_eui(self, deveui):
@@ -115,7 +128,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CDEVEUI=" + str(deveui)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def get_app_eui(self):
@@ -132,10 +145,10 @@ class LoRaWAN_Asr650x(object):
             AppEui: xxxxxxxxxxxxxxxx 8 bytes
         """
         cmd = "AT+CAPPEUI?"
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         if error:
             return False
-        result = self.__message_recv_data(result)
+        result = self._message_recv_data(result)
         return result[1][9:]
 
     def set_app_eui(self, appeui):
@@ -153,7 +166,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CAPPEUI=" + str(appeui)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def get_appkey(self):
@@ -171,10 +184,10 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CAPPKEY?"
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         if error:
             return False
-        result = self.__message_recv_data(result)
+        result = self._message_recv_data(result)
         return result[1][9:]
 
     def set_appkey(self, key):
@@ -192,7 +205,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CAPPKEY=" + str(key)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def get_app_session_key(self):
@@ -210,10 +223,10 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CAPPSKEY?"
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         if error:
             return False
-        result = self.__message_recv_data(result)
+        result = self._message_recv_data(result)
         return result[1][10:]
 
     def set_app_session_key(self, AppSKEY):
@@ -231,7 +244,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CAPPSKEY=" + str(AppSKEY)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def get_nwk_session_key(self):
@@ -249,10 +262,10 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CNWKSKEY?"
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         if error:
             return False
-        result = self.__message_recv_data(result)
+        result = self._message_recv_data(result)
         return result[1][10:]
 
     def set_nwk_session_key(self, NWKSKEY):
@@ -270,7 +283,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CNWKSKEY=" + str(NWKSKEY)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def get_join_mode(self):
@@ -283,10 +296,10 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CJOINMODE?"
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         if error:
             return False
-        result = self.__message_recv_data(result)
+        result = self._message_recv_data(result)
         if result[1][11:] == "1":
             return "ABP"
         else:
@@ -303,7 +316,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CJOINMODE=" + str(mode)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def get_frequency_band_mask(self):
@@ -315,10 +328,10 @@ class LoRaWAN_Asr650x(object):
             mask
         """
         cmd = "AT+CFREQBANDMASK?"
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         if error:
             return False
-        result = self.__message_recv_data(result)
+        result = self._message_recv_data(result)
         return result[1][15:]
 
     def set_frequency_band_mask(self, mask):
@@ -331,7 +344,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CFREQBANDMASK=" + str(mask)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def get_uplink_downlink_mode(self):
@@ -345,10 +358,10 @@ class LoRaWAN_Asr650x(object):
                 2 Inter-frequency mode
         """
         cmd = "AT+CULDLMODE?"
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         if error:
             return False
-        result = self.__message_recv_data(result)
+        result = self._message_recv_data(result)
         return result[1][11:]
 
     def set_uplink_downlink_mode(self, mode):
@@ -363,7 +376,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CULDLMODE=" + str(mode)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def get_work_mode(self):
@@ -376,10 +389,10 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CWORKMODE?"
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         if error:
             return False
-        result = self.__message_recv_data(result)
+        result = self._message_recv_data(result)
         return result[1][11:]
 
     def set_work_mode(self, mode):
@@ -393,7 +406,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CWORKMODE=" + str(mode)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def get_class_mode(self):
@@ -409,10 +422,10 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CCLASS?"
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         if error:
             return False
-        result = self.__message_recv_data(result)
+        result = self._message_recv_data(result)
         return result[1][8:]
 
     def set_class_mode(
@@ -443,7 +456,7 @@ class LoRaWAN_Asr650x(object):
             and para4 is not None
         ):
             cmd = "{},{},{},{},{},{}".format(cmd, branch, para1, para2, para3, para4)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def get_status(self):
@@ -487,10 +500,10 @@ class LoRaWAN_Asr650x(object):
         cmd = "AT+CJOIN=" + str(para1)
         if para2 is not None and para3 is not None and para4 is not None:
             cmd = "{},{},{},{}".format(cmd, para2, para3, para4)
-        result, error = self.__at_cmd(cmd, timeout=500)
+        result, error = self._at_cmd(cmd, timeout=500)
         return not error
 
-    def send_data(self, payload, confirm=None, nbtrials=None):
+    def send_data(self, payload, confirm=None, nbtrials=None, timeout=5000):
         """
         Send data.
         Parameter:
@@ -500,20 +513,34 @@ class LoRaWAN_Asr650x(object):
             nbtrials:
                 1 ~ 15
             payload:
-                xxxxxx  HEX format string
+                str, or bytes / bytearray sent as they are
+            timeout:
+                ms to wait for the uplink (and the downlink of a confirmed one)
         Return:
             True
             False
         """
-        data = self._bytes_to_hex_str(payload.encode())
+        if isinstance(payload, str):
+            payload = payload.encode()
+        data = binascii.hexlify(payload).decode().upper()
         if confirm is not None and nbtrials is not None:
-            cmd = "AT+DTRX={},{},{},{}".format(confirm, nbtrials, int(len(data) / 2), data)
-            result, error = self.__at_cmd(cmd, timeout=500, keyword="OK+RECV:")
+            cmd = "AT+DTRX={},{},{},{}".format(confirm, nbtrials, len(payload), data)
+            result, error = self._at_cmd(cmd, timeout=timeout, keyword="OK+RECV:")
         else:
-            cmd = "AT+DTRX={},{}".format(int(len(data) / 2), data)
-            result, error = self.__at_cmd(cmd, timeout=500, keyword="OK+SENT:")
+            cmd = "AT+DTRX={},{}".format(len(payload), data)
+            result, error = self._at_cmd(cmd, timeout=timeout, keyword="OK+SENT:")
         return not error
 
+    def max_payload(self, datarate=None):
+        """
+        Maximum application payload in bytes at datarate, by default the
+        one set with set_datarate() (the lowest when unknown, as with ADR).
+        """
+        if datarate is None:
+            datarate = self._datarate or 0
+        table = self.MAX_PAYLOAD
+        return table[min(datarate, len(table) - 1)]
+
     def receive_data(self):
         """
         Receive downlink data if have.
@@ -524,10 +551,10 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+DRX?"
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         if error:
             return False
-        result = self.__message_recv_data(result)
+        result = self._message_recv_data(result)
         try:
             index = result.index("+DRX:")
             if result[index][5] == "0":
@@ -549,7 +576,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CCONFIRM=" + str(mode)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def set_uplink_app_port(self, port):
@@ -562,7 +589,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CAPPPORT=" + str(port)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def set_datarate(self, rate):
@@ -581,7 +608,9 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CDATARATE=" + str(rate)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
+        if not error:
+            self._datarate = rate
         return not error
 
     def set_report_mode(self, mode, interval=None):
@@ -597,7 +626,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CRM={},{}".format(mode, interval)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def set_tx_power(self, power):
@@ -632,7 +661,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CADR=" + str(status)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def set_rx_window_param(self, rx1_offset, rx2_dr, rx2_freq):
@@ -653,7 +682,7 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CRXP={},{},{}".format(rx1_offset, rx2_dr, rx2_freq)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     def set_rx1_delay_time(self, delay):
@@ -666,61 +695,155 @@ class LoRaWAN_Asr650x(object):
             False
         """
         cmd = "AT+CRX1DELAY={}".format(delay)
-        result, error = self.__at_cmd(cmd)
+        result, error = self._at_cmd(cmd)
         return not error
 
     ##############################################################################
-    def __at_cmd(self, cmd, timeout=500, keyword=AT_RESPONED_OK):
+    def _at_cmd(self, cmd, timeout=500, keyword=AT_RESPONED_OK):
         command = str(cmd) + str("\r\n")
         if self.debug:
             print("T: " + command[:-2])
-        self.__uart.write(command)
-        return self.__wait_ok(timeout, keyword)
-
-    def __wait_ok(self, timeout, keyword=AT_RESPONED_OK):
+        # Drain the pending unsolicited lines first, poll() skips them once busy.
+        self.poll()
+        busy = self._busy
+        self._busy = True
+        try:
+            self._uart.write(command)
+            return self._wait_ok(timeout, keyword)
+        finally:
+            self._busy = busy
+
+    def _readline(self):
+        # Next complete line from the UART, None if there is none yet. Runs in
+        # the timer callback too, so a line garbled on the wire is dropped.
+        while True:
+            i = self._rx.find(b"\n")
+            if i < 0:
+                n = self._uart.any()
+                if not n:
+                    return None
+                self._rx += self._uart.read(n)
+                i = self._rx.find(b"\n")
+                if i < 0:
+                    return None
+            raw = self._rx[: i + 1]
+            self._rx = self._rx[i + 1 :]
+            try:
+                line = raw.decode()
+            except UnicodeError:
+                continue
+            if line.startswith(AT_PROMPT):
+                line = line[len(AT_PROMPT) :]
+            return line
+
+    def _wait_ok(self, timeout, keyword=AT_RESPONED_OK):
+        # Collect the response lines until keyword or an error line arrives,
+        # as soon as they arrive; unsolicited lines are handled on the way.
         error = True
         msgs = []
-        time.sleep(0.1)
-        while self.__uart.any():
-            time.sleep_ms(100)
-            line = self.__uart.readline()
-            if line is not None:
-                line = line.decode()
+        deadline = time.ticks_add(time.ticks_ms(), timeout)
+        while time.ticks_diff(deadline, time.ticks_ms()) > 0:
+            line = self._readline()
+            if line is None:
+                time.sleep_ms(2)
+                continue
+            self._urc(line)
+            if keyword in line:
                 msgs.append(line)
-                if keyword in line:
-                    error = False
-                elif line == AT_RESPONED_ERROR:
-                    error = True
-                    msgs.remove(line)
-
-                if "ERR+SENT" in line:
-                    error = True
-                    msgs.remove(line)
-                elif "ERR+SEND" in line:
-                    error = True
-                    msgs.remove(line)
-                elif "+CME ERROR" in line:
-                    error = True
-                    msgs.remove(line)
-                elif "OK+RECV:" in line:
-                    if "02,00,00" not in line:  # special case
-                        if len(self._downlink_buffer) < self._downlink_buffer_size:
-                            self._downlink_buffer.append(line[8:-2])
-                        else:
-                            self._downlink_buffer.pop(0)
-                            self._downlink_buffer.append(line[8:-2])
-                elif "+CJOIN:OK" in line:
-                    self._join_status = True
-                elif "+CJOIN:FAIL" in line:
-                    self._join_status = False
-                else:
-                    pass
+                error = False
+                break
+            if line == AT_RESPONED_ERROR or any(e in line for e in _AT_ERRORS):
+                error = True
+                break
+            msgs.append(line)
 
         if self.debug:
             print("R: {}".format(msgs))
         return (msgs, error)
 
-    def __message_recv_data(self, msgs):
+    def _urc(self, line) -> None:
+        # Unsolicited result codes: downlinks, join and uplink results.
+        if line.startswith(AT_RECV_OK):
+            data = line[8:-2]
+            if "02,00,00" not in data:  # special case
+                self._downlink(data)
+        elif "+CJOIN:OK" in line:
+            self._join_status = True
+        elif "+CJOIN:FAIL" in line:
+            self._join_status = False
+        elif line.startswith("OK+SENT:") or line.startswith("ERR+SENT"):
+            if self._sent_callback is not None:
+                self._sent_callback(line.startswith("OK"))
+
+    def _downlink(self, data) -> None:
+        # data is "type,port,length,hex payload"
+        self._downlink_buffer.append(data)
+        if self._downlink_callback is None:
+            return
+        parts = data.split(",")
+        try:
+            port = int(parts[1], 16)
+            payload = binascii.unhexlify(parts[3]) if len(parts) > 3 else b""
+        except (IndexError, ValueError):
+            return
+        self._downlink_callback(port, payload)
+
+    def poll(self) -> None:
+        """
+        Handle the unsolicited lines received since the last call, without
+        waiting. Called by start_event() from a timer.
+        """
+        # Test and set: the timer callback is scheduled between bytecodes, it
+        # must not read self._rx while a direct call or a command is in it.
+        if self._busy:
+            return  # a command or another poll() is reading the UART
+        self._busy = True
+        try:
+            line = self._readline()
+            while line is not None:
+                self._urc(line)
+                line = self._readline()
+        finally:
+            self._busy = False
+
+    def set_downlink_callback(self, callback):
+        """
+        Call callback(port, payload) for every downlink, payload is bytes.
+        """
+        self._downlink_callback = callback
+
+    def set_sent_callback(self, callback):
+        """
+        Call callback(success) when an uplink has been sent.
+        """
+        self._sent_callback = callback
+
+    def start_event(self, period_ms=50):
+        """
+        Handle downlinks and other events in the background.
+        """
+        self.stop_event()
+        self._timer = machine.Timer(-1)
+        self._timer.init(
+            period=period_ms, mode=machine.Timer.PERIODIC, callback=lambda _: self.poll()
+        )
+
+    def stop_event(self):
+        if self._timer is not None:
+            self._timer.deinit()
+            self._timer = None
+
+    def pop_downlink(self):
+        """
+        Oldest downlink as "type,port,length,hex payload", None if there is none.
+        """
+        self.poll()
+        try:
+            return self._downlink_buffer.popleft()
+        except IndexError:
+            return None
+
+    def _message_recv_data(self, msgs):
         respon = []
         for i in msgs:
             if i != "\r\n" and i != "ASR6501:~# ":
@@ -734,14 +857,14 @@ class LoRaWAN_Asr650x(object):
     def _flatten(self, _list):
         return sum(([x] if not isinstance(x, list) else self._flatten(x) for x in _list), [])
 
-    def _bytes_to_hex_str(self, bins):
-        return "".join(["%02X" % x for x in bins]).strip()
-
     def _hex_str_to_bytes(self, hexStr):
         return binascii.unhexlify(hexStr)
 
 
 class LoRaWAN_470(LoRaWAN_Asr650x):
+    # CN470 maximum application payload per datarate DR0..DR5
+    MAX_PAYLOAD = (51, 51, 51, 115, 222, 222)
+
     def __init__(self, tx, rx, debug=False):
         """
         Parameter:
@@ -829,8 +952,8 @@ class LoRaWAN_470(LoRaWAN_Asr650x):
             return self._join_status
         else:
             cmd = "AT+CSTATUS?"
-            result, error = self.__at_cmd(cmd)
-            result = self.__message_recv_data(result)
+            result, error = self._at_cmd(cmd)
+            result = self._message_recv_data(result)
             for item in range(len(result)):
                 try:
                     if result[item].index("+CSTATUS:") == 0:
@@ -858,8 +981,8 @@ class LoRaWAN_470(LoRaWAN_Asr650x):
             False  failed
         """
         cmd = "AT+CSTATUS?"
-        result, error = self.__at_cmd(cmd)
-        result = self.__message_recv_data(result)
+        result, error = self._at_cmd(cmd)
+        result = self._message_recv_data(result)
         for item in range(len(result)):
             try:
                 if result[item].index("+CSTATUS:") == 0:
@@ -886,24 +1009,20 @@ class LoRaWAN_470(LoRaWAN_Asr650x):
             false
             data
         """
-        msgs = []
-        now_time = time.time()
-        wait_time = now_time + timeout
-        line = self.__uart.readline()
-        while wait_time > time.time():
-            while (wait_time > time.time()) and (line is None):
-                line = self.__uart.readline()
-            if line is not None:
-                if AT_RECV_OK in line:
-                    line = line.decode()
-                    msgs.append(line[8:-2])
-                    return msgs
-                else:
-                    line = None
-        return False
+        deadline = time.ticks_add(time.ticks_ms(), timeout * 1000)
+        while True:
+            data = self.pop_downlink()
+            if data is not None:
+                return [data]
+            if time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+                return False
+            time.sleep_ms(10)
 
 
 class LoRaWAN_915(LoRaWAN_470):
+    # US915 maximum application payload per datarate DR0..DR4
+    MAX_PAYLOAD = (11, 53, 125, 242, 242)
+
     def __init__(self, tx, rx, debug=False):
         """
         Parameter:
@@ -916,6 +1035,9 @@ class LoRaWAN_915(LoRaWAN_470):
 
 
 class LoRaWAN_868(LoRaWAN_470):
+    # EU868 maximum application payload per datarate DR0..DR7
+    MAX_PAYLOAD = (51, 51, 51, 115, 222, 222, 222, 222)
+
     def __init__(self, tx, rx, debug=False):
         """
         Parameter:
@@ -24,6 +24,7 @@
 import time
 import struct
 from micropython import const
+import micropython
 import binascii
 
 
@@ -41,8 +42,11 @@ _OP_LOCK = const(0x17)
 _OP_GEN_KEY = const(0x40)
 _OP_SIGN = const(0x41)
 _OP_WRITE = const(0x12)
+_OP_READ = const(0x02)
+_OP_VERIFY = const(0x45)
 
-# Maximum execution times, in milliseconds (9-4)
+# Maximum execution times, in milliseconds (9-4). Responses are polled, so
+# these are only the deadlines, a command is read as soon as it is done.
 EXEC_TIME = {
     _OP_COUNTER: const(20),
     _OP_INFO: const(1),
@@ -53,8 +57,17 @@ EXEC_TIME = {
     _OP_GEN_KEY: const(115),
     _OP_SIGN: const(70),
     _OP_WRITE: const(26),
+    _OP_READ: const(5),
+    _OP_VERIFY: const(58),
 }
 
+# The watchdog puts the chip to sleep 1.3 s after a wake. A command is only
+# sent when it completes within this time after the wake, otherwise the
+# watchdog is restarted first.
+_WATCHDOG_MS = const(1000)
+# Pause between reads while the chip NACKs because it is still busy.
+_POLL_US = const(200)
+
 # pylint: disable=line-too-long
 """
 Configuration Zone Bytes
@@ -117,6 +130,37 @@ _CFG_BYTES_LIST_MOD = _CFG_BYTES_LIST[0:16] + list(_CFG_BYTE_16) + _CFG_BYTES_LI
 CFG_TLS = bytes(_CFG_BYTES_LIST_MOD)
 
 
+@micropython.viper
+def _crc16(data, start: int, end: int) -> int:
+    # CRC-16 of data[start:end], polynomial 0x8005, bits fed LSB first.
+    p = ptr8(data)  # noqa: F821
+    crc = 0
+    for i in range(start, end):
+        b = p[i]
+        for shift in range(8):
+            crc_bit = (crc >> 15) & 1
+            crc = (crc << 1) & 0xFFFF
+            if ((b >> shift) & 1) != crc_bit:
+                crc ^= 0x8005
+    return crc
+
+
+class _Session:
+    # Keeps the chip awake from __enter__ to __exit__, may be nested.
+    def __init__(self, atecc) -> None:
+        self._atecc = atecc
+
+    def __enter__(self):
+        self._atecc._session += 1
+        self._atecc.wakeup()
+        return self._atecc
+
+    def __exit__(self, *args) -> None:
+        self._atecc._session -= 1
+        if not self._atecc._session:
+            self._atecc.idle()
+
+
 class ATECC:
     #! uPython interface for ATECCx08A Crypto Co-Processor Devices.
 
@@ -127,30 +171,49 @@ class ATECC:
         # don't probe, the device will NACK until woken up
         self._i2c = i2c
         self._i2c_addr = address
+        self._awake = False
+        self._woken = 0
+        self._session = 0
+        self._block = bytearray(64)
+
+    def session(self) -> _Session:
+        #! Context manager keeping the chip awake for a batch of commands:
+        #!     with atecc.session():
+        #!         digest = atecc.sha256(payload)
+        #!         signature = atecc.ecdsa_sign(0, digest)
+        return _Session(self)
 
     def wakeup(self) -> None:
         #! Wakes up THE ATECC608A from sleep or idle modes.
+        #! Does nothing while it is awake.
+        if self._awake:
+            return
         try:
-            self._i2c.writeto(0, bytes([0x00]))
+            self._i2c.writeto(0, b"\x00")
         except:
             pass
-        time.sleep(0.0015)
+        time.sleep_us(1500)
+        self._awake = True
+        self._woken = time.ticks_ms()
 
     def idle(self) -> None:
         #! Puts the chip into idle mode until wakeup is called.
-        self._i2c.writeto(self._i2c_addr, bytes([0x02]))
-        time.sleep(0.001)
+        #! Inside a session the chip stays awake until the session ends.
+        if self._session:
+            return
+        self._awake = False
+        self._i2c.writeto(self._i2c_addr, b"\x02")
 
     def sleep(self) -> None:
         #! Puts the chip into low-power sleep mode until wakeup is called.
-        self._i2c.writeto(self._i2c_addr, bytes([0x01]))
+        self._awake = False
+        self._i2c.writeto(self._i2c_addr, b"\x01")
         time.sleep(0.001)
 
     def locked(self) -> bool:
         #! Returns if the ATECC is locked.
         config = bytearray(4)
         self._read(0x00, 0x15, config)
-        time.sleep(0.001)
         return config[2] == 0x0 and config[3] == 0x00
 
     def serial_number(self) -> str:
@@ -158,18 +221,16 @@ class ATECC:
         serial_num = bytearray(9)
         # 4-byte reads only
         temp_sn = bytearray(4)
-        # SN<0:3>
-        self._read(0, 0x00, temp_sn)
-        serial_num[0:4] = temp_sn
-        time.sleep(0.001)
-        # SN<4:8>
-        self._read(0, 0x02, temp_sn)
-        serial_num[4:8] = temp_sn
-        time.sleep(0.001)
-        # Append Rev
-        self._read(0, 0x03, temp_sn)
-        serial_num[8] = temp_sn[0]
-        time.sleep(0.001)
+        with self.session():
+            # SN<0:3>
+            self._read(0, 0x00, temp_sn)
+            serial_num[0:4] = temp_sn
+            # SN<4:8>
+            self._read(0, 0x02, temp_sn)
+            serial_num[4:8] = temp_sn
+            # Append Rev
+            self._read(0, 0x03, temp_sn)
+            serial_num[8] = temp_sn[0]
         # neaten up the serial for printing
         serial_num = str(binascii.hexlify(serial_num), "utf-8")
         serial_num = serial_num.upper()
@@ -191,10 +252,9 @@ class ATECC:
     def lock(self, zone: int) -> None:
         #! Locks specific ATECC zones.
         self.wakeup()
-        self._send_command(0x17, 0x80 | zone, 0x0000)
-        time.sleep(EXEC_TIME[_OP_LOCK] / 1000)
+        self._send_command(_OP_LOCK, 0x80 | zone, 0x0000)
         res = bytearray(1)
-        self._get_response(res)
+        self._get_response(res, timeout=EXEC_TIME[_OP_LOCK])
         assert res[0] == 0x00, "Failed locking ATECC!"
         self.idle()
 
@@ -205,9 +265,8 @@ class ATECC:
             self._send_command(_OP_INFO, mode)
         else:
             self._send_command(_OP_INFO, mode, param)
-        time.sleep(EXEC_TIME[_OP_INFO] / 1000)
         info_out = bytearray(4)
-        self._get_response(info_out)
+        self._get_response(info_out, timeout=EXEC_TIME[_OP_INFO])
         self.idle()
         return info_out
 
@@ -228,9 +287,7 @@ class ATECC:
             calculated_nonce = bytearray(1)
         else:
             raise RuntimeError("Invalid mode specified!")
-        time.sleep(EXEC_TIME[_OP_NONCE] / 1000)
-        self._get_response(calculated_nonce)
-        time.sleep(1 / 1000)
+        self._get_response(calculated_nonce, timeout=EXEC_TIME[_OP_NONCE])
         if mode == 0x03:
             assert calculated_nonce[0] == 0x00, "Incorrectly calculated nonce in pass-thru mode"
         self.idle()
@@ -248,9 +305,8 @@ class ATECC:
             self._send_command(_OP_COUNTER, 0x01, counter)
         else:
             self._send_command(_OP_COUNTER, 0x00, counter)
-        time.sleep(EXEC_TIME[_OP_COUNTER] / 1000)
         count = bytearray(4)
-        self._get_response(count)
+        self._get_response(count, timeout=EXEC_TIME[_OP_COUNTER])
         self.idle()
         return count
 
@@ -277,9 +333,8 @@ class ATECC:
         data_len = len(data)
         while data_len:
             self._send_command(_OP_RANDOM, 0x00, 0x0000)
-            time.sleep(EXEC_TIME[_OP_RANDOM] / 1000)
             resp = bytearray(32)
-            self._get_response(resp)
+            self._get_response(resp, timeout=EXEC_TIME[_OP_RANDOM])
             copy_len = min(32, data_len)
             data = resp[0:copy_len]
             data_len -= copy_len
@@ -292,9 +347,8 @@ class ATECC:
         #! This method MUST be called before sha_update or sha_digest
         self.wakeup()
         self._send_command(_OP_SHA, 0x00)
-        time.sleep(EXEC_TIME[_OP_SHA] / 1000)
         status = bytearray(1)
-        self._get_response(status)
+        self._get_response(status, timeout=EXEC_TIME[_OP_SHA])
         assert status[0] == 0x00, "Error during sha_start."
         self.idle()
         return status
@@ -303,9 +357,8 @@ class ATECC:
         #! Appends bytes to the message. Can be repeatedly called.
         self.wakeup()
         self._send_command(_OP_SHA, 0x01, 64, message)
-        time.sleep(EXEC_TIME[_OP_SHA] / 1000)
         status = bytearray(1)
-        self._get_response(status)
+        self._get_response(status, timeout=EXEC_TIME[_OP_SHA])
         assert status[0] == 0x00, "Error during SHA Update"
         self.idle()
         return status
@@ -320,13 +373,46 @@ class ATECC:
             self._send_command(_OP_SHA, 0x02, len(message), message)
         else:
             self._send_command(_OP_SHA, 0x02)
-        time.sleep(EXEC_TIME[_OP_SHA] / 1000)
         digest = bytearray(32)
-        self._get_response(digest)
+        self._get_response(digest, timeout=EXEC_TIME[_OP_SHA])
         assert len(digest) == 32, "SHA response length does not match expected length."
         self.idle()
         return digest
 
+    def sha256(self, data) -> bytearray:
+        #! Returns the SHA-256 digest of bytes, a file opened in binary mode or
+        #! an iterable of byte chunks. The 64 byte blocks are fed back to back
+        #! in one session.
+        block = self._block
+        mv = memoryview(block)
+        fill = 0
+        with self.session():
+            self.sha_start()
+            if hasattr(data, "readinto"):
+                while True:
+                    n = data.readinto(mv[fill:])
+                    if not n:
+                        break
+                    fill += n
+                    if fill == 64:
+                        self.sha_update(block)
+                        fill = 0
+            else:
+                if isinstance(data, (bytes, bytearray, memoryview)):
+                    data = (data,)
+                for chunk in data:
+                    chunk = memoryview(chunk)
+                    pos = 0
+                    while pos < len(chunk):
+                        n = min(64 - fill, len(chunk) - pos)
+                        mv[fill : fill + n] = chunk[pos : pos + n]
+                        fill += n
+                        pos += n
+                        if fill == 64:
+                            self.sha_update(block)
+                            fill = 0
+            return self.sha_digest(block[:fill])
+
     def gen_key(self, key: bytearray, slot_num: int, private_key: bool = False) -> bytearray:
         #! Generates a private or public key.
         assert 0 <= slot_num <= 4, "Provided slot must be between 0 and 4."
@@ -335,53 +421,48 @@ class ATECC:
             self._send_command(_OP_GEN_KEY, 0x04, slot_num)
         else:
             self._send_command(_OP_GEN_KEY, 0x00, slot_num)
-        time.sleep(EXEC_TIME[_OP_GEN_KEY] / 1000)
-        self._get_response(key)
-        time.sleep(0.001)
+        self._get_response(key, timeout=EXEC_TIME[_OP_GEN_KEY])
         self.idle()
         return key
 
     def ecdsa_sign(self, slot: int, message: bytearray) -> bytearray:
         #! Generates and returns a signature using the ECDSA algorithm.
-        # Load the message digest into TempKey using Nonce (9.1.8)
-        self.nonce(message, 0x03)
-        # Generate and return a signature
-        sig = bytearray(64)
-        sig = self.sign(slot)
-        return sig
+        with self.session():
+            # Load the message digest into TempKey using Nonce (9.1.8)
+            self.nonce(message, 0x03)
+            # Generate and return a signature
+            return self.sign(slot)
 
     def sign(self, slot_id: int) -> bytearray:
         #! Performs ECDSA signature calculation with key in provided slot.
         self.wakeup()
-        self._send_command(0x41, 0x80, slot_id)
-        time.sleep(EXEC_TIME[_OP_SIGN] / 1000)
+        self._send_command(_OP_SIGN, 0x80, slot_id)
         signature = bytearray(64)
-        self._get_response(signature)
+        self._get_response(signature, timeout=EXEC_TIME[_OP_SIGN])
         self.idle()
         return signature
 
     def verify_sign(self, message: bytearray, sign: bytearray, key: bytearray):
         temp_sign = bytearray(128)
-        # Load the message digest into TempKey using Nonce (9.1.8)
-        self.nonce(message, 0x03)
         temp_sign[0:64] = sign
         temp_sign[64:128] = key
-        self.wakeup()
-        self._send_command(0x45, 0x02, 0x0004, temp_sign)
-        time.sleep(0.058)
-        status = bytearray(1)
-        self._get_response(status)
-        self.idle()
+        with self.session():
+            # Load the message digest into TempKey using Nonce (9.1.8)
+            self.nonce(message, 0x03)
+            self._send_command(_OP_VERIFY, 0x02, 0x0004, temp_sign)
+            status = bytearray(1)
+            self._get_response(status, timeout=EXEC_TIME[_OP_VERIFY])
         return status
 
     def write_config(self, data: bytearray) -> None:
         #! Writes configuration data to the device's EEPROM.
         # First 16 bytes of data are skipped, not writable
-        for i in range(16, 128, 4):
-            if i == 84:
-                # can't write
-                continue
-            self._write(0, i // 4, data[i : i + 4])
+        with self.session():
+            for i in range(16, 128, 4):
+                if i == 84:
+                    # can't write
+                    continue
+                self._write(0, i // 4, data[i : i + 4])
 
     def _write(self, zone, address: int, buffer: bytearray) -> None:
         #! Writes to the I2C.
@@ -390,10 +471,9 @@ class ATECC:
             raise RuntimeError("Only 4 or 32-byte writes supported.")
         if len(buffer) == 32:
             zone |= 0x80
-        self._send_command(0x12, zone, address, buffer)
-        time.sleep(0.026)
+        self._send_command(_OP_WRITE, zone, address, buffer)
         status = bytearray(1)
-        self._get_response(status)
+        self._get_response(status, timeout=EXEC_TIME[_OP_WRITE])
         self.idle()
 
     def _read(self, zone: int, address: int, buffer: bytearray) -> None:
@@ -403,13 +483,11 @@ class ATECC:
             raise RuntimeError("Only 4 and 32 byte reads supported")
         if len(buffer) == 32:
             zone |= 0x80
-        self._send_command(2, zone, address)
-        time.sleep(0.005)
-        self._get_response(buffer)
-        time.sleep(0.001)
+        self._send_command(_OP_READ, zone, address)
+        self._get_response(buffer, timeout=EXEC_TIME[_OP_READ])
         self.idle()
 
-    def _send_command(self, opcode: int, param_1: int, param_2: int = 0x00, data="") -> None:
+    def _send_command(self, opcode: int, param_1: int, param_2: int = 0x00, data=b"") -> None:
         #! Sends a security command packet over i2c.
         #! assembling command packet
         command_packet = bytearray(8 + len(data))
@@ -422,38 +500,58 @@ class ATECC:
         command_packet[3] = param_1
         command_packet[4] = param_2 & 0xFF
         command_packet[5] = param_2 >> 8
-        for i, cmd in enumerate(data):
-            command_packet[6 + i] = cmd
+        command_packet[6 : 6 + len(data)] = data
         if self._debug:
             print("Command Packet Sz: ", len(command_packet))
             print("\tSending:", [hex(i) for i in command_packet])
         # Checksum, CRC16 verification
-        crc = self._at_crc(command_packet[1:-2])
+        crc = _crc16(command_packet, 1, len(command_packet) - 2)
         command_packet[-1] = crc >> 8
         command_packet[-2] = crc & 0xFF
+        self._refresh_watchdog(EXEC_TIME.get(opcode, _WATCHDOG_MS))
         self.wakeup()
         self._i2c.writeto(self._i2c_addr, command_packet)
-        # small sleep
-        time.sleep(0.001)
 
-    def _get_response(self, buf, length: int = None, retries: int = 20) -> int:
-        self.wakeup()
+    def _refresh_watchdog(self, exec_time: int) -> None:
+        # Between commands only: restart the watchdog by going idle (which
+        # keeps TempKey) when the command could not complete before it
+        # expires. If the idle write fails the chip already went to sleep,
+        # it gets a full wake.
+        if not self._awake:
+            return
+        if time.ticks_diff(time.ticks_ms(), self._woken) + exec_time < _WATCHDOG_MS:
+            return
+        try:
+            self._i2c.writeto(self._i2c_addr, b"\x02")
+        except OSError:
+            pass
+        self._awake = False
+
+    def _get_response(self, buf, length: int = None, timeout: int = 20) -> int:
+        #! Reads the response as soon as the chip stops NACKing, at most
+        #! timeout ms (the command's maximum execution time) after it was sent.
         if length is None:
             length = len(buf)
         response = bytearray(length + 3)  # 1 byte header, 2 bytes CRC, len bytes data
-        for _ in range(retries):
+        deadline = time.ticks_add(time.ticks_ms(), timeout + 1)
+        while True:
             try:
                 self._i2c.readfrom_into(self._i2c_addr, response)
                 break
             except OSError:
-                pass
-        else:
-            raise RuntimeError("Failed to read data from chip")
+                if time.ticks_diff(deadline, time.ticks_ms()) < 0:
+                    raise RuntimeError("Failed to read data from chip")
+                time.sleep_us(_POLL_US)
         if self._debug:
             print("\tReceived: ", [hex(i) for i in response])
-        crc = response[-2] | (response[-1] << 8)
-        crc2 = self._at_crc(response[0:-2])
-        if crc != crc2:
+        count = response[0]
+        if count == 4 and length > 1:
+            # A status packet instead of the data: the command failed.
+            if _crc16(response, 0, 2) == response[2] | (response[3] << 8):
+                raise RuntimeError("ATECC error 0x%02x" % response[1])
+        if count != length + 3 or _crc16(response, 0, count - 2) != (
+            response[count - 2] | (response[count - 1] << 8)
+        ):
             raise RuntimeError("CRC Mismatch")
         for i in range(length):
             buf[i] = response[i + 1]
@@ -465,17 +563,34 @@ class ATECC:
             length = len(data)
         if not data or not length:
             return 0
-        polynom = 0x8005
-        crc = 0x0
-        for b in data:
-            for shift in range(8):
-                data_bit = 0
-                if b & (1 << shift):
-                    data_bit = 1
-                crc_bit = (crc >> 15) & 0x1
-                crc <<= 1
-                crc &= 0xFFFF
-                if data_bit != crc_bit:
-                    crc ^= polynom
-                    crc &= 0xFFFF
-        return crc & 0xFFFF
+        return _crc16(data, 0, length)
+
+
+def benchmark(atecc, count: int = 20, slot: int = 0) -> dict:
+    #! Measures the commands per second of the ATECC, each with a wake and
+    #! idle cycle per command and in a session ("<name>_session").
+    #! Signing uses the private key in slot.
+    block = bytes(64)
+    digest = bytes(32)
+    tests = (
+        ("info", lambda: atecc.info(0x00)),
+        ("random", lambda: atecc._random(bytearray(32))),
+        ("read", lambda: atecc._read(0, 0x00, bytearray(4))),
+        ("sha256_64", lambda: atecc.sha256(block)),
+        ("sha256_1k", lambda: atecc.sha256(block * 16)),
+        ("sign", lambda: atecc.ecdsa_sign(slot, digest)),
+    )
+    result = {}
+    for name, run in tests:
+        result[name] = _rate(run, count)
+        with atecc.session():
+            result[name + "_session"] = _rate(run, count)
+    return result
+
+
+def _rate(run, count) -> float:
+    start = time.ticks_ms()
+    for _ in range(count):
+        run()
+    elapsed = time.ticks_diff(time.ticks_ms(), start)
+    return count * 1000 / elapsed if elapsed else 0.0
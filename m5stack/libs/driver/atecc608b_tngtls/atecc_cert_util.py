@@ -125,18 +125,8 @@ class CSR:
         # Terminator
         csr_info += b"\xa0\x00"
 
-        # Init. SHA-256 Calculation
-        csr_info_sha_256 = bytearray(64)
-        self._atecc.sha_start()
-
-        for i in range(0, len_csr_info + len_csr_info_header, 64):
-            chunk_len = (len_csr_info_header + len_csr_info) - i
-
-            chunk_len = min(chunk_len, 64)
-            if chunk_len == 64:
-                self._atecc.sha_update(csr_info[i : i + 64])
-            else:
-                csr_info_sha_256 = self._atecc.sha_digest(csr_info[i:])
+        # SHA-256 Calculation
+        csr_info_sha_256 = self._atecc.sha256(csr_info)
 
         # Sign the SHA256 Digest
         signature = bytearray(64)
@@ -25,7 +25,10 @@ DATA_REG = 0x0C
 SENSORTIME_0 = 0x18
 SENSORTIME_1 = 0x19
 SENSORTIME_2 = 0x1A
+INT_STATUS_1 = 0x1D
 INTERNAL_STATUS = 0x21
+FIFO_LENGTH_0 = 0x24
+FIFO_DATA = 0x26
 AUX_CONF_ADDR = 0x44
 FIFO_CONFIG_0 = 0x48
 FIFO_CONFIG_1 = 0x49
@@ -514,6 +517,9 @@ ODR = (0, 0.78, 1.5, 3.1, 6.25, 12.5, 25, 50, 100, 200, 400, 800, 1600, 3200)
 
 
 class BMI270:
+    # Headerless FIFO frame: gyro x, y, z then accel x, y, z, little endian.
+    FIFO_FRAME_SIZE = 12
+
     def __init__(
         self,
         i2c,
@@ -527,6 +533,7 @@ class BMI270:
         #! Initalizes Gyro and Accelerometer.
         self._i2c = i2c
         self.address = address
+        self._saved_config = None
 
         if self._read_reg(CHIP_ID) != 0x24:
             raise OSError("No BMI270 device was found at address 0x%x" % (self.address))
@@ -670,6 +677,63 @@ class BMI270:
         self._read_reg_into(ACC_X, self.scratch)
         return (self.scratch[0] / f, self.scratch[1] / f, self.scratch[2] / f)
 
+    def fifo_enable(self, odr=100) -> float:
+        #! Stream accel and gyro into the FIFO at the same ODR, returns the ODR used.
+        odr = min(ODR[7:12], key=lambda v: abs(v - odr))
+        # Headerless mode requires the same ODR for every sensor in the FIFO,
+        # the slower magnetometer is read from its data registers instead.
+        # Restored by fifo_disable().
+        if self._saved_config is None:
+            self._saved_config = (
+                self._read_reg(ACC_CONF),
+                self._read_reg(GYR_CONF),
+                self._read_reg(FIFO_CONFIG_0),
+                self._read_reg(FIFO_CONFIG_1),
+            )
+        self._write_reg(ACC_CONF, 0xA0 | ODR.index(odr))
+        self._write_reg(GYR_CONF, 0xE0 | ODR.index(odr))
+        self._write_reg(FIFO_CONFIG_0, 0x00)
+        self._write_reg(FIFO_CONFIG_1, 0xC0)
+        self._write_reg(CMD_REG, 0xB0)
+        self._read_reg(INT_STATUS_1)  # clear a stale FIFO full flag
+        self._fifo_length = bytearray(2)
+        return odr
+
+    def fifo_disable(self) -> None:
+        if self._saved_config is not None:
+            self._write_reg(ACC_CONF, self._saved_config[0])
+            self._write_reg(GYR_CONF, self._saved_config[1])
+            self._write_reg(FIFO_CONFIG_0, self._saved_config[2])
+            self._write_reg(FIFO_CONFIG_1, self._saved_config[3])
+            self._saved_config = None
+        self._write_reg(CMD_REG, 0xB0)
+
+    def fifo_read(self, buf) -> int:
+        #! Read whole frames from the FIFO into buf in one burst, returns the frame count.
+        #! -1 if the FIFO filled up since the last read, it is flushed then.
+        # ffull_int is latched even when it is not mapped to a pin, cleared on read.
+        if self._read_reg(INT_STATUS_1) & 0x01:
+            self._write_reg(CMD_REG, 0xB0)
+            return -1
+        self._read_reg_into(FIFO_LENGTH_0, self._fifo_length)
+        length = (self._fifo_length[0] | (self._fifo_length[1] << 8)) & 0x3FFF
+        n = min(length, len(buf)) // 12
+        if n:
+            self._i2c.readfrom_mem_into(self.address, FIFO_DATA, memoryview(buf)[: n * 12])
+        return n
+
+    def fifo_sample(self, buf, index, out) -> None:
+        #! Decode FIFO frame index into out: gyro in deg/s, accel in g.
+        gx, gy, gz, ax, ay, az = struct.unpack_from("<6h", buf, index * 12)
+        f = self.gyro_scale
+        out[0] = gx / f
+        out[1] = gy / f
+        out[2] = gz / f
+        f = self.accel_scale
+        out[3] = ax / f
+        out[4] = ay / f
+        out[5] = az / f
+
     def temperature(self) -> float:
         #! Return temperature value in celsius
         raw = struct.unpack("<h", self._read_reg(TEMP, 2))[0]
@@ -808,6 +872,18 @@ class BMI270_BMM150(BMI270):
             time.sleep_ms(30)
         raise OSError("Data not ready")
 
+    def magnet_poll(self):
+        #! Returns the magnetometer vector if a new sample is ready, else None.
+        self._read_reg_into(AUX_X, self.aux_scratch)
+        if not self.aux_scratch[3] & 0x1:
+            return None
+        h = self.aux_scratch[3] >> 2
+        return (
+            self._compensate_x(self.aux_scratch[0] >> 3, h),
+            self._compensate_y(self.aux_scratch[1] >> 3, h),
+            self._compensate_z(self.aux_scratch[2] >> 1, h),
+        )
+
     def magnet(self) -> tuple:
         #! Returns magnetometer vector.
         x, y, z, h = self.magnet_raw()
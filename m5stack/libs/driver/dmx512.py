@@ -7,10 +7,44 @@ import time
 import _thread
 import cdriver
 import micropython
+from array import array
+from micropython import const
 
 if sys.platform != "esp32":
     from typing import Literal
 
+# Start code and 512 slots; index n of a universe buffer is channel n.
+UNIVERSE_SIZE = const(513)
+
+
+@micropython.viper
+def _diff(new: ptr8, old: ptr8, n: int, ranges: ptr16) -> int:  # noqa: F821
+    # Copy the changed slots of new[1:n] into old and store each changed run
+    # as a start, end pair in ranges. Returns the number of runs.
+    count = 0
+    i = 1
+    while i < n:
+        if new[i] != old[i]:
+            ranges[count * 2] = i
+            while i < n and new[i] != old[i]:
+                old[i] = new[i]
+                i += 1
+            ranges[count * 2 + 1] = i
+            count += 1
+        else:
+            i += 1
+    return count
+
+
+@micropython.viper
+def _lerp(dst: ptr8, a: ptr8, b: ptr8, n: int, w: int):  # noqa: F821
+    # dst = a + (b - a) * w / 256 for the slots 1..n-1, w in 0..256.
+    i = 1
+    while i < n:
+        x = a[i]
+        dst[i] = x + (((b[i] - x) * w) >> 8)
+        i += 1
+
 
 class DMX512:
     """! DMX512 communication unit.
@@ -50,7 +84,19 @@ class DMX512:
         self.dmx_ch = 1
         self.recv_running = False
         self.receive_callbacks = {}
-        self._last_data = {}
+        self._change_callbacks = []
+        self._last = bytearray(UNIVERSE_SIZE)
+        # Double buffered output: the application edits _back, the output
+        # task sends _front once per DMX refresh.
+        self._front = bytearray(UNIVERSE_SIZE)
+        self._back = bytearray(UNIVERSE_SIZE)
+        self._lock = _thread.allocate_lock()
+        # Held while the output or receive thread runs, released by the
+        # thread itself when it leaves the driver.
+        self._send_done = _thread.allocate_lock()
+        self._recv_done = _thread.allocate_lock()
+        self._sending = False
+        self._fade = None
         self.dmx_init(self.dmx_mode)
 
     def dmx_init(self, mode=DMX_MASTER) -> None:
@@ -90,6 +136,95 @@ class DMX512:
         if self.dmx_mode == self.DMX_SLAVE:
             return cdriver.esp_dmx.dmx_read_data(channel)
 
+    def write_universe(self, buf) -> None:
+        """! Sends a whole packet, waiting until the previous one is sent.
+
+        @param buf Buffer of up to 513 bytes, the start code (0) followed by channels 1 to 512.
+        """
+        if self.dmx_mode == self.DMX_MASTER:
+            cdriver.esp_dmx.dmx_write_universe(buf)
+
+    def read_universe(self, into, timeout_ms=0) -> int:
+        """! Receives the next packet in Slave mode.
+
+        @param into Buffer of 513 bytes for the start code and channels 1 to 512.
+        @param timeout_ms Time to wait for a packet.
+        @return Number of bytes received, 0 if no valid packet arrived.
+        """
+        if self.dmx_mode != self.DMX_SLAVE:
+            return 0
+        return cdriver.esp_dmx.dmx_read_universe(into, timeout_ms)
+
+    @property
+    def universe(self) -> bytearray:
+        """! The back buffer of the output, index n is channel n. Edits are sent after present()."""
+        return self._back
+
+    def present(self) -> None:
+        """! Swaps the back buffer in, it is sent from the next DMX refresh on.
+
+        Cancels a running fade. The new back buffer starts as a copy of the frame shown.
+        """
+        with self._lock:
+            self._fade = None
+            self._front, self._back = self._back, self._front
+            self._back[:] = self._front
+
+    def fade_to(self, target, duration_ms, start=None) -> None:
+        """! Fades the output to target over duration_ms, computing a frame every refresh.
+
+        @param target Buffer of 513 bytes with the final frame.
+        @param duration_ms Duration of the fade.
+        @param start Buffer to fade from (crossfade), by default the frame shown.
+        """
+        dst = bytearray(target)
+        with self._lock:
+            # The output thread swaps and writes _front under the lock.
+            src = bytearray(start if start is not None else self._front)
+            self._fade = (src, dst, time.ticks_ms(), max(duration_ms, 1))
+
+    def crossfade(self, a, b, duration_ms) -> None:
+        """! Fades from the frame a to the frame b."""
+        self.fade_to(b, duration_ms, a)
+
+    @property
+    def fading(self) -> bool:
+        return self._fade is not None
+
+    def _fade_step(self) -> None:
+        src, dst, t0, duration = self._fade
+        w = min(time.ticks_diff(time.ticks_ms(), t0) * 256 // duration, 256)
+        _lerp(self._front, src, dst, UNIVERSE_SIZE, w)
+        if w == 256:
+            self._fade = None
+            self._back[:] = self._front
+
+    def _send_task(self) -> None:
+        """! Internal task that sends the front buffer once per DMX refresh."""
+        try:
+            while self._sending:
+                cdriver.esp_dmx.dmx_wait_sent()
+                with self._lock:
+                    if self._fade is not None:
+                        self._fade_step()
+                    cdriver.esp_dmx.dmx_write_universe(self._front)
+        finally:
+            self._send_done.release()
+
+    def start_output(self) -> None:
+        """! Starts sending the universe continuously in Master mode."""
+        if self.dmx_mode == self.DMX_MASTER and not self._sending:
+            self._send_done.acquire()
+            self._sending = True
+            _thread.start_new_thread(self._send_task, ())
+
+    def stop_output(self) -> None:
+        """! Stops the continuous output, returns once the output thread has left the driver."""
+        if self._sending:
+            self._sending = False
+            self._send_done.acquire()
+            self._send_done.release()
+
     def clear_buffer(self) -> None:
         """! Clears the DMX buffer and resets the data."""
         self.dmx_data = 0
@@ -97,33 +232,53 @@ class DMX512:
 
     def deinit(self) -> None:
         """! Deinitializes the DMX512 unit and stops any ongoing operations."""
+        # Both threads must be out of the driver before it is torn down.
+        self.stop_output()
+        self.stop_receive()
         if self.dmx_mode == self.DMX_MASTER:
             cdriver.esp_dmx.dmx_deinit()
         self.receive_callbacks.clear()
+        self._change_callbacks.clear()
         self.clear_buffer()
-        self.stop_receive()
+
+    def _notify(self, start, end) -> None:
+        for cb in self._change_callbacks:
+            cb(start, end, self._last)
+        callbacks = self.receive_callbacks
+        if end - start > len(callbacks):
+            channels = [ch for ch in callbacks if start <= ch < end]
+        else:
+            channels = [ch for ch in range(start, end) if ch in callbacks]
+        for ch in channels:
+            callbacks[ch](self._last[ch])
 
     def _recv_task(self) -> None:
         """! Internal task that runs in a separate thread to handle non-blocking DMX data reception."""
-        while self.recv_running:
-            for channel in self.receive_callbacks.keys():
-                data = self.read_data(channel)
-                if self._last_data[channel] != data:
-                    self._last_data[channel] = data
-                    self.receive_callbacks[channel](data)
-
-            time.sleep_ms(10)
+        rx = bytearray(UNIVERSE_SIZE)
+        ranges = array("H", bytes(UNIVERSE_SIZE * 2))
+        try:
+            while self.recv_running:
+                n = cdriver.esp_dmx.dmx_read_universe(rx, 100)
+                if not n:
+                    continue
+                for k in range(_diff(rx, self._last, n, ranges)):
+                    self._notify(ranges[2 * k], ranges[2 * k + 1])
+        finally:
+            self._recv_done.release()
 
     def receive_none_block(self) -> None:
         """! Starts non-blocking data reception for the specified channels with associated callbacks."""
         if not self.recv_running:
+            self._recv_done.acquire()
             self.recv_running = True
             _thread.start_new_thread(self._recv_task, ())
 
     def stop_receive(self) -> None:
-        """! Stops the non-blocking data reception task."""
-        self.recv_running = False
-        time.sleep_ms(50)
+        """! Stops the non-blocking data reception task, returns once it has left the driver (up to the 100 ms read timeout)."""
+        if self.recv_running:
+            self.recv_running = False
+            self._recv_done.acquire()
+            self._recv_done.release()
 
     def attach_channel(self, channel, callback) -> None:
         """! Attaches a callback function to a specified DMX channel.
@@ -132,7 +287,6 @@ class DMX512:
         @param callback The function to be called when data changes on the specified channel.
         """
         self.receive_callbacks[channel] = callback
-        self._last_data[channel] = 0
 
     def detach_channel(self, channel):
         """! Detaches the callback function from a specified DMX channel.
@@ -140,4 +294,14 @@ class DMX512:
         @param channel DMX channel number (1-512) to detach the callback from.
         """
         self.receive_callbacks.pop(channel)
-        self._last_data.pop(channel)
+
+    def attach_change(self, callback) -> None:
+        """! Attaches a callback for every changed run of channels.
+
+        @param callback Called as callback(start, end, universe) for the channels start to end - 1; universe holds the received values, index n is channel n.
+        """
+        self._change_callbacks.append(callback)
+
+    def detach_change(self, callback) -> None:
+        """! Detaches a callback attached with attach_change()."""
+        self._change_callbacks.remove(callback)
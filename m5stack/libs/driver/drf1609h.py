@@ -2,9 +2,16 @@
 #
 # SPDX-License-Identifier: MIT
 
+from machine import Timer
 import struct
 import time
 
+# Point to point frame: 0xED, data length, destination (u16), data, and on
+# receive the source address (u16) appended by the module.
+P2P_HEAD = 0xED
+P2P_OVERHEAD = 6
+BROADCAST = 0xFFFF
+
 
 class DeviceParameter:
     device_type = 0x02
@@ -377,3 +384,219 @@ class DRF1609H:
             for x in arg:
                 chcksum += x
         return chcksum & 0xFF
+
+
+class DRF1609HLink:
+    """
+    Frame parser and paced transmit queue for point to point (P2P) mode.
+
+    Bytes are staged in a fixed buffer, complete frames are copied into a
+    pool of ``pool`` preallocated buffers and dispatched by source address
+    to the handler registered with on(), as handler(src, data, dest) where
+    data is a memoryview only valid during the call. When dispatch falls
+    behind, the oldest frame is dropped and counted in ``overruns``.
+
+    send() queues a frame; poll() sends queued frames, at most one every
+    ``pace_ms`` per destination, so a burst to one node does not overrun
+    its radio while frames to other nodes still go out.
+
+    With ``framed=False`` (pass-through modes) whatever arrived is
+    dispatched as one frame from source -1 to BROADCAST.
+    """
+
+    def __init__(self, uart, pool=16, queue=8, max_len=80, pace_ms=20, framed=True) -> None:
+        self.uart = uart
+        self.max_len = max_len
+        self.pace_ms = pace_ms
+        self.framed = framed
+        self._acc = bytearray(2 * (max_len + P2P_OVERHEAD))
+        self._n = 0
+        self._rx_t = time.ticks_ms()
+        self._pool = [bytearray(max_len) for _ in range(pool)]
+        self._free = list(range(pool))
+        self._ready = []
+        self._handlers = {}
+        self._default = None
+        self._tx = [bytearray(max_len + 4) for _ in range(queue)]
+        self._tx_free = list(range(queue))
+        self._tx_queue = []
+        self._last_tx = {}
+        self._tim = None
+        self.rx_frames = 0
+        self.rx_bytes = 0
+        self.tx_frames = 0
+        self.tx_bytes = 0
+        self.tx_dropped = 0
+        self.overruns = 0
+        self.resyncs = 0
+        self._latency_sum = 0
+        self._latency_max = 0
+        self._window = (0, 0, 0, time.ticks_ms())
+
+    def on(self, src, handler) -> None:
+        """Call handler(src, data, dest) for frames from src, None removes it."""
+        if handler is None:
+            self._handlers.pop(src, None)
+        else:
+            self._handlers[src] = handler
+
+    def on_default(self, handler) -> None:
+        """Call handler(src, data, dest) for frames of sources without a handler."""
+        self._default = handler
+
+    def _store(self, acc, start, n, dest, src) -> None:
+        if not self._free:
+            # Drop the oldest frame to keep the newest.
+            self._free.append(self._ready.pop(0)[0])
+            self.overruns += 1
+        k = self._free.pop()
+        self._pool[k][:n] = acc[start : start + n]
+        self._ready.append((k, n, src, dest, time.ticks_us()))
+        self.rx_frames += 1
+        self.rx_bytes += n
+
+    def _frame(self, acc, start, end) -> int:
+        # Store the frame at acc[start:], returns its size, 0 if incomplete,
+        # -1 if invalid.
+        if end - start < 2:
+            return 0
+        n = acc[start + 1]
+        if n == 0 or n > self.max_len:
+            return -1
+        size = n + P2P_OVERHEAD
+        if end - start < size:
+            return 0
+        dest = (acc[start + 2] << 8) | acc[start + 3]
+        src = (acc[start + 4 + n] << 8) | acc[start + 5 + n]
+        self._store(acc, start + 4, n, dest, src)
+        return size
+
+    def _receive(self) -> None:
+        acc = self._acc
+        mv = memoryview(acc)
+        now = time.ticks_ms()
+        while self.uart.any() and self._n < len(acc):
+            self._n += self.uart.readinto(mv[self._n :]) or 0
+            self._rx_t = now
+        end = self._n
+        if not self.framed:
+            for pos in range(0, end, self.max_len):
+                self._store(acc, pos, min(self.max_len, end - pos), BROADCAST, -1)
+            self._n = 0
+            return
+        # A partial frame still incomplete after 100 ms started with a data
+        # byte that looked like the header.
+        stale = time.ticks_diff(now, self._rx_t) > 100 or end == len(acc)
+        pos = 0
+        while pos < end:
+            if acc[pos] != P2P_HEAD:
+                pos += 1
+                self.resyncs += 1
+                continue
+            size = self._frame(acc, pos, end)
+            if size == 0 and not stale:
+                break
+            if size <= 0:
+                self.resyncs += 1
+            pos += size if size > 0 else 1
+        if pos:
+            acc[: end - pos] = acc[pos:end]
+            self._n = end - pos
+
+    def _dispatch(self) -> None:
+        handlers = self._handlers
+        while self._ready:
+            k, n, src, dest, t = self._ready.pop(0)
+            latency = time.ticks_diff(time.ticks_us(), t)
+            self._latency_sum += latency
+            self._latency_max = max(self._latency_max, latency)
+            handler = handlers.get(src, self._default)
+            if handler is not None:
+                handler(src, memoryview(self._pool[k])[:n], dest)
+            self._free.append(k)
+
+    def send(self, address, data) -> bool:
+        """
+        Queue a frame to address (BROADCAST for all), returns False when the
+        queue is full.
+        """
+        n = len(data)
+        if n > self.max_len:
+            raise ValueError("data longer than %d bytes" % self.max_len)
+        if not self._tx_free:
+            self.tx_dropped += 1
+            return False
+        i = self._tx_free.pop()
+        buf = self._tx[i]
+        struct.pack_into("!BBH", buf, 0, P2P_HEAD, n, address)
+        buf[4 : 4 + n] = data
+        self._tx_queue.append((i, n, address))
+        return True
+
+    def _transmit(self) -> None:
+        # Send the oldest frame of every destination whose pace has elapsed.
+        now = time.ticks_ms()
+        q = self._tx_queue
+        j = 0
+        while j < len(q):
+            i, n, address = q[j]
+            last = self._last_tx.get(address)
+            if last is not None and time.ticks_diff(now, last) < self.pace_ms:
+                j += 1
+                continue
+            q.pop(j)
+            self.uart.write(memoryview(self._tx[i])[: 4 + n])
+            self._tx_free.append(i)
+            self._last_tx[address] = now
+            self.tx_frames += 1
+            self.tx_bytes += n
+
+    def poll(self) -> int:
+        """Receive, dispatch and transmit, returns the frames still queued to send."""
+        self._receive()
+        self._dispatch()
+        if self._tx_queue:
+            self._transmit()
+        return len(self._tx_queue)
+
+    def start(self, period_ms=10) -> None:
+        """Poll from a soft timer every period_ms."""
+        self.stop()
+        self._tim = Timer(-1)
+        self._tim.init(period=period_ms, mode=Timer.PERIODIC, callback=lambda _: self.poll())
+
+    def stop(self) -> None:
+        if self._tim is not None:
+            self._tim.deinit()
+            self._tim = None
+
+    def stats(self) -> dict:
+        """
+        Returns the link statistics. The rates in bytes per second and the
+        dispatch latency in us cover the time since the previous call;
+        overruns counts received frames dropped because the pool was full,
+        resyncs the bytes skipped to find the next frame header.
+        """
+        frames, rx, tx, t0 = self._window
+        now = time.ticks_ms()
+        dt = time.ticks_diff(now, t0)
+        done = self.rx_frames - frames - len(self._ready)
+        result = {
+            "rx_frames": self.rx_frames,
+            "tx_frames": self.tx_frames,
+            "rx_rate": (self.rx_bytes - rx) * 1000 // dt if dt > 0 else 0,
+            "tx_rate": (self.tx_bytes - tx) * 1000 // dt if dt > 0 else 0,
+            "latency_avg_us": self._latency_sum // done if done > 0 else 0,
+            "latency_max_us": self._latency_max,
+            "overruns": self.overruns,
+            "resyncs": self.resyncs,
+            "tx_dropped": self.tx_dropped,
+            "tx_queued": len(self._tx_queue),
+        }
+        self._window = (self.rx_frames - len(self._ready), self.rx_bytes, self.tx_bytes, now)
+        self._latency_sum = 0
+        self._latency_max = 0
+        return result
+
+    def deinit(self) -> None:
+        self.stop()
@@ -4,6 +4,7 @@
 
 from machine import UART
 from micropython import const
+import micropython
 
 try:
     import struct
@@ -17,9 +18,27 @@ except ImportError:
 
 import time
 import binascii
+import os
 
 from . import types as t
 
+# Bytes moved per UART read and file write when streaming an image.
+_CHUNK = const(512)
+# User database file: magic, version, record count, characteristic size,
+# then id (u16), permission (u8) and the characteristic of every user.
+_DB_MAGIC = b"FPDB"
+_DB_VERSION = const(1)
+_DB_HEADER = ">4sBHH"
+
+
+@micropython.viper
+def _xor(buf, start: int, end: int, value: int) -> int:  # noqa: F821
+    # value XOR every byte of buf[start:end]
+    p = ptr8(buf)  # noqa: F821
+    for i in range(start, end):
+        value ^= p[i]
+    return value
+
 
 class CommandId:
     SLEEP = const(0x2C)
@@ -112,6 +131,7 @@ class FPC1020A:
         self._verbose = verbose
         self._add_mode = self.NO_REPETITION
         self._match_level = 5
+        self._rxbuf = bytearray(256)
         while self._uart.any():
             self._uart.read(self._uart.any())
         if self.get_version() not in ("B1.10.00", "B1.07.00"):
@@ -290,7 +310,7 @@ class FPC1020A:
         """Register a new user with FPC1020A."""
         head = t.serialize([196, 0, 0], COMMANDS[CommandId.UPLOAD_USER_INFO])
         data = t.serialize([id, permissions], (t.uint16_t, t.uint8_t))
-        data += characteristic
+        data += bytes(characteristic)
         rxcmd, rxdata, rest = self.command_ext(
             CommandId.UPLOAD_USER_INFO, head, data, timeout=timeout
         )
@@ -352,25 +372,47 @@ class FPC1020A:
             return ""
         return rxdata[:8].decode()
 
-    def capture_raw_img(self, file_name: str, hd: bool = False) -> bytes:
-        """TODO: 保存到文件"""
+    def capture_raw_img(self, file_name: str, hd: bool = False, timeout=10000) -> int:
+        """Capture the fingerprint image into file_name, returns its size in
+        bytes, 0 on failure. The image is streamed to the file in chunks.
+        """
         data = t.serialize([0, 0, 0x20 if hd else 0, 0], COMMANDS[CommandId.CAPTURE_RAW_IMG])
         rxcmd, rxdata, rest = self.command(CommandId.CAPTURE_RAW_IMG, data)
         if rest is not True or rxcmd != CommandId.CAPTURE_RAW_IMG:
-            return b""
+            return 0
         r, _ = t.deserialize(rxdata, RESPONSES[CommandId.CAPTURE_RAW_IMG])
         if r[1] != self._ACK_SUCCESS:
-            return b""
-
-        rxdata, rest = self._receive(timeout=100000)
-        if rest is not True or int(r[0]) != len(rxdata):
-            return b""
-
-        f = open(file_name, "wb")
-        f.write(rxdata)
-        f.close()
-
-        return rxdata
+            return 0
+
+        with open(file_name, "wb") as f:
+            size = self._receive_to_file(f, int(r[0]), timeout)
+        if size == 0:
+            os.remove(file_name)
+        return size
+
+    def _receive_to_file(self, f, length, timeout) -> int:
+        # Stream a data packet of length bytes into f, checking the XOR
+        # checksum on the way.
+        deadline = time.ticks_add(time.ticks_ms(), timeout)
+        if not self._sync(deadline):
+            return 0
+        buf = self._buffer(_CHUNK)
+        mv = memoryview(buf)
+        checksum = 0
+        remaining = length
+        while remaining:
+            n = min(remaining, _CHUNK)
+            if not self._read_into(mv[:n], deadline):
+                return 0
+            checksum = _xor(buf, 0, n, checksum)
+            f.write(mv[:n])
+            remaining -= n
+        if not self._read_into(mv[:2], deadline):
+            return 0
+        if buf[0] != checksum or buf[1] != self._END[0]:
+            self._verbose and print("Invalid image checksum")
+            return 0
+        return length
 
     def upload_characteristic(self, characteristic: bytes, timeout=5000) -> bool:
         head = t.serialize([196, 0, 0], COMMANDS[CommandId.UPLOAD_CHARACTERISTIC])
@@ -396,6 +438,49 @@ class FPC1020A:
         r, _ = t.deserialize(rxdata, RESPONSES[CommandId.GET_UNREGISTERED_USER_ID])
         return int(r[0]) if r[1] == self._ACK_SUCCESS else -1
 
+    def export_users(self, file_name: str) -> int:
+        """Save every registered user with its permission and
+        characteristic into file_name, returns the number of users saved.
+        """
+        ids = self.get_user_list()
+        count = 0
+        with open(file_name, "wb") as f:
+            f.write(struct.pack(_DB_HEADER, _DB_MAGIC, _DB_VERSION, 0, 0))
+            size = 0
+            for id in ids:
+                info = self.get_user_info(id)
+                if info is None:
+                    continue
+                size = len(info[2])
+                f.write(struct.pack(">HB", info[0], info[1]))
+                f.write(info[2])
+                count += 1
+            f.seek(0)
+            f.write(struct.pack(_DB_HEADER, _DB_MAGIC, _DB_VERSION, count, size))
+        return count
+
+    def import_users(self, file_name: str, replace: bool = False) -> int:
+        """Register the users saved by export_users(), returns the number of
+        users added. With replace, all users are deleted first.
+        """
+        with open(file_name, "rb") as f:
+            head = f.read(struct.calcsize(_DB_HEADER))
+            magic, version, count, size = struct.unpack(_DB_HEADER, head)
+            if magic != _DB_MAGIC or version != _DB_VERSION:
+                raise ValueError("not a FPC1020A user database")
+            if replace:
+                self.delete_all_user()
+            record = bytearray(3 + size)
+            mv = memoryview(record)
+            added = 0
+            for _ in range(count):
+                if f.readinto(record) != len(record):
+                    break
+                id, permission = struct.unpack_from(">HB", record, 0)
+                if self.add_user_info(id, permission, mv[3:]):
+                    added += 1
+        return added
+
     def command(self, cmd, data=b"", timeout=5000):
         self._send(cmd, data)
         rxdata, rest = self._receive(timeout=timeout)
@@ -444,40 +529,52 @@ class FPC1020A:
                 break
             pos += rest
 
-    def _receive(self, length: int = 8, timeout=1000):
-        _buffer = b""
-        startpos = -1
-        endpos = -1
-        count = timeout
-        l = 0
-        while count > 0 and (l - startpos) < length:
+    def _buffer(self, size):
+        # Receive buffer, reallocated only when a larger packet comes.
+        if len(self._rxbuf) < size:
+            self._rxbuf = bytearray(size)
+        return self._rxbuf
+
+    def _read_into(self, mv, deadline) -> bool:
+        # Fill mv from the UART, False on timeout.
+        pos = 0
+        while pos < len(mv):
             if self._uart.any() == 0:
-                time.sleep_ms(10)
-                count -= 10
+                if time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+                    return False
+                time.sleep_ms(1)
                 continue
-            _buffer += self._uart.read(1)
-            l += 1
-            if startpos == -1:
-                startpos = _buffer.find(self._START)
-            # if startpos != -1 and endpos == -1:
-            #     endpos = _buffer.rfind(self._END, startpos + 1)
-            # if startpos != -1 and endpos != -1:
-            #     break
-
-        endpos = _buffer.rfind(self._END, startpos)
-        if startpos != -1 and endpos != -1:
-            self._verbose and print("Recv buffer: %s" % binascii.hexlify(_buffer))
-            frame = _buffer[startpos + 1 : endpos]
-            rxdata, checksum = struct.unpack(">%dsB" % (len(frame) - 1), frame)
-            if self._checksum(rxdata) != checksum:
-                self._verbose and print(
-                    "Invalid checksum: %s, data: 0x%s" % (checksum, binascii.hexlify(frame))
-                )
-                return b"", False
-            return rxdata, True
-        else:
+            pos += self._uart.readinto(mv[pos:]) or 0
+        return True
+
+    def _sync(self, deadline) -> bool:
+        # Skip bytes up to and including the start byte of a packet.
+        byte = bytearray(1)
+        while self._read_into(memoryview(byte), deadline):
+            if byte[0] == self._START[0]:
+                return True
+        return False
+
+    def _receive(self, length: int = 8, timeout=1000):
+        # Read a packet of length bytes (start byte, data, checksum, end
+        # byte) into the receive buffer, returns (data, True) if valid.
+        deadline = time.ticks_add(time.ticks_ms(), timeout)
+        buf = self._buffer(length)
+        mv = memoryview(buf)
+        if not self._sync(deadline) or not self._read_into(mv[1:length], deadline):
             self._verbose and print("Malformed packet received, ignore it")
             return b"", False
+        self._verbose and print("Recv buffer: %s" % binascii.hexlify(mv[:length]))
+        if buf[length - 1] != self._END[0]:
+            self._verbose and print("Malformed packet received, ignore it")
+            return b"", False
+        checksum = buf[length - 2]
+        if _xor(buf, 1, length - 2, 0) != checksum:
+            self._verbose and print(
+                "Invalid checksum: %s, data: 0x%s" % (checksum, binascii.hexlify(mv[:length]))
+            )
+            return b"", False
+        return bytes(mv[1 : length - 2]), True
 
     def _checksum(self, *args):
         chcksum = 0
@@ -485,6 +582,5 @@ class FPC1020A:
             if isinstance(arg, int):
                 chcksum ^= arg
                 continue
-            for x in arg:
-                chcksum ^= x
+            chcksum = _xor(arg, 0, len(arg), chcksum)
         return chcksum
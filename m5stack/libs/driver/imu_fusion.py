@@ -0,0 +1,539 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# FIFO based IMU sampling and orientation fusion.
+#
+# FusionEngine drains the hardware FIFO of the IMU in one I2C burst into a
+# preallocated buffer and feeds every sample to a Madgwick or Mahony
+# quaternion filter. Samples are integrated with the sensor ODR period, not
+# with the time between update() calls, so the filter runs at the same rate
+# however often the application polls it.
+#
+# The IMU driver provides the FIFO side:
+#
+#   fifo_enable(odr) -> actual odr in Hz
+#   fifo_disable()
+#   fifo_read(buf) -> number of frames read into buf, -1 on overflow
+#   fifo_sample(buf, index, out) -> out[0:6] = gx, gy, gz (deg/s), ax, ay, az (g)
+#   FIFO_FRAME_SIZE
+#
+# and optionally magnet_poll() -> (mx, my, mz) or None for a magnetometer.
+#
+#   engine = FusionEngine(imu, odr=100)
+#   while True:
+#       engine.update()
+#       yaw, pitch, roll = engine.euler()
+
+import array
+import math
+import micropython
+import time
+
+_DEG2RAD = 0.017453292519943
+_RAD2DEG = 57.295779513082
+
+
+@micropython.native
+def _madgwick6(q, gx, gy, gz, ax, ay, az, beta, dt):
+    q0 = q[0]
+    q1 = q[1]
+    q2 = q[2]
+    q3 = q[3]
+    qd0 = 0.5 * (-q1 * gx - q2 * gy - q3 * gz)
+    qd1 = 0.5 * (q0 * gx + q2 * gz - q3 * gy)
+    qd2 = 0.5 * (q0 * gy - q1 * gz + q3 * gx)
+    qd3 = 0.5 * (q0 * gz + q1 * gy - q2 * gx)
+    n = ax * ax + ay * ay + az * az
+    if n > 0.0:
+        n = 1.0 / math.sqrt(n)
+        ax *= n
+        ay *= n
+        az *= n
+        _2q0 = 2.0 * q0
+        _2q1 = 2.0 * q1
+        _2q2 = 2.0 * q2
+        _2q3 = 2.0 * q3
+        _4q0 = 4.0 * q0
+        _4q1 = 4.0 * q1
+        _4q2 = 4.0 * q2
+        _8q1 = 8.0 * q1
+        _8q2 = 8.0 * q2
+        q0q0 = q0 * q0
+        q1q1 = q1 * q1
+        q2q2 = q2 * q2
+        q3q3 = q3 * q3
+        s0 = _4q0 * q2q2 + _2q2 * ax + _4q0 * q1q1 - _2q1 * ay
+        s1 = (
+            _4q1 * q3q3
+            - _2q3 * ax
+            + 4.0 * q0q0 * q1
+            - _2q0 * ay
+            - _4q1
+            + _8q1 * q1q1
+            + _8q1 * q2q2
+            + _4q1 * az
+        )
+        s2 = (
+            4.0 * q0q0 * q2
+            + _2q0 * ax
+            + _4q2 * q3q3
+            - _2q3 * ay
+            - _4q2
+            + _8q2 * q1q1
+            + _8q2 * q2q2
+            + _4q2 * az
+        )
+        s3 = 4.0 * q1q1 * q3 - _2q1 * ax + 4.0 * q2q2 * q3 - _2q2 * ay
+        n = s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3
+        if n > 0.0:
+            n = beta / math.sqrt(n)
+            qd0 -= n * s0
+            qd1 -= n * s1
+            qd2 -= n * s2
+            qd3 -= n * s3
+    _integrate(q, q0 + qd0 * dt, q1 + qd1 * dt, q2 + qd2 * dt, q3 + qd3 * dt)
+
+
+@micropython.native
+def _madgwick9(q, gx, gy, gz, ax, ay, az, mx, my, mz, beta, dt):
+    q0 = q[0]
+    q1 = q[1]
+    q2 = q[2]
+    q3 = q[3]
+    qd0 = 0.5 * (-q1 * gx - q2 * gy - q3 * gz)
+    qd1 = 0.5 * (q0 * gx + q2 * gz - q3 * gy)
+    qd2 = 0.5 * (q0 * gy - q1 * gz + q3 * gx)
+    qd3 = 0.5 * (q0 * gz + q1 * gy - q2 * gx)
+    n = ax * ax + ay * ay + az * az
+    m = mx * mx + my * my + mz * mz
+    if n > 0.0 and m > 0.0:
+        n = 1.0 / math.sqrt(n)
+        ax *= n
+        ay *= n
+        az *= n
+        m = 1.0 / math.sqrt(m)
+        mx *= m
+        my *= m
+        mz *= m
+        _2q0mx = 2.0 * q0 * mx
+        _2q0my = 2.0 * q0 * my
+        _2q0mz = 2.0 * q0 * mz
+        _2q1mx = 2.0 * q1 * mx
+        _2q0 = 2.0 * q0
+        _2q1 = 2.0 * q1
+        _2q2 = 2.0 * q2
+        _2q3 = 2.0 * q3
+        _2q0q2 = 2.0 * q0 * q2
+        _2q2q3 = 2.0 * q2 * q3
+        q0q0 = q0 * q0
+        q0q1 = q0 * q1
+        q0q2 = q0 * q2
+        q0q3 = q0 * q3
+        q1q1 = q1 * q1
+        q1q2 = q1 * q2
+        q1q3 = q1 * q3
+        q2q2 = q2 * q2
+        q2q3 = q2 * q3
+        q3q3 = q3 * q3
+        # Earth frame reference direction of the magnetic field.
+        hx = (
+            mx * q0q0
+            - _2q0my * q3
+            + _2q0mz * q2
+            + mx * q1q1
+            + _2q1 * my * q2
+            + _2q1 * mz * q3
+            - mx * q2q2
+            - mx * q3q3
+        )
+        hy = (
+            _2q0mx * q3
+            + my * q0q0
+            - _2q0mz * q1
+            + _2q1mx * q2
+            - my * q1q1
+            + my * q2q2
+            + _2q2 * mz * q3
+            - my * q3q3
+        )
+        _2bx = math.sqrt(hx * hx + hy * hy)
+        _2bz = (
+            -_2q0mx * q2
+            + _2q0my * q1
+            + mz * q0q0
+            + _2q1mx * q3
+            - mz * q1q1
+            + _2q2 * my * q3
+            - mz * q2q2
+            + mz * q3q3
+        )
+        _4bx = 2.0 * _2bx
+        _4bz = 2.0 * _2bz
+        ex = 2.0 * q1q3 - _2q0q2 - ax
+        ey = 2.0 * q0q1 + _2q2q3 - ay
+        ez = 1.0 - 2.0 * q1q1 - 2.0 * q2q2 - az
+        fx = _2bx * (0.5 - q2q2 - q3q3) + _2bz * (q1q3 - q0q2) - mx
+        fy = _2bx * (q1q2 - q0q3) + _2bz * (q0q1 + q2q3) - my
+        fz = _2bx * (q0q2 + q1q3) + _2bz * (0.5 - q1q1 - q2q2) - mz
+        s0 = (
+            -_2q2 * ex
+            + _2q1 * ey
+            - _2bz * q2 * fx
+            + (-_2bx * q3 + _2bz * q1) * fy
+            + _2bx * q2 * fz
+        )
+        s1 = (
+            _2q3 * ex
+            + _2q0 * ey
+            - 4.0 * q1 * ez
+            + _2bz * q3 * fx
+            + (_2bx * q2 + _2bz * q0) * fy
+            + (_2bx * q3 - _4bz * q1) * fz
+        )
+        s2 = (
+            -_2q0 * ex
+            + _2q3 * ey
+            - 4.0 * q2 * ez
+            + (-_4bx * q2 - _2bz * q0) * fx
+            + (_2bx * q1 + _2bz * q3) * fy
+            + (_2bx * q0 - _4bz * q2) * fz
+        )
+        s3 = (
+            _2q1 * ex
+            + _2q2 * ey
+            + (-_4bx * q3 + _2bz * q1) * fx
+            + (-_2bx * q0 + _2bz * q2) * fy
+            + _2bx * q1 * fz
+        )
+        n = s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3
+        if n > 0.0:
+            n = beta / math.sqrt(n)
+            qd0 -= n * s0
+            qd1 -= n * s1
+            qd2 -= n * s2
+            qd3 -= n * s3
+    _integrate(q, q0 + qd0 * dt, q1 + qd1 * dt, q2 + qd2 * dt, q3 + qd3 * dt)
+
+
+@micropython.native
+def _mahony(q, e, gx, gy, gz, ax, ay, az, mx, my, mz, kp, ki, dt):
+    # e holds the integral feedback terms.
+    q0 = q[0]
+    q1 = q[1]
+    q2 = q[2]
+    q3 = q[3]
+    n = ax * ax + ay * ay + az * az
+    if n > 0.0:
+        n = 1.0 / math.sqrt(n)
+        ax *= n
+        ay *= n
+        az *= n
+        # Estimated direction of gravity.
+        vx = q1 * q3 - q0 * q2
+        vy = q0 * q1 + q2 * q3
+        vz = q0 * q0 - 0.5 + q3 * q3
+        ex = ay * vz - az * vy
+        ey = az * vx - ax * vz
+        ez = ax * vy - ay * vx
+        m = mx * mx + my * my + mz * mz
+        if m > 0.0:
+            m = 1.0 / math.sqrt(m)
+            mx *= m
+            my *= m
+            mz *= m
+            hx = 2.0 * (
+                mx * (0.5 - q2 * q2 - q3 * q3)
+                + my * (q1 * q2 - q0 * q3)
+                + mz * (q1 * q3 + q0 * q2)
+            )
+            hy = 2.0 * (
+                mx * (q1 * q2 + q0 * q3)
+                + my * (0.5 - q1 * q1 - q3 * q3)
+                + mz * (q2 * q3 - q0 * q1)
+            )
+            bx = math.sqrt(hx * hx + hy * hy)
+            bz = 2.0 * (
+                mx * (q1 * q3 - q0 * q2)
+                + my * (q2 * q3 + q0 * q1)
+                + mz * (0.5 - q1 * q1 - q2 * q2)
+            )
+            # Estimated direction of the magnetic field.
+            wx = bx * (0.5 - q2 * q2 - q3 * q3) + bz * (q1 * q3 - q0 * q2)
+            wy = bx * (q1 * q2 - q0 * q3) + bz * (q0 * q1 + q2 * q3)
+            wz = bx * (q0 * q2 + q1 * q3) + bz * (0.5 - q1 * q1 - q2 * q2)
+            ex += my * wz - mz * wy
+            ey += mz * wx - mx * wz
+            ez += mx * wy - my * wx
+        if ki > 0.0:
+            e[0] += ki * ex * dt
+            e[1] += ki * ey * dt
+            e[2] += ki * ez * dt
+            gx += e[0]
+            gy += e[1]
+            gz += e[2]
+        gx += kp * ex
+        gy += kp * ey
+        gz += kp * ez
+    gx *= 0.5 * dt
+    gy *= 0.5 * dt
+    gz *= 0.5 * dt
+    _integrate(
+        q,
+        q0 - q1 * gx - q2 * gy - q3 * gz,
+        q1 + q0 * gx + q2 * gz - q3 * gy,
+        q2 + q0 * gy - q1 * gz + q3 * gx,
+        q3 + q0 * gz + q1 * gy - q2 * gx,
+    )
+
+
+@micropython.native
+def _integrate(q, q0, q1, q2, q3):
+    n = q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3
+    if n > 0.0:
+        n = 1.0 / math.sqrt(n)
+        q[0] = q0 * n
+        q[1] = q1 * n
+        q[2] = q2 * n
+        q[3] = q3 * n
+
+
+class Madgwick:
+    """Madgwick gradient descent orientation filter.
+
+    ``beta`` trades gyro drift correction against accelerometer noise.
+    """
+
+    def __init__(self, beta=0.1) -> None:
+        self.beta = beta
+        self.q = array.array("f", [1.0, 0.0, 0.0, 0.0])
+
+    def reset(self) -> None:
+        self.q[0] = 1.0
+        self.q[1] = self.q[2] = self.q[3] = 0.0
+
+    def update(self, gx, gy, gz, ax, ay, az, dt, mag=None) -> None:
+        # gyro in rad/s, accel in any unit, mag in any unit.
+        if mag is None:
+            _madgwick6(self.q, gx, gy, gz, ax, ay, az, self.beta, dt)
+        else:
+            _madgwick9(self.q, gx, gy, gz, ax, ay, az, mag[0], mag[1], mag[2], self.beta, dt)
+
+
+class Mahony:
+    """Mahony complementary orientation filter with PI feedback."""
+
+    def __init__(self, kp=1.0, ki=0.0) -> None:
+        self.kp = kp
+        self.ki = ki
+        self.q = array.array("f", [1.0, 0.0, 0.0, 0.0])
+        self._e = array.array("f", [0.0, 0.0, 0.0])
+
+    def reset(self) -> None:
+        self.q[0] = 1.0
+        self.q[1] = self.q[2] = self.q[3] = 0.0
+        self._e[0] = self._e[1] = self._e[2] = 0.0
+
+    def update(self, gx, gy, gz, ax, ay, az, dt, mag=None) -> None:
+        mx, my, mz = mag if mag is not None else (0.0, 0.0, 0.0)
+        _mahony(self.q, self._e, gx, gy, gz, ax, ay, az, mx, my, mz, self.kp, self.ki, dt)
+
+
+def euler(q) -> tuple:
+    """Returns (yaw, pitch, roll) in degrees of quaternion q."""
+    q0, q1, q2, q3 = q
+    roll = math.atan2(q0 * q1 + q2 * q3, 0.5 - q1 * q1 - q2 * q2)
+    s = 2.0 * (q0 * q2 - q1 * q3)
+    pitch = math.asin(-1.0 if s < -1.0 else 1.0 if s > 1.0 else s)
+    yaw = math.atan2(q1 * q2 + q0 * q3, 0.5 - q2 * q2 - q3 * q3)
+    return (yaw * _RAD2DEG, pitch * _RAD2DEG, roll * _RAD2DEG)
+
+
+def linear_accel(q, ax, ay, az) -> tuple:
+    """Returns the sensor frame acceleration of (ax, ay, az) with gravity removed."""
+    q0, q1, q2, q3 = q
+    gx = 2.0 * (q1 * q3 - q0 * q2)
+    gy = 2.0 * (q0 * q1 + q2 * q3)
+    gz = q0 * q0 - q1 * q1 - q2 * q2 + q3 * q3
+    return (ax - gx, ay - gy, az - gz)
+
+
+class FusionEngine:
+    def __init__(self, imu, odr=100, filter=None, frames=32, magnet=True) -> None:
+        """
+        :param imu: driver implementing the FIFO interface described above
+        :param odr: sample rate in Hz, the driver picks the nearest supported rate
+        :param filter: Madgwick() (default) or Mahony() instance
+        :param frames: FIFO frames drained per I2C burst
+        :param magnet: fuse the magnetometer when the driver has one
+        """
+        self.imu = imu
+        self.filter = filter if filter is not None else Madgwick()
+        self.odr = imu.fifo_enable(odr)
+        self.period_us = int(1000000 / self.odr)
+        self._dt = 1.0 / self.odr
+        self._frame = imu.FIFO_FRAME_SIZE
+        self._buf = bytearray(frames * self._frame)
+        self._frames = frames
+        self._s = array.array("f", [0.0] * 6)
+        self._magnet = magnet and hasattr(imu, "magnet_poll")
+        self.mag = None
+        self.gyro_offset = [0.0, 0.0, 0.0]
+        self.accel = (0.0, 0.0, 1.0)
+        self.gyro = (0.0, 0.0, 0.0)
+        self.samples = 0
+        self.overruns = 0
+        self.timestamp = time.ticks_us()
+
+    def deinit(self) -> None:
+        self.imu.fifo_disable()
+
+    def _drain(self, sink) -> int:
+        # Read bursts until the FIFO holds less than one buffer.
+        total = 0
+        while True:
+            n = self.imu.fifo_read(self._buf)
+            if n < 0:
+                self.overruns += 1
+                break
+            s = self._s
+            buf = self._buf
+            for i in range(n):
+                self.imu.fifo_sample(buf, i, s)
+                sink(s)
+            total += n
+            if n < self._frames:
+                break
+        return total
+
+    def update(self) -> int:
+        """Fuse every sample queued in the FIFO, return how many were fused."""
+        if self._magnet:
+            m = self.imu.magnet_poll()
+            if m is not None:
+                self.mag = m
+        f = self.filter
+        dt = self._dt
+        mag = self.mag
+        ox, oy, oz = self.gyro_offset
+
+        def sink(s):
+            f.update(
+                (s[0] - ox) * _DEG2RAD,
+                (s[1] - oy) * _DEG2RAD,
+                (s[2] - oz) * _DEG2RAD,
+                s[3],
+                s[4],
+                s[5],
+                dt,
+                mag,
+            )
+
+        n = self._drain(sink)
+        if n:
+            s = self._s
+            self.gyro = (s[0] - ox, s[1] - oy, s[2] - oz)
+            self.accel = (s[3], s[4], s[5])
+            self.samples += n
+            # Samples are spaced by the ODR period, the newest one was taken
+            # right before the burst.
+            self.timestamp = time.ticks_us()
+        return n
+
+    def calibrate(self, samples=256) -> tuple:
+        """Average the gyro while the device is at rest, return the offsets in deg/s."""
+        acc = [0.0, 0.0, 0.0, 0]
+
+        def sink(s):
+            acc[0] += s[0]
+            acc[1] += s[1]
+            acc[2] += s[2]
+            acc[3] += 1
+
+        self._drain(lambda s: None)
+        while acc[3] < samples:
+            time.sleep_ms(max(1, self._frames * 1000 // self.odr // 2))
+            self._drain(sink)
+        n = acc[3]
+        self.gyro_offset = [acc[0] / n, acc[1] / n, acc[2] / n]
+        self.filter.reset()
+        return tuple(self.gyro_offset)
+
+    def sample_time(self, index, count) -> int:
+        """Returns the ticks_us timestamp of sample index of the last count fused samples."""
+        return time.ticks_add(self.timestamp, -(count - 1 - index) * self.period_us)
+
+    def quaternion(self) -> tuple:
+        return tuple(self.filter.q)
+
+    def euler(self) -> tuple:
+        """Returns (yaw, pitch, roll) in degrees."""
+        return euler(self.filter.q)
+
+    def linear_accel(self) -> tuple:
+        """Returns the last acceleration sample in g with gravity removed."""
+        ax, ay, az = self.accel
+        return linear_accel(self.filter.q, ax, ay, az)
+
+
+class FusionMixin:
+    """
+    Fusion methods shared by the IMU units. The unit provides the FIFO
+    methods above and sets self._fusion = None in __init__. Fusion starts
+    with the default settings on first use when start_fusion() was not
+    called.
+    """
+
+    def start_fusion(self, odr=100, algorithm="madgwick", gain=None, frames=32) -> None:
+        """
+        Sample accel and gyro through the hardware FIFO and fuse them at the
+        sensor rate. get_attitude() then reads the fused orientation.
+
+        :param odr: sample rate in Hz
+        :param algorithm: "madgwick" (gain is beta) or "mahony" (gain is kp)
+        :param frames: FIFO frames read per I2C burst
+        """
+        if algorithm == "mahony":
+            f = Mahony(kp=1.0 if gain is None else gain)
+        elif algorithm == "madgwick":
+            f = Madgwick(beta=0.1 if gain is None else gain)
+        else:
+            raise ValueError("unknown fusion algorithm: %s" % algorithm)
+        self.stop_fusion()
+        self._fusion = FusionEngine(self, odr, f, frames)
+
+    def stop_fusion(self) -> None:
+        if self._fusion is not None:
+            self._fusion.deinit()
+            self._fusion = None
+
+    def _engine(self) -> FusionEngine:
+        if self._fusion is None:
+            self.start_fusion()
+        return self._fusion
+
+    def update_fusion(self) -> int:
+        """Fuse the samples queued in the FIFO, returns the number of samples."""
+        return self._engine().update()
+
+    def calibrate_fusion(self, samples=256) -> tuple:
+        """Measure the gyro offsets (deg/s) used by the fusion, keep the device still."""
+        return self._engine().calibrate(samples)
+
+    def get_quaternion(self) -> tuple:
+        """Returns the orientation quaternion (w, x, y, z)."""
+        engine = self._engine()
+        engine.update()
+        return engine.quaternion()
+
+    def get_euler(self) -> tuple:
+        """Returns (yaw, pitch, roll) in degrees."""
+        engine = self._engine()
+        engine.update()
+        return engine.euler()
+
+    def get_linear_accel(self) -> tuple:
+        """Returns the acceleration in g with gravity removed."""
+        engine = self._engine()
+        engine.update()
+        return engine.linear_accel()
@@ -0,0 +1,146 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# IR burst capture backends.
+#
+# Both backends call callback(pulses, n) once per burst, pulses[0:n] holding
+# the durations in µs of mark, space, mark, ... The callback runs in a soft
+# timer context and must not keep a reference to pulses, the buffer is reused.
+#
+# RMTCapture records the burst with the RMT receive channel, Python only
+# polls the finished bursts, so Wi-Fi load or other interrupts cannot corrupt
+# the timing. EdgeCapture times pin edges in an interrupt handler, like IR_RX,
+# for firmware built without cdriver.ir_rmt.
+#
+# Pins are given by GPIO number; the RMT channel needs the number, so a Pin
+# object always uses EdgeCapture.
+
+from machine import Timer, Pin
+from array import array
+from utime import ticks_us, ticks_diff
+from .decoders import decode, error, PROTOCOLS, REPEAT, BADREP
+
+try:
+    from cdriver import ir_rmt
+except ImportError:
+    ir_rmt = None
+
+
+class RMTCapture:
+    def __init__(self, pin, callback, maxlen=512, idle_us=12000, poll_ms=20) -> None:
+        self.callback = callback
+        self._pulses = array("H", (0 for _ in range(maxlen)))
+        ir_rmt.init(pin, idle_us=idle_us)
+        self._tim = Timer(-1)
+        self._tim.init(period=poll_ms, mode=Timer.PERIODIC, callback=self._poll)
+
+    def _poll(self, _):
+        while True:
+            n = ir_rmt.read(self._pulses)
+            if not n:
+                return
+            self.callback(self._pulses, n)
+
+    @property
+    def overruns(self) -> int:
+        return ir_rmt.overruns()
+
+    def close(self) -> None:
+        self._tim.deinit()
+        ir_rmt.deinit()
+
+
+class EdgeCapture:
+    def __init__(self, pin, callback, maxlen=512, idle_us=12000, poll_ms=None) -> None:
+        self.callback = callback
+        self._pin = pin
+        self._times = array("i", (0 for _ in range(maxlen + 1)))
+        self._pulses = array("H", (0 for _ in range(maxlen)))
+        self._idle_ms = idle_us // 1000 + 1
+        self._edge = 0
+        self.overruns = 0
+        self._tim = Timer(-1)
+        self._tcb = self._end
+        pin.irq(handler=self._cb_pin, trigger=(Pin.IRQ_FALLING | Pin.IRQ_RISING))
+
+    def _cb_pin(self, _):
+        t = ticks_us()
+        # Restart the idle timer on every edge, the burst ends after idle_us
+        # without an edge.
+        self._tim.init(period=self._idle_ms, mode=Timer.ONE_SHOT, callback=self._tcb)
+        if self._edge < len(self._times):
+            self._times[self._edge] = t
+            self._edge += 1
+        else:
+            self.overruns += 1
+
+    def _end(self, _):
+        edges = self._edge
+        times = self._times
+        p = self._pulses
+        n = min(edges - 1, len(p))
+        for i in range(n):
+            p[i] = min(ticks_diff(times[i + 1], times[i]), 0xFFFF)
+        self._edge = 0
+        if n > 0:
+            self.callback(p, n)
+
+    def close(self) -> None:
+        self._pin.irq(handler=None)
+        self._tim.deinit()
+
+
+def capture(pin, callback, **kwargs):
+    """
+    Returns the best capture backend available on this firmware for ``pin``,
+    a GPIO number (or a Pin, edge timed only).
+    """
+    if not isinstance(pin, int):
+        return EdgeCapture(pin, callback, **kwargs)
+    if ir_rmt is not None:
+        return RMTCapture(pin, callback, **kwargs)
+    return EdgeCapture(Pin(pin, Pin.IN), callback, **kwargs)
+
+
+class IRReceiver:
+    """
+    Decode IR frames of several protocols.
+
+    callback(cmd, addr, ext, protocol) runs for every decoded frame, a NEC
+    repeat frame repeats the last cmd and addr. With ``errors`` the bursts no
+    protocol matched run callback(code, 0, 0, None) too, code being one of the
+    negative IR_RX error codes (BADSTART, BADREP, OVERRUN, BADDATA).
+    raw_callback(pulses, n), if given, receives the bursts no protocol matched.
+    """
+
+    def __init__(
+        self, pin, callback, protocols=PROTOCOLS, raw_callback=None, errors=False, **kwargs
+    ) -> None:
+        self.callback = callback
+        self.raw_callback = raw_callback
+        self.protocols = protocols
+        self.errors = errors
+        self._last = None
+        self._capture = capture(pin, self._on_burst, **kwargs)
+
+    def _on_burst(self, pulses, n):
+        r = decode(pulses, n, self.protocols)
+        if r is None:
+            if self.raw_callback is not None:
+                self.raw_callback(pulses, n)
+            if self.errors:
+                self.callback(error(pulses, n), 0, 0, None)
+            return
+        if r[1] == REPEAT:
+            if self._last is None:
+                if self.errors:
+                    self.callback(BADREP, 0, 0, None)
+                return
+            r = self._last
+        else:
+            self._last = r
+        self.callback(r[1], r[2], r[3], r[0])
+
+    def close(self) -> None:
+        self._capture.close()
@@ -0,0 +1,209 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Table driven IR protocol decoders working on captured bursts.
+#
+# A burst is pulses[0:n], the durations in µs of mark, space, mark, ... as
+# delivered by capture.py. decode() tries the enabled protocols and returns
+# (protocol, cmd, addr, ext) or None. A NEC repeat frame decodes as
+# ("nec", REPEAT, 0, 0).
+
+from micropython import const
+
+REPEAT = const(-1)
+# Error codes of the IR_RX receivers (receiver.py), reported by IRReceiver.
+BADSTART = const(-2)
+BADBLOCK = const(-3)
+BADREP = const(-4)
+OVERRUN = const(-5)
+BADDATA = const(-6)
+BADADDR = const(-7)
+
+# Pulse distance / pulse width protocols:
+#   name: (leader mark, leader space, bit mark, zero, one, bit counts, width coded)
+# Space coded protocols (NEC) carry the bit in the space after a fixed mark,
+# width coded ones (Sony SIRC) in the mark before a fixed space.
+DISTANCE = {
+    "nec": (9000, 4500, 560, 560, 1690, (32,), False),
+    "samsung": (4500, 4500, 560, 560, 1690, (32,), False),
+    "sirc": (2400, 600, 600, 600, 1200, (12, 15, 20), True),
+}
+
+# Bi-phase protocols: name: (half bit time, bits)
+BIPHASE = {
+    "rc5": (889, 14),
+    "rc6": (444, 21),
+}
+
+PROTOCOLS = ("nec", "samsung", "sirc", "rc5", "rc6")
+
+
+def _near(value, ref) -> bool:
+    return abs(value - ref) <= max(ref >> 2, 150)
+
+
+def _distance_bits(pulses, n, spec):
+    lead_mark, lead_space, mark, zero, one, counts, width = spec
+    if not (_near(pulses[0], lead_mark) and _near(pulses[1], lead_space)):
+        return None
+    # The last bit has no trailing space when width coded, and a stop mark
+    # follows it when space coded.
+    bits = (n - 1) // 2 if width else (n - 3) // 2
+    if bits not in counts:
+        return None
+    val = 0
+    for i in range(bits):
+        if width:
+            d = pulses[2 + 2 * i]
+            if i < bits - 1 and not _near(pulses[3 + 2 * i], mark):
+                return None
+        else:
+            if not _near(pulses[2 + 2 * i], mark):
+                return None
+            d = pulses[3 + 2 * i]
+        if _near(d, one):
+            val |= 1 << i
+        elif not _near(d, zero):
+            return None
+    return val, bits
+
+
+def _nec(pulses, n):
+    if n == 3 and _near(pulses[0], 9000) and _near(pulses[1], 2250):
+        return ("nec", REPEAT, 0, 0)
+    r = _distance_bits(pulses, n, DISTANCE["nec"])
+    if r is None:
+        return None
+    val = r[0]
+    cmd = (val >> 16) & 0xFF
+    if cmd != ((val >> 24) ^ 0xFF):
+        return None
+    addr = val & 0xFF
+    if addr != ((val >> 8) ^ 0xFF) & 0xFF:
+        addr = val & 0xFFFF  # extended 16 bit address
+    return ("nec", cmd, addr, 0)
+
+
+def _samsung(pulses, n):
+    r = _distance_bits(pulses, n, DISTANCE["samsung"])
+    if r is None:
+        return None
+    val = r[0]
+    cmd = (val >> 16) & 0xFF
+    if cmd != ((val >> 24) ^ 0xFF):
+        return None
+    addr = val & 0xFFFF
+    if addr & 0xFF == addr >> 8:
+        addr &= 0xFF
+    return ("samsung", cmd, addr, 0)
+
+
+def _sirc(pulses, n):
+    r = _distance_bits(pulses, n, DISTANCE["sirc"])
+    if r is None:
+        return None
+    val, bits = r
+    cmd = val & 0x7F
+    if bits == 15:
+        return ("sirc", cmd, (val >> 7) & 0xFF, 0)
+    return ("sirc", cmd, (val >> 7) & 0x1F, val >> 12)
+
+
+def _halves(pulses, start, n, t, first, total):
+    # Expand durations into half bit levels (1 = mark), padded with spaces.
+    levels = bytearray(total)
+    pos = 0
+    if first == 0:
+        pos = 1  # the burst starts in the second half of a bit
+    for i in range(start, n):
+        k = (pulses[i] + (t >> 1)) // t
+        if k < 1 or k > 4 or abs(pulses[i] - k * t) > (t * 2) // 5:
+            return None
+        level = 1 if (i - start) % 2 == 0 else 0
+        for _ in range(k):
+            if pos >= total:
+                return None
+            levels[pos] = level
+            pos += 1
+    return levels
+
+
+def _rc5(pulses, n):
+    t, bits = BIPHASE["rc5"]
+    # A "1" is space then mark, the leading space of the first start bit is
+    # not part of the burst.
+    h = _halves(pulses, 0, n, t, 0, 2 * bits)
+    if h is None:
+        return None
+    val = 0
+    for i in range(bits):
+        a = h[2 * i]
+        b = h[2 * i + 1]
+        if a == b:
+            return None
+        val = (val << 1) | b
+    if not val >> 13:
+        return None
+    cmd = (val & 0x3F) | ((((val >> 12) & 1) ^ 1) << 6)
+    return ("rc5", cmd, (val >> 6) & 0x1F, (val >> 11) & 1)
+
+
+def _rc6(pulses, n):
+    t, _ = BIPHASE["rc6"]
+    if not (_near(pulses[0], 6 * t) and _near(pulses[1], 2 * t)):
+        return None
+    # start bit, 3 mode bits, double length toggle bit, 16 data bits
+    h = _halves(pulses, 2, n, t, 1, 44)
+    if h is None or h[0] != 1 or h[1] != 0:
+        return None
+    val = 0
+    for i in range(1, 4):
+        a = h[2 * i]
+        if a == h[2 * i + 1]:
+            return None
+        val = (val << 1) | a
+    if val != 0:
+        return None  # only mode 0 is decoded
+    toggle = h[8]
+    if h[9] != toggle or h[10] == toggle or h[11] != h[10]:
+        return None
+    data = 0
+    for i in range(16):
+        a = h[12 + 2 * i]
+        if a == h[13 + 2 * i]:
+            return None
+        data = (data << 1) | a
+    return ("rc6", data & 0xFF, data >> 8, toggle)
+
+
+_DECODERS = {
+    "nec": _nec,
+    "samsung": _samsung,
+    "sirc": _sirc,
+    "rc5": _rc5,
+    "rc6": _rc6,
+}
+
+
+def decode(pulses, n, protocols=PROTOCOLS):
+    """Return (protocol, cmd, addr, ext) for pulses[0:n], or None."""
+    if n < 2:
+        return None
+    for name in protocols:
+        r = _DECODERS[name](pulses, n)
+        if r is not None:
+            return r
+    return None
+
+
+def error(pulses, n) -> int:
+    """Error code of a burst decode() rejected, like the IR_RX receivers."""
+    if n >= len(pulses):
+        return OVERRUN
+    if n < 2:
+        return BADSTART
+    for spec in DISTANCE.values():
+        if _near(pulses[0], spec[0]) and _near(pulses[1], spec[1]):
+            return BADDATA
+    return BADSTART
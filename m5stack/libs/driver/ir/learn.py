@@ -0,0 +1,91 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Learn and replay IR bursts of any protocol.
+#
+# A captured burst is stored compactly: the durations are clustered into a
+# small symbol table and every pulse becomes an index into it, 4 bits per
+# pulse for up to 16 symbols (typical remotes use 4 to 6), 8 bits otherwise.
+#
+#   offset size
+#   0      1    number of symbols s
+#   1      2*s  symbol durations in µs, u16 little endian
+#   1+2s   2    number of pulses n, u16 little endian
+#   3+2s        indices, two per byte (low nibble first) if s <= 16
+#
+# A 68 pulse NEC burst packs into about 45 bytes instead of 136.
+
+import struct
+import time
+from .capture import capture
+
+
+def pack(pulses, n, tolerance=0.2) -> bytes:
+    """Returns the compact encoding of pulses[0:n]."""
+    order = sorted(range(n), key=lambda i: pulses[i])
+    index = bytearray(n)
+    symbols = []
+    total = 0
+    count = 0
+    base = 0
+    for i in order:
+        d = pulses[i]
+        if count and d > base * (1 + tolerance):
+            symbols.append(total // count)
+            total = count = 0
+        if not count:
+            base = d
+        total += d
+        count += 1
+        index[i] = len(symbols)
+    if count:
+        symbols.append(total // count)
+    if len(symbols) > 255:
+        raise ValueError("too many distinct pulse lengths")
+
+    s = len(symbols)
+    out = bytearray(struct.pack("<B%dHH" % s, s, *(symbols + [n])))
+    if s <= 16:
+        for i in range(0, n, 2):
+            out.append(index[i] | ((index[i + 1] << 4) if i + 1 < n else 0))
+    else:
+        out += index
+    return bytes(out)
+
+
+def unpack(data) -> list:
+    """Returns the pulse durations in µs of a pack() encoding."""
+    s = data[0]
+    symbols = struct.unpack_from("<%dH" % s, data, 1)
+    n = struct.unpack_from("<H", data, 1 + 2 * s)[0]
+    p = 3 + 2 * s
+    if s <= 16:
+        return [symbols[(data[p + (i >> 1)] >> ((i & 1) << 2)) & 0x0F] for i in range(n)]
+    return [symbols[data[p + i]] for i in range(n)]
+
+
+def learn(pin, timeout_ms=10000, min_pulses=4, **kwargs):
+    """
+    Wait for one IR burst on ``pin`` and return it packed, None on timeout.
+    Bursts shorter than ``min_pulses`` (noise, repeat codes) are ignored.
+    """
+    result = []
+
+    def on_burst(pulses, n):
+        if not result and n >= min_pulses:
+            result.append(pack(pulses, n))
+
+    cap = capture(pin, on_burst, **kwargs)
+    try:
+        start = time.ticks_ms()
+        while not result and time.ticks_diff(time.ticks_ms(), start) < timeout_ms:
+            time.sleep_ms(20)
+    finally:
+        cap.close()
+    return result[0] if result else None
+
+
+def replay(player, data) -> None:
+    """Transmit a learned burst with any transmitter (NEC, Player)."""
+    player.play(unpack(data))
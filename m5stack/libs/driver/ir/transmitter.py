@@ -123,14 +123,18 @@ class IR:
         # .carrier unaffected
         self._arr[self.aptr - 1] += t
 
-
-# Given an iterable (e.g. list or tuple) of times, emit it as an IR stream.
-class Player(IR):
-    def __init__(self, pin, freq=38000, verbose=False):  # NEC specifies 38KHz
-        super().__init__(pin, freq, 68, 33, verbose)  # Measured duty ratio 33%
-
+    # Transmit an iterable of mark/space times, e.g. a learned burst.
     def play(self, lst):
+        if len(lst) > len(self._arr):  # learned bursts can be longer than asize
+            self._arr = array("H", lst)
+            self._mva = memoryview(self._arr)
         for x, t in enumerate(lst):
             self._arr[x] = t
         self.aptr = x + 1
         self.trigger()
+
+
+# Given an iterable (e.g. list or tuple) of times, emit it as an IR stream.
+class Player(IR):
+    def __init__(self, pin, freq=38000, verbose=False):  # NEC specifies 38KHz
+        super().__init__(pin, freq, 68, 33, verbose)  # Measured duty ratio 33%
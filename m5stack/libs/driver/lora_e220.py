@@ -0,0 +1,390 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Packet link layer for E220 LoRa modules in fixed (P2P) transmission mode.
+#
+# The module passes bytes through, so back to back packets merge or split on
+# the UART. E220Link frames every packet as
+#
+#   0xA5, length, source address (u16 big endian), sequence, data, CRC-16
+#
+# (CRC-16/CCITT-FALSE over length..data, little endian) and, when the module
+# appends an RSSI byte, takes it from behind the CRC. Valid frames are copied
+# into a fixed pool of buffers; transmissions wait in a short queue until the
+# AUX pin reports the module idle and the duty cycle budget of the region
+# allows their time on air.
+
+from machine import Pin
+from array import array
+from micropython import const
+import micropython
+import struct
+import time
+import _thread
+
+SYNC = const(0xA5)
+# sync, length, source, sequence, CRC
+OVERHEAD = const(7)
+
+# Regional transmit limits: (duty cycle, window ms, max single TX ms, pause ms)
+REGIONS = {
+    "EU433": (0.10, 3600000, 0, 0),
+    "EU868": (0.01, 3600000, 0, 0),
+    # ARIB STD-T108: 360 s per hour, 4 s per transmission, 50 ms pause
+    "JP920": (0.10, 3600000, 4000, 50),
+}
+
+
+def _crc_table():
+    t = array("H", bytes(512))
+    for i in range(256):
+        c = i << 8
+        for _ in range(8):
+            c = ((c << 1) ^ 0x1021) if c & 0x8000 else c << 1
+        t[i] = c & 0xFFFF
+    return t
+
+
+_CRC_TABLE = _crc_table()
+
+
+@micropython.native
+def crc16(buf, start: int, end: int) -> int:
+    """CRC-16/CCITT-FALSE of buf[start:end]."""
+    t = _CRC_TABLE
+    c = 0xFFFF
+    for i in range(start, end):
+        c = ((c << 8) & 0xFF00) ^ t[(c >> 8) ^ buf[i]]
+    return c
+
+
+def lora_time_on_air_ms(n, sf, bw_khz, cr=1, preamble=8) -> float:
+    """Time on air of n payload bytes, explicit header and CRC on, coding rate 4/(4+cr)."""
+    t_sym = (1 << sf) / bw_khz
+    de = 1 if t_sym > 16 else 0
+    num = 8 * n - 4 * sf + 28 + 16
+    payload = 8 + max(-(-num // (4 * (sf - 2 * de))) * (cr + 4), 0)
+    return (preamble + 4.25 + payload) * t_sym
+
+
+class DutyCycle:
+    """
+    Transmit budget over a sliding window, kept in ``buckets`` slots so the
+    memory use does not depend on the traffic.
+    """
+
+    def __init__(self, ratio=0.01, window_ms=3600000, max_tx_ms=0, pause_ms=0, buckets=60):
+        self.ratio = ratio
+        self.max_tx_ms = max_tx_ms
+        self.pause_ms = pause_ms
+        self.budget_ms = int(window_ms * ratio)
+        self._slot_ms = window_ms // buckets
+        self._used = array("I", bytes(4 * buckets))
+        self._slot = 0
+        self._slot_start = time.ticks_ms()
+        self._last_end = time.ticks_add(self._slot_start, -pause_ms)
+
+    def _advance(self) -> None:
+        k = time.ticks_diff(time.ticks_ms(), self._slot_start) // self._slot_ms
+        if k <= 0:
+            return
+        n = len(self._used)
+        for s in range(self._slot + 1, self._slot + min(k, n) + 1):
+            self._used[s % n] = 0
+        self._slot = (self._slot + k) % n
+        self._slot_start = time.ticks_add(self._slot_start, k * self._slot_ms)
+
+    @property
+    def used_ms(self) -> int:
+        self._advance()
+        return sum(self._used)
+
+    def delay_ms(self, airtime_ms) -> int:
+        """
+        Returns the ms until a transmission of airtime_ms may start, 0 for
+        now. Raises ValueError if it exceeds the single transmission limit.
+        """
+        if self.max_tx_ms and airtime_ms > self.max_tx_ms:
+            raise ValueError("transmission too long for the region")
+        self._advance()
+        wait = max(self.pause_ms - time.ticks_diff(time.ticks_ms(), self._last_end), 0)
+        excess = sum(self._used) + airtime_ms - self.budget_ms
+        if excess <= 0:
+            return wait
+        # Wait until the oldest slots leave the window.
+        n = len(self._used)
+        into_slot = time.ticks_diff(time.ticks_ms(), self._slot_start)
+        for k in range(1, n + 1):
+            excess -= self._used[(self._slot + k) % n]
+            if excess <= 0:
+                return max(wait, k * self._slot_ms - into_slot)
+        return -1  # never fits into the budget
+
+    def record(self, airtime_ms) -> None:
+        self._advance()
+        self._used[self._slot % len(self._used)] += int(airtime_ms + 0.5)
+        self._last_end = time.ticks_add(time.ticks_ms(), int(airtime_ms))
+
+
+class LinkStats:
+    def __init__(self) -> None:
+        self.packets = 0
+        self.lost = 0
+        self.rssi = None
+        self.rssi_avg = None
+        self.seq = -1
+
+    def update(self, seq, rssi) -> None:
+        if self.seq >= 0:
+            self.lost += (seq - self.seq - 1) & 0xFF
+        self.seq = seq
+        self.packets += 1
+        if rssi is not None:
+            self.rssi = rssi
+            self.rssi_avg = rssi if self.rssi_avg is None else (self.rssi_avg * 7 + rssi) / 8
+
+
+class E220Link:
+    """
+    Framed, scheduled packet link over an E220 module.
+
+    Create it with the link() method of the unit. callback(source, data,
+    rssi) receives every valid frame, data is a memoryview into the receive
+    pool only valid during the call.
+    """
+
+    def __init__(
+        self,
+        uart,
+        time_on_air,
+        max_len=200,
+        rssi=True,
+        address=0,
+        aux=None,
+        region=None,
+        pool=4,
+        queue=4,
+        callback=None,
+    ) -> None:
+        self.uart = uart
+        self.time_on_air = time_on_air
+        self.max_len = max_len
+        self.max_data = max_len - OVERHEAD
+        self.rssi = rssi
+        self.address = address
+        self.callback = callback
+        self.duty = DutyCycle(*REGIONS[region]) if region else None
+        self.links = {}
+        self.crc_errors = 0
+        self.rx_overflows = 0
+        self.tx_packets = 0
+        self.tx_dropped = 0
+        self.airtime_ms = 0
+        self._seq = 0
+        # receive side: UART staging buffer and the frame pool
+        self._acc = bytearray(2 * max_len + 2)
+        self._n = 0
+        self._rx_t = time.ticks_ms()
+        self._pool = [bytearray(max_len) for _ in range(pool)]
+        self._free = list(range(pool))
+        self._ready = []
+        # transmit side: queued frames with the 3 byte fixed transmission header
+        self._tx = [bytearray(max_len + 3) for _ in range(queue)]
+        self._tx_free = list(range(queue))
+        self._tx_queue = []
+        self._busy_until = time.ticks_ms()
+        self._running = False
+        # Held while the poll thread runs, released by the thread on exit.
+        self._done = _thread.allocate_lock()
+        self._aux = None
+        self._idle = True
+        if aux is not None:
+            self._aux = aux if isinstance(aux, Pin) else Pin(aux, Pin.IN)
+            self._idle = bool(self._aux.value())
+            self._aux.irq(self._on_aux, Pin.IRQ_RISING | Pin.IRQ_FALLING)
+
+    def _on_aux(self, pin) -> None:
+        # AUX is low while the module transmits or outputs received data.
+        self._idle = bool(pin.value())
+
+    def idle(self) -> bool:
+        """True when the module can take the next packet."""
+        late = time.ticks_diff(time.ticks_ms(), self._busy_until)
+        if self._aux is not None:
+            # Do not hang if an AUX edge was missed.
+            return self._idle or late > 1000
+        return late >= 0
+
+    def send(self, target_address, target_channel, data) -> bool:
+        """
+        Queue a packet, returns False when the queue is full. It is sent by
+        poll() once the module is idle and the duty cycle allows it.
+        """
+        n = len(data)
+        if n > self.max_data:
+            raise ValueError("data longer than %d bytes" % self.max_data)
+        if not self._tx_free:
+            return False
+        i = self._tx_free.pop()
+        buf = self._tx[i]
+        struct.pack_into(
+            ">HBBBHB", buf, 0, target_address, target_channel, SYNC, n, self.address, self._seq
+        )
+        buf[8 : 8 + n] = data
+        struct.pack_into("<H", buf, 8 + n, crc16(buf, 4, 8 + n))
+        self._seq = (self._seq + 1) & 0xFF
+        self._tx_queue.append((i, n + OVERHEAD + 3))
+        return True
+
+    def _transmit(self) -> int:
+        # Send the oldest queued frame, returns the ms until the next one
+        # may go out.
+        i, length = self._tx_queue[0]
+        airtime = self.time_on_air(length - 3)
+        if self.duty is not None:
+            wait = self.duty.delay_ms(airtime)
+            if wait < 0:
+                # Larger than the whole budget, it would block the queue.
+                self._tx_queue.pop(0)
+                self._tx_free.append(i)
+                self.tx_dropped += 1
+                return 1
+            if wait:
+                return wait
+            self.duty.record(airtime)
+        self._tx_queue.pop(0)
+        self.uart.write(memoryview(self._tx[i])[:length])
+        self._tx_free.append(i)
+        # UART time at 9600 baud plus the time on air.
+        busy = int(airtime + length * 1.1 + 1)
+        self._busy_until = time.ticks_add(time.ticks_ms(), busy)
+        self._idle = False
+        self.tx_packets += 1
+        self.airtime_ms += airtime
+        return busy
+
+    def _frame(self, acc, start, end) -> int:
+        # Check the frame at acc[start:], returns its size, 0 if incomplete,
+        # -1 if invalid.
+        if end - start < OVERHEAD:
+            return 0
+        n = acc[start + 1]
+        size = n + OVERHEAD + (1 if self.rssi else 0)
+        if n > self.max_data:
+            return -1
+        if end - start < size:
+            return 0
+        crc = acc[start + 5 + n] | (acc[start + 6 + n] << 8)
+        if crc != crc16(acc, start + 1, start + 5 + n):
+            self.crc_errors += 1
+            return -1
+        src = (acc[start + 2] << 8) | acc[start + 3]
+        rssi = acc[start + n + OVERHEAD] - 256 if self.rssi else None
+        link = self.links.get(src)
+        if link is None:
+            link = self.links[src] = LinkStats()
+        link.update(acc[start + 4], rssi)
+        if not self._free:
+            self.rx_overflows += 1
+            return size
+        k = self._free.pop()
+        self._pool[k][:n] = acc[start + 5 : start + 5 + n]
+        self._ready.append((k, n, src, rssi))
+        return size
+
+    def _receive(self) -> None:
+        acc = self._acc
+        mv = memoryview(acc)
+        now = time.ticks_ms()
+        while self.uart.any() and self._n < len(acc):
+            self._n += self.uart.readinto(mv[self._n :]) or 0
+            self._rx_t = now
+        # A frame is complete within a few ms at 9600 baud; a stale partial
+        # frame started with a data byte that looked like SYNC.
+        stale = time.ticks_diff(now, self._rx_t) > 100 or self._n == len(acc)
+        pos = 0
+        end = self._n
+        while pos < end:
+            if acc[pos] != SYNC:
+                pos += 1
+                continue
+            size = self._frame(acc, pos, end)
+            if size == 0 and not stale:
+                break
+            pos += size if size > 0 else 1
+        if pos:
+            acc[: end - pos] = acc[pos:end]
+            self._n = end - pos
+
+    def _dispatch(self) -> None:
+        while self._ready:
+            k, n, src, rssi = self._ready.pop(0)
+            if self.callback is not None:
+                self.callback(src, memoryview(self._pool[k])[:n], rssi)
+            self._free.append(k)
+
+    def recv(self):
+        """Returns (source, data, rssi) of the oldest received frame, or None."""
+        self._receive()
+        if not self._ready:
+            return None
+        k, n, src, rssi = self._ready.pop(0)
+        data = bytes(self._pool[k][:n])
+        self._free.append(k)
+        return src, data, rssi
+
+    def poll(self) -> int:
+        """
+        Receive and dispatch frames and start the next transmission,
+        returns the ms until poll() has more to do.
+        """
+        self._receive()
+        self._dispatch()
+        if not self._tx_queue:
+            return 10
+        if self.idle():
+            wait = self._transmit()
+        elif self._aux is None:
+            wait = time.ticks_diff(self._busy_until, time.ticks_ms())
+        else:
+            wait = 2
+        return min(max(wait, 1), 10)
+
+    def _task(self) -> None:
+        try:
+            while self._running:
+                time.sleep_ms(self.poll())
+        finally:
+            self._done.release()
+
+    def start(self) -> None:
+        """Run poll() in a thread."""
+        if not self._running:
+            self._running = True
+            self._done.acquire()
+            _thread.start_new_thread(self._task, ())
+
+    def stop(self) -> None:
+        """Stop the poll thread, returns once it has exited."""
+        if self._running:
+            self._running = False
+            self._done.acquire()
+            self._done.release()
+
+    def stats(self) -> dict:
+        """Returns the link statistics, per source address (packets, lost, rssi, rssi_avg)."""
+        return {
+            "tx_packets": self.tx_packets,
+            "tx_dropped": self.tx_dropped,
+            "airtime_ms": self.airtime_ms,
+            "duty_used_ms": self.duty.used_ms if self.duty else None,
+            "crc_errors": self.crc_errors,
+            "rx_overflows": self.rx_overflows,
+            "links": {a: (s.packets, s.lost, s.rssi, s.rssi_avg) for a, s in self.links.items()},
+        }
+
+    def deinit(self) -> None:
+        self.stop()
+        if self._aux is not None:
+            self._aux.irq(None)
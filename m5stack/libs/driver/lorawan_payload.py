@@ -0,0 +1,235 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Compact binary uplink payloads for LoRaWAN.
+#
+# Airtime grows with every byte, so sensor values are sent as fixed point
+# integers instead of text: LPP encodes Cayenne Low Power Payload records
+# understood by most network servers, StructCodec packs values with a
+# struct format, and UplinkBatcher collects records until the next one would
+# not fit the largest payload of the current datarate.
+
+import struct
+
+# Cayenne LPP types: (type id, size, resolution)
+LPP_DIGITAL_INPUT = (0, 1, 1)
+LPP_DIGITAL_OUTPUT = (1, 1, 1)
+LPP_ANALOG_INPUT = (2, 2, 100)
+LPP_ANALOG_OUTPUT = (3, 2, 100)
+LPP_LUMINOSITY = (101, 2, 1)
+LPP_PRESENCE = (102, 1, 1)
+LPP_TEMPERATURE = (103, 2, 10)
+LPP_RELATIVE_HUMIDITY = (104, 1, 2)
+LPP_BAROMETRIC_PRESSURE = (115, 2, 10)
+
+
+class LPP:
+    """
+    Cayenne LPP encoder writing into a preallocated buffer.
+
+        lpp = LPP()
+        lpp.add_temperature(1, 21.5)
+        lpp.add_relative_humidity(2, 48)
+        lorawan.send_data(lpp.payload())
+        lpp.reset()
+    """
+
+    def __init__(self, size=51) -> None:
+        self.buf = bytearray(size)
+        self._mv = memoryview(self.buf)
+        self.size = 0
+
+    def reset(self) -> None:
+        self.size = 0
+
+    def payload(self):
+        """Returns a memoryview of the records added since reset()."""
+        return self._mv[: self.size]
+
+    def fits(self, n) -> bool:
+        return self.size + n <= len(self.buf)
+
+    def add(self, channel, lpp_type, value) -> int:
+        """
+        Add a record of one of the LPP_* types, returns its size.
+        Raises ValueError when the buffer is full.
+        """
+        type_id, size, resolution = lpp_type
+        if not self.fits(size + 2):
+            raise ValueError("payload full")
+        raw = int(round(value * resolution))
+        o = self.size
+        self.buf[o] = channel
+        self.buf[o + 1] = type_id
+        for i in range(size):
+            self.buf[o + 1 + size - i] = (raw >> (8 * i)) & 0xFF
+        self.size = o + size + 2
+        return size + 2
+
+    def add_digital_input(self, channel, value) -> int:
+        return self.add(channel, LPP_DIGITAL_INPUT, value)
+
+    def add_digital_output(self, channel, value) -> int:
+        return self.add(channel, LPP_DIGITAL_OUTPUT, value)
+
+    def add_analog_input(self, channel, value) -> int:
+        return self.add(channel, LPP_ANALOG_INPUT, value)
+
+    def add_analog_output(self, channel, value) -> int:
+        return self.add(channel, LPP_ANALOG_OUTPUT, value)
+
+    def add_luminosity(self, channel, lux) -> int:
+        return self.add(channel, LPP_LUMINOSITY, lux)
+
+    def add_presence(self, channel, value) -> int:
+        return self.add(channel, LPP_PRESENCE, value)
+
+    def add_temperature(self, channel, celsius) -> int:
+        return self.add(channel, LPP_TEMPERATURE, celsius)
+
+    def add_relative_humidity(self, channel, rh) -> int:
+        return self.add(channel, LPP_RELATIVE_HUMIDITY, rh)
+
+    def add_barometric_pressure(self, channel, hpa) -> int:
+        return self.add(channel, LPP_BAROMETRIC_PRESSURE, hpa)
+
+    def add_accelerometer(self, channel, x, y, z) -> int:
+        if not self.fits(8):
+            raise ValueError("payload full")
+        struct.pack_into(
+            ">BBhhh", self.buf, self.size, channel, 113, *(int(round(v * 1000)) for v in (x, y, z))
+        )
+        self.size += 8
+        return 8
+
+    def add_gps(self, channel, lat, lon, alt) -> int:
+        if not self.fits(11):
+            raise ValueError("payload full")
+        o = self.size
+        self.buf[o] = channel
+        self.buf[o + 1] = 136
+        for i, raw in enumerate(
+            (int(round(lat * 10000)), int(round(lon * 10000)), int(round(alt * 100)))
+        ):
+            p = o + 2 + 3 * i
+            self.buf[p] = (raw >> 16) & 0xFF
+            self.buf[p + 1] = (raw >> 8) & 0xFF
+            self.buf[p + 2] = raw & 0xFF
+        self.size = o + 11
+        return 11
+
+
+class StructCodec:
+    """
+    Fixed layout records: values are scaled to integers and packed with a
+    struct format, e.g. temperature in 0.01 C and humidity in 0.5 %:
+
+        codec = StructCodec(">hB", (100, 2))
+        codec.encode(21.37, 48.5)  # 3 bytes instead of "21.37,48.5"
+    """
+
+    def __init__(self, fmt, scales=None) -> None:
+        self.fmt = fmt
+        self.size = struct.calcsize(fmt)
+        self.scales = scales
+
+    def encode_into(self, buf, offset, *values) -> int:
+        """Pack values into buf at offset, returns the record size."""
+        if self.scales is not None:
+            values = [int(round(v * s)) for v, s in zip(values, self.scales)]
+        struct.pack_into(self.fmt, buf, offset, *values)
+        return self.size
+
+    def encode(self, *values) -> bytes:
+        buf = bytearray(self.size)
+        self.encode_into(buf, 0, *values)
+        return bytes(buf)
+
+    def decode(self, data, offset=0) -> tuple:
+        values = struct.unpack_from(self.fmt, data, offset)
+        if self.scales is None:
+            return values
+        return tuple(v / s for v, s in zip(values, self.scales))
+
+
+class UplinkBatcher:
+    """
+    Collect fixed size records and send as many per uplink as the current
+    datarate allows, instead of one uplink per reading.
+
+        batcher = UplinkBatcher(lorawan, StructCodec(">Hh", (1, 100)))
+        batcher.add(seconds, temperature)  # sends when the next would not fit
+
+    ``max_records`` additionally caps the records per uplink; flush() sends
+    what is queued, e.g. before sleeping. While a record does not fit an
+    uplink at the current datarate nothing is sent, the records stay queued
+    and the oldest ones are dropped (counted in ``dropped``) when the queue
+    is full.
+    """
+
+    def __init__(self, lorawan, codec, max_records=None, confirm=None, nbtrials=None) -> None:
+        self.lorawan = lorawan
+        self.codec = codec
+        self.max_records = max_records
+        self.confirm = confirm
+        self.nbtrials = nbtrials
+        self.buf = bytearray(max(lorawan.MAX_PAYLOAD))
+        if codec.size > len(self.buf):
+            raise ValueError("record larger than any uplink")
+        self._mv = memoryview(self.buf)
+        self.size = 0
+        self.count = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def capacity(self) -> int:
+        """Records per uplink at the current datarate, 0 if one does not fit."""
+        n = self.lorawan.max_payload() // self.codec.size
+        return n if self.max_records is None else min(n, self.max_records)
+
+    def _shift(self, n) -> None:
+        # Drop the n oldest records.
+        size = n * self.codec.size
+        self._mv[: self.size - size] = self._mv[size : self.size]
+        self.size -= size
+        self.count -= n
+
+    def add(self, *values) -> bool:
+        """
+        Queue one record, returns True when the batch was sent.
+        """
+        cap = self.capacity()
+        if cap and self.count >= cap:
+            # The datarate dropped since the records were queued.
+            self.flush()
+        if self.size + self.codec.size > len(self.buf):
+            self._shift(1)
+            self.dropped += 1
+        self.size += self.codec.encode_into(self.buf, self.size, *values)
+        self.count += 1
+        if cap and self.count >= cap:
+            return self.flush()
+        return False
+
+    def flush(self) -> bool:
+        """
+        Send the queued records, in as many uplinks as the datarate needs.
+        Returns False if nothing was sent or an uplink failed.
+        """
+        cap = self.capacity()
+        if not self.count or not cap:
+            return False
+        ok = True
+        while self.count:
+            n = min(self.count, cap)
+            if self.lorawan.send_data(
+                self._mv[: n * self.codec.size], self.confirm, self.nbtrials
+            ):
+                self.sent += 1
+            else:
+                self.failed += 1
+                ok = False
+            self._shift(n)
+        return ok
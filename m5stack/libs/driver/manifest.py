@@ -14,6 +14,9 @@ package(
         "fpc1020a/fpc1020a/api.py",
         "fpc1020a/fpc1020a/types.py",
         "ir/__init__.py",
+        "ir/capture.py",
+        "ir/decoders.py",
+        "ir/learn.py",
         "ir/nec.py",
         "ir/receiver.py",
         "ir/transmitter.py",
@@ -46,6 +49,9 @@ package(
         "dmx512.py",
         "drf1609h.py",
         "haptic.py",
+        "imu_fusion.py",
+        "lora_e220.py",
+        "lorawan_payload.py",
         "mcp4725.py",
         "mlx90614.py",
         "pca9554.py",
@@ -9,10 +9,13 @@ import struct
 import time
 from micropython import const
 
+_SMPLRT_DIV = const(0x19)
 _CONFIG = const(0x1A)
 _GYRO_CONFIG = const(0x1B)
 _ACCEL_CONFIG = const(0x1C)
 _ACCEL_CONFIG2 = const(0x1D)
+_FIFO_EN = const(0x23)
+_INT_STATUS = const(0x3A)
 _ACCEL_XOUT_H = const(0x3B)
 _ACCEL_XOUT_L = const(0x3C)
 _ACCEL_YOUT_H = const(0x3D)
@@ -27,7 +30,10 @@ _GYRO_YOUT_H = const(0x45)
 _GYRO_YOUT_L = const(0x46)
 _GYRO_ZOUT_H = const(0x47)
 _GYRO_ZOUT_L = const(0x48)
+_USER_CTRL = const(0x6A)
 _PWR_MGMT_1 = const(0x6B)
+_FIFO_COUNTH = const(0x72)
+_FIFO_R_W = const(0x74)
 _WHO_AM_I = const(0x75)
 
 ACCEL_FS_SEL_2G = const(0b00000000)
@@ -62,6 +68,9 @@ SF_RAD_S = 0.017453292519943  # 1 deg/s is 0.017453292519943 rad/s
 class MPU6886:
     """Class which provides interface to MPU6886 6-axis motion tracking device."""
 
+    # FIFO frame: accel x, y, z, temperature, gyro x, y, z, big endian.
+    FIFO_FRAME_SIZE = 14
+
     def __init__(
         self,
         i2c,
@@ -74,6 +83,7 @@ class MPU6886:
     ):
         self.i2c = i2c
         self.address = address
+        self._saved_config = None
 
         if 0x19 != self.whoami():
             raise RuntimeError("MPU6886 not found in I2C bus.")
@@ -126,6 +136,60 @@ class MPU6886:
         # return ((temp - _TEMP_OFFSET) / _TEMP_SO) + _TEMP_OFFSET
         return (temp / _TEMP_SO) + _TEMP_OFFSET
 
+    def fifo_enable(self, odr=100):
+        """
+        Stream accel and gyro samples into the FIFO, returns the sample rate
+        in Hz actually used (1 kHz divided by an integer).
+        """
+        div = min(255, max(0, round(1000 / odr) - 1))
+        # Restored by fifo_disable().
+        self._saved_config = (
+            self._register_char(_CONFIG),
+            self._register_char(_SMPLRT_DIV),
+        )
+        self._register_char(_CONFIG, 0x01)  # DLPF 176 Hz, 1 kHz internal rate
+        self._register_char(_SMPLRT_DIV, div)
+        self._register_char(_FIFO_EN, 0x18)  # gyro and accel
+        self._register_char(_USER_CTRL, 0x44)  # enable and reset
+        self._fifo_count = bytearray(2)
+        return 1000 / (div + 1)
+
+    def fifo_disable(self):
+        self._register_char(_FIFO_EN, 0x00)
+        self._register_char(_USER_CTRL, 0x04)
+        if self._saved_config is not None:
+            self._register_char(_CONFIG, self._saved_config[0])
+            self._register_char(_SMPLRT_DIV, self._saved_config[1])
+            self._saved_config = None
+
+    def fifo_read(self, buf):
+        """
+        Read whole frames from the FIFO into buf in one burst, returns the
+        frame count or -1 if the FIFO overflowed (it is reset then, frames
+        may not be aligned any more after an overflow).
+        """
+        if self._register_char(_INT_STATUS) & 0x10:
+            self._register_char(_USER_CTRL, 0x44)
+            return -1
+        self.i2c.readfrom_mem_into(self.address, _FIFO_COUNTH, self._fifo_count)
+        count = ((self._fifo_count[0] << 8) | self._fifo_count[1]) & 0x1FFF
+        n = min(count, len(buf)) // 14
+        if n:
+            self.i2c.readfrom_mem_into(self.address, _FIFO_R_W, memoryview(buf)[: n * 14])
+        return n
+
+    def fifo_sample(self, buf, index, out):
+        """Decode FIFO frame index into out: gyro in deg/s, accel in g."""
+        ax, ay, az, _, gx, gy, gz = struct.unpack_from(">7h", buf, index * 14)
+        so = self._gyro_so
+        out[0] = gx / so
+        out[1] = gy / so
+        out[2] = gz / so
+        so = self._accel_so
+        out[3] = ax / so
+        out[4] = ay / so
+        out[5] = az / so
+
     def whoami(self):
         """Value of the whoami register."""
         return self._register_char(_WHO_AM_I)
@@ -31,6 +31,9 @@ class SHT30:
 
     # MSB = 0x2C LSB = 0x06 Repeatability = High, Clock stretching = enabled
     MEASURE_CMD = b"\x2c\x10"
+    # Repeatability = High, Clock stretching = disabled, ready after 15 ms
+    MEASURE_NOSTRETCH_CMD = b"\x24\x00"
+    MEASURE_NOSTRETCH_MS = 16
     STATUS_CMD = b"\xf3\x2d"
     RESET_CMD = b"\x30\xa2"
     CLEAR_STATUS_CMD = b"\x30\x41"
@@ -83,19 +86,22 @@ class SHT30:
             if not response_size:
                 return
             time.sleep_ms(read_delay_ms)
-            data = self.i2c.readfrom(self.i2c_addr, response_size)
-
-            for i in range(response_size // 3):
-                if not self._check_crc(data[i * 3 : (i + 1) * 3]):  # pos 2 and 5 are CRC
-                    raise SHT30Error(SHT30Error.CRC_ERROR)
-            if data == bytearray(response_size):
-                raise SHT30Error(SHT30Error.DATA_ERROR)
-            return data
+            return self._read_response(response_size)
         except OSError:
             raise SHT30Error(SHT30Error.BUS_ERROR)
         except Exception as ex:
             raise ex
 
+    def _read_response(self, response_size):
+        data = self.i2c.readfrom(self.i2c_addr, response_size)
+
+        for i in range(response_size // 3):
+            if not self._check_crc(data[i * 3 : (i + 1) * 3]):  # pos 2 and 5 are CRC
+                raise SHT30Error(SHT30Error.CRC_ERROR)
+        if data == bytearray(response_size):
+            raise SHT30Error(SHT30Error.DATA_ERROR)
+        return data
+
     def clear_status(self):
         """
         Clear the status register
@@ -132,7 +138,27 @@ class SHT30:
 
         if raw:
             return data
+        return self._convert(data)
+
+    def trigger_measure(self):
+        """
+        Start a measurement without clock stretching and return the time in ms
+        after which fetch_measure() can read it. The bus is free in between.
+        """
+        self.send_cmd(SHT30.MEASURE_NOSTRETCH_CMD, None)
+        return SHT30.MEASURE_NOSTRETCH_MS
+
+    def fetch_measure(self):
+        """
+        Read the measurement started by trigger_measure(), returns (T, RH) like measure()
+        or None while the sensor NACKs the read (conversion not done, or a bus glitch)
+        """
+        try:
+            return self._convert(self._read_response(6))
+        except OSError:
+            return None
 
+    def _convert(self, data):
         t_celsius = (((data[0] << 8 | data[1]) * 175) / 0xFFFF) - 45 + self.delta_temp
         rh = (((data[3] << 8 | data[4]) * 100.0) / 0xFFFF) + self.delta_hum
         return t_celsius, rh
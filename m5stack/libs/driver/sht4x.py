@@ -124,12 +124,19 @@ class SHT4x:
     def measure(self) -> Tuple[float, float]:
         """both `temperature` and `relative_humidity`, read simultaneously"""
 
+        time.sleep_ms(self.trigger_measure())
+        return self.fetch_measure()
+
+    def trigger_measure(self) -> int:
+        """Start a measurement, returns the time in ms until `fetch_measure` can read it"""
+        self.i2c_device.writeto(self.sht4x_i2c_addr, bytearray([self._mode]))
+        return int(Mode.delay[self._mode] * 1000 + 0.999)
+
+    def fetch_measure(self) -> Tuple[float, float]:
+        """Read the measurement started by `trigger_measure`"""
         temperature = None
         humidity = None
-        command = self._mode
 
-        self.i2c_device.writeto(self.sht4x_i2c_addr, bytearray([command]))
-        time.sleep(Mode.delay[self._mode])
         self._buffer = self.i2c_device.readfrom(self.sht4x_i2c_addr, 6)
 
         # separate the read data
@@ -10,6 +10,9 @@ from collections import namedtuple
 
 AT_CMD = namedtuple("AT_CMD", ["command", "response", "timeout"])
 
+# Bytes kept of one AT response; bulk data is read with read_raw() instead.
+RESPONSE_SIZE = 1024
+
 
 class Response(object):
     def __init__(self, status_code, content):
@@ -30,9 +33,14 @@ class Modem(object):
         # Uart
         self.uart = uart
         self.modem_debug = False
-        self.downlink_callback = {}
-        self.downlink_keyword = []
-        self.callback_keyword = []
+        # URC prefix (bytes up to and including ":") -> callback(line)
+        self.urc_callback = {}
+        # Response accumulator, lines are copied in as bytes and decoded once.
+        self._resp = bytearray(RESPONSE_SIZE)
+        self._resp_mv = memoryview(self._resp)
+        self._resp_len = 0
+        # True when the last response did not fit in RESPONSE_SIZE bytes.
+        self.response_truncated = False
 
         if not self.uart:
             from machine import UART, Pin
@@ -137,6 +145,40 @@ class Modem(object):
                 return (list_item, index, False)
         return (list_item, 0, True)
 
+    def register_urc(self, prefix, callback):
+        # Call callback(line) for the unsolicited lines starting with prefix,
+        # e.g. "+SMSUB:", line is bytes; None removes it.
+        if isinstance(prefix, str):
+            prefix = prefix.encode()
+        if callback is None:
+            self.urc_callback.pop(prefix, None)
+        else:
+            self.urc_callback[prefix] = callback
+
+    def _dispatch_urc(self, line):
+        # Returns True if line was an URC with a registered callback.
+        if not self.urc_callback:
+            return False
+        i = line.find(b":")
+        if i < 0:
+            return False
+        callback = self.urc_callback.get(line[: i + 1])
+        if callback is None:
+            return False
+        callback(line)
+        return True
+
+    def _urc_message(self, line):
+        # Split an MQTT message URC like +SMSUB: "topic","payload" into the
+        # topic string and the payload bytes, taken as is between the first
+        # quote after the topic and the last quote of the line.
+        start = line.find(b'"') + 1
+        end = line.find(b'"', start)
+        topic = str(line[start:end], "utf-8")
+        start = line.find(b'"', end + 1) + 1
+        end = line.rfind(b'"')
+        return topic, bytes(line[start:end]) if 0 < start <= end else b""
+
     # ----------------------
     # Execute AT commands
     # ----------------------
@@ -146,24 +188,101 @@ class Modem(object):
         self.response_at_command(DUMMY)
 
         # Execute the AT command
-        command_string_for_at = "{}\r\n".format(command.command)
         if self.modem_debug:
             print('write AT command: "{}"'.format(command.command))
-        self.uart.write(command_string_for_at)
+        self.uart.write(command.command)
+        self.uart.write(b"\r\n")
         return self.response_at_command(command, repeat, clean_output)
 
+    def write_raw(self, command: AT_CMD, data):
+        # Run a command answering with the ">" prompt, then send data (str or
+        # bytes) as is and wait for OK, e.g. AT+SMPUB or AT+SHBOD.
+        _, error = self.execute_at_command(command)
+        if error:
+            return False
+        self.uart.write(data)
+        _, error = self.response_at_command(AT_CMD("", "OK", command.timeout))
+        return not error
+
+    def read_raw(self, command: AT_CMD, buf, offset=0):
+        """
+        Run a command answering with a "<response> <length>" line followed by
+        length raw bytes, e.g. AT+SHREAD, and read them into buf at offset.
+        Returns the number of bytes read, -1 on error.
+        """
+        DUMMY = AT_CMD("", "", 0)  # noqa: N806
+        self.response_at_command(DUMMY)
+        self.uart.write(command.command)
+        self.uart.write(b"\r\n")
+        prefix = command.response.encode()
+        deadline = time.ticks_add(time.ticks_ms(), command.timeout * 1000)
+        line = b""
+        while not line.startswith(prefix):
+            if line == b"ERROR\r\n" or time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+                return -1
+            line = self.uart.readline() or b""
+            self._dispatch_urc(line)
+        n = min(int(line[len(prefix) :]), len(buf) - offset)
+        mv = memoryview(buf)
+        got = 0
+        while got < n and time.ticks_diff(deadline, time.ticks_ms()) > 0:
+            got += self.uart.readinto(mv[offset + got : offset + n]) or 0
+        return got
+
+    def _match_line(self, command, line, pre_end):
+        # Returns (end, error) for one response line.
+        if line == b"ERROR\r\n":
+            print('Got generic AT error for command "{}"'.format(command.command))
+            return True, True
+        response = command.response
+        if line.startswith(response) and (pre_end or line[len(response) :] == b"\r\n"):
+            return True, False
+        return False, False
+
+    def _append_line(self, line, echo, clean_output):
+        # Copy a response line into the accumulator, cleaned like the text
+        # output: without echo, OK lines and line ends.
+        if line == echo:
+            return
+        if clean_output:
+            if line == b"OK\r\n":
+                return
+            end = len(line)
+            while end and line[end - 1] in (10, 13):
+                end -= 1
+            start = 1 if line[:1] == b"\n" else 0
+            line = memoryview(line)[start:end]
+        n = min(len(line), RESPONSE_SIZE - self._resp_len)
+        if n < len(line):
+            self.response_truncated = True
+        self._resp_mv[self._resp_len : self._resp_len + n] = line[:n]
+        self._resp_len += n
+
+    def _output(self, clean_output):
+        n = self._resp_len
+        if not clean_output and self._resp[n - 2 : n] == b"\r\n":
+            n -= 2
+        try:
+            return str(self._resp_mv[:n], "utf-8")
+        except UnicodeError:
+            # MicroPython ignores errors="replace", replace by hand.
+            return "".join(chr(c) if c < 0x80 else "\ufffd" for c in self._resp_mv[:n])
+
     def response_at_command(self, command: AT_CMD, repeat=False, clean_output=True):
-        # Support vars
-        processed_lines = 0
+        """
+        Read the response of command until its response keyword, returns
+        (output, error). Unsolicited lines with a registered callback are
+        dispatched on the way and left out of the output.
+        """
+        command = AT_CMD(command.command, command.response.encode(), command.timeout)
+        echo = command.command.encode() + b"\r\r\n"
+        in_cmd = command.command != "" or command.response != b""
         pre_end = True
         find_keyword = False
-        output = ""
         error = False
         empty_reads = 0
-        in_cmd = False
-        if command.command != "":
-            command_string_for_at = "{}\r\n".format(command.command)
-            in_cmd = True
+        self._resp_len = 0
+        self.response_truncated = False
 
         while True:
             line = self.uart.readline()
@@ -172,7 +291,8 @@ class Modem(object):
                     break
                 time.sleep(1)
                 if repeat:
-                    self.uart.write(command_string_for_at)
+                    self.uart.write(command.command)
+                    self.uart.write(b"\r\n")
                 empty_reads += 1
                 if empty_reads > command.timeout:
                     print(
@@ -182,66 +302,28 @@ class Modem(object):
                     )
                     error = True
                     break
-            else:
-                if self.modem_debug:
-                    print('response AT command: "{}"'.format(line))
-                # Convert line to string
-                try:
-                    line_str = line.decode("utf-8")
-                except:
-                    line_str = ""
-
-                for kw in self.downlink_keyword:
-                    if kw in line_str:
-                        for cb_kw in self.callback_keyword:
-                            self.downlink_callback[cb_kw](line_str)
-                        line_str = ""
-                        break
-
-                # Do we have an error?
-                if line_str == "ERROR\r\n":
-                    # raise GenericATError('Got generic AT error')
-                    print('Got generic AT error for command "{}"'.format(command.command))
-                    error = True
-                    break
-
-                # If we had a pre-end, do we have the expected end?
-                if line_str == "{}\r\n".format(command.response):
-                    find_keyword = True
-                if pre_end and line_str.startswith("{}".format(command.response)):
-                    find_keyword = True
-
-                # Do we have a pre-end?
-                if line_str == "\r\n" or line_str == "{}\r\r\n".format(command.command):
-                    pre_end = True
-                else:
-                    pre_end = False
-
-                # Keep track of processed lines and stop if exceeded
-                processed_lines += 1
-
-                # Save this line unless in particular conditions
-                output += line_str
-
-                if find_keyword and self.uart.any() == 0:
-                    break
-
-        # Remove the command string from the output
-        output = output.replace(command.command + "\r\r\n", "")
-
-        # ..and remove the last \r\n added by the AT protocol
-        if output.endswith("\r\n"):
-            output = output[:-2]
-
-        # Also, clean output if needed
-        if clean_output:
-            output = output.replace("OK", "")
-            output = output.replace("\r\n", "")
-            output = output.replace("\r", "")
-            if output.startswith("\n"):
-                output = output[1:]
-            if output.endswith("\n"):
-                output = output[:-1]
-
-        # Return
-        return (output, error)
+                continue
+            if self.modem_debug:
+                print('response AT command: "{}"'.format(line))
+            if self._dispatch_urc(line):
+                continue
+
+            end, error = self._match_line(command, line, pre_end)
+            if error:
+                break
+            find_keyword = find_keyword or end
+
+            # A pre-end is an empty line or the echo of the command.
+            pre_end = line == b"\r\n" or line == echo
+            self._append_line(line, echo, clean_output)
+
+            if find_keyword and self.uart.any() == 0:
+                break
+
+        if self.response_truncated:
+            print(
+                'Response of command "{}" truncated to {} bytes'.format(
+                    command.command, RESPONSE_SIZE
+                )
+            )
+        return (self._output(clean_output), error)
@@ -74,9 +74,7 @@ class SIM7020(Modem):
         )
         self._mqtt_id = 0
         # mqtt callback function keyword is set
-        self.downlink_keyword.append("+CMQPUB:")
-        self.callback_keyword.append("MQTT_CB")
-        self.downlink_callback["MQTT_CB"] = self.mqtt_subscribe_cb
+        self.register_urc("+CMQPUB:", self.mqtt_subscribe_cb)
 
         self.mqtt_subscribe_cb_list = {}
 
@@ -158,9 +156,9 @@ class SIM7020(Modem):
         self.response_at_command(DUMMY)
 
     def mqtt_subscribe_cb(self, buffer):
-        # main callback function
-        topic = buffer.split('"')[1]
-        payload = buffer.split('"')[3]
+        # main callback function, buffer is the URC line as bytes, the
+        # payload is passed on as bytes
+        topic, payload = self._urc_message(buffer)
         if topic in self.mqtt_subscribe_cb_list.keys():
             self.mqtt_subscribe_cb_list[topic](topic, payload)
 
@@ -76,9 +76,7 @@ class SIM7080(Modem):
         SMCONN = AT_CMD("AT+SMCONN", "OK", 10)  # noqa: N806
 
         # mqtt callback function keyword is set
-        self.downlink_keyword.append("+SMSUB:")
-        self.callback_keyword.append("MQTT_CB")
-        self.downlink_callback["MQTT_CB"] = self.mqtt_subscribe_cb
+        self.register_urc("+SMSUB:", self.mqtt_subscribe_cb)
 
         self.mqtt_subscribe_cb_list = {}
 
@@ -148,23 +146,15 @@ class SIM7080(Modem):
         return True
 
     def mqtt_publish_topic(self, topic, payload, qos=0, retained=None):
-        # Publish message with topic.
-        if retained is None:
-            SMPUB = AT_CMD('AT+SMPUB="{0}",{1},{2},0'.format(topic, len(payload), qos), ">", 3)  # noqa: N806
-        else:
-            SMPUB = AT_CMD(  # noqa: N806
-                'AT+SMPUB="{0}",{1},{2},{3}'.format(topic, len(payload), qos, retained),
-                ">",
-                3,
-            )
-
-        output, error = self.execute_at_command(SMPUB)
-        if error:
-            return False
-
-        PAYLOAD = AT_CMD("{0}".format(payload), "OK", 3)  # noqa: N806
-        output, error = self.execute_at_command(PAYLOAD)
-        return not error
+        # Publish message with topic, payload is str or bytes and sent as is.
+        if isinstance(payload, str):
+            payload = payload.encode()
+        SMPUB = AT_CMD(  # noqa: N806
+            'AT+SMPUB="{0}",{1},{2},{3}'.format(topic, len(payload), qos, retained or 0),
+            ">",
+            3,
+        )
+        return self.write_raw(SMPUB, payload)
 
     def mqtt_server_is_connect(self):
         # Check mqtt server connection.
@@ -178,9 +168,9 @@ class SIM7080(Modem):
         self.response_at_command(DUMMY)
 
     def mqtt_subscribe_cb(self, buffer):
-        # main callback function
-        topic = buffer.split('"')[1]
-        payload = buffer.split('"')[3]
+        # main callback function, buffer is the URC line as bytes, the
+        # payload is passed on as bytes
+        topic, payload = self._urc_message(buffer)
         if topic in self.mqtt_subscribe_cb_list.keys():
             self.mqtt_subscribe_cb_list[topic](topic, payload)
 
@@ -189,9 +179,21 @@ class SIM7080(Modem):
     HTTPCLIENT_PUT = 2
     HTTPCLIENT_POST = 3
 
+    # Bytes read from the module per AT+SHREAD.
+    HTTP_READ_CHUNK = 1024
+
     def http_request(
-        self, method=HTTPCLIENT_GET, url="http://api.m5stack.com/v1", headers={}, data=None
+        self,
+        method=HTTPCLIENT_GET,
+        url="http://api.m5stack.com/v1",
+        headers={},
+        data=None,
+        buf=None,
     ):
+        # Without buf the body is kept as text in data_content (bytes if it is
+        # not UTF-8), with a buffer
+        # (bytearray or memoryview) it is read into it as is and
+        # content_length / data_length give the body and read sizes.
         # Create HTTP host instance
         proto, dummy, host, path = url.split("/", 3)
         find_url = url.find("/", 10)
@@ -205,6 +207,8 @@ class SIM7080(Modem):
 
         self.response_code = 0
         self.data_content = ""
+        self.content_length = 0
+        self.data_length = 0
 
         for pdp_id in range(0, 4):
             if self.get_network_activated(pdp_id):
@@ -253,13 +257,10 @@ class SIM7080(Modem):
 
         if method == self.HTTPCLIENT_POST:
             if data is not None:
+                if isinstance(data, str):
+                    data = data.encode()
                 SHBOD = AT_CMD("AT+SHBOD={0},10000".format(len(data)), ">", 15)  # noqa: N806
-                _, error = self.execute_at_command(SHBOD)
-                if error:
-                    return False
-                DATA = AT_CMD("{0}".format(data), "OK", 3)  # noqa: N806
-                _, error = self.execute_at_command(DATA)
-                if error:
+                if not self.write_raw(SHBOD, data):
                     return False
 
         SHREQ = AT_CMD('AT+SHREQ="{0}",{1}'.format(path, method), "+SHREQ:", 25)  # noqa: N806
@@ -273,19 +274,35 @@ class SIM7080(Modem):
             self.http_server_disconnect()
             return False
 
-        length = output.split(",")[2]
-        SHREAD = AT_CMD("AT+SHREAD=0,{0}".format(int(length)), "+SHREAD:", 10)  # noqa: N806
-        output, error = self.execute_at_command(SHREAD)
-        if error:
-            return False
-        find_out_str = "+SHREAD: {}".format(length)
-        find_index = output.find(find_out_str)
-        if find_index != -1:
-            self.data_content = output[(len(find_out_str) + find_index) :]
+        self.content_length = int(output.split(",")[2])
+        if buf is None:
+            body = bytearray(self.content_length)
+            self.data_length = self.http_read_into(body)
+            try:
+                self.data_content = str(memoryview(body)[: self.data_length], "utf-8")
+            except UnicodeError:
+                # Binary body, keep the bytes rather than failing the request.
+                self.data_content = bytes(memoryview(body)[: self.data_length])
+        else:
+            self.data_length = self.http_read_into(buf)
 
         error = self.http_server_disconnect()
         return error
 
+    def http_read_into(self, buf, start=0):
+        # Read the body of the last response from start into buf, in chunks,
+        # returns the number of bytes read.
+        n = min(len(buf), self.content_length - start)
+        got = 0
+        while got < n:
+            size = min(self.HTTP_READ_CHUNK, n - got)
+            SHREAD = AT_CMD("AT+SHREAD={0},{1}".format(start + got, size), "+SHREAD:", 10)  # noqa: N806
+            r = self.read_raw(SHREAD, buf, got)
+            if r <= 0:
+                break
+            got += r
+        return got
+
     def http_server_connect(self):
         # Http server is connect
         SHCONN = AT_CMD("AT+SHCONN", "OK", 25)  # noqa: N806
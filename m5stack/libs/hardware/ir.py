@@ -2,7 +2,9 @@
 #
 # SPDX-License-Identifier: MIT
 
-from driver.ir.nec import NEC, NEC_8
+from driver.ir.nec import NEC
+from driver.ir.capture import IRReceiver
+from driver.ir import learn
 import M5
 from machine import Pin
 
@@ -35,6 +37,31 @@ class IR:
             return
 
         if self._receiver is None:
-            self._receiver = NEC_8(Pin(self._port[0], Pin.IN), cb)
+            # NEC frames only, like the edge timed NEC_8 receiver this replaces.
+            # Errors are reported as negative cmd, as the NEC_8 receiver did.
+            self._receiver = IRReceiver(
+                self._port[0], lambda cmd, addr, ext, _: cb(cmd, addr, ext), ("nec",), errors=True
+            )
         else:
             self._receiver.close()
+
+    def rx_event(self, cb, protocols=("nec", "samsung", "sirc", "rc5", "rc6")):
+        # cb(cmd, addr, ext, protocol) for every decoded frame.
+        if self._port[0] is None:
+            return
+        if self._receiver is not None:
+            self._receiver.close()
+        self._receiver = IRReceiver(self._port[0], cb, protocols)
+
+    def learn(self, timeout_ms=10000):
+        # Capture one burst of any remote, returns it packed or None.
+        if self._port[0] is None:
+            return None
+        if self._receiver is not None:
+            self._receiver.close()
+            self._receiver = None
+        return learn.learn(self._port[0], timeout_ms)
+
+    def replay(self, data):
+        # Transmit a burst returned by learn().
+        learn.replay(self._transmitter, data)
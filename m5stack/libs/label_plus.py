@@ -8,11 +8,20 @@ try:
 except ImportError:
     import requests
 from machine import Timer
-
-# from micropython import schedule
+from micropython import schedule
+import _thread
 
 
 class LabelPlus(Widgets.Label):
+    """
+    Label showing a value fetched over HTTP every ``period`` ms.
+
+    The request runs in a background thread started by the timer, never in
+    the timer callback itself. The result is drawn from the main context
+    through micropython.schedule(), or by poll() if the schedule queue was
+    full.
+    """
+
     def __init__(
         self,
         text,
@@ -41,6 +50,9 @@ class LabelPlus(Widgets.Label):
         super(LabelPlus, self).__init__(text, x, y, size, text_color, bg_color, font)
 
         self._data = error_msg
+        self._fetching = False
+        # (text, data, ok) waiting to be drawn
+        self._pending = None
         self._init_timer()
 
     def _init_timer(self):
@@ -56,9 +68,45 @@ class LabelPlus(Widgets.Label):
         self._init_timer()
 
     def _cb(self, tim):
-        # schedule(self._update(), self)
-        self._update()
-        self._tim.init(mode=Timer.ONE_SHOT, period=self._period, callback=self._cb)
+        if self._fetching:
+            return
+        self._fetching = True
+        try:
+            _thread.start_new_thread(self._fetch_task, ())
+        except OSError:
+            self._fetching = False
+            self._init_timer()
+
+    def _fetch_task(self):
+        try:
+            self._pending = self._fetch()
+        finally:
+            self._fetching = False
+        try:
+            schedule(self._apply, None)
+        except RuntimeError:
+            # Queue full, poll() applies it.
+            pass
+        self._init_timer()
+
+    def _apply(self, _=None):
+        pending = self._pending
+        if pending is None:
+            return
+        self._pending = None
+        text, data, ok = pending
+        if ok:
+            self._data = data
+            self._show(text)
+        else:
+            self._show_error(text)
+
+    def poll(self) -> bool:
+        """Draw a fetched value not drawn yet, returns True if there was one."""
+        if self._pending is None:
+            return False
+        self._apply()
+        return True
 
     def set_update_period(self, period):
         if self._enable:
@@ -79,42 +127,47 @@ class LabelPlus(Widgets.Label):
     def set_url(self, url):
         self._url = url
 
-    def _update(self):
-        r = None
+    def _fetch(self):
+        # Returns (text, data, ok), without drawing.
         try:
             r = requests.get(self._url)
-            if r.status_code == 200:
-                if self._key is None:
-                    self._data = r.content
-                    self._show(str(r.content))
-                else:
-                    try:
-                        data = r.json()
-                        self._data = self._find_key(data)
-                        self._show(str(self._data))
-                    except ValueError:
-                        self._show_error("ValueError")
-            else:
-                error_str = "ERR: " + str(r.status_code)
-                self._show_error(error_str)
-            r.close()
         except OSError:
-            self._show_error("OSError")
+            return ("OSError", None, False)
+        try:
+            if r.status_code != 200:
+                return ("ERR: " + str(r.status_code), None, False)
+            if self._key is None:
+                return (str(r.content), r.content, True)
+            try:
+                data = self._find_key(r.json(), self._key)
+            except ValueError:
+                return ("ValueError", None, False)
+            return (str(data), data, True)
+        except OSError:
+            return ("OSError", None, False)
+        finally:
+            r.close()
 
-    def _find_key(self, data):
-        self._data = data.get(self._key)
-        if self._data is not None:
-            return self._data
-        for _, value in data.items():
+    def _update(self):
+        self._pending = self._fetch()
+        self._apply()
+
+    def _find_key(self, data, key):
+        value = data.get(key)
+        if value is not None:
+            return value
+        for value in data.values():
             if isinstance(value, list):
                 for item in value:
-                    self._find_key(item)
-                    if self._data is not None:
-                        return self._data
+                    if isinstance(item, dict):
+                        found = self._find_key(item, key)
+                        if found is not None:
+                            return found
             elif isinstance(value, dict):
-                self._find_key(value)
-            if self._data is not None:
-                return self._data
+                found = self._find_key(value, key)
+                if found is not None:
+                    return found
+        return None
 
     def update(self):
         self._tim.deinit()
@@ -18,7 +18,8 @@ from camera import (
 )
 import M5
 from collections import namedtuple
-import gc
+import micropython
+import time
 
 YUV422 = camera.YUV422
 GRAYSCALE = camera.GRAYSCALE
@@ -60,19 +61,56 @@ _max_width = 0
 _max_height = 0
 _frame_size = None
 _visible = True
+_pixformat = RGB565
+_scale = 1
+# Window buffer for frames that have to be cropped or scaled before
+# drawing, None when the frame buffer is drawn as it is.
+_win = None
+# frames, us waiting for frames, us copying and drawing, start of the window
+_stats = [0, 0, 0, 0]
+
+
+@micropython.viper
+def _crop(src, src_width: int, dst, width: int, height: int, step: int):  # noqa: F821
+    # Copy the top left width x height pixels of every step-th row and
+    # column of src into dst.
+    s = ptr16(src)  # noqa: F821
+    d = ptr16(dst)  # noqa: F821
+    o = 0
+    for y in range(height):
+        p = y * step * src_width
+        for _ in range(width):
+            d[o] = s[p]
+            o += 1
+            p += step
+
+
+def _update_window() -> None:
+    global _width, _height, _win
+    if _frame_size is None:
+        return
+    w = _frame_size.width // _scale
+    h = _frame_size.height // _scale
+    _width = w if w < _max_width else _max_width
+    _height = h if h < _max_height else _max_height
+    if _scale == 1 and _width == _frame_size.width:
+        # Whole rows: the frame buffer is drawn in place, cut to _height.
+        _win = None
+    elif _win is None or len(_win) != _width * _height * 2:
+        _win = bytearray(_width * _height * 2)
 
 
 def init(
     x, y, width, height, pixformat=RGB565, framesize=FRAME_QVGA, fb_count=2, fb_location=IN_PSRAM
 ) -> None:
-    global _x, _y, _width, _height, _max_width, _max_height, _frame_size
+    global _x, _y, _max_width, _max_height, _frame_size, _pixformat
     _x = x
     _y = y
     _max_width = width
     _max_height = height
     _frame_size = _frame_size_table.get(framesize)
-    _width = _frame_size.width if _frame_size.width < _max_width else _max_width
-    _height = _frame_size.height if _frame_size.height < _max_height else _max_height
+    _pixformat = pixformat
+    _update_window()
     camera.init(
         pixformat=pixformat, framesize=framesize, fb_count=fb_count, fb_location=fb_location
     )
@@ -80,36 +118,98 @@ def init(
 
 
 def framesize(size) -> None:
+    global _frame_size
     frame_size = _frame_size_table.get(size)
     if frame_size is None:
         return
-    global _width, _height, _max_width, _max_height
-    _width = frame_size.width if frame_size.width < _max_width else _max_width
-    _height = frame_size.height if frame_size.height < _max_height else _max_height
+    _frame_size = frame_size
+    _update_window()
     camera.framesize(size)
 
 
+def set_scale(scale: int) -> None:
+    """Show every scale-th pixel of the frame, 1 shows it at full size."""
+    global _scale
+    _scale = max(1, scale)
+    _update_window()
+
+
+def frame_size():
+    """(width, height) of the frames the camera delivers, None before init()."""
+    return _frame_size
+
+
+def downscale(fb, dst, scale: int) -> tuple:
+    """
+    Copy every scale-th pixel of the RGB565 frame fb into dst, which holds
+    at least (width // scale) * (height // scale) pixels. Returns (w, h) of
+    the copy.
+    """
+    w = _frame_size.width // scale
+    h = _frame_size.height // scale
+    _crop(fb, _frame_size.width, dst, w, h, scale)
+    return (w, h)
+
+
+def _draw_frame():
+    fb = camera.fb_get()
+    if fb is None:
+        return
+    t = time.ticks_us()
+    if _win is None:
+        # Drawn straight from the driver's buffer while the camera fills
+        # the next one.
+        M5.Lcd.drawRawBuf(fb, _x, _y, _width, _height, _width * _height)
+        camera.fb_return()
+    else:
+        _crop(fb, _frame_size.width, _win, _width, _height, _scale)
+        camera.fb_return()
+        M5.Lcd.drawRawBuf(_win, _x, _y, _width, _height, _width * _height)
+    return t
+
+
 def disp_to_screen():
-    global _visible
-    if _visible:
+    if not _visible:
+        return
+    if _pixformat != RGB565:
         raw = camera.capture_to_bmp()
         if raw:
             M5.Lcd.drawBmp(raw, _x, _y, _width, _height)
-            del raw
-            gc.collect()
+        return
+    t0 = time.ticks_us()
+    t1 = _draw_frame()
+    if t1 is None:
+        return
+    _stats[0] += 1
+    _stats[1] += time.ticks_diff(t1, t0)
+    _stats[2] += time.ticks_diff(time.ticks_us(), t1)
+
+
+def stats() -> dict:
+    """
+    Preview statistics since the previous call: frames per second, and the
+    average ms per frame spent waiting for the camera and drawing.
+    """
+    now = time.ticks_ms()
+    frames, wait_us, draw_us, start = _stats
+    dt = time.ticks_diff(now, start)
+    _stats[:] = [0, 0, 0, now]
+    return {
+        "fps": frames * 1000 / dt if dt > 0 else 0.0,
+        "wait_ms": wait_us / frames / 1000 if frames else 0.0,
+        "draw_ms": draw_us / frames / 1000 if frames else 0.0,
+    }
 
 
 def setCursor(x=0, y=0, w=0, h=0):  # noqa: N802
-    global _x, _y, _max_width, _width, _max_height, _height, _frame_size
+    global _x, _y, _max_width, _max_height
     _x = x
     _y = y
-    frame_size = _frame_size_table.get(_frame_size)
     if w != 0:
         _max_width = w
-        _width = frame_size.width if frame_size.width < _max_width else _max_width
     if h != 0:
         _max_height = h
-        _height = frame_size.height if frame_size.height < _max_height else _max_height
+    _update_window()
 
 
 def setVisible(enable: bool):  # noqa: N802
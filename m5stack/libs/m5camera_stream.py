@@ -0,0 +1,282 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# MJPEG streaming server for the camera.
+#
+# One capture loop serves every client: a frame is taken once, encoded once
+# per distinct (scale, quality) asked by the clients, and the same JPEG is
+# sent to all clients of that group. A client still sending the previous
+# frame skips the new one instead of buffering it.
+#
+#   GET /stream?scale=2&quality=40   multipart/x-mixed-replace MJPEG
+#   GET /snapshot                    latest frame as a single JPEG
+#
+# The camera must be set up with m5camera.init() in RGB565.
+
+import camera
+import errno
+import m5camera
+import socket
+import _thread
+import time
+
+_BOUNDARY = b"frame"
+_STREAM_HEADER = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: multipart/x-mixed-replace; boundary=" + _BOUNDARY + b"\r\n"
+    b"Cache-Control: no-cache\r\n"
+    b"Connection: close\r\n\r\n"
+)
+_JPEG_HEADER = b"HTTP/1.1 200 OK\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\nConnection: close\r\n\r\n"
+_PART_HEADER = b"--" + _BOUNDARY + b"\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n"
+_NOT_FOUND = b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+_CRLF = b"\r\n"
+
+
+class _Client:
+    def __init__(self, sock) -> None:
+        self.sock = sock
+        self.request = b""
+        self.stream = False
+        self.key = None
+        # Parts still to send and the offset into the first one.
+        self.parts = []
+        self.offset = 0
+        self.close_when_sent = False
+        self.frames = 0
+        self.dropped = 0
+
+
+def _query(path) -> dict:
+    _, _, qs = path.partition("?")
+    params = {}
+    for item in qs.split("&"):
+        k, _, v = item.partition("=")
+        if k:
+            params[k] = v
+    return params
+
+
+class MJPEGServer:
+    """
+    Serve the camera as MJPEG over HTTP.
+
+        m5camera.init(0, 0, 320, 240)
+        server = m5camera_stream.MJPEGServer(port=80, max_fps=15)
+        server.start()  # or call server.poll() from the main loop
+
+    quality is the default JPEG quality (1 to 100) and max_clients the
+    number of connections served at the same time. Clients may ask for
+    ``scale`` (every n-th pixel) and ``quality`` in the query string.
+    """
+
+    def __init__(self, port=80, quality=60, max_fps=15, max_clients=4) -> None:
+        self.quality = quality
+        self.max_clients = max_clients
+        self.interval_ms = 1000 // max_fps if max_fps else 0
+        self.clients = []
+        self._scaled = {}
+        self._snapshot = None
+        self._snapshot_t = 0
+        self._next = time.ticks_ms()
+        self._running = False
+        # Held while the poll thread runs, released by the thread on exit.
+        self._done = _thread.allocate_lock()
+        self.frames = 0
+        self.bytes_sent = 0
+        self._window = (0, 0, time.ticks_ms())
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(socket.getaddrinfo("0.0.0.0", port)[0][-1])
+        self._sock.listen(max_clients)
+        self._sock.setblocking(False)
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                sock, _ = self._sock.accept()
+            except OSError:
+                return
+            if len(self.clients) >= self.max_clients:
+                sock.close()
+                continue
+            sock.setblocking(False)
+            self.clients.append(_Client(sock))
+
+    def _close(self, client) -> None:
+        client.sock.close()
+        self.clients.remove(client)
+
+    def _read_request(self, client) -> None:
+        try:
+            data = client.sock.recv(512)
+        except OSError:
+            return
+        if not data:
+            self._close(client)
+            return
+        client.request += data
+        if b"\r\n\r\n" not in client.request and len(client.request) < 1024:
+            return
+        line = client.request.split(b"\r\n", 1)[0].decode()
+        client.request = None
+        parts = line.split(" ")
+        path = parts[1] if len(parts) > 1 else "/"
+        params = _query(path)
+        route = path.split("?")[0]
+        if route == "/stream":
+            try:
+                scale = max(1, int(params.get("scale", 1)))
+                quality = min(100, max(1, int(params.get("quality", self.quality))))
+            except ValueError:
+                scale, quality = 1, self.quality
+            client.stream = True
+            client.key = (scale, quality)
+            client.parts = [_STREAM_HEADER]
+        elif route in ("/snapshot", "/capture"):
+            jpg = self._snapshot
+            if jpg is None or time.ticks_diff(time.ticks_ms(), self._snapshot_t) > 1000:
+                jpg = self._encode_now()
+            client.parts = [_JPEG_HEADER % len(jpg), jpg] if jpg else [_NOT_FOUND]
+            client.close_when_sent = True
+        else:
+            client.parts = [_NOT_FOUND]
+            client.close_when_sent = True
+
+    def _encode(self, fb, key):
+        scale, quality = key
+        size = m5camera.frame_size()
+        if scale == 1:
+            return camera.jpeg_encode(fb, size.width, size.height, quality)
+        buf = self._scaled.get(scale)
+        if buf is None:
+            buf = self._scaled[scale] = bytearray(
+                (size.width // scale) * (size.height // scale) * 2
+            )
+        w, h = m5camera.downscale(fb, buf, scale)
+        return camera.jpeg_encode(buf, w, h, quality)
+
+    def _encode_now(self):
+        fb = camera.fb_get()
+        if fb is None:
+            return None
+        try:
+            self._snapshot = self._encode(fb, (1, self.quality))
+        finally:
+            camera.fb_return()
+        self._snapshot_t = time.ticks_ms()
+        return self._snapshot
+
+    def _capture(self) -> None:
+        # Encode one frame for every group with an idle client.
+        keys = set()
+        for c in self.clients:
+            if not c.stream:
+                continue
+            if c.parts:
+                # Still sending; a skipped frame only once one was sent, not
+                # while the stream header is pending.
+                if c.frames:
+                    c.dropped += 1
+            else:
+                keys.add(c.key)
+        if not keys:
+            return
+        fb = camera.fb_get()
+        if fb is None:
+            return
+        try:
+            jpgs = {key: self._encode(fb, key) for key in keys}
+        finally:
+            camera.fb_return()
+        self.frames += 1
+        if (1, self.quality) in jpgs:
+            self._snapshot = jpgs[(1, self.quality)]
+            self._snapshot_t = time.ticks_ms()
+        for c in self.clients:
+            jpg = jpgs.get(c.key) if c.stream and not c.parts else None
+            if jpg:
+                c.parts = [_PART_HEADER % len(jpg), jpg, _CRLF]
+                c.frames += 1
+
+    def _send(self, client) -> None:
+        while client.parts:
+            part = client.parts[0]
+            try:
+                n = client.sock.send(memoryview(part)[client.offset :])
+            except OSError as e:
+                if e.args[0] != errno.EAGAIN:
+                    self._close(client)
+                return
+            self.bytes_sent += n
+            client.offset += n
+            if client.offset < len(part):
+                return
+            client.parts.pop(0)
+            client.offset = 0
+        if client.close_when_sent:
+            self._close(client)
+
+    def poll(self) -> int:
+        """
+        Accept clients, read their requests, capture and send frames without
+        blocking on the network. Returns the ms until the next frame is due.
+        """
+        self._accept()
+        for c in self.clients[:]:
+            if c.request is not None:
+                self._read_request(c)
+        wait = time.ticks_diff(self._next, time.ticks_ms())
+        if wait <= 0:
+            self._next = time.ticks_add(time.ticks_ms(), self.interval_ms)
+            self._capture()
+            wait = self.interval_ms
+        for c in self.clients[:]:
+            if c.parts:
+                self._send(c)
+        return wait
+
+    def _task(self) -> None:
+        try:
+            while self._running:
+                time.sleep_ms(max(1, min(self.poll(), 10)))
+        finally:
+            self._done.release()
+
+    def start(self) -> None:
+        """Run poll() in a thread."""
+        if not self._running:
+            self._running = True
+            self._done.acquire()
+            _thread.start_new_thread(self._task, ())
+
+    def stop(self) -> None:
+        """Stop the poll thread, returns once it has exited."""
+        if self._running:
+            self._running = False
+            self._done.acquire()
+            self._done.release()
+
+    def stats(self) -> dict:
+        """
+        Returns frames/s and bytes/s since the previous call, the number of
+        connected clients and the frames each streaming client skipped
+        because it was still receiving the previous one.
+        """
+        frames, sent, start = self._window
+        now = time.ticks_ms()
+        dt = time.ticks_diff(now, start)
+        self._window = (self.frames, self.bytes_sent, now)
+        return {
+            "fps": (self.frames - frames) * 1000 / dt if dt > 0 else 0.0,
+            "bytes_per_s": (self.bytes_sent - sent) * 1000 // dt if dt > 0 else 0,
+            "clients": len(self.clients),
+            "dropped": [c.dropped for c in self.clients if c.stream],
+        }
+
+    def deinit(self) -> None:
+        self.stop()
+        for c in self.clients[:]:
+            self._close(c)
+        self._sock.close()
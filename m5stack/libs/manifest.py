@@ -20,3 +20,4 @@ include("utility/manifest.py")
 module("boot_option.py")
 module("label_plus.py")
 module("m5camera.py")
+module("m5camera_stream.py")
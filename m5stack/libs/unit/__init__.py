@@ -18,6 +18,9 @@ _attrs = {
     "CardKBUnit": "cardkb",
     "CANUnit": "can",
     "MiniCANUnit": "can",
+    "CANReceiver": "can",
+    "CANMessage": "can",
+    "CANSignal": "can",
     "KeyCode": "cardkb",
     "CatchUnit": "catch",
     "CATMGNSSUnit": "catm_gnss",
@@ -108,6 +111,7 @@ _attrs = {
     "TVOCUnit": "tvoc",
     "UltrasoundI2CUnit": "ultrasonic_i2c",
     "UltrasoundIOUnit": "ultrasonic_io",
+    "UltrasoundArray": "ultrasonic_io",
     "VibratorUnit": "vibrator",
     "UWBUnit": "uwb",
     "VoltmeterUnit": "vmeter",
@@ -3,10 +3,23 @@
 # SPDX-License-Identifier: MIT
 
 from m5can import CAN
+from machine import Timer
+from micropython import const
+import micropython
+import time
+
+# Frame records written by CAN.recv_into(): id u32, flags u8, dlc u8,
+# 2 bytes padding, 8 data bytes.
+FRAME_SIZE = const(16)
+FLAG_EXTFRAME = const(1)
+FLAG_RTR = const(2)
+
+# Handler keys of extended IDs, the 29 bit ID plus this bit stays a small int.
+_EXT_KEY = const(1 << 29)
 
 
 class CANUnit(CAN):
-    def __init__(self, port, mode, baudrate=125000):
+    def __init__(self, port, mode, baudrate=125000, rx_queue=5):
         timing_table = {
             25000: (128, 16, 8, 3, False),
             50000: (80, 15, 4, 3, False),
@@ -18,6 +31,7 @@ class CANUnit(CAN):
             1000000: (4, 15, 4, 3, False),
         }
         timing = timing_table.get(baudrate)
+        self.baudrate = baudrate
         super().__init__(
             0,
             mode,
@@ -28,7 +42,339 @@ class CANUnit(CAN):
             timing[1],  # bs1
             timing[2],  # bs2
             timing[4],  # triple_sampling
+            rx_queue=rx_queue,
         )
 
 
 MiniCANUnit = CANUnit
+
+
+def _dont_care(care, width) -> int:
+    # Number of ID bits a (id, care) filter does not compare.
+    free = ~care & ((1 << width) - 1)
+    n = 0
+    while free:
+        free &= free - 1
+        n += 1
+    return n
+
+
+def _merge(filters, width):
+    # One (id, care) filter accepting every filter of the list.
+    id_, care = filters[0]
+    for fid, fcare in filters[1:]:
+        care &= fcare & ~(id_ ^ fid)
+    return id_ & care, care & ((1 << width) - 1)
+
+
+def plan_filters(ids, extframe=False):
+    """
+    Returns the setfilter() mode and params accepting every ID of ``ids``,
+    each an ID or an (id, mask) tuple whose mask bits set to 1 must match.
+
+    The controller has one acceptance filter; standard IDs are split into
+    the two groups of dual filter mode that let the fewest other IDs through.
+    """
+    width = 29 if extframe else 11
+    full = (1 << width) - 1
+    filters = sorted((f, full) if isinstance(f, int) else (f[0], f[1]) for f in ids)
+    if extframe or len(filters) < 2:
+        return CAN.MASK32, _merge(filters, width)
+    best = None
+    for split in range(1, len(filters)):
+        a = _merge(filters[:split], width)
+        b = _merge(filters[split:], width)
+        cost = (1 << _dont_care(a[1], width)) + (1 << _dont_care(b[1], width))
+        if best is None or cost < best[0]:
+            best = (cost, a + b)
+    return CAN.MASK16, best[1]
+
+
+@micropython.native
+def _frame_bits(buf, start: int, n: int) -> int:
+    # Bits on the wire of n records, without stuff bits: 47 bits of framing
+    # for a standard frame, 67 for an extended one, plus the data.
+    bits = 0
+    o = start * FRAME_SIZE
+    for _ in range(n):
+        bits += (67 if buf[o + 4] & FLAG_EXTFRAME else 47) + (buf[o + 5] << 3)
+        o += FRAME_SIZE
+    return bits
+
+
+class CANReceiver:
+    """
+    Receive service for a busy bus.
+
+    Frames are drained from the controller in bulk into a preallocated ring
+    of ``depth`` records and dispatched from there, at most ``batch`` per
+    poll(), to the handler registered for their ID. Handlers are called as
+    handler(frame_id, data); data is a memoryview into the ring, only valid
+    during the call. When dispatch falls behind, the oldest frames are
+    dropped and counted in the ``overruns`` statistic.
+
+        can = CANUnit(port, CANUnit.NORMAL, baudrate=500000, rx_queue=64)
+        rx = CANReceiver(can)
+        rx.on(0x0C9, engine)
+        rx.on(0x1E5, steering)
+        rx.set_filters()     # accept only the IDs with a handler
+        rx.start()
+    """
+
+    def __init__(self, can, depth=128, batch=32, baudrate=None) -> None:
+        self.can = can
+        self.depth = depth
+        self.batch = batch
+        self.baudrate = baudrate or getattr(can, "baudrate", 125000)
+        self.buf = bytearray(depth * FRAME_SIZE)
+        self._mv = memoryview(self.buf)
+        self._head = 0
+        self._count = 0
+        self._handlers = {}
+        self._default = None
+        self._stats = [0] * 6
+        self._tim = None
+        self.frames = 0
+        self.overruns = 0
+        self._bits = 0
+        self._t0 = time.ticks_ms()
+
+    def on(self, frame_id, handler, extframe=False) -> None:
+        """Call handler(frame_id, data) for every frame with this ID, None removes it."""
+        key = frame_id | _EXT_KEY if extframe else frame_id
+        if handler is None:
+            self._handlers.pop(key, None)
+        else:
+            self._handlers[key] = handler
+
+    def on_default(self, handler) -> None:
+        """Call handler(frame_id, data) for frames of IDs without a handler."""
+        self._default = handler
+
+    def on_message(self, message, callback) -> None:
+        """Decode frames of a CANMessage and call callback(message, values)."""
+        self.on(
+            message.frame_id,
+            lambda _, data: callback(message, message.decode(data)),
+            message.extframe,
+        )
+
+    def set_filters(self, ids=None, extframe=False) -> None:
+        """
+        Program the hardware acceptance filter for ``ids``, by default the
+        IDs with a handler. The filter may let a few other IDs through.
+        """
+        if ids is None:
+            ext = _EXT_KEY if extframe else 0
+            ids = [k & ~_EXT_KEY for k in self._handlers if (k & _EXT_KEY) == ext]
+        if not ids:
+            self.can.clearfilter(0, extframe)
+            return
+        mode, params = plan_filters(ids, extframe)
+        self.can.setfilter(0, mode, 0, params, extframe=extframe)
+
+    def clear_filters(self) -> None:
+        self.can.clearfilter(0)
+
+    def _drain(self) -> None:
+        depth = self.depth
+        while True:
+            if self._count == depth:
+                if not self.can.any(0):
+                    return
+                # Ring full: make room by dropping the oldest batch.
+                drop = min(self.batch, depth)
+                self._head = (self._head + drop) % depth
+                self._count -= drop
+                self.overruns += drop
+            tail = (self._head + self._count) % depth
+            room = min(depth - self._count, depth - tail)
+            n = self.can.recv_into(self._mv[tail * FRAME_SIZE : (tail + room) * FRAME_SIZE])
+            self._bits += _frame_bits(self.buf, tail, n)
+            self._count += n
+            if n < room:
+                return
+
+    def _dispatch(self, limit) -> int:
+        buf = self.buf
+        mv = self._mv
+        handlers = self._handlers
+        default = self._default
+        head = self._head
+        n = min(self._count, limit)
+        for _ in range(n):
+            o = head * FRAME_SIZE
+            fid = buf[o] | (buf[o + 1] << 8) | (buf[o + 2] << 16) | (buf[o + 3] << 24)
+            key = fid | _EXT_KEY if buf[o + 4] & FLAG_EXTFRAME else fid
+            handler = handlers.get(key, default)
+            if handler is not None:
+                handler(fid, mv[o + 8 : o + 8 + buf[o + 5]])
+            head += 1
+            if head == self.depth:
+                head = 0
+        self._head = head
+        self._count -= n
+        self.frames += n
+        return n
+
+    def poll(self) -> int:
+        """Drain the controller and dispatch one batch, returns the frames still queued."""
+        self._drain()
+        self._dispatch(self.batch)
+        return self._count
+
+    def flush(self) -> None:
+        """Dispatch every queued frame."""
+        self._drain()
+        while self._dispatch(self.depth):
+            self._drain()
+
+    def start(self, period_ms=5) -> None:
+        """Poll from a soft timer every period_ms."""
+        self.stop()
+        self._tim = Timer(-1)
+        self._tim.init(period=period_ms, mode=Timer.PERIODIC, callback=lambda _: self.poll())
+
+    def stop(self) -> None:
+        if self._tim is not None:
+            self._tim.deinit()
+            self._tim = None
+
+    def stats(self) -> dict:
+        """
+        Returns the receive statistics. bus_load is the share of the bus
+        time taken by accepted frames since the previous call, stuff bits
+        excluded; missed counts frames the controller dropped because its
+        queue was full, overruns the frames dropped from the ring.
+        """
+        s = self.can.stats(self._stats)
+        now = time.ticks_ms()
+        dt = time.ticks_diff(now, self._t0)
+        load = self._bits * 1000 / (self.baudrate * dt) if dt > 0 else 0.0
+        self._bits = 0
+        self._t0 = now
+        return {
+            "frames": self.frames,
+            "queued": self._count,
+            "overruns": self.overruns,
+            "missed": s[2],
+            "tec": s[0],
+            "rec": s[1],
+            "bus_errors": s[3],
+            "arb_lost": s[4],
+            "bus_load": load,
+        }
+
+    def deinit(self) -> None:
+        self.stop()
+        self.clear_filters()
+
+
+class CANSignal:
+    """
+    A signal of a CAN message, as in a DBC file: ``start`` bit and
+    ``length``, Intel (little endian) or Motorola (big endian, ``start`` is
+    the most significant bit) byte order, value = raw * scale + offset.
+    The shift and mask are computed once here.
+    """
+
+    def __init__(
+        self, name, start, length, little_endian=True, signed=False, scale=1, offset=0, unit=""
+    ) -> None:
+        self.name = name
+        self.unit = unit
+        self.little_endian = little_endian
+        self.scale = scale
+        self.offset = offset
+        if little_endian:
+            self._shift = start
+        else:
+            # Position of the MSB counted from the first bit on the wire.
+            msb = (start & ~7) + 7 - (start & 7)
+            self._shift = 64 - msb - length
+        self._mask = (1 << length) - 1
+        self._sign = 1 << (length - 1) if signed else 0
+        self._raw = scale == 1 and offset == 0
+
+    def extract(self, le, be):
+        """Returns the value from the payload read as 64 bit little and big endian ints."""
+        raw = ((le if self.little_endian else be) >> self._shift) & self._mask
+        if raw & self._sign:
+            raw -= self._mask + 1
+        return raw if self._raw else raw * self.scale + self.offset
+
+
+class CANMessage:
+    def __init__(self, frame_id, signals, name="", extframe=False) -> None:
+        self.frame_id = frame_id
+        self.name = name
+        self.extframe = extframe
+        self.signals = signals
+        self.names = [s.name for s in signals]
+        self._le = any(s.little_endian for s in signals)
+        self._be = any(not s.little_endian for s in signals)
+
+    def decode(self, data) -> list:
+        """Returns the signal values in the order of signals."""
+        le = int.from_bytes(data, "little") if self._le else 0
+        be = int.from_bytes(data, "big") << (64 - 8 * len(data)) if self._be else 0
+        return [s.extract(le, be) for s in self.signals]
+
+    def decode_dict(self, data) -> dict:
+        return dict(zip(self.names, self.decode(data)))
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _parse_signal(line):
+    # SG_ name [M|mN] : start|length@order+ (scale,offset) [min|max] "unit" receivers
+    # Returns None for the multiplexor and multiplexed signals.
+    head, _, spec = line.partition(":")
+    head = head.split()
+    if len(head) > 2:
+        return None
+    name = head[1]
+    layout, factors, _, unit = spec.split(None, 3)
+    pos, order = layout.split("@")
+    start, length = pos.split("|")
+    scale, offset = factors.strip("()").split(",")
+    return CANSignal(
+        name,
+        int(start),
+        int(length),
+        order[0] == "1",
+        order[1] == "-",
+        _number(scale),
+        _number(offset),
+        unit.split('"')[1] if '"' in unit else "",
+    )
+
+
+def load_dbc(path) -> dict:
+    """
+    Read the messages and signals of a DBC file, returns {frame_id: CANMessage}.
+    Multiplexed signals, value tables and attributes are ignored.
+    """
+    found = {}
+    signals = None
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("BO_ "):
+                parts = line.split()
+                signals = []
+                found[int(parts[1])] = (parts[2].rstrip(":"), signals)
+            elif line.startswith("SG_ ") and signals is not None:
+                signal = _parse_signal(line)
+                if signal is not None:
+                    signals.append(signal)
+    messages = {}
+    for raw_id, (name, sigs) in found.items():
+        frame_id = raw_id & 0x1FFFFFFF
+        messages[frame_id] = CANMessage(frame_id, sigs, name, bool(raw_id & 0x80000000))
+    return messages
@@ -47,6 +47,7 @@ class CO2Unit:
         self.co2 = 0
         self.temperature = 0
         self.humidity = 0
+        self._periodic = False
 
     def available(self) -> None:
         """! Is there available or Not? Check."""
@@ -58,6 +59,7 @@ class CO2Unit:
         try:
             self.write_cmd(STARTPERIODICMEASUREMENT)
             time.sleep_ms(1)
+            self._periodic = True
         except:
             raise OSError(
                 "Indicates that the block cannot be executed while a periodic measurement is running"
@@ -66,6 +68,7 @@ class CO2Unit:
     def set_stop_periodic_measurement(self) -> None:
         """! stop measurement mode."""
         self.write_cmd(STOPPERIODICMEASUREMENT)
+        self._periodic = False
         time.sleep(0.5)
 
     def get_sensor_measurement(self) -> None:
@@ -74,7 +77,7 @@ class CO2Unit:
         time.sleep_ms(1)
         buf = self.read_response(9)
         self.co2 = (buf[0] << 8) | buf[1]
-        temp = (buf[3] << 8) | buf[1]
+        temp = (buf[3] << 8) | buf[4]
         self.temperature = round((-45 + 175 * (temp / (2**16 - 1))), 2)
         humi = (buf[6] << 8) | buf[7]
         self.humidity = round((100 * (humi / (2**16 - 1))), 2)
@@ -87,6 +90,20 @@ class CO2Unit:
         else:
             return False
 
+    def trigger_measure(self) -> int:
+        """! start periodic measurement if needed, return ms until the next sample."""
+        if not self._periodic:
+            self.set_start_periodic_measurement()
+            return 5000
+        return 0
+
+    def fetch_measure(self):
+        """! read (co2, temperature, humidity), None if no new sample is ready yet."""
+        if not self.data_isready():
+            return None
+        self.get_sensor_measurement()
+        return (self.co2, self.temperature, self.humidity)
+
     def get_temperature_offset(self) -> float:
         """! get the temperature offset to be added to the reported measurements."""
         try:
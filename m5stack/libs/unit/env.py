@@ -45,6 +45,17 @@ class ENVUnit:
         else:
             raise UnitError("Unknown ENVUnit type")
 
+    def trigger_measure(self) -> int:
+        """
+        Start a temperature and humidity measurement (ENV II/III/IV), returns
+        the ms after which fetch_measure() can read it, see utility.SensorHub.
+        """
+        return self._temp_humid.trigger_measure()
+
+    def fetch_measure(self):
+        """Read the measurement started by trigger_measure(), (T, RH) or None"""
+        return self._temp_humid.fetch_measure()
+
     def read_temperature(self) -> float:
         return round(self._temp_humid.measure()[0], 2)
 
@@ -84,15 +84,12 @@ class IDUnit:
             return bool(not self.atecc.verify_sign(message, sign, key)[0])
 
     def get_sha256_hash(self, message: str = None, format: int = 0) -> str:
-        # Initialize the SHA256 calculation engine
-        self.atecc.sha_start()
-        # Append bytes to the SHA digest
-        self.atecc.sha_update(message.encode())
-        # Return the digest of the data passed to sha_update
+        # Hash the message in 64 byte blocks, in one wake cycle
+        digest = self.atecc.sha256(message.encode())
         return (
-            binascii.b2a_base64(self.atecc.sha_digest()).decode()[:-1]
+            binascii.b2a_base64(digest).decode()[:-1]
             if format
-            else binascii.hexlify(self.atecc.sha_digest()).decode()
+            else binascii.hexlify(digest).decode()
         )
 
     def set_certificate_signing_request(
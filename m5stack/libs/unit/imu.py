@@ -9,6 +9,7 @@ from machine import I2C
 from .pahub import PAHUBUnit
 from .unit_helper import UnitError
 from driver.mpu6886 import MPU6886
+from driver.imu_fusion import FusionMixin
 import math
 import time
 
@@ -24,7 +25,7 @@ ACC_ODR = {2: 0x00, 4: 0x08, 8: 0x10, 16: 0x18}
 GYRO_ODR = {250: 0x00, 500: 0x08, 1000: 0x10, 2000: 0x18}
 
 
-class IMUUnit(MPU6886):
+class IMUUnit(FusionMixin, MPU6886):
     def __init__(self, i2c: I2C | PAHUBUnit, address: int | list | tuple = MPU6886_ADDR) -> None:
         #! Initializes Gyro, Accelerometer using default values.
         self._i2c = i2c
@@ -46,6 +47,7 @@ class IMUUnit(MPU6886):
         self.gyroYoffset = 0
         self.gyroZoffset = 0
         self.preInterval = time.ticks_us()
+        self._fusion = None
 
     def set_accel_range(self, accel_scale) -> None:
         # Set accelerometer scale and range.
@@ -86,6 +88,10 @@ class IMUUnit(MPU6886):
 
     def get_attitude(self) -> tuple:
         # !Attitude angles as yaw, pitch, and roll in degrees.
+        if self._fusion is not None:
+            yaw, pitch, roll = self.get_euler()
+            return (round(yaw, 3), round(roll, 3), round(pitch, 3))
+
         (
             accX,  # noqa: N806
             accY,  # noqa: N806
@@ -103,8 +109,9 @@ class IMUUnit(MPU6886):
         gyroZ -= self.gyroZoffset  # noqa: N806
 
         # Calculate the time elapsed since the last measurement
-        interval = (time.ticks_us() - self.preInterval) / 1000000
-        self.preInterval = time.ticks_us()
+        now = time.ticks_us()
+        interval = time.ticks_diff(now, self.preInterval) / 1000000
+        self.preInterval = now
 
         # Compute the change in angles from the gyro data
         self.angleGyroX += gyroX * interval
@@ -9,6 +9,7 @@ from machine import I2C
 from .pahub import PAHUBUnit
 from .unit_helper import UnitError
 from driver.bmi270_bmm150 import BMI270_BMM150
+from driver.imu_fusion import FusionMixin
 from driver.bmp280 import BMP280
 import math
 import time
@@ -22,7 +23,7 @@ SF_DEG_S = 1
 SF_RAD_S = 57.295779513082  # Radian to degree conversion factor, 1 rad/s = 57.295779578552 deg/s
 
 
-class IMUProUnit(BMI270_BMM150, BMP280):
+class IMUProUnit(FusionMixin, BMI270_BMM150, BMP280):
     def __init__(
         self,
         i2c: I2C | PAHUBUnit,
@@ -49,6 +50,7 @@ class IMUProUnit(BMI270_BMM150, BMP280):
         self.gyroYoffset = 0
         self.gyroZoffset = 0
         self.preInterval = time.ticks_us()
+        self._fusion = None
 
     def set_accel_gyro_odr(self, accel_odr, gyro_odr) -> None:
         # acc_filter_perf | acc_bwp normal mode | ODR
@@ -97,6 +99,10 @@ class IMUProUnit(BMI270_BMM150, BMP280):
 
     def get_attitude(self) -> tuple:
         # !Attitude angles as yaw, pitch, and roll in degrees.
+        if self._fusion is not None:
+            yaw, pitch, roll = self.get_euler()
+            return (round(yaw, 3), round(roll, 3), round(pitch, 3))
+
         (
             accX,  # noqa: N806
             accY,  # noqa: N806
@@ -114,8 +120,9 @@ class IMUProUnit(BMI270_BMM150, BMP280):
         gyroZ -= self.gyroZoffset  # noqa: N806
 
         # Calculate the time elapsed since the last measurement
-        interval = (time.ticks_us() - self.preInterval) / 1000000
-        self.preInterval = time.ticks_us()
+        now = time.ticks_us()
+        interval = time.ticks_diff(now, self.preInterval) / 1000000
+        self.preInterval = now
 
         # Compute the change in angles from the gyro data
         self.angleGyroX += gyroX * interval
@@ -2,7 +2,8 @@
 #
 # SPDX-License-Identifier: MIT
 
-from machine import UART
+from machine import UART, Pin
+from driver.lora_e220 import E220Link
 import time
 import struct
 import _thread
@@ -74,8 +75,11 @@ class LoRaE220433Unit:
     WOR_3500MS = 0b110
     WOR_4000MS = 0b111
 
-    def __init__(self, id=1, port=None) -> None:
-        #! Initial the LoRa E220-433 Mhz Unit.
+    #! Nominal air data rate in bit/s of the AIRRATE values
+    _AIR_BPS = {2: 2400, 3: 4800, 4: 9600, 5: 19200, 6: 38400, 7: 62500}
+
+    def __init__(self, id=1, port=None, aux=None) -> None:
+        #! Initial the LoRa E220-433 Mhz Unit, aux is the optional AUX pin.
         self._uart = UART(
             id, tx=port[1], rx=port[0], baudrate=9600, bits=8, parity=None, stop=1, rxbuf=1024
         )
@@ -87,6 +91,9 @@ class LoRaE220433Unit:
         self._TXD_BUFFER = bytearray(self.max_len)
         self._RXD_BUFFER = bytearray(self.max_len)
         self.rssi_byte_flag = self.RSSI_BYTE_DISABLE
+        self.own_address = 0
+        self.air_data_rate = self.AIRRATE_2_4K
+        self._aux = None if aux is None else Pin(aux, Pin.IN)
 
     def setup(
         self,
@@ -112,6 +119,9 @@ class LoRaE220433Unit:
             (rssi_byte_flag << 7) | (transmission_method_type << 6) | (lbt_flag << 4) | wor_cycle
         )
         self.rssi_byte_flag = rssi_byte_flag
+        self.own_address = own_address
+        self.air_data_rate = air_data_rate
+        self.max_len = (200, 128, 64, 32)[subpacket_size]
         return self.write_command_format(own_address, REG2, REG3, REG4, REG5, encryption_key)
 
     def write_command_format(self, address, reg2, reg3, reg4, reg5, crypt=0x0000) -> None:
@@ -124,10 +134,7 @@ class LoRaE220433Unit:
         command.append(reg5)
         command.extend([crypt >> 8, crypt & 0xFF])
         self._uart.write(bytes(command))
-        time.sleep_ms(100)  #! wait for response
-        response = []
-        if self._uart.any():
-            response = self._uart.read()
+        response = self._wait_response(len(command))
 
         if len(response) != len(command):
             print(
@@ -136,14 +143,21 @@ class LoRaE220433Unit:
             return False
         return True
 
+    def _wait_response(self, length, timeout_ms=200) -> bytes:
+        #! wait until the module answered length bytes, or AUX reports it done.
+        start = time.ticks_ms()
+        while time.ticks_diff(time.ticks_ms(), start) < timeout_ms:
+            n = self._uart.any()
+            if n >= length or (n and self._aux is not None and self._aux.value()):
+                break
+            time.sleep_ms(1)
+        return self._uart.read() or b""
+
     def read_command_format(self) -> list:
         #! read control command registers.
         command = [0xC1, 0x00, 0x08]
         self._uart.write(bytes(command))
-        time.sleep_ms(100)  #! wait for response
-        response = []
-        if self._uart.any():
-            response = self._uart.read()
+        response = self._wait_response(len(command) + 8)
 
         if len(response) != (len(command) + 8):
             print(
@@ -252,3 +266,20 @@ class LoRaE220433Unit:
         self._uart.write(frame)
 
         return True
+
+    def time_on_air_ms(self, length) -> float:
+        #! estimated time on air of a packet of length bytes at the configured air data rate.
+        return (length + 8) * 8000 / self._AIR_BPS[self.air_data_rate]
+
+    def link(self, region=None, **kwargs) -> E220Link:
+        #! framed packet link with CRC, RX buffer pool and duty cycle scheduler, see driver.lora_e220.
+        return E220Link(
+            self._uart,
+            self.time_on_air_ms,
+            max_len=self.max_len,
+            rssi=self.rssi_byte_flag == self.RSSI_BYTE_ENABLE,
+            address=self.own_address,
+            aux=self._aux,
+            region=region,
+            **kwargs,
+        )
@@ -4,6 +4,7 @@
 
 # UART: ['any', 'read', 'readinto', 'readline', 'write', 'INV_CTS', 'INV_RTS', 'INV_RX', 'INV_TX', 'deinit', 'init', 'sendbreak']
 import machine
+from driver.lora_e220 import E220Link, lora_time_on_air_ms
 import time
 import _thread
 import struct
@@ -76,7 +77,7 @@ class LoRaE220JPUnit:
     WOR_2500MS = 0b0000_0100
     WOR_3000MS = 0b0000_0101
 
-    def __init__(self, id=1, port=None, port_id=1) -> None:
+    def __init__(self, id=1, port=None, port_id=1, aux=None) -> None:
         # TODO: 2.0.6 移除 port_id 参数
         id = port_id
         self.uart = machine.UART(id, tx=port[1], rx=port[0])
@@ -87,6 +88,9 @@ class LoRaE220JPUnit:
         self._RXD_BUFFER = bytearray(200)
         self.max_len = 200
         self.rssi_byte_flag = self.RSSI_BYTE_DISABLE
+        self.own_address = 0
+        self.air_data_rate = self.BW125K_SF9
+        self._aux = None if aux is None else machine.Pin(aux, machine.Pin.IN)
 
     def _conf_range(self, target, min, max) -> bool:
         return min <= target <= max
@@ -117,6 +121,9 @@ class LoRaE220JPUnit:
         else:
             self.max_len = 200
 
+        self.own_address = own_address
+        self.air_data_rate = air_data_rate
+
         # Configuration
         struct.pack_into(">B", self._TXD_BUFFER, 0, 0xC0)
         struct.pack_into(">B", self._TXD_BUFFER, 1, 0x00)
@@ -151,11 +158,7 @@ class LoRaE220JPUnit:
         print("")
 
         self.uart.write(command)
-        time.sleep_ms(100)  # wait for response
-
-        response = []
-        if self.uart.any():
-            response = self.uart.read()
+        response = self._wait_response(len(command))
 
         if len(response) != len(command):
             print(
@@ -164,6 +167,16 @@ class LoRaE220JPUnit:
             return False
         return True
 
+    def _wait_response(self, length, timeout_ms=200) -> bytes:
+        # Wait until the module answered length bytes, or AUX reports it done.
+        start = time.ticks_ms()
+        while time.ticks_diff(time.ticks_ms(), start) < timeout_ms:
+            n = self.uart.any()
+            if n >= length or (n and self._aux is not None and self._aux.value()):
+                break
+            time.sleep_ms(1)
+        return self.uart.read() or b""
+
     def _recv_task(self) -> None:
         response = bytes()
         rssi = 0
@@ -235,6 +248,27 @@ class LoRaE220JPUnit:
 
         return True
 
+    def time_on_air_ms(self, length) -> float:
+        # Time on air of a packet of length bytes with the configured bandwidth
+        # and spreading factor.
+        bw = (125, 250, 500)[self.air_data_rate & 0x03]
+        sf = ((self.air_data_rate >> 2) & 0x07) + 5
+        return lora_time_on_air_ms(length, sf, bw)
+
+    def link(self, region="JP920", **kwargs) -> E220Link:
+        # Framed packet link with CRC, RX buffer pool and duty cycle scheduler,
+        # see driver.lora_e220.
+        return E220Link(
+            self.uart,
+            self.time_on_air_ms,
+            max_len=self.max_len,
+            rssi=self.rssi_byte_flag == self.RSSI_BYTE_ENABLE,
+            address=self.own_address,
+            aux=self._aux,
+            region=region,
+            **kwargs,
+        )
+
 
 if __name__ == "main":
     lora = LoRaE220JPUnit(id=1, port=(26, 36))
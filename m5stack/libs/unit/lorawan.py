@@ -22,8 +22,8 @@ class LoRaWANUnit(LoRaWAN_470):
         set core device uart id
         id_num: 1-2
         """
-        self.__uart = machine.UART(id_num, tx=self.tx, rx=self.rx)
-        self.__uart.init(115200, bits=0, parity=None, stop=1)
+        self._uart = machine.UART(id_num, tx=self.tx, rx=self.rx)
+        self._uart.init(115200, bits=0, parity=None, stop=1)
 
     def deinit(self):
         pass
@@ -21,12 +21,21 @@ class UltrasoundI2CUnit:
 
     def get_target_distance(self, mode=1):
         try:
-            self.i2c.writeto(self.i2c_addr, bytearray([0x01]))
-            time.sleep_ms(150)
-            data = self.i2c.readfrom(self.i2c_addr, 3)
-            self._distance = ((data[0] << 16) | (data[1] << 8) | data[2]) / 1000
+            time.sleep_ms(self.trigger_measure())
+            self.fetch_measure()
         except OSError:
             pass
         if mode == 2:
             self._distance = self._distance / 10
         return round(self._distance, 2)
+
+    def trigger_measure(self) -> int:
+        # start ranging, the result is ready after 150ms
+        self.i2c.writeto(self.i2c_addr, bytearray([0x01]))
+        return 150
+
+    def fetch_measure(self) -> float:
+        # distance in mm of the ranging started by trigger_measure()
+        data = self.i2c.readfrom(self.i2c_addr, 3)
+        self._distance = ((data[0] << 16) | (data[1] << 8) | data[2]) / 1000
+        return self._distance
@@ -6,11 +6,26 @@
 # pulse_time // 2 // 2.91 -> pulse_time // 5.82 -> pulse_time * 100 // 582
 # echo timeout -> max=4500mm, 4500 * 2.91us -> 0.0131 * 2 -> 0.0262 or 26.2ms
 # echo timeout -> 1000000us or 1s
+#
+# The echo pulse is timed by a pin interrupt on both edges, so a ping does
+# not block: trigger_measure() starts it and fetch_measure() returns the
+# distance once the falling edge arrived (None before, OSError after the
+# echo window without an echo). read_distance_async() and
+# UltrasoundArray.run_async() await the falling edge through a
+# ThreadSafeFlag the interrupt sets; the blocking calls time the echo with
+# machine.time_pulse_us(), which returns on the falling edge.
 
 import machine
 from machine import Pin
+from utility.ring import Ring
 import time
 
+# Longest echo of the 4.5m range plus margin.
+ECHO_WINDOW_MS = 30
+# Pause between pings of the same or a neighbouring sensor, so late
+# reflections of the previous ping are not taken as the echo.
+PING_INTERVAL_MS = 50
+
 
 class ULTRASONIC_IOUnit:
     def __init__(self, port, echo_timeout_us=1000000):
@@ -20,34 +35,229 @@ class ULTRASONIC_IOUnit:
         self.trigger.value(0)
         # echo pin (in)
         self.echo = Pin(port[0], mode=Pin.IN, pull=None)
+        self._rise = 0
+        self._fall = 0
+        self._state = 0  # 0 idle, 1 waiting for rise, 2 waiting for fall, 3 done
+        self._ping = time.ticks_ms() - PING_INTERVAL_MS
+        self._flag = None
+        self.set_temperature(20)
+        trigger = Pin.IRQ_RISING | Pin.IRQ_FALLING
+        try:
+            self.echo.irq(handler=self._on_edge, trigger=trigger, hard=True)
+        except TypeError:
+            self.echo.irq(handler=self._on_edge, trigger=trigger)
+
+    def _on_edge(self, pin):
+        t = time.ticks_us()
+        if self._state == 1 and pin.value():
+            self._rise = t
+            self._state = 2
+        elif self._state == 2 and not pin.value():
+            self._fall = t
+            self._state = 3
+            if self._flag is not None:
+                self._flag.set()
+
+    def set_temperature(self, celsius):
+        """
+        Compensate the speed of sound for the air temperature in Celsius.
+        """
+        # 331.3 m/s at 0 C, +0.606 m/s per degree; halved for the round trip.
+        self._mm_per_us = (331.3 + 0.606 * celsius) / 2000
+
+    def _interval(self) -> int:
+        # ms until this sensor may ping again.
+        return max(0, PING_INTERVAL_MS - time.ticks_diff(time.ticks_ms(), self._ping))
 
     def tx_pulse_rx_echo(self):
-        self.trigger.value(0)
-        time.sleep_us(5)
-        # Send a 10us pulse.
-        self.trigger.value(1)
-        time.sleep_us(10)
-        self.trigger.value(0)
+        """
+        Ping and wait for the echo, returns its width in us or None.
+        """
+        wait = self._interval()
+        if wait > 0:
+            time.sleep_ms(wait)
+        self.trigger_measure()
+        self._state = 0
+        # Negative when no echo started or ended within the window.
+        width = machine.time_pulse_us(
+            self.echo, 1, min(self.echo_timeout_us, ECHO_WINDOW_MS * 1000)
+        )
+        return width if width >= 0 else None
+
+    async def echo_async(self):
+        """
+        Ping and await the echo, returns its width in us or None. Other tasks
+        run until the interrupt reports the falling edge.
+        """
+        import asyncio
+
+        if self._flag is None:
+            self._flag = asyncio.ThreadSafeFlag()
+        wait = self._interval()
+        if wait > 0:
+            await asyncio.sleep_ms(wait)
+        self.trigger_measure()
         try:
-            echo_time = machine.time_pulse_us(self.echo, 1, self.echo_timeout_us)
-            return echo_time
-        except:
-            pass
+            # A set() left over from an earlier ping wakes the loop early.
+            while self._state != 3:
+                await asyncio.wait_for_ms(self._flag.wait(), ECHO_WINDOW_MS)
+        except asyncio.TimeoutError:
+            self._state = 0
+            return None
+        self._state = 0
+        return time.ticks_diff(self._fall, self._rise)
 
-    def get_target_distance(self, mode=1):
+    async def read_distance_async(self, mode=1):
         """
-        Get the distance in milimeters or centimeters.
+        get_target_distance() awaiting the echo instead of blocking.
         """
-        echo_time = self.tx_pulse_rx_echo()
-        time.sleep_ms(50)
+        echo_time = await self.echo_async()
+        if echo_time is None:
+            return None
+        return self._distance(echo_time, mode)
+
+    def _distance(self, echo_time, mode):
+        mm = int(echo_time * self._mm_per_us)
         if mode == 1:
-            mm = echo_time * 100 // 582
             return mm
         elif mode == 2:
-            cm = (echo_time * 100 // 582) / 10
-            return cm
+            return mm / 10
+
+    def get_target_distance(self, mode=1):
+        """
+        Get the distance in milimeters or centimeters, None without an echo.
+        """
+        echo_time = self.tx_pulse_rx_echo()
+        if echo_time is None:
+            return None
+        return self._distance(echo_time, mode)
+
+    def trigger_measure(self):
+        """
+        Send a ping, returns the ms after which fetch_measure() has the echo.
+        """
+        self._state = 1
+        self.trigger.value(1)
+        time.sleep_us(10)
+        self.trigger.value(0)
+        self._ping = time.ticks_ms()
+        return ECHO_WINDOW_MS
+
+    def fetch_measure(self, mode=1):
+        """
+        Distance of the last trigger_measure() in the units and rounding of
+        get_target_distance(), None while the echo is still expected.
+        """
+        if self._state == 3:
+            self._state = 0
+            return self._distance(time.ticks_diff(self._fall, self._rise), mode)
+        if time.ticks_diff(time.ticks_ms(), self._ping) <= ECHO_WINDOW_MS:
+            return None
+        self._state = 0
+        raise OSError("echo timeout")
+
+    def deinit(self):
+        self.echo.irq(handler=None)
 
 
 class UltrasoundIOUnit(ULTRASONIC_IOUnit):
     def __init__(self, port, echo_timeout_us=1000000):
         super().__init__(port, echo_timeout_us)
+
+
+class UltrasoundArray:
+    """
+    Round-robin ranging for several ultrasonic units.
+
+    Only one sensor pings at a time, the next one after PING_INTERVAL_MS, so
+    they do not hear each other's echoes. Each sensor reports the median of
+    its last ``samples`` echoes (missed echoes are skipped), which rejects
+    single outliers, into its own Ring of (ticks_ms, mm).
+
+        array = UltrasoundArray([UltrasoundIOUnit(p) for p in ports])
+        while True:
+            time.sleep_ms(array.poll())
+            print(array.distances())
+
+    or, without polling, asyncio.create_task(array.run_async()).
+    """
+
+    def __init__(self, sensors, samples=3, depth=16, callback=None) -> None:
+        self.sensors = sensors
+        self.samples = samples
+        self.callback = callback
+        self.rings = [Ring(depth) for _ in sensors]
+        self.misses = [0] * len(sensors)
+        self._window = [[] for _ in sensors]
+        self._current = 0
+        self._pinged = False
+        self._next = time.ticks_ms()
+        self._running = False
+
+    def set_temperature(self, celsius) -> None:
+        for s in self.sensors:
+            s.set_temperature(celsius)
+
+    def _store(self, i, mm) -> None:
+        w = self._window[i]
+        w.append(mm)
+        if len(w) > self.samples:
+            w.pop(0)
+        median = sorted(w)[len(w) // 2]
+        now = time.ticks_ms()
+        self.rings[i].append(now, median)
+        if self.callback is not None:
+            self.callback(i, now, median)
+
+    def poll(self) -> int:
+        """Advance the round-robin without blocking, return ms until the next step."""
+        now = time.ticks_ms()
+        i = self._current
+        if self._pinged:
+            try:
+                mm = self.sensors[i].fetch_measure()
+            except OSError:
+                mm = -1
+                self.misses[i] += 1
+            if mm is None:
+                return 1
+            if mm >= 0:
+                self._store(i, mm)
+            self._pinged = False
+            self._current = (i + 1) % len(self.sensors)
+        wait = time.ticks_diff(self._next, now)
+        if wait > 0:
+            return wait
+        self.sensors[self._current].trigger_measure()
+        self._pinged = True
+        self._next = time.ticks_add(now, PING_INTERVAL_MS)
+        return 1
+
+    async def run_async(self) -> None:
+        """Ping the sensors in turn forever, awaiting each echo."""
+        import asyncio
+
+        self._running = True
+        while self._running:
+            i = self._current
+            start = time.ticks_ms()
+            echo = await self.sensors[i].echo_async()
+            if echo is None:
+                self.misses[i] += 1
+            else:
+                self._store(i, self.sensors[i]._distance(echo, 1))
+            self._current = (i + 1) % len(self.sensors)
+            wait = PING_INTERVAL_MS - time.ticks_diff(time.ticks_ms(), start)
+            if wait > 0:
+                await asyncio.sleep_ms(wait)
+
+    def stop(self) -> None:
+        self._running = False
+
+    def distance(self, index):
+        """Returns the latest median distance in mm of sensor index, or None."""
+        s = self.rings[index].latest()
+        return None if s is None else s[1]
+
+    def distances(self) -> list:
+        return [self.distance(i) for i in range(len(self.sensors))]
@@ -3,8 +3,7 @@
 # SPDX-License-Identifier: MIT
 
 
-from driver.drf1609h import DRF1609H
-from driver.soft_timer import SoftTimer
+from driver.drf1609h import DRF1609H, DRF1609HLink
 from machine import UART
 import sys
 
@@ -32,9 +31,26 @@ class ZigbeeUnit(DRF1609H):
     def __init__(self, id: Literal[0, 1, 2], port: list | tuple, verbose: bool = True) -> None:
         uart1 = UART(id, 38400, tx=port[1], rx=port[0])
         super().__init__(uart1, verbose=verbose)
-        self._timer = SoftTimer()
+        self._link = None
         self._receive_callback = None
 
+    def _write_param(self, parameter, router=None) -> bool:
+        # Write the changed fields and restart the module, the previous
+        # values are restored if the module rejects them.
+        saved = [(self.parameter, k, getattr(self.parameter, k)) for k in parameter]
+        for k, v in parameter.items():
+            setattr(self.parameter, k, v)
+        if router:
+            saved += [(self.router, k, getattr(self.router, k)) for k in router]
+            for k, v in router.items():
+                setattr(self.router, k, v)
+        if self.write_module_param_command():
+            self.restart_command()
+            return True
+        for obj, k, v in saved:
+            setattr(obj, k, v)
+        return False
+
     def set_module_param(
         self,
         device_type,
@@ -50,84 +66,43 @@ class ZigbeeUnit(DRF1609H):
         node_transfer_mode=TRANSFER_MODE_PASS_THROUGH,
         node_custom_address=0x0066,
     ):
-        parameter = self.parameter.deepcopy()
-        router = self.router.deepcopy()
-        self.parameter.device_type = device_type
-        self.parameter.pan_id = pan_id
-        self.parameter.channel = channel
-        self.parameter.transfer_mode = transfer_mode
-        self.parameter.custom_address = custom_address
-        self.parameter.ant_type = ant_type
-        self.parameter.encryption_enable = encryption_enable
-        self.parameter.password = encryption_key
-        self.router.device_type = node_type
-        self.router.ant_type = node_ant_type
-        self.router.transfer_mode = node_transfer_mode
-        self.router.custom_address = node_custom_address
-        if self.write_module_param_command():
-            self.restart_command()
-        else:
-            self.parameter.device_type = parameter.device_type
-            self.parameter.device_type = parameter.pan_id
-            self.parameter.channel = parameter.channel
-            self.parameter.transfer_mode = parameter.transfer_mode
-            self.parameter.custom_address = parameter.custom_address
-            self.parameter.ant_type = parameter.ant_type
-            self.parameter.encryption_enable = parameter.encryption_enable
-            self.parameter.password = parameter.password
-            self.router.device_type = router.device_type
-            self.router.ant_type = router.ant_type
-            self.router.transfer_mode = router.transfer_mode
-            self.router.custom_address = router.custom_address
-        del parameter, router
+        self._write_param(
+            {
+                "device_type": device_type,
+                "pan_id": pan_id,
+                "channel": channel,
+                "transfer_mode": transfer_mode,
+                "custom_address": custom_address,
+                "ant_type": ant_type,
+                "encryption_enable": encryption_enable,
+                "password": encryption_key,
+            },
+            {
+                "device_type": node_type,
+                "ant_type": node_ant_type,
+                "transfer_mode": node_transfer_mode,
+                "custom_address": node_custom_address,
+            },
+        )
 
     def set_device_type(self, device_type):
-        t = self.parameter.device_type
-        self.parameter.device_type = device_type
-        if self.write_module_param_command():
-            self.restart_command()
-        else:
-            self.parameter.device_type = t
+        self._write_param({"device_type": device_type})
 
     def set_pan_id(self, pan_id):
-        t = self.parameter.pan_id
-        self.parameter.pan_id = pan_id
-        if self.write_module_param_command():
-            self.restart_command()
-        else:
-            self.parameter.pan_id = t
+        self._write_param({"pan_id": pan_id})
 
     def set_channel(self, channel):
-        t = self.parameter.channel
-        self.parameter.channel = channel
-        if self.write_module_param_command():
-            self.restart_command()
-        else:
-            self.parameter.channel = t
+        self._write_param({"channel": channel})
 
     def set_transfer_mode(self, transfer_mode):
-        t = self.parameter.transfer_mode
-        self.parameter.transfer_mode = transfer_mode
-        if self.write_module_param_command():
-            self.restart_command()
-        else:
-            self.parameter.transfer_mode = t
+        if self._write_param({"transfer_mode": transfer_mode}) and self._link is not None:
+            self._link.framed = transfer_mode == self.TRANSFER_MODE_P2P
 
     def set_custom_address(self, address):
-        t = self.parameter.custom_address
-        self.parameter.custom_address = address
-        if self.write_module_param_command():
-            self.restart_command()
-        else:
-            self.parameter.custom_address = t
+        self._write_param({"custom_address": address})
 
     def set_ant_type(self, ant_type):
-        t = self.parameter.ant_type
-        self.parameter.ant_type = ant_type
-        if self.write_module_param_command():
-            self.restart_command()
-        else:
-            self.parameter.ant_type = t
+        self._write_param({"ant_type": ant_type})
 
     def get_short_address(self):
         self.read_module_param_command()
@@ -141,13 +116,29 @@ class ZigbeeUnit(DRF1609H):
         self.read_module_param_command()
         return True if self.router.short_address != 0xFFFE else False
 
+    def link(self, pool=16, queue=8, max_len=80, pace_ms=20) -> DRF1609HLink:
+        """
+        Returns the frame link of this unit, framed in P2P transfer mode and
+        raw in the pass-through modes.
+        """
+        if self._link is None:
+            framed = self.parameter.transfer_mode == self.TRANSFER_MODE_P2P
+            self._link = DRF1609HLink(self._uart, pool, queue, max_len, pace_ms, framed)
+        return self._link
+
     def receive_none_block(self, receive_callback):
         self._receive_callback = receive_callback
-        self._timer.init(period=1000, mode=SoftTimer.PERIODIC, callback=self.receive_task)
+        link = self.link()
+        link.on_default(self._on_frame)
+        link.start()
+
+    def _on_frame(self, src, data, dest):
+        self._receive_callback(dest, src, bytes(data))
 
     def receive_task(self):
         msg = self.receive()
         msg and self._receive_callback(msg[0], msg[2], msg[1])
 
     def stop_receive(self):
-        self._timer.deinit()
+        if self._link is not None:
+            self._link.stop()
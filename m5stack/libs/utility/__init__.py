@@ -2,3 +2,18 @@
 #
 # SPDX-License-Identifier: MIT
 from .exception_helper import print_error_msg
+
+# Loaded on first use, so print_error_msg does not pull in asyncio.
+_attrs = {
+    "Ring": "ring",
+    "SensorHub": "sensor_hub",
+}
+
+
+def __getattr__(attr):
+    mod = _attrs.get(attr, None)
+    if mod is None:
+        raise AttributeError(attr)
+    value = getattr(__import__("utility." + mod, None, None, (attr,)), attr)
+    globals()[attr] = value
+    return value
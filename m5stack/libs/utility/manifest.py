@@ -7,6 +7,8 @@ package(
     (
         "__init__.py",
         "exception_helper.py",
+        "ring.py",
+        "sensor_hub.py",
     ),
     base_path="..",
     opt=0,
@@ -0,0 +1,47 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+
+# Sample history shared by utility.SensorHub and the sensor arrays of units,
+# kept apart so they do not import the hub and asyncio.
+
+
+class Ring:
+    """Fixed size ring buffer of (ticks_ms, value) samples."""
+
+    def __init__(self, depth) -> None:
+        self.times = [0] * depth
+        self.values = [None] * depth
+        self._depth = depth
+        self._head = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, t, value) -> None:
+        self.times[self._head] = t
+        self.values[self._head] = value
+        self._head = (self._head + 1) % self._depth
+        if self._count < self._depth:
+            self._count += 1
+
+    def latest(self):
+        """Returns the newest (ticks_ms, value) or None."""
+        if not self._count:
+            return None
+        i = (self._head - 1) % self._depth
+        return (self.times[i], self.values[i])
+
+    def items(self) -> list:
+        """Returns the samples oldest first."""
+        start = (self._head - self._count) % self._depth
+        return [
+            (self.times[(start + i) % self._depth], self.values[(start + i) % self._depth])
+            for i in range(self._count)
+        ]
+
+    def clear(self) -> None:
+        self._head = 0
+        self._count = 0
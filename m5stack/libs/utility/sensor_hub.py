@@ -0,0 +1,138 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Cooperative scheduler for sensors with slow conversions.
+#
+# A sensor takes part by implementing the split measurement protocol:
+#
+#   trigger_measure() -> ms until the result is ready
+#   fetch_measure()   -> result, or None if it is not ready yet (polled again)
+#
+# The hub starts every due conversion first and reads the results when they
+# are ready, so sensors sharing a bus convert at the same time and the caller
+# only sleeps until the earliest ready or due time.
+#
+#   hub = SensorHub()
+#   env = hub.add(SHT30(i2c), 1000, callback=lambda ch, t, v: print(v))
+#   dist = hub.add(UltrasoundI2CUnit(i2c), 200, depth=32)
+#   while True:
+#       M5.update()
+#       hub.poll()
+#   # or: asyncio.create_task(hub.run_async())
+
+import asyncio
+import time
+from .ring import Ring
+
+_IDLE = 0
+_CONVERTING = 1
+
+
+class Channel:
+    def __init__(self, sensor, period_ms, callback, depth, retry_ms, name) -> None:
+        self.sensor = sensor
+        self.period_ms = period_ms
+        self.callback = callback
+        self.retry_ms = retry_ms
+        self.name = name
+        self.ring = Ring(depth)
+        self.errors = 0
+        self.error = None
+        self._state = _IDLE
+        self._due = time.ticks_ms()
+        self._ready = self._due
+
+    @property
+    def value(self):
+        s = self.ring.latest()
+        return None if s is None else s[1]
+
+
+class SensorHub:
+    def __init__(self) -> None:
+        self.channels = []
+        self._running = False
+
+    def add(self, sensor, period_ms, callback=None, depth=16, retry_ms=100, name=None) -> Channel:
+        """
+        Sample ``sensor`` every ``period_ms``.
+
+        :param callback: called as callback(channel, ticks_ms, value) for every sample
+        :param depth: samples kept in ``channel.ring``
+        :param retry_ms: poll interval while fetch_measure() returns None
+        """
+        ch = Channel(sensor, period_ms, callback, depth, retry_ms, name)
+        self.channels.append(ch)
+        return ch
+
+    def remove(self, channel) -> None:
+        self.channels.remove(channel)
+
+    def _fail(self, ch, now, e) -> None:
+        ch.errors += 1
+        ch.error = e
+        ch._state = _IDLE
+        ch._due = time.ticks_add(now, ch.period_ms)
+
+    def _start(self, ch, now) -> None:
+        try:
+            delay = ch.sensor.trigger_measure()
+        except Exception as e:
+            self._fail(ch, now, e)
+            return
+        ch._state = _CONVERTING
+        ch._ready = time.ticks_add(now, delay)
+        # Keep the sampling grid, do not drift by the conversion time.
+        ch._due = time.ticks_add(ch._due, ch.period_ms)
+        if time.ticks_diff(ch._due, now) < 0:
+            ch._due = time.ticks_add(now, ch.period_ms)
+
+    def _collect(self, ch, now) -> None:
+        try:
+            value = ch.sensor.fetch_measure()
+        except Exception as e:
+            self._fail(ch, now, e)
+            return
+        if value is None:
+            ch._ready = time.ticks_add(now, ch.retry_ms)
+            return
+        ch._state = _IDLE
+        ch.ring.append(now, value)
+        if ch.callback is not None:
+            ch.callback(ch, now, value)
+
+    def poll(self) -> int:
+        """Run every due step without blocking, return ms until the next one."""
+        # Start conversions before reading results, so a read never delays
+        # a trigger that is due in the same pass.
+        now = time.ticks_ms()
+        for ch in self.channels:
+            if ch._state == _IDLE and time.ticks_diff(ch._due, now) <= 0:
+                self._start(ch, now)
+        now = time.ticks_ms()
+        for ch in self.channels:
+            if ch._state == _CONVERTING and time.ticks_diff(ch._ready, now) <= 0:
+                self._collect(ch, now)
+
+        now = time.ticks_ms()
+        wait = 1000
+        for ch in self.channels:
+            t = ch._ready if ch._state == _CONVERTING else ch._due
+            wait = min(wait, time.ticks_diff(t, now))
+        return max(0, wait)
+
+    def run(self) -> None:
+        """Poll forever, sleeping until the next ready or due time."""
+        self._running = True
+        while self._running:
+            time.sleep_ms(self.poll())
+
+    async def run_async(self) -> None:
+        """Poll forever as a uasyncio task."""
+        self._running = True
+        while self._running:
+            await asyncio.sleep_ms(self.poll())
+
+    def stop(self) -> None:
+        self._running = False
@@ -3,9 +3,31 @@
 # SPDX-License-Identifier: MIT
 
 # Combine bootloader, partition table and application into a final binary.
+#
+# Usage:
+#   makeimg.py <sdkconfig> <bootloader.bin> <partition-table.bin> <nvs.bin>
+#              <micropython.bin> <fs-system.bin> <fs-user.bin|none>
+#              <board_type> <lvgl_flag> <output.bin> <output.uf2>
+#
+#   makeimg.py --batch [--jobs N] [--lvgl] [--vfs] [--report sizes.json]
+#              build-<BOARD> [build-<BOARD> ...]
+#
+# Images are assembled by streaming every component through a fixed size
+# buffer into a working image at a stable path of the build directory
+# (".makeimg-image.bin", whatever GIT_VERSION the output is named after).
+# The sha256 of each component is kept next to it in ".makeimg-image.json";
+# only the components that changed are rewritten in place. The output,
+# release file and .uf2 are always rewritten from it, so a stale file of
+# the same name is never shipped.
+# Batch mode assembles several build directories in parallel and writes a
+# JSON size report.
 
 from datetime import date
+import hashlib
+import json
 import os, sys
+import shutil
+import subprocess
 
 sys.path.append(os.getenv("IDF_PATH") + "/components/partition_table")
 
@@ -14,211 +36,477 @@ import gen_esp32part
 OFFSET_BOOTLOADER_DEFAULT = 0x1000
 OFFSET_PARTITIONS_DEFAULT = 0x8000
 
+BUF_SIZE = 64 * 1024
+PAD_BYTE = b"\xff"
 
-def load_sdkconfig_value(filename, value, default):
-    value = "CONFIG_" + value + "="
-    with open(filename, "r") as f:
-        for line in f:
-            if line.startswith(value):
-                return line.split("=", 1)[1]
-    return
-
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def load_sdkconfig_hex_value(filename, value, default):
-    value = "CONFIG_" + value + "="
-    with open(filename, "r") as f:
-        for line in f:
-            if line.startswith(value):
-                return int(line.split("=", 1)[1], 16)
-    return default
+WORK_IMAGE = ".makeimg-image.bin"
 
 
-def load_sdkconfig_spiram_value(filename):
-    value = "SPIRAM_SUPPORT="
-    with open(filename, "r") as f:
-        for line in f:
-            if value in line:
-                if line.split("=", 1)[1][0] == "y":
-                    return "SPIRAM-"
-    return ""
+class ImageError(Exception):
+    pass
 
 
-def load_sdkconfig_flash_size_value(filename):
-    value = "CONFIG_ESPTOOLPY_FLASHSIZE="
+def load_sdkconfig(filename):
+    config = {}
     with open(filename, "r") as f:
         for line in f:
-            if line.startswith(value):
-                return str(line.split("_")[-1].split("=", 1)[1][1:-2])
-    return "4MB"
+            if line.startswith("CONFIG_") and "=" in line:
+                key, value = line.rstrip("\n").split("=", 1)
+                config[key[len("CONFIG_") :]] = value
+    return config
 
 
-def load_sdkconfig_str_value(filename, value, default):
-    value = load_sdkconfig_value(filename, value, None)
+def sdkconfig_str_value(config, value, default):
+    value = config.get(value)
     if value is None:
         return default
     return value.strip().strip('"')
 
 
+def sdkconfig_hex_value(config, value, default):
+    value = config.get(value)
+    if value is None:
+        return default
+    return int(value, 16)
+
+
+def sdkconfig_spiram_value(config):
+    for key, value in config.items():
+        if key.endswith("SPIRAM_SUPPORT") and value.startswith("y"):
+            return "SPIRAM-"
+    return ""
+
+
+def sdkconfig_flash_size_value(config):
+    return sdkconfig_str_value(config, "ESPTOOLPY_FLASHSIZE", "4MB")
+
+
 def load_partition_table(filename):
     with open(filename, "rb") as f:
         return gen_esp32part.PartitionTable.from_binary(f.read())
 
 
-# Extract command-line arguments.
-arg_sdkconfig = sys.argv[1]
-arg_bootloader_bin = sys.argv[2]
-arg_partitions_bin = sys.argv[3]
-arg_nvs_bin = sys.argv[4]
-arg_application_bin = sys.argv[5]
-arg_fs_sys_bin = sys.argv[6]
-arg_fs_vfs_bin = sys.argv[7]
-arg_board_type_flag = sys.argv[8]
-arg_lvgl_flag = sys.argv[9]
-arg_output_bin = sys.argv[10]
-arg_output_uf2 = sys.argv[11]
-
-# Load required sdkconfig values.
-idf_target = load_sdkconfig_str_value(arg_sdkconfig, "IDF_TARGET", "").upper()
-offset_bootloader = load_sdkconfig_hex_value(
-    arg_sdkconfig, "BOOTLOADER_OFFSET_IN_FLASH", OFFSET_BOOTLOADER_DEFAULT
-)
-offset_partitions = load_sdkconfig_hex_value(
-    arg_sdkconfig, "PARTITION_TABLE_OFFSET", OFFSET_PARTITIONS_DEFAULT
-)
-
-# Load the partition table.
-partition_table = load_partition_table(arg_partitions_bin)
-
-max_size_bootloader = offset_partitions - offset_bootloader
-max_size_partitions = 0
-offset_nvs = 0
-max_size_nvs = 0
-offset_application = 0
-max_size_application = 0
-offset_fs_sys = 0
-max_size_fs_sys = 0
-offset_fs_vfs = 0
-max_size_fs_vfs = 0
-
-# Inspect the partition table to find offsets and maximum sizes.
-for part in partition_table:
-    if part.name == "nvs":
-        max_size_partitions = part.offset - offset_partitions
-        offset_nvs = part.offset
-        max_size_nvs = part.size
-    elif part.type == gen_esp32part.APP_TYPE and offset_application == 0:
-        offset_application = part.offset
-        max_size_application = part.size
-    elif part.type == gen_esp32part.DATA_TYPE and part.name == "sys":
-        offset_fs_sys = part.offset
-        max_size_fs_sys = part.size
-    elif part.type == gen_esp32part.DATA_TYPE and part.name == "vfs":
-        offset_fs_vfs = part.offset
-        max_size_fs_vfs = part.size
-
-
-# Define the input files, their location and maximum size.
-files_in = [
-    ("bootloader", offset_bootloader, max_size_bootloader, arg_bootloader_bin),
-    ("partitions", offset_partitions, max_size_partitions, arg_partitions_bin),
-    ("nvs", offset_nvs, max_size_nvs, arg_nvs_bin),
-    ("application", offset_application, max_size_application, arg_application_bin),
-    ("fs_sys", offset_fs_sys, max_size_fs_sys, arg_fs_sys_bin),
-    ("fs_vfs", offset_fs_vfs, max_size_fs_vfs, arg_fs_vfs_bin),
-]
-
-# Remove files that are not present.
-if arg_fs_vfs_bin == "none":
-    files_in.pop()
-
-file_out = arg_output_bin
-
-# Write output file with combined firmware.
-cur_offset = 0
-with open(file_out, "wb") as fout:
-    for name, offset, max_size, file_in in files_in:
+def image_layout(config, partition_table, files):
+    """Return [(name, offset, max_size, path)] for the components to write.
+
+    ``files`` maps component names to input paths, a component whose path is
+    "none" is left out.
+    """
+    offset_bootloader = sdkconfig_hex_value(
+        config, "BOOTLOADER_OFFSET_IN_FLASH", OFFSET_BOOTLOADER_DEFAULT
+    )
+    offset_partitions = sdkconfig_hex_value(
+        config, "PARTITION_TABLE_OFFSET", OFFSET_PARTITIONS_DEFAULT
+    )
+
+    max_size_partitions = 0
+    offset_nvs = 0
+    max_size_nvs = 0
+    offset_application = 0
+    max_size_application = 0
+    offset_fs_sys = 0
+    max_size_fs_sys = 0
+    offset_fs_vfs = 0
+    max_size_fs_vfs = 0
+
+    # Inspect the partition table to find offsets and maximum sizes.
+    for part in partition_table:
+        if part.name == "nvs":
+            max_size_partitions = part.offset - offset_partitions
+            offset_nvs = part.offset
+            max_size_nvs = part.size
+        elif part.type == gen_esp32part.APP_TYPE and offset_application == 0:
+            offset_application = part.offset
+            max_size_application = part.size
+        elif part.type == gen_esp32part.DATA_TYPE and part.name == "sys":
+            offset_fs_sys = part.offset
+            max_size_fs_sys = part.size
+        elif part.type == gen_esp32part.DATA_TYPE and part.name == "vfs":
+            offset_fs_vfs = part.offset
+            max_size_fs_vfs = part.size
+
+    layout = [
+        ("bootloader", offset_bootloader, offset_partitions - offset_bootloader),
+        ("partitions", offset_partitions, max_size_partitions),
+        ("nvs", offset_nvs, max_size_nvs),
+        ("application", offset_application, max_size_application),
+        ("fs_sys", offset_fs_sys, max_size_fs_sys),
+        ("fs_vfs", offset_fs_vfs, max_size_fs_vfs),
+    ]
+    files_in = []
+    for name, offset, max_size in layout:
+        path = files.get(name, "none")
+        if path == "none":
+            continue
         if name == "fs_sys" and offset == 0:
             continue
-        assert offset >= cur_offset
-        fout.write(b"\xff" * (offset - cur_offset))
-        cur_offset = offset
-        with open(file_in, "rb") as fin:
-            data = fin.read()
-            fout.write(data)
-            cur_offset += len(data)
-            print(
-                "%-12s@0x%06x % 9d  (% 8d remaining)"
-                % (name, offset, len(data), max_size - len(data))
+        files_in.append((name, offset, max_size, path))
+    return files_in
+
+
+def file_digest(path, buf):
+    h = hashlib.sha256()
+    mv = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(mv[:n])
+    return h.hexdigest()
+
+
+def copy_stream(fout, path, buf):
+    mv = memoryview(buf)
+    size = 0
+    with open(path, "rb", buffering=0) as fin:
+        while True:
+            n = fin.readinto(buf)
+            if not n:
+                break
+            fout.write(mv[:n])
+            size += n
+    return size
+
+
+def write_padding(fout, size, pad):
+    while size > 0:
+        n = min(size, len(pad))
+        fout.write(pad[:n])
+        size -= n
+
+
+def _load_cache(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def assemble(files_in, file_out, log):
+    """Write ``files_in`` to ``file_out`` and return the component report.
+
+    Only components whose sha256 changed since the last build are rewritten,
+    in the working image of the directory of ``file_out``.
+    """
+    buf = bytearray(BUF_SIZE)
+    pad = PAD_BYTE * BUF_SIZE
+
+    components = []
+    for name, offset, max_size, path in files_in:
+        size = os.path.getsize(path)
+        components.append(
+            {
+                "name": name,
+                "offset": offset,
+                "max_size": max_size,
+                "size": size,
+                "sha256": file_digest(path, buf),
+                "path": path,
+            }
+        )
+
+    cur_offset = 0
+    for c in components:
+        assert c["offset"] >= cur_offset
+        cur_offset = c["offset"] + c["size"]
+        log(
+            "%-12s@0x%06x % 9d  (% 8d remaining)"
+            % (c["name"], c["offset"], c["size"], c["max_size"] - c["size"])
+        )
+        if c["size"] > c["max_size"]:
+            raise ImageError(
+                "%s overflows allocated space of %d bytes by %d bytes"
+                % (c["name"], c["max_size"], c["size"] - c["max_size"])
             )
-            if len(data) > max_size:
-                print(
-                    "ERROR: %s overflows allocated space of %d bytes by %d bytes"
-                    % (name, max_size, len(data) - max_size)
-                )
-                sys.exit(1)
-    print("%-23s%8d  (% 8.1f MB)" % ("total", cur_offset, (cur_offset / 1024 / 1024)))
-    print(
+    total = cur_offset
+
+    work = os.path.join(os.path.dirname(file_out), WORK_IMAGE)
+    cache_path = os.path.splitext(work)[0] + ".json"
+    cache = _load_cache(cache_path)
+    layout = [(c["name"], c["offset"]) for c in components]
+    if (
+        cache is None
+        or not os.path.exists(work)
+        or os.path.getsize(work) != cache.get("total")
+        or [tuple(x) for x in cache.get("layout", [])] != layout
+    ):
+        changed = [c["name"] for c in components]
+        with open(work, "wb") as fout:
+            cur_offset = 0
+            for c in components:
+                write_padding(fout, c["offset"] - cur_offset, pad)
+                cur_offset = c["offset"] + copy_stream(fout, c["path"], buf)
+    else:
+        old = cache["components"]
+        changed = [c["name"] for c in components if old.get(c["name"]) != c["sha256"]]
+        if changed:
+            with open(work, "r+b") as fout:
+                for i, c in enumerate(components):
+                    if c["name"] not in changed:
+                        continue
+                    fout.seek(c["offset"])
+                    end = c["offset"] + copy_stream(fout, c["path"], buf)
+                    # Clear what is left of a component that shrank.
+                    if i + 1 < len(components):
+                        write_padding(fout, components[i + 1]["offset"] - end, pad)
+                fout.truncate(total)
+
+    with open(cache_path, "w") as f:
+        json.dump(
+            {
+                "layout": layout,
+                "total": total,
+                "components": {c["name"]: c["sha256"] for c in components},
+            },
+            f,
+        )
+
+    # Always copied: an existing output of the same size may still be stale
+    # (replaced, or built from another config), and copyfile() is cheap.
+    shutil.copyfile(work, file_out)
+
+    for c in components:
+        del c["path"]
+    return components, total, changed
+
+
+def make_uf2(idf_target, application_bin, output_uf2):
+    sys.path.append(os.path.join(SCRIPT_DIR, "../micropython/tools"))
+    import uf2conv
+
+    families = uf2conv.load_families()
+    uf2conv.appstartaddr = 0
+    uf2conv.familyid = families[idf_target]
+    with open(application_bin, "rb") as fin, open(output_uf2, "wb") as fout:
+        fout.write(uf2conv.convert_to_uf2(fin.read()))
+
+
+def release_name(config, file_out, board_type, lvgl_flag):
+    # uiflow-0973efa-esp32s3-8mb-atoms3-v2.0.0-alpha-2-20230206.bin
+    idf_target = sdkconfig_str_value(config, "IDF_TARGET", "").upper()
+    feature_str = ""
+    if idf_target == "ESP32C3":
+        if sdkconfig_str_value(config, "ESP_CONSOLE_USB_SERIAL_JTAG", "").upper() == "Y":
+            feature_str = "usb-"
+    else:
+        feature_str = sdkconfig_spiram_value(config).lower()
+
+    with open(os.path.join(SCRIPT_DIR, "version.txt"), "r") as f:
+        uiflow_version = f.readline().strip() + "-"
+
+    return "{}-{}-{}{}-{}{}{}{}.bin".format(
+        file_out.split(".bin")[0],
+        idf_target.lower(),
+        feature_str.lower(),
+        sdkconfig_flash_size_value(config).lower(),
+        board_type.lower() + "-",
+        "lvgl-" if lvgl_flag == "1" else "",
+        uiflow_version.lower(),
+        date.today().strftime("%Y%m%d"),
+    )
+
+
+def copy_release(src, dst):
+    # shutil.copyfile() lets the kernel copy the data (sendfile) instead of
+    # shelling out to cp.
+    shutil.copyfile(src, dst)
+
+
+def make_image(
+    sdkconfig,
+    bootloader_bin,
+    partitions_bin,
+    nvs_bin,
+    application_bin,
+    fs_sys_bin,
+    fs_vfs_bin,
+    board_type,
+    lvgl_flag,
+    output_bin,
+    output_uf2,
+    log=print,
+):
+    for path in (sdkconfig, bootloader_bin, partitions_bin, application_bin):
+        if not os.path.exists(path):
+            raise ImageError("%s not found" % path)
+    for path in (nvs_bin, fs_sys_bin, fs_vfs_bin):
+        if path != "none" and not os.path.exists(path):
+            raise ImageError("%s not found" % path)
+
+    # Parse sdkconfig and the partition table once for the whole image.
+    config = load_sdkconfig(sdkconfig)
+    idf_target = sdkconfig_str_value(config, "IDF_TARGET", "").upper()
+    partition_table = load_partition_table(partitions_bin)
+
+    files_in = image_layout(
+        config,
+        partition_table,
+        {
+            "bootloader": bootloader_bin,
+            "partitions": partitions_bin,
+            "nvs": nvs_bin,
+            "application": application_bin,
+            "fs_sys": fs_sys_bin,
+            "fs_vfs": fs_vfs_bin,
+        },
+    )
+
+    file_out = output_bin
+    components, total, changed = assemble(files_in, file_out, log)
+    log("%-23s%8d  (% 8.1f MB)" % ("total", total, (total / 1024 / 1024)))
+    log("%-23s%s" % ("rewritten", ", ".join(changed) if changed else "none, image is up to date"))
+    log(
         "\r\nWrote 0x%x bytes to file %s, ready to flash to offset 0x%x.\r\n\r\n"
         "\033[1;32mExample command:\033[0m\r\n"
         "    \033[1;33m1.\033[0m make BOARD=%s BOARD_TYPE=%s PORT=/dev/ttyUSBx flash\r\n"
         "    \033[1;33m2.\033[0m esptool.py --chip %s --port /dev/ttyUSBx --baud 1500000 write_flash 0x%x %s"
         % (
-            cur_offset,
+            total,
             file_out,
             0x0,
             file_out[6:].split("/")[0],
-            arg_board_type_flag.lower(),
+            board_type.lower(),
             idf_target.lower(),
             0x0,
             file_out,
         )
     )
 
-# Generate .uf2 file if the SoC has native USB.
-if idf_target in ("ESP32S2", "ESP32S3"):
-    sys.path.append(os.path.join(os.path.dirname(__file__), "../micropython/tools"))
-    import uf2conv
+    # Generate .uf2 file if the SoC has native USB.
+    if idf_target in ("ESP32S2", "ESP32S3"):
+        make_uf2(idf_target, application_bin, output_uf2)
 
-    families = uf2conv.load_families()
-    uf2conv.appstartaddr = 0
-    uf2conv.familyid = families[idf_target]
-    with open(arg_application_bin, "rb") as fin, open(arg_output_uf2, "wb") as fout:
-        fout.write(uf2conv.convert_to_uf2(fin.read()))
+    release_file_out = release_name(config, file_out, board_type, lvgl_flag)
+    log(
+        "\033[1;32mRelease Firmware:\033[0m\r\n    \033[1;33m"
+        + board_type.upper()
+        + ":\033[0m "
+        + release_file_out
+    )
+    copy_release(file_out, release_file_out)
+
+    return {
+        "output": file_out,
+        "release": release_file_out,
+        "target": idf_target.lower(),
+        "total": total,
+        "rewritten": changed,
+        "components": components,
+    }
+
+
+def load_board_types(makefile):
+    """Return the BOARD -> BOARD_TYPE map from the ``boards :=`` list."""
+    boards = {}
+    with open(makefile, "r") as f:
+        in_list = False
+        for line in f:
+            if line.startswith("boards :="):
+                in_list = True
+                continue
+            if in_list:
+                entry = line.strip().rstrip("\\").strip()
+                if ":" in entry:
+                    board, board_type = entry.split(":", 1)
+                    boards[board] = board_type
+                if not line.rstrip().endswith("\\"):
+                    break
+    return boards
+
+
+def git_version():
+    try:
+        return (
+            subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR)
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _optional(path, lines):
+    # Boards without a component (TINY boards have no fs-system) skip it.
+    if os.path.exists(path):
+        return path
+    lines.append("%s not found, skipped" % path)
+    return "none"
+
+
+def _batch_job(job):
+    build, board_type, lvgl_flag, vfs, version = job
+    lines = []
+    result = make_image(
+        os.path.join(build, "sdkconfig"),
+        os.path.join(build, "bootloader", "bootloader.bin"),
+        os.path.join(build, "partition_table", "partition-table.bin"),
+        _optional(os.path.join(build, "nvs.bin"), lines),
+        os.path.join(build, "micropython.bin"),
+        _optional(os.path.join(build, "fs-system.bin"), lines),
+        _optional(os.path.join(build, "fs-user.bin"), lines) if vfs else "none",
+        board_type,
+        lvgl_flag,
+        os.path.join(build, "uiflow-%s.bin" % version),
+        os.path.join(build, "uiflow-Sx-%s.uf2" % version),
+        log=lines.append,
+    )
+    return build, result, lines
+
+
+def batch(argv):
+    import argparse
+    from concurrent.futures import ProcessPoolExecutor
+
+    parser = argparse.ArgumentParser(prog="makeimg.py --batch")
+    parser.add_argument("builds", nargs="+", help="build-<BOARD> directories")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--lvgl", action="store_true")
+    parser.add_argument("--vfs", action="store_true", help="include fs-user.bin")
+    parser.add_argument("--report", default=None, help="write a JSON size report")
+    args = parser.parse_args(argv)
+
+    board_types = load_board_types(os.path.join(SCRIPT_DIR, "Makefile"))
+    version = git_version()
+    jobs = []
+    for build in args.builds:
+        board = os.path.basename(os.path.normpath(build))
+        board = board[len("build-") :] if board.startswith("build-") else board
+        jobs.append(
+            (build, board_types.get(board, "none"), "1" if args.lvgl else "0", args.vfs, version)
+        )
 
-# uiflow-0973efa-esp32s3-8mb-atoms3-v2.0.0-alpha-2-20230206.bin
-today = date.today()
-feature_str = ""
-if idf_target == "ESP32C3":
-    if load_sdkconfig_str_value(arg_sdkconfig, "ESP_CONSOLE_USB_SERIAL_JTAG", "").upper() == "Y":
-        feature_str = "usb-"
-else:
-    feature_str = load_sdkconfig_spiram_value(arg_sdkconfig).lower()
-
-arg_board_type_flag = arg_board_type_flag + "-"
-
-if arg_lvgl_flag == "1":
-    arg_lvgl_flag = "lvgl-"
-else:
-    arg_lvgl_flag = ""
-
-uiflow_version = ""
-with open("./version.txt", "r") as f:
-    uiflow_version = f.readline() + "-"
-
-release_file_out = "{}-{}-{}{}-{}{}{}{}.bin".format(
-    file_out.split(".bin")[0],
-    idf_target.lower(),
-    feature_str.lower(),
-    load_sdkconfig_flash_size_value(arg_sdkconfig).lower(),
-    arg_board_type_flag.lower(),
-    arg_lvgl_flag,
-    uiflow_version.lower(),
-    today.strftime("%Y%m%d"),
-)
-print(
-    "\033[1;32mRelease Firmware:\033[0m\r\n    \033[1;33m"
-    + arg_board_type_flag[:-1].upper()
-    + ":\033[0m "
-    + release_file_out
-)
-os.system("cp {} {}".format(file_out, release_file_out))
+    report = {}
+    failed = False
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [(job[0], pool.submit(_batch_job, job)) for job in jobs]
+        for build, future in futures:
+            print("\033[1;32m==== %s\033[0m" % build)
+            try:
+                _, result, lines = future.result()
+            except ImageError as e:
+                print("ERROR: %s" % e)
+                failed = True
+                continue
+            print("\n".join(lines))
+            report[build] = result
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        sys.exit(batch(sys.argv[2:]))
+
+    # Extract command-line arguments.
+    try:
+        make_image(*sys.argv[1:12])
+    except ImageError as e:
+        print("ERROR: %s" % e)
+        sys.exit(1)
@@ -2,6 +2,10 @@
 #
 # SPDX-License-Identifier: MIT
 
+import boot_profile
+
+boot_profile.mark("vm")
+
 import gc
 import uos as os
 from flashbdev import sys_bdev, vfs_bdev
@@ -29,6 +33,7 @@ except OSError:
     import inisetup
 
     vfs = inisetup.setup()
+boot_profile.mark("mount")
 
 gc.collect()
 gc.threshold(56 * 1024)
@@ -44,14 +49,24 @@ sys.path.append("/flash/libs")
 # change directory to "/flash"
 os.chdir("/flash")
 
-# copy OTA update file to main.py
+# move OTA update file to main.py
 # main_ota_temp.py this file name is fixed
 try:
-    s = open("/flash/main_ota_temp.py", "rb")
-    f = open("/flash/main.py", "wb")
-    f.write(s.read())
-    s.close()
-    f.close()
-    os.remove("/flash/main_ota_temp.py")
-except:
+    os.stat("/flash/main_ota_temp.py")
+except OSError:
     pass
+else:
+    try:
+        # littlefs renames over an existing file, no need to copy the data
+        os.rename("/flash/main_ota_temp.py", "/flash/main.py")
+    except OSError:
+        buf = bytearray(1024)
+        with open("/flash/main_ota_temp.py", "rb") as s, open("/flash/main.py", "wb") as f:
+            while True:
+                n = s.readinto(buf)
+                if not n:
+                    break
+                f.write(buf if n == len(buf) else memoryview(buf)[:n])
+        del buf
+        os.remove("/flash/main_ota_temp.py")
+boot_profile.mark("ota")
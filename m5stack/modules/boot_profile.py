@@ -0,0 +1,69 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Boot-time profiler.
+#
+# _boot.py and startup() call mark() at the end of every boot phase; the marks
+# only cost a list append. When enabled (NVS "uiflow" key "boot_profile"),
+# save() writes the breakdown to /flash/boot_profile.txt, one line per phase:
+# "<phase> <phase ms> <ms since reset>".
+#
+#   import boot_profile
+#   boot_profile.enable(True)   # then reset the device
+#   print(boot_profile.load())
+
+import time
+
+PATH = "/flash/boot_profile.txt"
+
+_marks = []
+
+
+def mark(name):
+    _marks.append((name, time.ticks_ms()))
+
+
+def report():
+    """Return [(phase, phase_ms, ms_since_reset)] for the current boot."""
+    result = []
+    last = 0
+    for name, t in _marks:
+        result.append((name, t - last, t))
+        last = t
+    return result
+
+
+def is_enabled(nvs=None):
+    if nvs is None:
+        import esp32
+
+        nvs = esp32.NVS("uiflow")
+    try:
+        return nvs.get_u8("boot_profile") == 1
+    except OSError:
+        return False
+
+
+def enable(on=True):
+    import esp32
+
+    nvs = esp32.NVS("uiflow")
+    nvs.set_u8("boot_profile", 1 if on else 0)
+    nvs.commit()
+
+
+def save(nvs=None):
+    if not _marks or not is_enabled(nvs):
+        return
+    with open(PATH, "w") as f:
+        for name, dt, t in report():
+            f.write("%s %d %d\n" % (name, dt, t))
+
+
+def load():
+    try:
+        with open(PATH, "r") as f:
+            return [(p[0], int(p[1]), int(p[2])) for p in (line.split() for line in f) if p]
+    except OSError:
+        return []
@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: MIT
 
 module("_boot.py")
+module("boot_profile.py")
 module("flashbdev.py")
 module("inisetup.py")
 include("widgets/manifest.py")
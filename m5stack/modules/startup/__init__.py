@@ -8,21 +8,39 @@ import M5
 import esp32
 import network
 import time
+import boot_profile
 
 BOOT_OPT_NOTHING = 0  # Run main.py(after download code to device set to this)
 BOOT_OPT_MENU_NET = 1  # Startup menu + Network setup
 BOOT_OPT_NETWORK = 2  # Only Network setup
 
 
+_wlan_started = False
+_wlan_connecting = None
+
+
 class Startup:
     def __init__(self) -> None:
+        global _wlan_started
         self.wlan = network.WLAN(network.STA_IF)
-        self.wlan.active(False)
-        self.wlan.active(True)
+        # Reset the interface once per boot only, board launchers create
+        # several Startup objects and startup() may already be connecting.
+        if not _wlan_started:
+            self.wlan.active(False)
+            self.wlan.active(True)
+            _wlan_started = True
 
     def connect_network(self, ssid: str, pswd: str) -> bool:
+        global _wlan_connecting
         if len(ssid) > 0:
-            self.wlan.connect(ssid, pswd)
+            # connect() is asynchronous, don't restart an attempt that
+            # startup() already kicked off with the same credentials.
+            if _wlan_connecting != (ssid, pswd) or self.wlan.status() not in (
+                network.STAT_CONNECTING,
+                network.STAT_GOT_IP,
+            ):
+                self.wlan.connect(ssid, pswd)
+                _wlan_connecting = (ssid, pswd)
             return True
         else:
             return False
@@ -45,8 +63,48 @@ def _is_psram():
     return True if sum > 520 * 1024 else False
 
 
+# board id -> (startup module, launcher class), only the matching module is
+# imported, and each firmware only freezes its own board module.
+_STARTUP_TABLE = {
+    M5.BOARD.M5AtomS3: ("atoms3", "AtomS3_Startup"),
+    M5.BOARD.M5Atom: ("atoms3lite", "AtomS3Lite_Startup"),
+    M5.BOARD.M5StampPico: ("atoms3lite", "AtomS3Lite_Startup"),
+    M5.BOARD.M5AtomU: ("atoms3lite", "AtomS3Lite_Startup"),
+    M5.BOARD.M5AtomEcho: ("atoms3lite", "AtomS3Lite_Startup"),
+    M5.BOARD.M5AtomS3R: ("atoms3r", "AtomS3R_Startup"),
+    M5.BOARD.M5AtomMatrix: ("atommatrix", "AtomMatrix_Startup"),
+    M5.BOARD.M5AtomS3Lite: ("atoms3lite", "AtomS3Lite_Startup"),
+    M5.BOARD.M5StampS3: ("stamps3", "StampS3_Startup"),
+    M5.BOARD.M5StackCoreS3: ("cores3", "CoreS3_Startup"),
+    M5.BOARD.M5StackCore2: ("core2", "Core2_Startup"),
+    M5.BOARD.M5AtomS3U: ("atoms3u", "AtomS3U_Startup"),
+    M5.BOARD.M5StickCPlus2: ("stickcplus", "StickCPlus_Startup"),
+    M5.BOARD.M5StickCPlus: ("stickcplus", "StickCPlus_Startup"),
+    M5.BOARD.M5Capsule: ("capsule", "Capsule_Startup"),
+    M5.BOARD.M5Dial: ("dial", "Dial_Startup"),
+    M5.BOARD.M5StackCoreInk: ("coreink", "CoreInk_Startup"),
+    M5.BOARD.M5AirQ: ("airq", "AirQ_Startup"),
+    M5.BOARD.M5Cardputer: ("cardputer", "Cardputer_Startup"),
+    M5.BOARD.M5Paper: ("paper", "Paper_Startup"),
+    M5.BOARD.M5DinMeter: ("dinmeter", "DinMeter_Startup"),
+    M5.BOARD.M5StickC: ("stickc", "StickC_Startup"),
+    M5.BOARD.M5Station: ("station", "Station_Startup"),
+    M5.BOARD.M5Tough: ("tough", "Tough_Startup"),
+}
+
+
+def _launcher(board_id):
+    if board_id == M5.BOARD.M5Stack:
+        entry = ("fire", "Fire_Startup") if _is_psram() else ("basic", "Basic_Startup")
+    else:
+        entry = _STARTUP_TABLE.get(board_id)
+    if entry is None:
+        return None
+    mod, cls = entry
+    return getattr(__import__("startup." + mod, None, None, (cls,)), cls)
+
+
 def startup(boot_opt, timeout: int = 60) -> None:
-    M5.begin()
     # Read saved Wi-Fi information from NVS
     nvs = esp32.NVS("uiflow")
     ssid = nvs.get_str("ssid0")
@@ -56,6 +114,10 @@ def startup(boot_opt, timeout: int = 60) -> None:
         time.timezone(tz)
     except:
         pass
+    boot_profile.mark("nvs")
+
+    M5.begin()
+    boot_profile.mark("m5_begin")
 
     if boot_opt != BOOT_OPT_MENU_NET:
         M5.update()
@@ -90,140 +152,28 @@ def startup(boot_opt, timeout: int = 60) -> None:
         nvs.set_u32("AUTODETECT", board_id)
         nvs.commit()
 
+    # Start connecting before the launcher and its UI are loaded, connect()
+    # returns immediately and the launchers reuse the running attempt.
+    if boot_opt != BOOT_OPT_NOTHING:
+        Startup().connect_network(ssid, pswd)
+        boot_profile.mark("network")
+
+    launcher = None
     # Do nothing
     if boot_opt is BOOT_OPT_NOTHING:
         pass
     # Show startup menu and connect to network
     elif boot_opt is BOOT_OPT_MENU_NET:
-        if board_id == M5.BOARD.M5AtomS3:
-            from .atoms3 import AtomS3_Startup
-
-            atoms3 = AtomS3_Startup()
-            atoms3.startup(ssid, pswd, timeout)
-        elif board_id in (
-            M5.BOARD.M5Atom,
-            M5.BOARD.M5StampPico,
-            M5.BOARD.M5AtomU,
-            M5.BOARD.M5AtomEcho,
-        ):
-            from .atoms3lite import AtomS3Lite_Startup
-
-            atomlite = AtomS3Lite_Startup()
-            atomlite.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5AtomS3R:
-            from .atoms3r import AtomS3R_Startup
-
-            atoms3r = AtomS3R_Startup()
-            atoms3r.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5AtomMatrix:
-            from .atommatrix import AtomMatrix_Startup
-
-            atommatrix = AtomMatrix_Startup()
-            atommatrix.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5AtomS3Lite:
-            from .atoms3lite import AtomS3Lite_Startup
-
-            atoms3 = AtomS3Lite_Startup()
-            atoms3.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5StampS3:
-            from .stamps3 import StampS3_Startup
-
-            stamps3 = StampS3_Startup()
-            stamps3.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5StackCoreS3:
-            from .cores3 import CoreS3_Startup
-
-            cores3 = CoreS3_Startup()
-            cores3.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5StackCore2:
-            from .core2 import Core2_Startup
-
-            core2 = Core2_Startup()
-            core2.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5AtomS3U:
-            from .atoms3u import AtomS3U_Startup
-
-            atoms3u = AtomS3U_Startup()
-            atoms3u.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5StickCPlus2:
-            from .stickcplus import StickCPlus_Startup
-
-            stickcplus = StickCPlus_Startup()
-            stickcplus.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5StickCPlus:
-            from .stickcplus import StickCPlus_Startup
-
-            stickcplus2 = StickCPlus_Startup()
-            stickcplus2.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5Stack:
-            if _is_psram():
-                from .fire import Fire_Startup
-
-                fire = Fire_Startup()
-                fire.startup(ssid, pswd, timeout)
-            else:
-                from .basic import Basic_Startup
-
-                basic = Basic_Startup()
-                basic.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5Capsule:
-            from .capsule import Capsule_Startup
-
-            capsule = Capsule_Startup()
-            capsule.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5Dial:
-            from .dial import Dial_Startup
-
-            dial = Dial_Startup()
-            dial.startup(ssid, pswd, timeout)
-
-        elif board_id == M5.BOARD.M5StackCoreInk:
-            from .coreink import CoreInk_Startup
-
-            coreink = CoreInk_Startup()
-            coreink.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5AirQ:
-            from .airq import AirQ_Startup
-
-            airq = AirQ_Startup()
-            airq.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5Cardputer:
-            from .cardputer import Cardputer_Startup
-
-            cardputer = Cardputer_Startup()
-            cardputer.startup(ssid, pswd, timeout)
-
-        elif board_id == M5.BOARD.M5Paper:
-            from .paper import Paper_Startup
-
-            paper = Paper_Startup()
-            paper.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5DinMeter:
-            from .dinmeter import DinMeter_Startup
-
-            dinmeter = DinMeter_Startup()
-            dinmeter.startup(ssid, pswd, timeout)
-        elif board_id == M5.BOARD.M5StickC:
-            from .stickc import StickC_Startup
-
-            stickc = StickC_Startup()
-            stickc.startup(ssid, pswd, timeout)
-
-        elif board_id == M5.BOARD.M5Station:
-            from .station import Station_Startup
-
-            station = Station_Startup()
-            station.startup(ssid, pswd, timeout)
-
-        elif board_id == M5.BOARD.M5Tough:
-            from .tough import Tough_Startup
-
-            tough = Tough_Startup()
-            tough.startup(ssid, pswd, timeout)
-
+        launcher = _launcher(board_id)
+        boot_profile.mark("app_import")
     # Only connect to network, not show any menu
     elif boot_opt is BOOT_OPT_NETWORK:
         startup = Startup()
         startup.connect_network(ssid, pswd)
     else:
         print("Boot options not processed.")
+    boot_profile.mark("startup")
+    # The launcher does not return, save before running it.
+    boot_profile.save()
+    if launcher is not None:
+        launcher().startup(ssid, pswd, timeout)
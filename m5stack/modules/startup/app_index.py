@@ -0,0 +1,174 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Persistent index of the scripts in apps/ for the App List launchers.
+#
+# The index file keeps, per script, its size and mtime and the icon and
+# description found in its header comment:
+#
+#     # icon: /flash/res/img/weather.png
+#     # description: Weather station
+#
+# Opening the list walks the directory with ilistdir and stat; a script is
+# opened again only when its size or mtime changed, and the index file is
+# rewritten only when something changed. Only the names stay in memory: the
+# list views read them page by page through the sequence interface (len,
+# [i], [a:b], iter), info() and page() read the metadata from the file.
+
+import os
+
+_INDEX = ".app_index"
+_SEP = "\t"
+# Header lines read for the icon and description.
+_HEADER_LINES = 16
+_CHUNK = 4096
+
+# Entry fields
+NAME = 0
+SIZE = 1
+MTIME = 2
+ICON = 3
+DESCRIPTION = 4
+
+
+def _header(path) -> tuple:
+    icon = ""
+    description = ""
+    try:
+        with open(path, "r") as f:
+            for _ in range(_HEADER_LINES):
+                line = f.readline()
+                if not line.startswith("#"):
+                    break
+                key, _, value = line[1:].partition(":")
+                key = key.strip().lower()
+                if key == "icon":
+                    icon = value.strip()
+                elif key in ("description", "desc"):
+                    description = value.strip()
+    except (OSError, UnicodeError):
+        pass
+    return (icon, description.replace(_SEP, " "))
+
+
+class AppIndex:
+    def __init__(self, dir="apps", suffix=".py", path=_INDEX) -> None:
+        self.dir = dir
+        self.suffix = suffix
+        self.path = path
+        self.names = []
+        self.scanned = 0
+        # All entries, kept in memory only when the index file can't be written.
+        self._entries = None
+        self.refresh()
+
+    def _read(self):
+        # Entries of the index file, in its (sorted) order.
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    e = line.rstrip("\n").split(_SEP)
+                    if len(e) == 5:
+                        yield (e[0], int(e[1]), int(e[2]), e[3], e[4])
+        except (OSError, ValueError):
+            return
+
+    def _save(self, entries) -> None:
+        try:
+            with open(self.path, "w") as f:
+                for e in entries:
+                    f.write("{}\t{:d}\t{:d}\t{}\t{}\n".format(*e))
+            self._entries = None
+        except OSError:
+            self._entries = entries
+
+    def refresh(self) -> bool:
+        """
+        Update the index from the directory, returns True when it changed.
+        Only new or modified scripts are opened.
+        """
+        old = {e[NAME]: e for e in (self._entries or self._read())}
+        entries = []
+        changed = False
+        self.scanned = 0
+        try:
+            listing = os.ilistdir(self.dir)
+        except OSError:
+            listing = ()
+        for item in listing:
+            name = item[0]
+            if item[1] != 0x8000 or not name.endswith(self.suffix):
+                continue
+            path = self.dir + "/" + name
+            # ilistdir already told the type, stat is only for size and mtime.
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # removed since the listing
+            e = old.pop(name, None)
+            if e is None or e[MTIME] != st[8] or e[SIZE] != st[6]:
+                e = (name, st[6], st[8]) + _header(path)
+                self.scanned += 1
+                changed = True
+            entries.append(e)
+        if old:
+            changed = True
+        entries.sort()
+        if changed:
+            self._save(entries)
+        names = [e[NAME] for e in entries]
+        changed = changed or names != self.names
+        self.names = names
+        return changed
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, item):
+        return self.names[item]
+
+    def __contains__(self, item):
+        return item in self.names
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def page(self, start, count) -> list:
+        """(name, size, mtime, icon, description) of count scripts from start."""
+        if self._entries is not None:
+            return self._entries[start : start + count]
+        entries = []
+        for i, e in enumerate(self._read()):
+            if i >= start + count:
+                break
+            if i >= start:
+                entries.append(e)
+        return entries
+
+    def info(self, i) -> tuple:
+        """(name, size, mtime, icon, description) of the i-th script."""
+        if i < 0:
+            i += len(self.names)
+        e = self.page(i, 1)
+        if not e:
+            raise IndexError("index out of range")
+        return e[0]
+
+
+def copy(src, dst="main.py") -> int:
+    """
+    Copy a script in chunks, e.g. to main.py, without loading it whole.
+    Returns the bytes written.
+    """
+    buf = bytearray(_CHUNK)
+    mv = memoryview(buf)
+    total = 0
+    with open(src, "rb") as f_src, open(dst, "wb") as f_dst:
+        while True:
+            n = f_src.readinto(buf)
+            if not n:
+                break
+            f_dst.write(mv[:n])
+            total += n
+    return total
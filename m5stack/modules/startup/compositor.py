@@ -0,0 +1,138 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Sprite cache and dirty-region compositor for the launcher apps.
+#
+# Images are decoded once into canvases of an LRU SpriteCache bounded by a
+# byte budget (in PSRAM). Apps queue their draws on the Compositor with the
+# rectangle each covers; an opaque draw drops the queued draws it fully
+# covers, so the repaints of a tab switch (old tab, new tab, background,
+# content) reach the panel once. The Framework calls screen.flush() once per
+# frame, which runs what is left in one display transaction.
+#
+#     from ... import compositor
+#     compositor.screen.draw_image("/system/core2/List/main.png", 4, 84, 312, 156)
+#     compositor.screen.push(canvas, 0, 80)
+#     compositor.screen.draw(label.set_text, x, y, w, h, "text")
+
+import M5
+
+
+class SpriteCache:
+    """
+    Decoded images as 16 bit canvases keyed by (path, w, h, bg), the same
+    image drawn at another size or on another background is decoded again.
+    When ``budget`` bytes are used, the least recently used sprites are
+    deleted first.
+    """
+
+    def __init__(self, budget=512 * 1024, psram=True) -> None:
+        self.budget = budget
+        self.psram = psram
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self._sprites = {}
+        self._order = []
+
+    def get(self, path, w, h, bg=0):
+        """Returns the canvas of path, None if it does not fit the budget."""
+        key = (path, w, h, bg)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            if self._order[-1] != key:
+                self._order.remove(key)
+                self._order.append(key)
+            return sprite[0]
+        size = w * h * 2
+        if size > self.budget:
+            return None
+        self.misses += 1
+        while self._order and self.used + size > self.budget:
+            self._evict(self._order.pop(0))
+        canvas = M5.Lcd.newCanvas(w, h, 16, self.psram)
+        canvas.fillScreen(bg)
+        canvas.drawImage(path, 0, 0)
+        self._sprites[key] = (canvas, size)
+        self._order.append(key)
+        self.used += size
+        return canvas
+
+    def _evict(self, key) -> None:
+        canvas, size = self._sprites.pop(key)
+        canvas.delete()
+        self.used -= size
+
+    def clear(self) -> None:
+        for key in self._order:
+            self._evict(key)
+        self._order.clear()
+
+
+class Compositor:
+    def __init__(self, cache, display=M5.Lcd) -> None:
+        self.cache = cache
+        self.display = display
+        # [x, y, w, h, opaque, fn, args] in drawing order
+        self._queue = []
+        self.drawn = 0
+        self.skipped = 0
+
+    def draw(self, fn, x, y, w, h, *args, opaque=False) -> None:
+        """
+        Queue fn(*args), which draws into the rectangle x, y, w, h. Opaque
+        draws cover everything queued inside their rectangle.
+        """
+        if opaque:
+            x1 = x + w
+            y1 = y + h
+            queue = self._queue
+            i = 0
+            while i < len(queue):
+                q = queue[i]
+                if q[0] >= x and q[1] >= y and q[0] + q[2] <= x1 and q[1] + q[3] <= y1:
+                    queue.pop(i)
+                    self.skipped += 1
+                else:
+                    i += 1
+        self._queue.append((x, y, w, h, opaque, fn, args))
+
+    def draw_image(self, path, x, y, w, h, bg=0) -> None:
+        """Queue an opaque image, decoded once through the sprite cache."""
+        sprite = self.cache.get(path, w, h, bg)
+        if sprite is None:
+            self.draw(self.display.drawImage, x, y, w, h, path, x, y)
+        else:
+            self.draw(sprite.push, x, y, w, h, x, y, opaque=True)
+
+    def push(self, canvas, x, y) -> None:
+        """
+        Queue pushing canvas at x, y. The canvas is not copied: flush() pushes
+        what it holds then, so drawing into it after push() in the same frame
+        shows too. Push once after the last draw of the frame.
+        """
+        self.draw(canvas.push, x, y, canvas.width(), canvas.height(), x, y, opaque=True)
+
+    def fill_rect(self, x, y, w, h, color) -> None:
+        self.draw(self.display.fillRect, x, y, w, h, x, y, w, h, color, opaque=True)
+
+    def flush(self) -> int:
+        """Run the queued draws, returns how many."""
+        queue = self._queue
+        if not queue:
+            return 0
+        self._queue = []
+        self.display.startWrite()
+        try:
+            for q in queue:
+                q[5](*q[6])
+        finally:
+            self.display.endWrite()
+        self.drawn += len(queue)
+        return len(queue)
+
+
+sprites = SpriteCache()
+screen = Compositor(sprites)
@@ -3,9 +3,10 @@
 # SPDX-License-Identifier: MIT
 
 from .. import app_base
+from ... import app_index
+from ... import compositor
 import widgets
 import M5
-import os
 import sys
 import time
 import machine
@@ -30,57 +31,28 @@ class Rectangle:
         self._parent.drawRect(self._x, self._y, self._w, self._h, self._color)
 
 
-class FileList:
-    def __init__(self, dir, suffix=".py") -> None:
-        self.files = []
-        for file in os.listdir(dir):
-            if file.endswith(suffix):
-                self.files.append(file)
-        self.files_len = len(self.files)
-        self.file_pos = 0
-
-    def __contains__(self, item):
-        return item in self.files
-
-    def __getitem__(self, item):
-        return self.files[item]
-
-    # def __iter__(self):
-    #     return iter(self.files)
-
-    # def __next__(self):
-    #     if self.file_pos < self.files_len:
-    #         val = self.files[self.file_pos]
-    #         self.file_pos += 1
-    #         return val
-    #     else:
-    #         raise StopIteration()
-
-    def __len__(self):
-        return self.files_len
-
-
 class ListApp(app_base.AppBase):
     def __init__(self, icos: dict, data=None) -> None:
         super().__init__()
 
     def on_install(self):
-        M5.Lcd.drawImage("/system/core2/Selection/appList_unselected.png", 5 + 62 * 3, 20 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/appList_unselected.png", 5 + 62 * 3, 20 + 4, 62, 56
+        )
         self.descriptor = app_base.Descriptor(x=5 + 62 + 62 + 62, y=20 + 4, w=62, h=56)
 
     def on_launch(self):
-        self._files = FileList("apps")
+        self._files = app_index.AppIndex("apps")
         self._max_file_num = 4 if len(self._files) > 4 else len(self._files)
         self._cursor_pos = 0
         self._file_pos = 0
 
     def on_view(self):
-        M5.Lcd.drawImage("/system/core2/Selection/appList_selected.png", 5 + 62 * 3, 20 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/appList_selected.png", 5 + 62 * 3, 20 + 4, 62, 56
+        )
 
-        self._bg_img = widgets.Image(use_sprite=False)
-        self._bg_img.set_pos(4, 20 + 4 + 56 + 4)
-        self._bg_img.set_size(312, 156)
-        self._bg_img.set_src("/system/core2/List/main.png")
+        compositor.screen.draw_image("/system/core2/List/main.png", 4, 20 + 4 + 56 + 4, 312, 156)
 
         self._line_spacing = 36 + 2 + 2
         self._left_cursor_x = 4 + 2 + 30
@@ -90,11 +62,6 @@ class ListApp(app_base.AppBase):
             self._left_cursor_x, self._left_cursor_y, 10, 36, 0xFEFEFE, 0xFEFEFE
         )
 
-        self._left_img = widgets.Image(use_sprite=False)
-        self._left_img.set_pos(self._left_cursor_x, self._left_cursor_y)
-        self._left_img.set_size(10, 36)
-        self._left_img.set_src("/system/core2/List/left_cursor.png")
-
         self._right_cursor_x = 320 - 4 - 60 - 10
         self._right_cursor_y = (20 + 4 + 56 + 4) + 2
 
@@ -102,10 +69,7 @@ class ListApp(app_base.AppBase):
             self._right_cursor_x, self._right_cursor_y, 10, 36, 0xFEFEFE, 0xFEFEFE, parent=M5.Lcd
         )
 
-        self._right_img = widgets.Image(use_sprite=False)
-        self._right_img.set_pos(self._right_cursor_x, self._right_cursor_y)
-        self._right_img.set_size(10, 36)
-        self._right_img.set_src("/system/core2/List/right_cursor.png")
+        self._draw_cursor()
 
         self._label0 = widgets.Label(
             "",
@@ -156,8 +120,8 @@ class ListApp(app_base.AppBase):
         self._labels.append(self._label2)
         self._labels.append(self._label3)
 
-        for label, file in zip(self._labels, self._files):
-            file and label and label.set_text(file)
+        # The names go over main.png, so they are drawn after it is flushed.
+        compositor.screen.draw(self._draw_files, 4, 20 + 4 + 56 + 4, 312, 156)
 
         self._btn_up = widgets.Button(None)
         self._btn_up.set_pos(4 + 2, (20 + 4 + 56 + 4) + 2)
@@ -182,11 +146,36 @@ class ListApp(app_base.AppBase):
         self._buttons = (self._btn_up, self._btn_down, self._btn_once, self._btn_always)
 
     def on_exit(self):
-        M5.Lcd.drawImage("/system/core2/Selection/appList_unselected.png", 5 + 62 * 3, 20 + 4)
-        del self._bg_img, self._left_img, self._right_img
+        compositor.screen.draw_image(
+            "/system/core2/Selection/appList_unselected.png", 5 + 62 * 3, 20 + 4, 62, 56
+        )
         del self._label0, self._label1, self._label2, self._label3, self._labels
         del self._files
 
+    def _draw_files(self):
+        for label, file in zip(self._labels, self._files):
+            file and label and label.set_text(file)
+
+    def _draw_cursor(self):
+        # Queue the cursor sprites next to the selected line.
+        y = self._line_spacing * self._cursor_pos
+        compositor.screen.draw_image(
+            "/system/core2/List/left_cursor.png",
+            self._left_cursor_x,
+            self._left_cursor_y + y,
+            10,
+            36,
+            0xFEFEFE,
+        )
+        compositor.screen.draw_image(
+            "/system/core2/List/right_cursor.png",
+            self._right_cursor_x,
+            self._right_cursor_y + y,
+            10,
+            36,
+            0xFEFEFE,
+        )
+
     async def _click_event_handler(self, x, y, fw):
         # print("_click_event_handler")
         for button in self._buttons:
@@ -227,12 +216,7 @@ class ListApp(app_base.AppBase):
             ):
                 label.set_text(file)
 
-        self._left_img.set_pos(
-            self._left_cursor_x, self._left_cursor_y + self._line_spacing * self._cursor_pos
-        )
-        self._right_img.set_pos(
-            self._right_cursor_x, self._right_cursor_y + self._line_spacing * self._cursor_pos
-        )
+        self._draw_cursor()
 
     def _btn_down_event_handler(self, fw):
         # Clear selection cursor
@@ -252,12 +236,7 @@ class ListApp(app_base.AppBase):
             self._cursor_pos = max_cursor_pos
 
         # cursor img
-        self._left_img.set_pos(
-            self._left_cursor_x, self._left_cursor_y + self._cursor_pos * self._line_spacing
-        )
-        self._right_img.set_pos(
-            self._right_cursor_x, self._right_cursor_y + self._cursor_pos * self._line_spacing
-        )
+        self._draw_cursor()
 
         if self._file_pos >= len(self._files):
             self._file_pos = len(self._files) - 1
@@ -286,13 +265,6 @@ class ListApp(app_base.AppBase):
         nvs = esp32.NVS("uiflow")
         nvs.set_u8("boot_option", 2)
         nvs.commit()
-        with open("apps/" + self._files[self._file_pos], "rb") as f_src, open(
-            "main.py", "wb"
-        ) as f_dst:
-            while True:
-                chunk = f_src.read(1024)
-                if not chunk:
-                    break
-                f_dst.write(chunk)
+        app_index.copy("apps/" + self._files[self._file_pos], "main.py")
         time.sleep(0.1)
         machine.reset()
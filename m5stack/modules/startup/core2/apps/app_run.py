@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: MIT
 
 from .. import app_base
+from ... import compositor
 import M5
 import widgets
 import esp32
@@ -24,15 +25,19 @@ class RunApp(app_base.AppBase):
         super().__init__()
 
     def on_install(self):
-        M5.Lcd.drawImage("/system/core2/Selection/appRun_unselected.png", 5 + 62 + 62, 20 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/appRun_unselected.png", 5 + 62 + 62, 20 + 4, 62, 56
+        )
         self.descriptor = app_base.Descriptor(x=5 + 62 + 62, y=20 + 4, w=62, h=56)
 
     def on_launch(self):
         self._mtime_text, self._account_text, self._ver_text = self._get_file_info("main.py")
 
     def on_view(self):
-        M5.Lcd.drawImage("/system/core2/Selection/appRun_selected.png", 5 + 62 + 62, 20 + 4)
-        M5.Lcd.drawImage("/system/core2/Run/run.png", 4, 20 + 4 + 56 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/appRun_selected.png", 5 + 62 + 62, 20 + 4, 62, 56
+        )
+        compositor.screen.draw_image("/system/core2/Run/run.png", 4, 20 + 4 + 56 + 4, 312, 156)
 
         self._name_label = widgets.Label(
             "name",
@@ -43,7 +48,6 @@ class RunApp(app_base.AppBase):
             bg_color=0xEEEEEF,
             font="/system/common/font/Montserrat-Medium-18.vlw",
         )
-        self._name_label.set_text("main.py")
 
         self._mtime_label = widgets.Label(
             "Time: 2023/5/14 12:23:43",
@@ -54,7 +58,6 @@ class RunApp(app_base.AppBase):
             bg_color=0xDCDDDD,
             font="/system/common/font/Montserrat-Medium-16.vlw",
         )
-        self._mtime_label.set_text(self._mtime_text)
 
         self._account_label = widgets.Label(
             "Account: XXABC",
@@ -65,7 +68,6 @@ class RunApp(app_base.AppBase):
             bg_color=0xDCDDDD,
             font="/system/common/font/Montserrat-Medium-16.vlw",
         )
-        self._account_label.set_text(self._account_text)
 
         self._ver_label = widgets.Label(
             "Ver: UIFLOW2.0 a18",
@@ -76,7 +78,6 @@ class RunApp(app_base.AppBase):
             bg_color=0xDCDDDD,
             font="/system/common/font/Montserrat-Medium-16.vlw",
         )
-        self._ver_label.set_text(self._ver_text)
 
         _button_run_once = widgets.Button(None)
         _button_run_once.set_pos(4, 20 + 4 + 56 + 4 + 84)
@@ -89,6 +90,15 @@ class RunApp(app_base.AppBase):
         _button_run_always.add_event(self._handle_run_always)
         self._buttons = (_button_run_once, _button_run_always)
 
+        # The labels go over run.png, so they are drawn after it is flushed.
+        compositor.screen.draw(self._draw_labels, 4, 20 + 4 + 56 + 4, 312, 156)
+
+    def _draw_labels(self):
+        self._name_label.set_text("main.py")
+        self._mtime_label.set_text(self._mtime_text)
+        self._account_label.set_text(self._account_text)
+        self._ver_label.set_text(self._ver_text)
+
     def on_ready(self):
         pass
 
@@ -96,7 +106,9 @@ class RunApp(app_base.AppBase):
         pass
 
     def on_exit(self):
-        M5.Lcd.drawImage("/system/core2/Selection/appRun_unselected.png", 5 + 62 + 62, 20 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/appRun_unselected.png", 5 + 62 + 62, 20 + 4, 62, 56
+        )
         del self._name_label, self._mtime_label, self._account_label, self._ver_label
 
     async def _click_event_handler(self, x, y, fw):
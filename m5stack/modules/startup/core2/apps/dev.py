@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: MIT
 
 from .. import app_base
+from ... import compositor
 import M5
 import widgets
 import asyncio
@@ -41,7 +42,9 @@ class DevApp(app_base.AppBase):
         super().__init__()
 
     def on_install(self):
-        M5.Lcd.drawImage("/system/core2/Selection/develop_unselected.png", 5 + 62, 20 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/develop_unselected.png", 5 + 62, 20 + 4, 62, 56
+        )
         self.descriptor = app_base.Descriptor(x=5 + 62, y=20 + 4, w=62, h=56)
 
     def on_launch(self):
@@ -51,7 +54,9 @@ class DevApp(app_base.AppBase):
         self._avatar_src = self._get_avatar()
 
     def on_view(self):
-        M5.Lcd.drawImage("/system/core2/Selection/develop_selected.png", 5 + 62, 20 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/develop_selected.png", 5 + 62, 20 + 4, 62, 56
+        )
         self._origin_x = 0
         self._origin_y = 80
         self._lcd.clear()
@@ -92,7 +97,7 @@ class DevApp(app_base.AppBase):
         self._avatar_img.set_scale(0.28, 0.28)
         self._avatar_img.set_src(self._avatar_src)
 
-        self._lcd.push(self._origin_x, self._origin_y)
+        compositor.screen.push(self._lcd, self._origin_x, self._origin_y)
 
     async def on_run(self):
         refresh = False
@@ -109,7 +114,7 @@ class DevApp(app_base.AppBase):
             if t != self._account_text or refresh:
                 self._account_text = t
                 self._account_label.set_text(self._account_text)
-                self._lcd.push(self._origin_x, self._origin_y)
+                compositor.screen.push(self._lcd, self._origin_x, self._origin_y)
 
             t = self._get_avatar()
             if t != self._avatar_src:
@@ -123,7 +128,7 @@ class DevApp(app_base.AppBase):
                 self._avatar_img._draw(False)
 
             if refresh:
-                self._lcd.push(self._origin_x, self._origin_y)
+                compositor.screen.push(self._lcd, self._origin_x, self._origin_y)
 
             refresh = False
             await asyncio.sleep_ms(1500)
@@ -134,7 +139,9 @@ class DevApp(app_base.AppBase):
         self._task.cancel()
 
     def on_exit(self):
-        M5.Lcd.drawImage("/system/core2/Selection/develop_unselected.png", 5 + 62, 20 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/develop_unselected.png", 5 + 62, 20 + 4, 62, 56
+        )
         del self._bg_img, self._mac_label, self._account_label, self._avatar_img
 
     async def _click_event_handler(self, x, y, fw):
@@ -165,7 +172,7 @@ class DevApp(app_base.AppBase):
                 except:
                     self._avatar_img.set_src("/system/common/img/avatar.jpg")
                 finally:
-                    self._lcd.push(self._origin_x, self._origin_y)
+                    compositor.screen.push(self._lcd, self._origin_x, self._origin_y)
         else:
             self._avatar_img.set_src("/system/common/img/avatar.jpg")
 
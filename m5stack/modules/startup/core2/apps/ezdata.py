@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: MIT
 
 from .. import app_base
+from ... import compositor
 import M5
 
 
@@ -12,16 +13,20 @@ class EzDataApp(app_base.AppBase):
         super().__init__()
 
     def on_install(self):
-        M5.Lcd.drawImage("/system/core2/Selection/ezdata_unselected.png", 5 + 62 * 4, 20 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/ezdata_unselected.png", 5 + 62 * 4, 20 + 4, 62, 56
+        )
         self.descriptor = app_base.Descriptor(x=5 + 62 + 62 + 62 + 62, y=20 + 4, w=62, h=56)
 
     def on_view(self):
-        M5.Lcd.drawImage("/system/core2/Selection/ezdata_selected.png", 5 + 62 * 4, 20 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/ezdata_selected.png", 5 + 62 * 4, 20 + 4, 62, 56
+        )
 
         self._origin_x = 0
         self._origin_y = 80
         self._lcd.clear()
-        self._lcd.push(self._origin_x, self._origin_y)
+        compositor.screen.push(self._lcd, self._origin_x, self._origin_y)
 
     def on_ready(self):
         pass
@@ -30,9 +35,11 @@ class EzDataApp(app_base.AppBase):
         pass
 
     def on_exit(self):
-        M5.Lcd.drawImage("/system/core2/Selection/ezdata_unselected.png", 5 + 62 * 4, 20 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/ezdata_unselected.png", 5 + 62 * 4, 20 + 4, 62, 56
+        )
         self._lcd.clear()
-        self._lcd.push(self._origin_x, self._origin_y)
+        compositor.screen.push(self._lcd, self._origin_x, self._origin_y)
 
     async def _btna_event_handler(self, fw):
         pass
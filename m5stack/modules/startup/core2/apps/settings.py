@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: MIT
 
 from .. import app_base
+from ... import compositor
 import M5
 import widgets
 import esp32
@@ -306,7 +307,7 @@ class BatteryChargeSetting(app_base.AppBase):
         self._current = next(self._options)
         self._set_charge_current(self._current)
         self._option_img.set_src(_current_options.get(self._current))
-        self._lcd.push(0, 80)
+        compositor.screen.push(self._lcd, 0, 80)
 
     def _get_charge_current(self):
         self.nvs = esp32.NVS("uiflow")
@@ -389,7 +390,7 @@ class BootScreenSetting(app_base.AppBase):
         self._boot_option = next(self._options)
         self._set_boot_option(self._boot_option)
         self._boot_option_img.set_src(_boot_options.get(self._boot_option))
-        self._lcd.push(0, 80)
+        compositor.screen.push(self._lcd, 0, 80)
 
 
 _comlink_options = {
@@ -448,7 +449,7 @@ class ComLinkSetting(app_base.AppBase):
     def _handle_option(self, fw):
         self._option = next(self._options)
         self._option_img.set_src(_comlink_options.get(self._option))
-        self._lcd.push(0, 80)
+        compositor.screen.push(self._lcd, 0, 80)
 
 
 _brightness_options = {
@@ -507,7 +508,7 @@ class BrightnessSetting(app_base.AppBase):
         self._brightness = next(self._options)
         M5.Lcd.setBrightness(self._brightness)
         self._brightness_img.set_src(_brightness_options.get(self._brightness))
-        self._lcd.push(0, 80)
+        compositor.screen.push(self._lcd, 0, 80)
 
     @staticmethod
     def approximate(number):
@@ -572,7 +573,7 @@ class BUSPowerSetting(app_base.AppBase):
         self._option = next(self._options)
         M5.Power.setExtOutput(self._option)
         self._option_img.set_src(_buspower_options.get(self._option))
-        self._lcd.push(0, 80)
+        compositor.screen.push(self._lcd, 0, 80)
 
 
 class SettingsApp(app_base.AppBase):
@@ -590,7 +591,9 @@ class SettingsApp(app_base.AppBase):
         super().__init__()
 
     def on_install(self):
-        M5.Lcd.drawImage("/system/core2/Selection/setting_unselected.png", 5 + 62 * 0, 20 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/setting_unselected.png", 5 + 62 * 0, 20 + 4, 62, 56
+        )
         self.descriptor = app_base.Descriptor(x=5, y=20 + 4, w=62, h=56)
 
     def on_launch(self):
@@ -599,7 +602,9 @@ class SettingsApp(app_base.AppBase):
     def on_view(self):
         self._origin_x = 0
         self._origin_y = 80
-        M5.Lcd.drawImage("/system/core2/Selection/setting_selected.png", 5 + 62 * 0, 20 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/setting_selected.png", 5 + 62 * 0, 20 + 4, 62, 56
+        )
         self._lcd.clear()
 
     def on_ready(self):
@@ -609,19 +614,21 @@ class SettingsApp(app_base.AppBase):
         pass
 
     def on_exit(self):
-        M5.Lcd.drawImage("/system/core2/Selection/setting_unselected.png", 5 + 62 * 0, 20 + 4)
+        compositor.screen.draw_image(
+            "/system/core2/Selection/setting_unselected.png", 5 + 62 * 0, 20 + 4, 62, 56
+        )
 
     async def _click_event_handler(self, x, y, fw):
         for menu in self._menus:
             if hasattr(menu, "_click_event_handler"):
                 await menu._click_event_handler(x, y, fw)
-        self._lcd.push(self._origin_x, self._origin_y)
+        compositor.screen.push(self._lcd, self._origin_x, self._origin_y)
 
     async def _kb_event_handler(self, event, fw):
         for menu in self._menus:
             if hasattr(menu, "_kb_event_handler"):
                 await menu._kb_event_handler(event, fw)
-                self._lcd.push(self._origin_x, self._origin_y)
+                compositor.screen.push(self._lcd, self._origin_x, self._origin_y)
 
     async def _btna_event_handler(self, fw):
         pass
@@ -630,21 +637,21 @@ class SettingsApp(app_base.AppBase):
         await self._menus[0]._btnb_event_handler(fw)
         self._menu_selector.current().pause()
         self._menu_selector.next().resume()
-        self._lcd.push(self._origin_x, self._origin_y)
+        compositor.screen.push(self._lcd, self._origin_x, self._origin_y)
 
     async def _btnc_event_handler(self, fw):
         await self._menu_selector.current()._btnc_event_handler(fw)
-        self._lcd.push(self._origin_x, self._origin_y)
+        compositor.screen.push(self._lcd, self._origin_x, self._origin_y)
 
     def start(self):
         super().start()
         for menu in self._menus:
             menu.install()
         self._menus[0].start()
-        self._lcd.push(self._origin_x, self._origin_y)
+        compositor.screen.push(self._lcd, self._origin_x, self._origin_y)
 
     def stop(self):
         for menu in self._menus:
             menu.stop()
         super().stop()
-        self._lcd.push(self._origin_x, self._origin_y)
+        compositor.screen.push(self._lcd, self._origin_x, self._origin_y)
@@ -3,7 +3,9 @@
 # SPDX-License-Identifier: MIT
 
 from . import app_base
+from .. import compositor
 import asyncio
+import boot_profile
 import M5
 import gc
 import time
@@ -23,6 +25,8 @@ class Framework:
         self._launcher = None
         self._bar = None
         self._last_app = None
+        self._profile = boot_profile.is_enabled()
+        self.switch_ms = 0
 
     def install_bar(self, bar: app_base.AppBase):
         self._bar = bar
@@ -55,6 +59,7 @@ class Framework:
             self._app_selector.select(self._launcher)
             self._launcher.start()
             self._last_app = self._launcher
+        compositor.screen.flush()
 
         self.i2c0 = machine.I2C(0, scl=machine.Pin(33), sda=machine.Pin(32), freq=100000)
         self._kb_status = False
@@ -84,9 +89,7 @@ class Framework:
                                 break
                         if select_app is not None:
                             if self._last_app != select_app and self._last_app is not None:
-                                self._last_app.stop()
-                                select_app.start()
-                                self._last_app = select_app
+                                self._switch(select_app)
                         else:
                             app = self._app_selector.current()
                             if hasattr(app, "_click_event_handler"):
@@ -100,26 +103,32 @@ class Framework:
                     self._event.status = False
                     await self.handle_input(self._event)
 
+            compositor.screen.flush()
             await asyncio.sleep_ms(10)
 
     async def handle_input(self, event: KeyEvent):
         if event.key is KeyCode.KEYCODE_RIGHT:
-            self._last_app.stop()
-            app = self._app_selector.next()
-            app.start()
-            self._last_app = app
+            self._switch(self._app_selector.next())
             event.status = True
         if KeyCode.KEYCODE_LEFT == event.key:
-            self._last_app.stop()
-            app = self._app_selector.prev()
-            app.start()
-            self._last_app = app
+            self._switch(self._app_selector.prev())
             event.status = True
         if event.status is False:
             app = self._app_selector.current()
             if hasattr(app, "_kb_event_handler"):
                 await app._kb_event_handler(event, self)
 
+    def _switch(self, app: app_base.AppBase):
+        # Stop the current tab, start app and draw the result in one flush.
+        t = time.ticks_us()
+        self._last_app.stop()
+        app.start()
+        self._last_app = app
+        compositor.screen.flush()
+        self.switch_ms = time.ticks_diff(time.ticks_us(), t) / 1000
+        if self._profile:
+            print("tab switch: {:.1f} ms".format(self.switch_ms))
+
     async def gc_task(self):
         while True:
             gc.collect()
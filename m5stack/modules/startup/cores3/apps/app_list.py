@@ -2,9 +2,9 @@
 #
 # SPDX-License-Identifier: MIT
 from .. import app_base
+from ... import app_index
 import widgets
 import M5
-import os
 import sys
 import time
 import machine
@@ -29,36 +29,6 @@ class Rectangle:
         self._parent.drawRect(self._x, self._y, self._w, self._h, self._color)
 
 
-class FileList:
-    def __init__(self, dir, suffix=".py") -> None:
-        self.files = []
-        for file in os.listdir(dir):
-            if file.endswith(suffix):
-                self.files.append(file)
-        self.files_len = len(self.files)
-        self.file_pos = 0
-
-    def __contains__(self, item):
-        return item in self.files
-
-    def __getitem__(self, item):
-        return self.files[item]
-
-    # def __iter__(self):
-    #     return iter(self.files)
-
-    # def __next__(self):
-    #     if self.file_pos < self.files_len:
-    #         val = self.files[self.file_pos]
-    #         self.file_pos += 1
-    #         return val
-    #     else:
-    #         raise StopIteration()
-
-    def __len__(self):
-        return self.files_len
-
-
 class ListApp(app_base.AppBase):
     def __init__(self, icos: dict, data=None) -> None:
         super().__init__()
@@ -68,7 +38,7 @@ class ListApp(app_base.AppBase):
         self.descriptor = app_base.Descriptor(x=5 + 62 + 62 + 62, y=20 + 4, w=62, h=56)
 
     def on_launch(self):
-        self._files = FileList("apps")
+        self._files = app_index.AppIndex("apps")
         self._max_file_num = 4 if len(self._files) > 4 else len(self._files)
         self._cursor_pos = 0
         self._file_pos = 0
@@ -247,13 +217,6 @@ class ListApp(app_base.AppBase):
         nvs = esp32.NVS("uiflow")
         nvs.set_u8("boot_option", 2)
         nvs.commit()
-        with open("apps/" + self._files[self._file_pos], "rb") as f_src, open(
-            "main.py", "wb"
-        ) as f_dst:
-            while True:
-                chunk = f_src.read(1024)
-                if not chunk:
-                    break
-                f_dst.write(chunk)
+        app_index.copy("apps/" + self._files[self._file_pos], "main.py")
         time.sleep(0.1)
         machine.reset()
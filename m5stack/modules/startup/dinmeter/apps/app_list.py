@@ -3,12 +3,12 @@
 # SPDX-License-Identifier: MIT
 
 from .. import app_base
+from ... import app_index
 from .. import res
 import widgets
 import M5
 import esp32
 import machine
-import os
 import sys
 
 
@@ -36,36 +36,6 @@ class Rectangle:
         self._parent.drawRect(self._x, self._y, self._w, self._h, self._color)
 
 
-class FileList:
-    def __init__(self, dir, suffix=".py") -> None:
-        self.files = []
-        for file in os.listdir(dir):
-            if file.endswith(suffix):
-                self.files.append(file)
-        self.files_len = len(self.files)
-        self.file_pos = 0
-
-    def __contains__(self, item):
-        return item in self.files
-
-    def __getitem__(self, item):
-        return self.files[item]
-
-    # def __iter__(self):
-    #     return iter(self.files)
-
-    # def __next__(self):
-    #     if self.file_pos < self.files_len:
-    #         val = self.files[self.file_pos]
-    #         self.file_pos += 1
-    #         return val
-    #     else:
-    #         raise StopIteration()
-
-    def __len__(self):
-        return self.files_len
-
-
 class ListApp(app_base.AppBase):
     # log control
     DEBUG = False
@@ -78,7 +48,7 @@ class ListApp(app_base.AppBase):
         pass
 
     def on_launch(self):
-        self._files = FileList("apps")
+        self._files = app_index.AppIndex("apps")
         self._imgs = []
         self._icos = []
         self._labels = []
@@ -262,14 +232,7 @@ class ListApp(app_base.AppBase):
         nvs = esp32.NVS("uiflow")
         nvs.set_u8("boot_option", 2)
         nvs.commit()
-        with open("apps/" + self._files[self._file_pos], "rb") as f_src, open(
-            "main.py", "wb"
-        ) as f_dst:
-            while True:
-                chunk = f_src.read(1024)
-                if not chunk:
-                    break
-                f_dst.write(chunk)
+        app_index.copy("apps/" + self._files[self._file_pos], "main.py")
         machine.reset()
 
     async def _keycode_enter_event_handler(self, fw):
@@ -6,6 +6,7 @@ package(
     "startup",
     (
         "__init__.py",
+        "app_index.py",
         "basic/__init__.py",
         "basic/app_base.py",
         "basic/framework.py",
@@ -6,6 +6,9 @@ package(
     "startup",
     (
         "__init__.py",
+        "app_index.py",
+        "compositor.py",
+        "status_bar.py",
         "cardputer/__init__.py",
         "cardputer/app_base.py",
         "cardputer/framework.py",
@@ -6,6 +6,9 @@ package(
     "startup",
     (
         "__init__.py",
+        "app_index.py",
+        "compositor.py",
+        "status_bar.py",
         "core2/__init__.py",
         "core2/app_base.py",
         "core2/framework.py",
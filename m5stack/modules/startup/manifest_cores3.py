@@ -6,6 +6,9 @@ package(
     "startup",
     (
         "__init__.py",
+        "app_index.py",
+        "compositor.py",
+        "status_bar.py",
         "cores3/__init__.py",
         "cores3/app_base.py",
         "cores3/framework.py",
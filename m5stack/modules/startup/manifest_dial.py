@@ -6,6 +6,7 @@ package(
     "startup",
     (
         "__init__.py",
+        "app_index.py",
         "dial/__init__.py",
         "dial/app_base.py",
         "dial/framework.py",
@@ -6,6 +6,9 @@ package(
     "startup",
     (
         "__init__.py",
+        "app_index.py",
+        "compositor.py",
+        "status_bar.py",
         "dinmeter/__init__.py",
         "dinmeter/app_base.py",
         "dinmeter/framework.py",
@@ -6,6 +6,7 @@ package(
     "startup",
     (
         "__init__.py",
+        "app_index.py",
         "fire/__init__.py",
         "fire/app_base.py",
         "fire/framework.py",
@@ -2,6 +2,7 @@ package(
     "startup",
     (
         "__init__.py",
+        "app_index.py",
         "paper/__init__.py",
         "paper/app_base.py",
         "paper/framework.py",
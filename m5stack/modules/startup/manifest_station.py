@@ -6,6 +6,9 @@ package(
     "startup",
     (
         "__init__.py",
+        "app_index.py",
+        "compositor.py",
+        "status_bar.py",
         "station/__init__.py",
         "station/app_base.py",
         "station/framework.py",
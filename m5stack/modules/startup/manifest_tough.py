@@ -6,6 +6,9 @@ package(
     "startup",
     (
         "__init__.py",
+        "app_index.py",
+        "compositor.py",
+        "status_bar.py",
         "tough/__init__.py",
         "tough/app_base.py",
         "tough/framework.py",
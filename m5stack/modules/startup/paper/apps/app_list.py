@@ -3,9 +3,9 @@
 # SPDX-License-Identifier: MIT
 
 from .. import app_base
+from ... import app_index
 import widgets
 import M5
-import os
 import sys
 
 
@@ -94,36 +94,6 @@ class Rectangle:
         self._parent.fillRect(self._x, self._y, self._w, self._h, self._fg)
 
 
-class FileList:
-    def __init__(self, dir, suffix=".py") -> None:
-        self.files = []
-        for file in os.listdir(dir):
-            if file.endswith(suffix):
-                self.files.append(file)
-        self.files_len = len(self.files)
-        self.file_pos = 0
-
-    def __contains__(self, item):
-        return item in self.files
-
-    def __getitem__(self, item):
-        return self.files[item]
-
-    # def __iter__(self):
-    #     return iter(self.files)
-
-    # def __next__(self):
-    #     if self.file_pos < self.files_len:
-    #         val = self.files[self.file_pos]
-    #         self.file_pos += 1
-    #         return val
-    #     else:
-    #         raise StopIteration()
-
-    def __len__(self):
-        return self.files_len
-
-
 class ListApp(app_base.AppBase):
     def __init__(self, icos: dict, data=None) -> None:
         super().__init__()
@@ -132,7 +102,7 @@ class ListApp(app_base.AppBase):
         self.descriptor = app_base.Descriptor(x=493, y=321, w=48, h=181)
 
     def on_launch(self):
-        self._files = FileList("apps")
+        self._files = app_index.AppIndex("apps")
         self._max_file_num = 9 if len(self._files) > 9 else len(self._files)
         self._file_pos = 0
 
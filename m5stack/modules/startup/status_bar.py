@@ -0,0 +1,247 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Status bar shared by the launchers.
+#
+# The bar only redraws on change events: the clock on the minute boundary,
+# Wi-Fi and cloud when their state changes, the battery when its icon (low,
+# charging) or its percentage changes. Apps may also push a state with the
+# set_*() methods, it is shown on the next flush. Icons are decoded once into
+# canvases of the shared sprite cache (compositor.sprites), and all changed
+# elements are pushed together in one display transaction.
+#
+# A launcher subclasses StatusBar with its icons and layout:
+#
+#     class StatusBarApp(status_bar.StatusBar, app_base.AppBase):
+#         TITLE = "/system/core2/Title/title_blue.png"
+#         ...
+
+from . import compositor
+import M5
+import asyncio
+import network
+import time
+import widgets
+
+try:
+    import M5Things
+
+    _HAS_SERVER = True
+except ImportError:
+    _HAS_SERVER = False
+
+
+class NetworkStatus:
+    INIT = 0
+    RSSI_GOOD = 1
+    RSSI_MID = 2
+    RSSI_WORSE = 3
+    DISCONNECTED = 4
+
+
+class CloudStatus:
+    INIT = 0
+    CONNECTED = 1
+    DISCONNECTED = 2
+
+
+_CLOUD_STATUS = {
+    -2: CloudStatus.DISCONNECTED,
+    -1: CloudStatus.DISCONNECTED,
+    0: CloudStatus.INIT,
+    1: CloudStatus.INIT,
+    2: CloudStatus.CONNECTED,
+    3: CloudStatus.DISCONNECTED,
+}
+
+# Dirty flags of the bar elements.
+_TIME = 1
+_NETWORK = 2
+_CLOUD = 4
+_BATTERY = 8
+_ALL = 15
+
+# Wi-Fi and cloud state checks, the battery level changes slowly.
+_STATE_MS = 5000
+_BATTERY_MS = 30000
+_LOW_BATTERY = 20
+
+
+class StatusBar:
+    # Title image drawn once by on_view(), over TITLE_BG if set.
+    TITLE = None
+    TITLE_BG = None
+    # Background behind the icons.
+    BG = 0xEEEEEF
+    FG = 0x534D4C
+    # (x, y, w, font) of the centered clock and battery labels.
+    TIME = (160, 2, 312, "/system/common/font/Montserrat-Medium-16.vlw")
+    BATTERY_TEXT = (286, 4, 312, "/system/common/font/Montserrat-Medium-10.vlw")
+    BATTERY_TEXT_BG = 0xFEFEFE
+    # (x, y, w, h) of the icons.
+    NETWORK = (214, 0, 20, 20)
+    CLOUD = (239, 0, 20, 20)
+    BATTERY = (264, 0, 56, 20)
+    # {NetworkStatus: path}, {CloudStatus: path}
+    WIFI_ICONS = {}
+    CLOUD_ICONS = {}
+    # (unknown, unknown charging, low, low charging, normal, normal charging)
+    BATTERY_ICONS = ()
+
+    icons = compositor.sprites
+
+    def __init__(self, icos: dict, wifi) -> None:
+        self._wifi = wifi
+        self._wake = asyncio.Event()
+        self._dirty = _ALL
+        self._time_text = ""
+        self._network_status = NetworkStatus.INIT
+        self._cloud_status = CloudStatus.INIT
+        self._battery = (0, False)
+        self._time_label = None
+        self._battery_label = None
+
+    # Events, from the watchers of on_run() or from other apps.
+
+    def set_time(self, text) -> None:
+        self._update(_TIME, "_time_text", text)
+
+    def set_network(self, status) -> None:
+        self._update(_NETWORK, "_network_status", status)
+
+    def set_cloud(self, status) -> None:
+        self._update(_CLOUD, "_cloud_status", status)
+
+    def set_battery(self, level, charging) -> None:
+        self._update(_BATTERY, "_battery", (level, charging))
+
+    def _update(self, flag, attr, value) -> None:
+        if getattr(self, attr) != value:
+            setattr(self, attr, value)
+            self._dirty |= flag
+            self._wake.set()
+
+    # Drawing
+
+    def flush(self) -> None:
+        """Push the changed elements in one display transaction."""
+        dirty = self._dirty
+        if not dirty or self._time_label is None:
+            return
+        self._dirty = 0
+        M5.Lcd.startWrite()
+        try:
+            if dirty & _TIME:
+                self._time_label.set_text(self._time_text)
+            if dirty & _NETWORK:
+                self._push(self.NETWORK, self.WIFI_ICONS.get(self._network_status))
+            if dirty & _CLOUD:
+                self._push(self.CLOUD, self.CLOUD_ICONS.get(self._cloud_status))
+            if dirty & _BATTERY:
+                level, charging = self._battery
+                self._push(self.BATTERY, self._battery_src(level, charging))
+                self._battery_label.set_text("{:d}%".format(level) if 0 < level <= 100 else "")
+        finally:
+            M5.Lcd.endWrite()
+
+    def _push(self, box, path) -> None:
+        x, y, w, h = box
+        if path:
+            self.icons.get(path, w, h, self.BG).push(x, y)
+        else:
+            M5.Lcd.fillRect(x, y, w, h, self.BG)
+
+    def _battery_src(self, level, charging):
+        if not self.BATTERY_ICONS:
+            return None
+        if 0 < level <= 100:
+            i = 2 if level < _LOW_BATTERY else 4
+        else:
+            i = 0
+        return self.BATTERY_ICONS[i + 1 if charging else i]
+
+    def _label(self, spec, bg):
+        x, y, w, font = spec
+        return widgets.Label(
+            "",
+            x,
+            y,
+            w=w,
+            font_align=widgets.Label.CENTER_ALIGNED,
+            fg_color=self.FG,
+            bg_color=bg,
+            font=font,
+        )
+
+    # Watchers
+
+    def _read_time(self) -> int:
+        # Sets the clock, returns the ms until the next minute.
+        t = time.localtime()
+        self.set_time("{:02d}:{:02d}".format(t[3], t[4]))
+        return (60 - t[5]) * 1000
+
+    def _read_state(self) -> None:
+        if self._wifi.connect_status() is network.STAT_GOT_IP:
+            rssi = self._wifi.get_rssi()
+            if rssi <= -80:
+                self.set_network(NetworkStatus.RSSI_WORSE)
+            elif rssi <= -60:
+                self.set_network(NetworkStatus.RSSI_MID)
+            else:
+                self.set_network(NetworkStatus.RSSI_GOOD)
+        else:
+            self.set_network(NetworkStatus.DISCONNECTED)
+        if _HAS_SERVER:
+            self.set_cloud(_CLOUD_STATUS[M5Things.status()])
+        else:
+            self.set_cloud(CloudStatus.DISCONNECTED)
+
+    def _read_battery(self) -> None:
+        self.set_battery(M5.Power.getBatteryLevel(), M5.Power.isCharging())
+
+    # App
+
+    def on_launch(self):
+        self._read_time()
+        self._read_state()
+        self._read_battery()
+
+    def on_view(self):
+        if self.TITLE_BG is not None:
+            M5.Lcd.fillRect(0, 0, M5.Lcd.width(), self.BATTERY[3], self.TITLE_BG)
+        if self.TITLE:
+            M5.Lcd.drawImage(self.TITLE, 0, 0)
+        self._time_label = self._label(self.TIME, self.BG)
+        self._battery_label = self._label(self.BATTERY_TEXT, self.BATTERY_TEXT_BG)
+        self._dirty = _ALL
+        self.flush()
+
+    async def on_run(self):
+        now = time.ticks_ms()
+        clock = time.ticks_add(now, self._read_time())
+        state = time.ticks_add(now, _STATE_MS)
+        battery = time.ticks_add(now, _BATTERY_MS)
+        while True:
+            self.flush()
+            wait = min(
+                time.ticks_diff(clock, now),
+                time.ticks_diff(state, now),
+                time.ticks_diff(battery, now),
+            )
+            if wait > 0:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for_ms(self._wake.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+            now = time.ticks_ms()
+            if time.ticks_diff(now, clock) >= 0:
+                clock = time.ticks_add(now, self._read_time())
+            if time.ticks_diff(now, state) >= 0:
+                state = time.ticks_add(now, _STATE_MS)
+                self._read_state()
+            if time.ticks_diff(now, battery) >= 0:
+                battery = time.ticks_add(now, _BATTERY_MS)
+                self._read_battery()
@@ -5,8 +5,12 @@
 _attrs = {
     "Base": "base",
     "Button": "button",
+    "FontFile": "font",
     "Image": "image",
     "Label": "label",
+    "Metrics": "layout",
+    "Sprite": "sprite",
+    "SpriteSheet": "sprite",
 }
 
 
@@ -0,0 +1,73 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+import struct
+from array import array
+
+_HEADER_SIZE = 24
+_RECORD_SIZE = 28
+
+
+class FontFile:
+    """Metrics of a VLW font file.
+
+    Label draws the font with ``loadFont(path)``, M5GFX then pages the
+    bitmaps from flash itself. Only the glyph codes and advances are read
+    here, for text layout without loading the font into a parent.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._codes = None
+        self._advances = None
+        self.count = 0
+        self.size = 0
+        self.ascent = 0
+        self.descent = 0
+
+    def _open(self):
+        if self._codes is not None:
+            return
+        with open(self.path, "rb") as f:
+            self.count, _, self.size, _, self.ascent, self.descent = struct.unpack(
+                ">6i", f.read(_HEADER_SIZE)
+            )
+            self._codes = array("L")
+            self._advances = bytearray(self.count)
+            record = bytearray(_RECORD_SIZE)
+            for i in range(self.count):
+                f.readinto(record)
+                code, _, _, adv, _, _, _ = struct.unpack(">7i", record)
+                self._codes.append(code)
+                self._advances[i] = adv
+
+    def index(self, code: int) -> int:
+        self._open()
+        lo = 0
+        hi = self.count - 1
+        codes = self._codes
+        while lo <= hi:
+            mid = (lo + hi) >> 1
+            c = codes[mid]
+            if c == code:
+                return mid
+            if c < code:
+                lo = mid + 1
+            else:
+                hi = mid - 1
+        return -1
+
+    def advance(self, code: int) -> int:
+        i = self.index(code)
+        return self._advances[i] if i >= 0 else 0
+
+    def text_width(self, text: str) -> int:
+        w = 0
+        for ch in text:
+            w += self.advance(ord(ch))
+        return w
+
+    def font_height(self) -> int:
+        self._open()
+        return self.ascent + self.descent
@@ -4,6 +4,8 @@
 
 import M5
 from .base import Base
+from . import r565
+from .sprite import Sprite
 
 
 class Image(Base):
@@ -54,27 +56,42 @@ class Image(Base):
         self._draw(False)
 
     def _draw(self, is_decode):
-        if self._src is None or len(self._src) == 0:
+        if not self._src:
             return
-        if self._sprite:
-            is_decode and self._sprite.drawImage(
-                self._src, 0, 0, self._w, self._h, 0, 0, self._scale_x, self._scale_y
-            )
+        if isinstance(self._src, Sprite):
+            # already RGB565, blit it without a canvas
+            self._src.blit(self._x, self._y, self._parent)
+        elif self._sprite:
+            is_decode and self._decode_to_sprite()
             self._sprite.push(self._x, self._y)
+        elif self._is_raw():
+            # pre-decoded at build time, stream it straight to the display
+            r565.draw(self._parent, self._src, self._x, self._y, w=self._w, h=self._h)
         else:
             self._parent.drawImage(
                 self._src, self._x, self._y, self._w, self._h, 0, 0, self._scale_x, self._scale_y
             )
 
+    def _is_raw(self):
+        return isinstance(self._src, str) and self._src.endswith(".r565")
+
+    def _decode_to_sprite(self):
+        if isinstance(self._src, Sprite):
+            self._src.blit(0, 0, self._sprite)
+        elif self._is_raw():
+            r565.draw(self._sprite, self._src, w=self._w, h=self._h)
+        else:
+            self._sprite.drawImage(
+                self._src, 0, 0, self._w, self._h, 0, 0, self._scale_x, self._scale_y
+            )
+
     def _sprite_init(self):
         if self._use_sprite is False:
             return
         self._sprite and self._sprite.delete()
         if self._w != 0 and self._h != 0:
             self._sprite = self._parent.newCanvas(self._w, self._h, 16, True)
-            self._src and self._sprite.drawImage(
-                self._src, 0, 0, self._w, self._h, 0, 0, self._scale_x, self._scale_y
-            )
+            self._src and self._decode_to_sprite()
 
     def clear(self, color):
         if self._sprite:
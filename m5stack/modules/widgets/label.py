@@ -3,6 +3,13 @@
 # SPDX-License-Identifier: MIT
 
 import M5
+from .font import FontFile
+from . import layout
+
+# Font last loaded into each parent by a Label, with its height and the width
+# of _PROBE to notice when other code loaded another font since.
+_fonts = {}
+_PROBE = "Mg0"
 
 
 class Label:
@@ -40,108 +47,75 @@ class Label:
         self._bg_color = bg_color
         self._font = font
         self._parent = parent
-        self._long_fn = self._long_wrap
+        self._long_mode = self.LONG_WARP
+        # (x, y, w, h) covered by the drawn lines
+        self._drawn = None
         self._load_font()
         self._line_spacing = int(self._parent.fontHeight() * 1.2)
 
     def _erase_helper(self):
-        for text in self._texts:
-            w = self._parent.textWidth(text)
-            h = self._parent.fontHeight()
-            if self._font_align == self.LEFT_ALIGNED:
-                self._parent.fillRect(self._x, self._y, w, h, self._bg_color)
-            elif self._font_align == self.CENTER_ALIGNED:
-                self._parent.fillRect(self._x - int(w / 2), self._y, w, h, self._bg_color)
-            elif self._font_align == self.RIGHT_ALIGNED:
-                self._parent.fillRect(self._x - w, self._y, w, h, self._bg_color)
+        if self._drawn is not None:
+            self._parent.fillRect(*self._drawn, self._bg_color)
+            self._drawn = None
 
     def set_text(self, text=None) -> None:
-        self._load_font()
-        self._erase_helper()
-        self._texts.clear()
         if text is not None:
             self._text = text
-        self._long_fn()
-        self._parent.setTextColor(self._fg_color, self._bg_color)
-        yy = self._y
-        for text in self._texts:
-            if self._font_align == self.LEFT_ALIGNED:
-                self._parent.drawString(text, self._x, yy)
-            elif self._font_align == self.CENTER_ALIGNED:
-                self._parent.drawCenterString(text, self._x, yy)
-            elif self._font_align == self.RIGHT_ALIGNED:
-                self._parent.drawRightString(text, self._x, yy)
-            else:
-                print("Warning: unknown alignment")
-            yy += self._line_spacing
-
-    def _long_dot(self):
-        w = self._parent.textWidth(self._text)
-        start = 1
-        end = 0
-        if w < self._max_w:
-            self._texts.append(self._text)
-            return
-
-        while True:
-            ww = self._parent.textWidth(self._text[0:end])
-            if ww > int(self._max_w / 2):
-                end -= 1
-                break
-            end += 1
-
-        start = end
-        w = self._parent.textWidth("...")
-        while True:
-            ww = self._parent.textWidth(self._text[start:-1])
-            if ww < (int(self._max_w / 2) - w):
-                start += 1
-                break
-            start += 1
-
-        self._texts.append(self._text[0:end] + "..." + self._text[start:])
-
-    def _long_wrap(self):
-        if self._parent.textWidth(self._text) < self._max_w:
-            self._texts.append(self._text)
-            return
-
-        start = 0
-        end = 0
-        while end < len(self._text):
-            ww = self._parent.textWidth(self._text[start:end])
-            if ww > self._max_w:
-                self._texts.append(self._text[start:end])
-                start = end
-                end = end + 1
-            end += 1
-
-        if start is not end:
-            self._texts.append(self._text[start:end])
-
-        text_h = self._parent.fontHeight()
-        for _ in self._texts:
-            if sum(text_h for _ in self._texts) > self._max_h:
-                self._texts.pop()
+        parent = self._parent
+        parent.startWrite()
+        try:
+            self._load_font()
+            self._erase_helper()
+            m = layout.metrics(self._font, parent)
+            self._texts, xs, widths = layout.layout(
+                self._text,
+                m,
+                self._max_w,
+                self._max_h,
+                self._long_mode,
+                self._font_align,
+                self._line_spacing,
+            )
+            parent.setTextColor(self._fg_color, self._bg_color)
+            yy = self._y
+            for text, dx in zip(self._texts, xs):
+                parent.drawString(text, self._x + dx, yy)
+                yy += self._line_spacing
+            w = max(widths)
+            if w > 0:
+                x = self._x + min(xs)
+                self._drawn = (x, self._y, w + 1, yy - self._line_spacing - self._y + m.height)
+        finally:
+            parent.endWrite()
 
     def set_text_color(self, fg_color, bg_color):
         self._fg_color = fg_color
         self._bg_color = bg_color
 
     def _load_font(self):
+        parent = self._parent
+        state = _fonts.get(parent)
+        if (
+            state is not None
+            and state[0] is self._font
+            and state[1] == parent.fontHeight()
+            and state[2] == parent.textWidth(_PROBE)
+        ):
+            return
         if isinstance(self._font, bytes):
             self._parent.unloadFont()
             self._parent.loadFont(self._font)
         elif isinstance(self._font, str):
             self._parent.loadFont(self._font)
+        elif isinstance(self._font, FontFile):
+            self._parent.loadFont(self._font.path)
         else:
             self._parent.setFont(self._font)
+        _fonts[parent] = (self._font, parent.fontHeight(), parent.textWidth(_PROBE))
 
     def set_long_mode(self, mode):
-        if mode is self.LONG_DOT:
-            self._long_fn = self._long_dot
-        elif mode is self.LONG_WARP:
-            self._long_fn = self._long_wrap
+        if mode in (self.LONG_WARP, self.LONG_DOT, self.LONG_CLIP):
+            self._long_mode = mode
 
     def set_pos(self, x, y):
         self._x = x
@@ -0,0 +1,159 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+from array import array
+from .font import FontFile
+
+WRAP = 0
+DOT = 1
+CLIP = 2
+
+LEFT = 0
+CENTER = 1
+RIGHT = 2
+
+_FIRST = 32
+_LAST = 127
+_DOTS = "..."
+
+# Metrics by font, layouts by (hash(text), w, h, mode, align, font).
+_metrics = {}
+_layouts = {}
+_LAYOUTS = 32
+
+
+class Metrics:
+    """Advance widths of one font.
+
+    Printable ASCII is measured once into an ``array``, other code points
+    on first use. ``parent`` must have the font loaded while measuring,
+    except for a :class:`FontFile`, which is read directly.
+    """
+
+    def __init__(self, font, parent) -> None:
+        self.font = font
+        self.height = font.font_height() if isinstance(font, FontFile) else parent.fontHeight()
+        self._parent = parent
+        self._ascii = array("H", (self._measure(chr(c)) for c in range(_FIRST, _LAST)))
+        self._other = {}
+
+    def _measure(self, ch) -> int:
+        if isinstance(self.font, FontFile):
+            return self.font.advance(ord(ch))
+        return self._parent.textWidth(ch)
+
+    def advance(self, ch) -> int:
+        c = ord(ch)
+        if _FIRST <= c < _LAST:
+            return self._ascii[c - _FIRST]
+        w = self._other.get(c)
+        if w is None:
+            w = self._other[c] = self._measure(ch)
+        return w
+
+    def width(self, text) -> int:
+        w = 0
+        for ch in text:
+            w += self.advance(ch)
+        return w
+
+
+def metrics(font, parent) -> Metrics:
+    m = _metrics.get(id(font))
+    if m is None or m.font is not font:
+        m = _metrics[id(font)] = Metrics(font, parent)
+    return m
+
+
+def _wrap(text, max_w, max_lines, m) -> list:
+    # Break before the character that would overflow, and at "\n".
+    lines = []
+    start = 0
+    w = 0
+    for i, ch in enumerate(text):
+        if ch == "\n":
+            lines.append((text[start:i], w))
+            start = i + 1
+            w = 0
+            continue
+        a = m.advance(ch)
+        if max_w > 0 and w + a > max_w and i > start:
+            lines.append((text[start:i], w))
+            start = i
+            w = 0
+        w += a
+        if len(lines) >= max_lines:
+            return lines[:max_lines]
+    lines.append((text[start:], w))
+    return lines[:max_lines]
+
+
+def _dot(text, max_w, m) -> tuple:
+    # Keep the head and the tail, "..." in the middle.
+    w = m.width(text)
+    if max_w <= 0 or w <= max_w:
+        return (text, w)
+    half = max_w // 2
+    dots = m.width(_DOTS)
+    head = 0
+    head_w = 0
+    for ch in text:
+        a = m.advance(ch)
+        if head_w + a > half:
+            break
+        head_w += a
+        head += 1
+    tail = len(text)
+    tail_w = 0
+    budget = max_w - head_w - dots
+    while tail > head:
+        a = m.advance(text[tail - 1])
+        if tail_w + a > budget:
+            break
+        tail_w += a
+        tail -= 1
+    return (text[:head] + _DOTS + text[tail:], head_w + dots + tail_w)
+
+
+def _clip(text, max_w, m) -> tuple:
+    w = 0
+    for i, ch in enumerate(text):
+        a = m.advance(ch)
+        if max_w > 0 and w + a > max_w:
+            return (text[:i], w)
+        w += a
+    return (text, w)
+
+
+def layout(text, m, w=0, h=0, mode=WRAP, align=LEFT, line_spacing=0) -> tuple:
+    """
+    Lay ``text`` out in a box ``w`` wide and ``h`` high (0: unbounded).
+
+    Returns ``(lines, xs, widths)``: the lines to draw, their x offsets from
+    the anchor for ``align`` and their widths. Results are cached.
+    """
+    key = (hash(text), w, h, mode, align, id(m))
+    cached = _layouts.get(key)
+    if cached is not None and cached[0] == text:
+        return cached[1]
+    if mode == DOT:
+        lines = [_dot(text, w, m)]
+    elif mode == CLIP:
+        lines = [_clip(text, w, m)]
+    else:
+        step = line_spacing or m.height
+        max_lines = max(1, (h - m.height) // step + 1) if h > 0 else len(text) + 1
+        lines = _wrap(text, w, max_lines, m)
+    texts = []
+    xs = []
+    widths = []
+    for line, lw in lines:
+        texts.append(line)
+        widths.append(lw)
+        xs.append(-(lw // 2) if align == CENTER else -lw if align == RIGHT else 0)
+    result = (texts, xs, widths)
+    if len(_layouts) >= _LAYOUTS:
+        _layouts.clear()
+    _layouts[key] = (text, result)
+    return result
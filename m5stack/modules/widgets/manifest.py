@@ -8,8 +8,12 @@ package(
         "__init__.py",
         "base.py",
         "button.py",
+        "font.py",
         "image.py",
         "label.py",
+        "layout.py",
+        "r565.py",
+        "sprite.py",
     ),
     base_path="..",
     opt=3,
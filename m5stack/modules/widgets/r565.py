@@ -0,0 +1,150 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Reader for the R565 raw images produced by tools/fs_prebuild.py.
+
+import micropython
+import struct
+
+MAGIC = b"R565"
+FLAG_RLE = 0x01
+FLAG_KEY = 0x02
+
+_HEADER = "<4sHHBBHI"
+_HEADER_SIZE = 16
+
+
+def read_header(f):
+    magic, w, h, flags, _, key, size = struct.unpack(_HEADER, f.read(_HEADER_SIZE))
+    if magic != MAGIC:
+        raise ValueError("not a R565 image")
+    return w, h, flags, key, size
+
+
+@micropython.viper
+def _run(buf, start: int, end: int, key: int, opaque: int) -> int:
+    # Index of the first pixel from start whose opacity differs from opaque.
+    p = ptr8(buf)  # noqa: F821
+    i = start
+    while i < end:
+        c = (p[2 * i] << 8) | p[2 * i + 1]
+        o = 0
+        if c != key:
+            o = 1
+        if o != opaque:
+            return i
+        i += 1
+    return end
+
+
+def draw_keyed(parent, strip, x, y, w, rows, key, stride=0):
+    """Draw ``rows`` lines of ``strip`` skipping the ``key`` pixels.
+
+    drawRawBuf() cannot skip pixels, so each run of opaque pixels is one
+    drawRawBuf(). ``stride`` is the line length in pixels, ``w`` by default.
+    """
+    stride = stride or w
+    for r in range(rows):
+        start = r * stride
+        end = start + w
+        i = start
+        while i < end:
+            i = _run(strip, i, end, key, 0)
+            if i >= end:
+                break
+            j = _run(strip, i, end, key, 1)
+            parent.drawRawBuf(strip[2 * i : 2 * j], x + i - start, y + r, j - i, 1, j - i)
+            i = j
+
+
+def _push(parent, mv, x, y, iw, rows, w, key):
+    # rows lines of an iw wide strip, clipped to w pixels.
+    if key is not None:
+        draw_keyed(parent, mv, x, y, w, rows, key, iw)
+    elif w == iw:
+        parent.drawRawBuf(mv, x, y, w, rows, w * rows)
+    else:
+        for r in range(rows):
+            o = r * iw * 2
+            parent.drawRawBuf(mv[o : o + w * 2], x, y + r, w, 1, w)
+
+
+def draw(parent, path, x=0, y=0, rows=8, w=0, h=0):
+    """Stream a R565 image to ``parent``, ``rows`` lines per push.
+
+    Peak RAM is ``width * rows * 2`` bytes (plus the packed payload for RLE
+    images), no decoder runs on the device. ``w``/``h`` clip the image when
+    not 0, pixels of the transparent key are not drawn. Images are sized at
+    build time, they are drawn unscaled.
+    """
+    with open(path, "rb") as f:
+        iw, ih, flags, key, size = read_header(f)
+        key = key if flags & FLAG_KEY else None
+        w = min(w, iw) if w > 0 else iw
+        h = min(h, ih) if h > 0 else ih
+        rows = min(rows, h)
+        buf = bytearray(iw * rows * 2)
+        mv = memoryview(buf)
+        parent.startWrite()
+        try:
+            if flags & FLAG_RLE:
+                _draw_rle(parent, f.read(size), mv, iw, h, x, y, w, key)
+                return iw, ih
+            line = 0
+            while line < h:
+                n = min(rows, h - line)
+                f.readinto(mv[: iw * n * 2])
+                _push(parent, mv[: iw * n * 2], x, y + line, iw, n, w, key)
+                line += n
+        finally:
+            parent.endWrite()
+    return iw, ih
+
+
+def unpack_rle(data, out):
+    """Expand a R565 RLE payload into ``out``, a chunk at a time.
+
+    A generator: yields the number of bytes written each time ``out`` is
+    full and once more for the rest, so an image larger than ``out`` is
+    expanded strip by strip.
+    """
+    cap = len(out)
+    pos = 0
+    i = 0
+    end = len(data)
+    while i < end:
+        c = data[i]
+        i += 1
+        if c & 0x80:
+            n = ((c & 0x7F) + 1) * 2
+            px = data[i : i + 2]
+            i += 2
+        else:
+            n = (c + 1) * 2
+            px = None
+        while n:
+            k = min(n, cap - pos)
+            if px is None:
+                out[pos : pos + k] = data[i : i + k]
+                i += k
+            else:
+                out[pos : pos + k] = px * (k >> 1)
+            pos += k
+            n -= k
+            if pos == cap:
+                yield pos
+                pos = 0
+    if pos:
+        yield pos
+
+
+def _draw_rle(parent, data, buf, iw, h, x, y, w, key):
+    line = 0
+    for n in unpack_rle(data, buf):
+        rows = min(n // (iw * 2), h - line)
+        if rows > 0:
+            _push(parent, buf, x, y + line, iw, rows, w, key)
+        line += rows
+        if line >= h:
+            return
@@ -0,0 +1,175 @@
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# RGB565 sprites blitted with drawRawBuf(), nothing is decoded on the device.
+#
+# Pixels are big endian RGB565 as in the R565 files of tools/fs_prebuild.py
+# and tools/img2r565.py. A sprite either holds them in a bytearray
+# (Sprite.load(), or Sprite(w, h) drawn into by the app) or reads them from
+# an uncompressed R565 file at every blit (Sprite.open()), which costs only
+# a strip buffer. Pixels equal to the transparent key are not drawn.
+
+import M5
+from . import r565
+
+# Scratch buffer for clipped or file backed blits.
+_SCRATCH = 2048
+
+
+class Sprite:
+    """
+    A w x h RGB565 image. ``key`` is the RGB565 color not drawn, None for
+    an opaque sprite.
+    """
+
+    def __init__(self, w, h, buf=None, key=None) -> None:
+        self.w = w
+        self.h = h
+        self.key = key
+        self.buf = bytearray(w * h * 2) if buf is None else buf
+        self._mv = memoryview(self.buf)
+        self._file = None
+        self._offset = 0
+        self._scratch = None
+
+    @classmethod
+    def load(cls, path):
+        """Read a R565 file, compressed or not, into a new sprite."""
+        with open(path, "rb") as f:
+            w, h, flags, key, size = r565.read_header(f)
+            sprite = cls(w, h, key=key if flags & r565.FLAG_KEY else None)
+            if flags & r565.FLAG_RLE:
+                for _ in r565.unpack_rle(f.read(size), sprite.buf):
+                    pass
+            else:
+                f.readinto(sprite.buf)
+        return sprite
+
+    @classmethod
+    def open(cls, path):
+        """
+        Sprite reading its pixels from an uncompressed R565 file at every
+        blit instead of holding them. close() it when done.
+        """
+        f = open(path, "rb")
+        w, h, flags, key, _ = r565.read_header(f)
+        if flags & r565.FLAG_RLE:
+            f.close()
+            raise ValueError("RLE images must be loaded")
+        sprite = cls(0, 0, key=key if flags & r565.FLAG_KEY else None)
+        sprite.w = w
+        sprite.h = h
+        sprite.buf = sprite._mv = None
+        sprite._file = f
+        sprite._offset = f.tell()
+        return sprite
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def fill(self, color) -> None:
+        mv = self._mv
+        mv[0] = color >> 8
+        mv[1] = color & 0xFF
+        # Double the filled part until the buffer is full.
+        n = 2
+        size = len(mv)
+        while n < size:
+            k = min(n, size - n)
+            mv[n : n + k] = mv[:k]
+            n += k
+
+    def _scratch_mv(self, size):
+        if self._scratch is None or len(self._scratch) < size:
+            self._scratch = memoryview(bytearray(max(size, _SCRATCH)))
+        return self._scratch
+
+    def _rows(self, sx, sy, sw, sh):
+        # Yields (memoryview, rows) strips of the source rectangle.
+        stride = self.w * 2
+        if self._file is None and sw == self.w:
+            start = sy * stride
+            yield self._mv[start : start + sh * stride], sh
+            return
+        rows = max(1, min(sh, _SCRATCH // (sw * 2)))
+        scratch = self._scratch_mv(sw * 2 * rows)
+        line = 0
+        while line < sh:
+            n = min(rows, sh - line)
+            if self._file is not None and sw == self.w:
+                self._file.seek(self._offset + (sy + line) * stride)
+                self._file.readinto(scratch[: n * stride])
+                yield scratch[: n * stride], n
+                line += n
+                continue
+            for i in range(n):
+                src = (sy + line + i) * stride + sx * 2
+                dst = scratch[i * sw * 2 : (i + 1) * sw * 2]
+                if self._file is None:
+                    dst[:] = self._mv[src : src + sw * 2]
+                else:
+                    self._file.seek(self._offset + src)
+                    self._file.readinto(dst)
+            yield scratch[: n * sw * 2], n
+            line += n
+
+    def blit(self, x, y, parent=M5.Lcd, src=None) -> None:
+        """
+        Draw the sprite, or its ``src`` (sx, sy, w, h) rectangle, at x, y on
+        parent, clipped to the parent.
+        """
+        sx, sy, sw, sh = src if src is not None else (0, 0, self.w, self.h)
+        sw = min(sw, self.w - sx)
+        sh = min(sh, self.h - sy)
+        if x < 0:
+            sx -= x
+            sw += x
+            x = 0
+        if y < 0:
+            sy -= y
+            sh += y
+            y = 0
+        sw = min(sw, parent.width() - x)
+        sh = min(sh, parent.height() - y)
+        if sw <= 0 or sh <= 0:
+            return
+        parent.startWrite()
+        try:
+            yy = y
+            for strip, n in self._rows(sx, sy, sw, sh):
+                if self.key is None:
+                    parent.drawRawBuf(strip, x, yy, sw, n, sw * n)
+                else:
+                    r565.draw_keyed(parent, strip, x, yy, sw, n, self.key)
+                yy += n
+        finally:
+            parent.endWrite()
+
+
+class SpriteSheet:
+    """
+    Equal tiles of a sprite, numbered left to right, top to bottom:
+
+        sheet = SpriteSheet(Sprite.load("/flash/res/img/wifi.r565"), 20, 20)
+        sheet.blit(level, 214, 0)
+    """
+
+    def __init__(self, sprite, tile_w, tile_h) -> None:
+        self.sprite = sprite
+        self.tile_w = tile_w
+        self.tile_h = tile_h
+        self.columns = sprite.w // tile_w
+        self.count = self.columns * (sprite.h // tile_h)
+
+    def __len__(self):
+        return self.count
+
+    def blit(self, index, x, y, parent=M5.Lcd) -> None:
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        sx = (index % self.columns) * self.tile_w
+        sy = (index // self.columns) * self.tile_h
+        self.sprite.blit(x, y, parent, (sx, sy, self.tile_w, self.tile_h))
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Subset VLW fonts per application.
+#
+# Input fonts can be plain .vlw files or the legacy Python font modules that
+# wrap a VLW blob in a ``FONT = (b"...")`` literal. The output is a VLW file
+# holding only the requested glyphs: a sorted glyph table followed by the
+# bitmaps. The firmware already pages bitmaps of a font loaded by path
+# (``M5.Lcd.loadFont(path)``), so the gain is the flash the dropped glyphs
+# took, which is what is reported per font.
+#
+# Examples:
+#   fontsubset.py -r 0x20-0x7e -o build/font fs/system/common/font/*.vlw
+#   fontsubset.py -c apps/ -r 0x20-0x7e -o build/font MontserratMedium14.py
+
+import argparse
+import ast
+import os
+import struct
+import sys
+
+HEADER = struct.Struct(">6i")
+RECORD = struct.Struct(">7i")
+
+
+def load_blob(path):
+    if path.endswith(".py"):
+        with open(path, "r") as f:
+            tree = ast.parse(f.read(), path)
+        for node in tree.body:
+            if (
+                isinstance(node, ast.Assign)
+                and len(node.targets) == 1
+                and getattr(node.targets[0], "id", None) == "FONT"
+            ):
+                return ast.literal_eval(node.value)
+        raise ValueError("%s: no FONT literal found" % path)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def parse_vlw(blob):
+    count, version, size, pad, ascent, descent = HEADER.unpack_from(blob, 0)
+    glyphs = []
+    offset = HEADER.size + RECORD.size * count
+    for i in range(count):
+        record = RECORD.unpack_from(blob, HEADER.size + RECORD.size * i)
+        n = record[1] * record[2]
+        glyphs.append((record, blob[offset : offset + n]))
+        offset += n
+    header = (version, size, pad, ascent, descent)
+    return header, glyphs, blob[offset:]
+
+
+def build_vlw(header, glyphs, trailer):
+    glyphs = sorted(glyphs, key=lambda g: g[0][0])
+    out = bytearray(HEADER.pack(len(glyphs), *header))
+    for record, _ in glyphs:
+        out += RECORD.pack(*record)
+    for _, bitmap in glyphs:
+        out += bitmap
+    out += trailer
+    return bytes(out)
+
+
+def parse_ranges(text):
+    codes = set()
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part[1:]:
+            lo, hi = part.split("-", 1) if part[0] != "-" else ("-", part[2:])
+            codes.update(range(_parse_code(lo), _parse_code(hi) + 1))
+        else:
+            codes.add(_parse_code(part))
+    return codes
+
+
+def _parse_code(text):
+    text = text.strip()
+    if len(text) == 1:
+        return ord(text)
+    if text.lower().startswith("u+"):
+        return int(text[2:], 16)
+    return int(text, 0)
+
+
+def collect_chars(paths):
+    codes = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in files:
+                    if name.endswith((".py", ".txt", ".json")):
+                        codes.update(_file_chars(os.path.join(root, name)))
+        else:
+            codes.update(_file_chars(path))
+    return codes
+
+
+def _file_chars(path):
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return {ord(ch) for ch in f.read() if ch >= " "}
+
+
+def subset(path, codes):
+    blob = load_blob(path)
+    header, glyphs, trailer = parse_vlw(blob)
+    keep = [g for g in glyphs if g[0][0] in codes]
+    missing = codes.difference(g[0][0] for g in glyphs)
+    return blob, build_vlw(header, keep, trailer), len(glyphs), len(keep), missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Subset VLW fonts per application.")
+    parser.add_argument("fonts", nargs="+", help=".vlw files or FONT = (b'...') modules")
+    parser.add_argument("-o", "--output", required=True, help="output directory")
+    parser.add_argument(
+        "-r",
+        "--ranges",
+        default="",
+        help="comma separated code points or ranges, e.g. '0x20-0x7e,0xb0,U+2026'",
+    )
+    parser.add_argument(
+        "-c",
+        "--chars-from",
+        action="append",
+        default=[],
+        help="file or directory whose characters must be kept (repeatable)",
+    )
+    args = parser.parse_args()
+
+    codes = parse_ranges(args.ranges) | collect_chars(args.chars_from)
+    if not codes:
+        parser.error("nothing to keep, pass --ranges and/or --chars-from")
+
+    os.makedirs(args.output, exist_ok=True)
+    print("%-28s %8s %8s %8s %8s" % ("font", "glyphs", "src", "out", "saved"))
+    for path in args.fonts:
+        blob, out, total, kept, missing = subset(path, codes)
+        name = os.path.splitext(os.path.basename(path))[0]
+        out_path = os.path.join(args.output, name + ".vlw")
+        with open(out_path, "wb") as f:
+            f.write(out)
+
+        # Flash taken by the VLW data, a Python font module holds the same
+        # blob plus the module overhead.
+        print(
+            "%-28s %4d/%-3d %8d %8d %8d"
+            % (name, kept, total, len(blob), len(out), len(blob) - len(out))
+        )
+        if missing:
+            print(
+                "  warning: %d code points not in font: %s"
+                % (len(missing), " ".join("U+%04X" % c for c in sorted(missing)[:16])),
+                file=sys.stderr,
+            )
+
+
+if __name__ == "__main__":
+    main()
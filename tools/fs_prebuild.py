@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Precompile filesystem assets before they are packed by fs_packed.py.
+#
+# The input tree (./fs/system or ./fs/user) is copied into a staging
+# directory with the same layout, which is then handed to fs_packed.py:
+#
+#   - .py files are cross-compiled to .mpy so the device does not compile them
+#     at every boot (boot.py, main.py and apps/ stay source, MicroPython and
+#     the launchers need them as .py).
+#   - with --raw-images, PNG/JPG/BMP images are also decoded on the host
+#     into the R565 raw format (see below), scaled down to fit the board's
+#     LCD. The .r565 file is staged next to the original, which is kept
+#     because the launchers and user code load images by their original
+#     path; code that wants the raw version opens the .r565 path
+#     (widgets.Image, widgets.Sprite).
+#   - every output is stored once in a content-hash cache, so assets shared
+#     between boards (or between boards built in the same run) are only
+#     converted once.
+#   - a manifest.json with sizes and hashes is written next to the staged
+#     tree.
+#
+# R565 raw image format, little endian header:
+#
+#   offset size
+#   0      4    magic b"R565"
+#   4      2    width
+#   6      2    height
+#   8      1    flags, bit0: RLE payload, bit1: transparent key valid
+#   9      1    reserved
+#   10     2    transparent key, RGB565
+#   12     4    payload length in bytes
+#   16          payload, big endian RGB565 pixels (the order drawRawBuf()
+#               expects), or PackBits style RLE of 16 bit pixels: a control
+#               byte c, c < 0x80 -> c + 1 literal pixels follow, otherwise
+#               one pixel follows which is repeated (c & 0x7f) + 1 times.
+#
+# Examples:
+#   fs_prebuild.py -b core2 -i fs/system -o build/fs-stage/system
+#   fs_prebuild.py -b all -i fs/system -o build/fs-stage --raw-images
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+R565_HEADER = struct.Struct("<4sHHBBHI")
+R565_MAGIC = b"R565"
+R565_FLAG_RLE = 0x01
+R565_FLAG_KEY = 0x02
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp")
+
+KEEP_SOURCE = ("boot.py", "main.py", "apps/*")
+
+# LCD size (width, height) per BOARD_TYPE, in the default rotation used by
+# the startup launchers.
+LCD_SIZE = {
+    "airq": (200, 200),
+    "atoms3": (128, 128),
+    "atoms3r": (128, 128),
+    "basic": (320, 240),
+    "cardputer": (240, 135),
+    "core2": (320, 240),
+    "coreink": (200, 200),
+    "cores3": (320, 240),
+    "dial": (240, 240),
+    "dinmeter": (240, 135),
+    "fire": (320, 240),
+    "paper": (540, 960),
+    "station": (240, 135),
+    "stickc": (160, 80),
+    "stickcplus": (240, 135),
+    "stickcplus2": (240, 135),
+    "tough": (320, 240),
+}
+
+
+def sha1_file(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def rgb565(r, g, b):
+    return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+
+
+def rle_encode(pixels):
+    out = bytearray()
+    n = len(pixels) // 2
+    i = 0
+    while i < n:
+        px = pixels[2 * i : 2 * i + 2]
+        run = 1
+        while i + run < n and run < 128 and pixels[2 * (i + run) : 2 * (i + run) + 2] == px:
+            run += 1
+        if run > 1:
+            out.append(0x80 | (run - 1))
+            out += px
+            i += run
+            continue
+        start = i
+        i += 1
+        while i < n and i - start < 128:
+            if i + 1 < n and pixels[2 * i : 2 * i + 2] == pixels[2 * i + 2 : 2 * i + 4]:
+                break
+            i += 1
+        out.append(i - start - 1)
+        out += pixels[2 * start : 2 * i]
+    return bytes(out)
+
+
+def encode_r565(src, max_size, rle=False, key=None):
+    # src is a path or a PIL image.
+    img = src if hasattr(src, "getdata") else Image.open(src)
+    img.load()
+    has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+    img = img.convert("RGBA" if has_alpha else "RGB")
+    if max_size and (img.width > max_size[0] or img.height > max_size[1]):
+        img.thumbnail(max_size)
+    # Images with alpha get a key for their transparent pixels; an explicit
+    # key also makes that color transparent in opaque images (BMP, JPG).
+    flags = 0
+    key565 = 0
+    if has_alpha or key is not None:
+        key565 = key if key is not None else 0xF81F
+        flags |= R565_FLAG_KEY
+    pixels = bytearray(img.width * img.height * 2)
+    i = 0
+    for px in img.getdata():
+        if has_alpha and px[3] < 128:
+            c = key565
+        else:
+            c = rgb565(px[0], px[1], px[2])
+            if has_alpha and c == key565:
+                c ^= 0x0020
+        pixels[i] = c >> 8
+        pixels[i + 1] = c & 0xFF
+        i += 2
+    payload = bytes(pixels)
+    if rle:
+        packed = rle_encode(payload)
+        if len(packed) < len(payload):
+            payload = packed
+            flags |= R565_FLAG_RLE
+    header = R565_HEADER.pack(R565_MAGIC, img.width, img.height, flags, 0, key565, len(payload))
+    return header + payload
+
+
+class Stage:
+    def __init__(self, args):
+        self.args = args
+        self.cache = args.cache
+        os.makedirs(self.cache, exist_ok=True)
+        self.converted = 0
+        self.reused = 0
+        self._mpy_tag = None
+
+    def mpy_tag(self):
+        # Output depends on the compiler version and flags, both go in the key.
+        if self._mpy_tag is None:
+            try:
+                version = subprocess.check_output([self.args.mpy_cross, "--version"])
+            except (OSError, subprocess.CalledProcessError):
+                version = b""
+            h = hashlib.sha1(version)
+            h.update("\0".join(self.args.mpy_cross_flags).encode())
+            self._mpy_tag = h.hexdigest()[:12]
+        return self._mpy_tag
+
+    def _cached(self, digest, suffix, build):
+        path = os.path.join(self.cache, digest + suffix)
+        if os.path.exists(path):
+            self.reused += 1
+            return path
+        data = build()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.converted += 1
+        return path
+
+    def mpy(self, src, rel, digest):
+        def build():
+            out = os.path.join(self.cache, digest + ".build.mpy")
+            subprocess.check_call(
+                [self.args.mpy_cross, "-o", out, "-s", rel] + self.args.mpy_cross_flags + [src]
+            )
+            with open(out, "rb") as f:
+                data = f.read()
+            os.remove(out)
+            return data
+
+        # The source name is embedded too (-s rel).
+        key = hashlib.sha1(rel.replace(os.sep, "/").encode()).hexdigest()[:8]
+        return self._cached("%s-mpy-%s-%s" % (digest, self.mpy_tag(), key), ".mpy", build)
+
+    def raw_image(self, src, digest, max_size):
+        tag = "%s-r565-%dx%d%s" % (digest, max_size[0], max_size[1], "-rle" if self.args.rle else "")
+        return self._cached(tag, ".r565", lambda: encode_r565(src, max_size, self.args.rle))
+
+
+def keep_source(rel):
+    name = rel.replace(os.sep, "/")
+    return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(os.path.basename(name), p) for p in KEEP_SOURCE)
+
+
+def board_roots(src, board):
+    if os.path.basename(os.path.normpath(src)) != "system":
+        return [src]
+    roots = [os.path.join(src, "common")]
+    if board != "none":
+        roots.append(os.path.join(src, board))
+    return [r for r in roots if os.path.isdir(r)]
+
+
+def stage_board(stage, src, dst, board):
+    args = stage.args
+    entries = []
+    max_size = LCD_SIZE.get(board)
+    use_mpy = args.mpy_cross and os.path.exists(args.mpy_cross)
+    use_raw = args.raw_images and Image is not None
+    if args.raw_images and Image is None:
+        print("[ FS Prebuild ] Pillow not installed, images are copied as-is", file=sys.stderr)
+
+    for root in board_roots(src, board):
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name == ".DS_Store":
+                    continue
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, src)
+                digest = sha1_file(path)
+                lower = name.lower()
+                outputs = [(path, rel, "copy")]
+                if lower.endswith(".py") and use_mpy and not keep_source(rel):
+                    outputs = [(stage.mpy(path, rel, digest), rel[:-3] + ".mpy", "mpy")]
+                elif lower.endswith(IMAGE_SUFFIXES) and use_raw and max_size:
+                    # Keep the original, the launchers reference it by path.
+                    raw = stage.raw_image(path, digest, max_size)
+                    outputs.append((raw, os.path.splitext(rel)[0] + ".r565", "r565"))
+                for out, out_rel, kind in outputs:
+                    target = os.path.join(dst, out_rel)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copyfile(out, target)
+                    entries.append(
+                        {
+                            "src": rel.replace(os.sep, "/"),
+                            "dst": out_rel.replace(os.sep, "/"),
+                            "kind": kind,
+                            "sha1": digest,
+                            "src_size": os.path.getsize(path),
+                            "size": os.path.getsize(target),
+                        }
+                    )
+    return entries
+
+
+def write_manifest(path, boards):
+    report = {"boards": {}}
+    seen = {}
+    for board, entries in boards.items():
+        # A .r565 is staged next to its source, count the source once.
+        src_total = sum(e["src_size"] for e in entries if e["kind"] != "r565")
+        out_total = sum(e["size"] for e in entries)
+        report["boards"][board] = {
+            "files": entries,
+            "src_size": src_total,
+            "size": out_total,
+        }
+        for e in entries:
+            seen.setdefault(e["sha1"], set()).add(e["src"])
+        print(
+            "[ FS Prebuild ] %-12s files: %4d  src: %8d  out: %8d"
+            % (board, len(entries), src_total, out_total)
+        )
+    report["duplicates"] = sorted(sorted(v) for v in seen.values() if len(v) > 1)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Precompile filesystem assets before packing.")
+    parser.add_argument("-b", "--board", required=True, help="BOARD_TYPE, or 'all'")
+    parser.add_argument("-i", "--input", required=True, help="fs/system or fs/user tree")
+    parser.add_argument("-o", "--output", required=True, help="staging directory")
+    parser.add_argument(
+        "--mpy-cross",
+        default=os.path.join(here, "..", "micropython", "mpy-cross", "build", "mpy-cross"),
+        help="mpy-cross executable, .py files are copied as-is when it is missing",
+    )
+    parser.add_argument("--mpy-cross-flag", dest="mpy_cross_flags", action="append", default=[])
+    parser.add_argument("--raw-images", action="store_true", help="convert images to R565")
+    parser.add_argument("--rle", action="store_true", help="RLE compress R565 images")
+    parser.add_argument("--cache", default=None, help="content-hash cache directory")
+    parser.add_argument("--manifest", default=None, help="manifest path")
+    args = parser.parse_args()
+
+    if args.cache is None:
+        args.cache = os.path.join(os.path.dirname(os.path.normpath(args.output)), "fs-cache")
+
+    stage = Stage(args)
+    boards = sorted(LCD_SIZE) if args.board == "all" else [args.board]
+    results = {}
+    for board in boards:
+        # One staging tree per board when building all of them, the tree
+        # keeps the "system/<board>" layout littlefs2 filters on.
+        dst = os.path.join(args.output, board) if args.board == "all" else args.output
+        if os.path.isdir(dst):
+            shutil.rmtree(dst)
+        os.makedirs(dst)
+        results[board] = stage_board(stage, args.input, dst, board)
+
+    manifest = args.manifest or os.path.join(
+        os.path.dirname(os.path.normpath(args.output)), "fs-manifest.json"
+    )
+    write_manifest(manifest, results)
+    print(
+        "[ FS Prebuild ] converted: %d  reused from cache: %d  manifest: %s"
+        % (stage.converted, stage.reused, manifest)
+    )
+
+
+if __name__ == "__main__":
+    main()
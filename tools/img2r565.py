@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Convert PNG/JPG/BMP images to R565 sprites for widgets.Sprite.
+#
+# Uses the R565 encoder of fs_prebuild.py (see there for the format). Images
+# with alpha get a transparent key, pixels under 50 % alpha become the key.
+# --key sets that key, and in opaque images makes pixels of that color
+# transparent.
+# Output is uncompressed by default so widgets.Sprite.open() can read it
+# straight from flash; --rle is only worth it for Sprite.load().
+#
+# With --sheet the images are packed, in the order given, into one sprite
+# sheet of equal tiles for widgets.SpriteSheet.
+#
+# Examples:
+#   img2r565.py -o build/res/img res/img/*.png
+#   img2r565.py --sheet 20x20 --columns 5 -o build/res/img/wifi.r565 wifi_*.png
+
+import argparse
+import os
+import sys
+
+from fs_prebuild import Image, encode_r565
+
+
+def parse_size(text):
+    w, _, h = text.lower().partition("x")
+    return (int(w), int(h))
+
+
+def build_sheet(paths, tile, columns):
+    tiles = [Image.open(p) for p in paths]
+    alpha = any(
+        t.mode in ("RGBA", "LA") or (t.mode == "P" and "transparency" in t.info) for t in tiles
+    )
+    columns = columns or len(tiles)
+    rows = (len(tiles) + columns - 1) // columns
+    mode = "RGBA" if alpha else "RGB"
+    sheet = Image.new(mode, (tile[0] * columns, tile[1] * rows), (0, 0, 0, 0) if alpha else 0)
+    for i, t in enumerate(tiles):
+        t = t.convert(mode)
+        if t.size != tile:
+            t = t.resize(tile)
+        sheet.paste(t, ((i % columns) * tile[0], (i // columns) * tile[1]))
+    return sheet
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert images to R565 sprites.")
+    parser.add_argument("images", nargs="+", help="PNG/JPG/BMP files")
+    parser.add_argument(
+        "-o", "--output", required=True, help="output directory, or file for --sheet"
+    )
+    parser.add_argument(
+        "--key", type=lambda v: int(v, 0), default=None, help="RGB565 transparent key"
+    )
+    parser.add_argument("--max", type=parse_size, default=None, help="scale down to fit WxH")
+    parser.add_argument("--rle", action="store_true", help="RLE compress, Sprite.load() only")
+    parser.add_argument("--sheet", type=parse_size, default=None, help="pack as WxH tiles")
+    parser.add_argument("--columns", type=int, default=0, help="tiles per sheet row")
+    args = parser.parse_args()
+
+    if Image is None:
+        parser.error("Pillow is required (pip install pillow)")
+
+    if args.sheet:
+        data = encode_r565(
+            build_sheet(args.images, args.sheet, args.columns), None, args.rle, args.key
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "wb") as f:
+            f.write(data)
+        print("%s: %d tiles, %d bytes" % (args.output, len(args.images), len(data)))
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+    for path in args.images:
+        try:
+            data = encode_r565(path, args.max, args.rle, args.key)
+        except OSError as e:
+            print("%s: %s" % (path, e), file=sys.stderr)
+            continue
+        name = os.path.splitext(os.path.basename(path))[0] + ".r565"
+        out = os.path.join(args.output, name)
+        with open(out, "wb") as f:
+            f.write(data)
+        print("%s -> %s, %d bytes" % (path, out, len(data)))
+
+
+if __name__ == "__main__":
+    main()
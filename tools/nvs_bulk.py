@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2024 M5Stack Technology CO LTD
+#
+# SPDX-License-Identifier: MIT
+
+# Bulk NVS partition generation for device provisioning.
+#
+# Builds on nvs_partition_gen.py (same page layout and entry encoding) but is
+# meant to produce thousands of per-device images in one call:
+#
+#   - the rows shared by every device (namespaces, common settings) are
+#     written once into a page template that is cloned per device;
+#   - encryption is done per page after the entries are laid out: all tweaks
+#     of a page are derived with one AES-ECB call and all entries with a
+#     second one (XTS with one 32 byte data unit per entry, as the NVS
+#     encryption scheme defines it), instead of one XTS cipher per entry;
+#   - devices are spread over a process pool.
+#
+# Library use:
+#
+#   import nvs_bulk
+#   common = [("uiflow", "namespace", "", ""), ("server", "data", "string", "uiflow2.m5stack.com")]
+#   devices = [[("ssid", "data", "string", s), ("pswd", "data", "string", p)] for s, p in creds]
+#   images = nvs_bulk.generate_many(devices, 0x6000, common=common, key=key)
+#
+# Command line (one image per device CSV, the common rows come from --common):
+#
+#   nvs_bulk.py generate --common common.csv --size 0x6000 -o out/ dev1.csv dev2.csv ...
+#   nvs_bulk.py benchmark --devices 1000 --size 0x6000 [--encrypt]
+
+import argparse
+import copy
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import nvs_partition_gen as nvs_gen
+from nvs_partition_gen import InsufficientSizeError, Page
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+PAGE_SIZE = Page.PAGE_PARAMS["max_size"]
+ENTRY_SIZE = Page.SINGLE_ENTRY_SIZE
+MAX_ENTRIES = Page.PAGE_PARAMS["max_entries"]
+
+
+def read_csv(path):
+    """Read a nvs_partition_gen CSV file into a list of (key, type, encoding, value)."""
+    with open(path, "rt", encoding="utf8", newline="") as f:
+        rows = [r for r in csv.reader(f) if r and not r[0].startswith("#")]
+    header = [h.strip() for h in rows[0]]
+    idx = [header.index(name) for name in ("key", "type", "encoding", "value")]
+    return [tuple(r[i].strip() if i < len(r) else "" for i in idx) for r in rows[1:]]
+
+
+class Template:
+    """NVS layout holding the rows shared by every device.
+
+    ``instantiate()`` returns an independent NVS object positioned right after
+    the template rows, so per device only the device rows are encoded.
+    """
+
+    def __init__(self, size, version=2, rows=()):
+        version = Page.VERSION2 if version == 2 else Page.VERSION1
+        # nvs_partition_gen reserves the last page out of the given size.
+        self._nvs = nvs_gen.NVS(None, size - PAGE_SIZE, version)
+        for row in rows:
+            _write_row(self._nvs, row)
+
+    def instantiate(self):
+        nvs = copy.copy(self._nvs)
+        nvs.pages = [_clone_page(p) for p in self._nvs.pages]
+        nvs.cur_page = nvs.pages[-1]
+        return nvs
+
+
+def _clone_page(page):
+    clone = copy.copy(page)
+    clone.page_buf = bytearray(page.page_buf)
+    clone.bitmap_array = copy.copy(page.bitmap_array)
+    return clone
+
+
+def _write_row(nvs, row):
+    key, datatype, encoding, value = row
+    if len(key) > 15:
+        raise nvs_gen.InputError("Length of key `{}` should be <= 15 characters.".format(key))
+    nvs_gen.write_entry(nvs, key, datatype, encoding, value)
+
+
+def _finish(nvs):
+    """Close ``nvs`` like NVS.__exit__ does and return its pages."""
+    while True:
+        try:
+            nvs.create_new_page()
+        except InsufficientSizeError:
+            nvs.size = None
+            nvs.create_new_page(is_rsrv_page=True)
+            break
+    return nvs.pages
+
+
+def _split_key(key):
+    if len(key) != 64:
+        key = bytes.fromhex(key.decode() if isinstance(key, bytes) else key)
+    return key
+
+
+def _gf_mul_x(block):
+    # Multiply a 128 bit little endian tweak by x in GF(2^128), as XTS does
+    # between consecutive AES blocks of a data unit.
+    v = int.from_bytes(block, "little") << 1
+    if v >> 128:
+        v = (v & ((1 << 128) - 1)) ^ 0x87
+    return v.to_bytes(16, "little")
+
+
+def _xor(a, b):
+    return (int.from_bytes(a, "little") ^ int.from_bytes(b, "little")).to_bytes(len(a), "little")
+
+
+def encrypt_page(page_buf, page_num, key):
+    """XTS-encrypt the written entries of one page in place.
+
+    ``key`` is the 64 byte NVS key (data key followed by tweak key). Every
+    written 32 byte entry is its own XTS data unit whose tweak is the entry
+    address relative to the partition start, which is what
+    ``Page.encrypt_entry`` computes one entry at a time.
+    """
+    entries = []
+    bitmap = page_buf[Page.BITMAPARRAY_OFFSET : Page.BITMAPARRAY_OFFSET + 32]
+    for i in range(MAX_ENTRIES):
+        if (bitmap[i >> 2] >> ((i & 3) * 2)) & 3 != 3:
+            entries.append(i)
+    if not entries:
+        return page_buf
+
+    backend = default_backend()
+    data_key = Cipher(algorithms.AES(key[:32]), modes.ECB(), backend=backend).encryptor()
+    tweak_key = Cipher(algorithms.AES(key[32:]), modes.ECB(), backend=backend).encryptor()
+
+    base = page_num * PAGE_SIZE + Page.FIRST_ENTRY_OFFSET
+    tweaks = tweak_key.update(
+        b"".join((base + i * ENTRY_SIZE).to_bytes(16, "little") for i in entries)
+    )
+    masks = bytearray()
+    for n in range(len(entries)):
+        t0 = tweaks[16 * n : 16 * n + 16]
+        masks += t0
+        masks += _gf_mul_x(t0)
+    masks = bytes(masks)
+
+    plain = b"".join(
+        page_buf[Page.FIRST_ENTRY_OFFSET + i * ENTRY_SIZE :][:ENTRY_SIZE] for i in entries
+    )
+    cipher = _xor(data_key.update(_xor(plain, masks)), masks)
+    for n, i in enumerate(entries):
+        offset = Page.FIRST_ENTRY_OFFSET + i * ENTRY_SIZE
+        page_buf[offset : offset + ENTRY_SIZE] = cipher[n * ENTRY_SIZE : (n + 1) * ENTRY_SIZE]
+    return page_buf
+
+
+def build_image(template, rows, key=None):
+    nvs = template.instantiate()
+    for row in rows:
+        _write_row(nvs, row)
+    pages = _finish(nvs)
+    if key is None:
+        return b"".join(p.get_data() for p in pages)
+    key = _split_key(key)
+    return b"".join(bytes(encrypt_page(p.page_buf, n, key)) for n, p in enumerate(pages))
+
+
+_worker_template = None
+
+
+def _init_worker(size, version, common):
+    global _worker_template
+    _worker_template = Template(size, version, common)
+
+
+def _build_chunk(args):
+    chunk, key = args
+    return [build_image(_worker_template, rows, key) for rows in chunk]
+
+
+def generate_many(devices, size, version=2, common=(), key=None, jobs=None, chunk_size=64):
+    """Return one NVS image (bytes) per entry of ``devices``.
+
+    :param devices: iterable of row lists, a row is (key, type, encoding, value)
+        as in the nvs_partition_gen CSV format
+    :param size: partition size in bytes, multiple of 4096
+    :param common: rows written first in every image, encoded only once
+    :param key: 64 byte encryption key (raw or hex), None for plain images
+    :param jobs: worker processes, 1 builds in the calling process
+    """
+    if size % PAGE_SIZE:
+        raise ValueError("Size of partition must be multiple of 4096")
+    devices = list(devices)
+    common = list(common)
+    if jobs == 1 or len(devices) <= chunk_size:
+        template = Template(size, version, common)
+        return [build_image(template, rows, key) for rows in devices]
+
+    chunks = [devices[i : i + chunk_size] for i in range(0, len(devices), chunk_size)]
+    images = []
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker, initargs=(size, version, common)
+    ) as pool:
+        for result in pool.map(_build_chunk, [(c, key) for c in chunks]):
+            images.extend(result)
+    return images
+
+
+def benchmark(args):
+    common = [
+        ("uiflow", "namespace", "", ""),
+        ("server", "data", "string", "uiflow2.m5stack.com"),
+        ("boot_option", "data", "u8", "1"),
+        ("tz", "data", "string", "GMT0"),
+    ]
+    devices = [
+        [
+            ("ssid0", "data", "string", "factory-ap-%04d" % n),
+            ("pswd0", "data", "string", "secret-%08x" % (n * 2654435761 & 0xFFFFFFFF)),
+            ("token", "data", "hex2bin", "%032x" % n),
+            ("board_id", "data", "u32", str(n)),
+        ]
+        for n in range(args.devices)
+    ]
+    key = os.urandom(64) if args.encrypt else None
+    size = int(args.size, 0)
+
+    t = time.perf_counter()
+    generate_many(devices, size, common=common, key=key, jobs=args.jobs)
+    elapsed = time.perf_counter() - t
+    print(
+        "%d images (%s, %d bytes each) in %.2f s: %.1f images/s"
+        % (
+            args.devices,
+            "encrypted" if args.encrypt else "plain",
+            size,
+            elapsed,
+            args.devices / elapsed,
+        )
+    )
+
+
+def generate(args):
+    common = read_csv(args.common) if args.common else []
+    devices = [read_csv(path) for path in args.inputs]
+    key = None
+    if args.inputkey:
+        with open(args.inputkey, "rb") as f:
+            key = f.read(64)
+    images = generate_many(
+        devices, int(args.size, 0), args.version, common, key=key, jobs=args.jobs
+    )
+    os.makedirs(args.outdir, exist_ok=True)
+    for path, image in zip(args.inputs, images):
+        out = os.path.join(args.outdir, os.path.splitext(os.path.basename(path))[0] + ".bin")
+        with open(out, "wb") as f:
+            f.write(image)
+    print("Created %d NVS binaries in %s" % (len(images), args.outdir))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk NVS partition generation")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="one image per device CSV")
+    gen.add_argument("inputs", nargs="+", help="device CSV files")
+    gen.add_argument("--common", help="CSV with the rows shared by every device")
+    gen.add_argument("--size", required=True, help="partition size, e.g. 0x6000")
+    gen.add_argument("--version", type=int, choices=[1, 2], default=2)
+    gen.add_argument("--inputkey", help="64 byte key file, enables encryption")
+    gen.add_argument("--jobs", type=int, default=None)
+    gen.add_argument("-o", "--outdir", default=os.getcwd())
+    gen.set_defaults(func=generate)
+
+    bench = sub.add_parser("benchmark", help="report images per second")
+    bench.add_argument("--devices", type=int, default=1000)
+    bench.add_argument("--size", default="0x6000")
+    bench.add_argument("--encrypt", action="store_true")
+    bench.add_argument("--jobs", type=int, default=None)
+    bench.set_defaults(func=benchmark)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()